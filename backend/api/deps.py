@@ -1,9 +1,14 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, object_session
 from backend.database import get_db
 from backend.utils.security import verify_token
-from backend.database.user_models import User
+from backend.database.user_models import User, Permission
+from backend.services.user.effective_permission_service import has_any_permission
+from backend.services.user.permission_catalog import permission_catalog
+from backend.services.user.principal_service import load_principal
+from backend.services.user.service_account_service import is_api_key, authenticate_api_key
 from typing import Optional, List
 import jwt
 
@@ -16,9 +21,12 @@ def get_current_user(
     db: Session = Depends(get_db)
 ) -> User:
     """
-    从 JWT 令牌中获取当前认证用户
+    从 JWT 令牌或服务账户的 API 密钥中获取当前认证用户
     """
     token = credentials.credentials
+    if is_api_key(token):
+        return _get_api_key_user(db, token)
+    
     payload = verify_token(token)
     
     if payload is None:
@@ -36,7 +44,8 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.username == username).first()
+    # 同一用户的并发请求共享一次加载
+    user = load_principal(db, payload.get("user_id"), username)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -54,6 +63,61 @@ def get_current_user(
     return user
 
 
+def _get_api_key_user(db: Session, key: str) -> User:
+    """
+    通过 API 密钥认证，有效权限为账户权限与密钥范围的交集
+    """
+    principal = authenticate_api_key(db, key)
+    user = load_principal(db, principal.user_id, principal.username) if principal is not None else None
+    if user is None or not user.status:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无效的 API 密钥",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    user.effective_permission_ids = user.effective_permission_ids & principal.scope_ids
+    # 按用户ID查询数据库的权限判断（如资源 ACL）需要据此收窄
+    user.api_key_scope_ids = principal.scope_ids
+    return user
+
+
+def _permission_ids(db: Session, permission_names: List[str]) -> List[int]:
+    """
+    通过权限目录将权限名称解析为ID，目录未命中时回退到数据库
+    """
+    permission_catalog.ensure_fresh(db)
+    ids = []
+    for name in permission_names:
+        permission_id = permission_catalog.get_id(name)
+        if permission_id is None:
+            permission_id = db.execute(select(Permission.id).where(Permission.name == name)).scalar()
+        if permission_id is not None:
+            ids.append(permission_id)
+    return ids
+
+
+def _has_any_permission(user: User, permission_names: List[str]) -> bool:
+    """
+    检查用户是否拥有任意一个指定权限
+
+    优先使用加载主体时读取的有效权限ID；用户绑定在会话上时对有效权限表做主键探测，
+    否则遍历已加载的角色与权限。
+    """
+    db = object_session(user)
+    permission_ids = getattr(user, "effective_permission_ids", None)
+    if permission_ids is not None and db is not None:
+        return not permission_ids.isdisjoint(_permission_ids(db, permission_names))
+    if db is not None:
+        return has_any_permission(db, user.id, _permission_ids(db, permission_names))
+
+    user_permissions = set()
+    for role in user.roles:
+        for perm in role.permissions:
+            user_permissions.add(perm.name)
+    return any(perm in user_permissions for perm in permission_names)
+
+
 def require_permission(permission_name: str):
     """
     依赖项，用于检查当前用户是否具有特定权限
@@ -61,14 +125,8 @@ def require_permission(permission_name: str):
     def permission_checker(
         current_user: User = Depends(get_current_user)
     ) -> bool:
-        # 从用户角色获取用户权限
-        user_permissions = set()
-        for role in current_user.roles:
-            for perm in role.permissions:
-                user_permissions.add(perm.name)
-        
         # 检查用户是否具有所需权限
-        if permission_name not in user_permissions:
+        if not _has_any_permission(current_user, [permission_name]):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"需要权限 '{permission_name}'"
@@ -86,15 +144,8 @@ def require_any_permission(permission_names: List[str]):
     def permission_checker(
         current_user: User = Depends(get_current_user)
     ) -> bool:
-        # 从用户角色获取用户权限
-        user_permissions = set()
-        for role in current_user.roles:
-            for perm in role.permissions:
-                user_permissions.add(perm.name)
-        
         # 检查用户是否至少具有一个所需权限
-        has_permission = any(perm in user_permissions for perm in permission_names)
-        if not has_permission:
+        if not _has_any_permission(current_user, permission_names):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"需要以下权限之一: {', '.join(permission_names)}"
@@ -112,6 +163,13 @@ def require_role(role_name: str):
     def role_checker(
         current_user: User = Depends(get_current_user)
     ) -> bool:
+        # API 密钥的权限限于其范围，角色成员身份不能代表密钥的授权
+        if getattr(current_user, "api_key_scope_ids", None) is not None:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"需要角色 '{role_name}'，API 密钥不能用于角色检查"
+            )
+        
         # 检查用户是否具有所需角色
         user_roles = [role.name for role in current_user.roles]
         if role_name not in user_roles:
@@ -0,0 +1,96 @@
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.orm import Session
+from backend.config import settings
+from backend.database import get_db
+from backend.schemas.acl import ResourceAclGrant, ResourceAclFilter, ResourceAclFilterResult
+from backend.services.user.acl_service import grant_resource_access, revoke_resource_access, filter_accessible
+from backend.utils.responses import success_response, error_response, create_json_response
+from backend.api.deps import require_permission, get_current_user
+from backend.database.user_models import User
+from backend.constants.permissions import PERMISSIONS
+
+router = APIRouter()
+
+
+@router.post("/acl/grants", response_model=dict)
+async def grant_resource_acl(
+    grant_data: ResourceAclGrant,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    授予用户或角色对一批资源的指定权限
+    需要: permission:update 权限
+    """
+    # 检查用户是否有更新权限的权限
+    require_permission(PERMISSIONS["PERMISSION_UPDATE"])(current_user)
+    
+    granted = grant_resource_access(
+        db, grant_data.resource_type, grant_data.resource_ids, grant_data.permission,
+        grant_data.subject_type, grant_data.subject_id
+    )
+    if granted is None:
+        response = error_response(error="权限或授权主体未找到", message="授权失败", code=status.HTTP_404_NOT_FOUND)
+        return create_json_response(response)
+    
+    response = success_response(data={"granted": granted}, message="授权成功")
+    return create_json_response(response)
+
+
+@router.delete("/acl/grants", response_model=dict)
+async def revoke_resource_acl(
+    grant_data: ResourceAclGrant,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    撤销用户或角色对一批资源的指定权限
+    需要: permission:update 权限
+    """
+    # 检查用户是否有更新权限的权限
+    require_permission(PERMISSIONS["PERMISSION_UPDATE"])(current_user)
+    
+    revoked = revoke_resource_access(
+        db, grant_data.resource_type, grant_data.resource_ids, grant_data.permission,
+        grant_data.subject_type, grant_data.subject_id
+    )
+    if revoked is None:
+        response = error_response(error="权限未找到", message="撤销失败", code=status.HTTP_404_NOT_FOUND)
+        return create_json_response(response)
+    
+    response = success_response(data={"revoked": revoked}, message="撤销成功")
+    return create_json_response(response)
+
+
+@router.post("/acl/filter", response_model=dict)
+async def filter_resource_acl(
+    filter_data: ResourceAclFilter,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    将一批资源ID过滤为用户有权访问的部分（保持输入顺序）
+    默认针对当前用户；查询其他用户时需要: user:read 权限
+    """
+    user_id = filter_data.user_id if filter_data.user_id is not None else current_user.id
+    if user_id != current_user.id:
+        require_permission(PERMISSIONS["USER_READ"])(current_user)
+    
+    if len(filter_data.resource_ids) > settings.ACL_FILTER_MAX_IDS:
+        response = error_response(
+            error=f"单次最多过滤 {settings.ACL_FILTER_MAX_IDS} 个资源ID",
+            message="过滤失败",
+            code=status.HTTP_400_BAD_REQUEST
+        )
+        return create_json_response(response)
+    
+    # 查询当前用户时使用认证主体的有效权限与 API 密钥范围，查询其他用户时按其数据库中的授权判断
+    own = user_id == current_user.id
+    resource_ids = filter_accessible(
+        db, user_id, filter_data.resource_type, filter_data.permission, filter_data.resource_ids,
+        permission_ids=getattr(current_user, "effective_permission_ids", None) if own else None,
+        scope_ids=getattr(current_user, "api_key_scope_ids", None) if own else None,
+    )
+    result = ResourceAclFilterResult(resource_ids=resource_ids)
+    response = success_response(data=result.model_dump(), message="过滤成功")
+    return create_json_response(response)
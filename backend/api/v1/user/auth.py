@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from backend.database import get_db
 from backend.schemas.user import UserCreate, UserResponse, Token
-from backend.services.auth_service import authenticate_user, register_user, create_access_token_for_user
+from backend.services.user.auth_service import authenticate_user, register_user, create_access_token_for_user
 from backend.utils.responses import success_response, error_response, create_json_response
+from backend.utils.rate_limit import login_rate_limiter, client_ip
+from backend.config import settings
 
 router = APIRouter()
 
@@ -33,21 +35,40 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """
     登录端点，返回 JWT 令牌
+
+    按客户端IP与用户名限流，超限请求在查询数据库和校验密码之前即被拒绝。
+    用户名的限额只计算认证失败的尝试。
     """
+    rate_limit_headers = {}
+    ip = client_ip(request)
+    if settings.LOGIN_RATE_LIMIT_ENABLED:
+        limit = login_rate_limiter.check(ip, form_data.username)
+        rate_limit_headers = limit.headers()
+        if not limit.allowed:
+            response = error_response(error="登录尝试过于频繁，请稍后再试", message="请求过多", code=status.HTTP_429_TOO_MANY_REQUESTS)
+            return _with_headers(create_json_response(response), rate_limit_headers)
+    
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
+        if settings.LOGIN_RATE_LIMIT_ENABLED:
+            login_rate_limiter.record_failure(ip, form_data.username)
         response = error_response(error="用户名或密码错误", message="认证失败", code=status.HTTP_401_UNAUTHORIZED)
-        return create_json_response(response)
+        return _with_headers(create_json_response(response), rate_limit_headers)
     
     if not user.status:
         response = error_response(error="用户账户已停用", message="账户已停用", code=status.HTTP_401_UNAUTHORIZED)
-        return create_json_response(response)
+        return _with_headers(create_json_response(response), rate_limit_headers)
     
-    access_token = create_access_token_for_user(user)
+    access_token = create_access_token_for_user(db, user)
     token = Token(access_token=access_token, token_type="bearer")
     
     response = success_response(data=token, message="登录成功")
-    return create_json_response(response)
\ No newline at end of file
+    return _with_headers(create_json_response(response), rate_limit_headers)
+
+
+def _with_headers(response, headers: dict):
+    response.headers.update(headers)
+    return response
\ No newline at end of file
@@ -0,0 +1,92 @@
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from backend.config import settings
+from backend.database import get_db
+from backend.schemas.change_feed import ChangeEvent, ChangeFeedPage
+from backend.services.user.change_feed import change_feed
+from backend.services.user.outbox_service import get_changes, latest_sequence, needs_reset
+from backend.utils.responses import success_response, create_json_response
+from backend.api.deps import require_permission, get_current_user
+from backend.database.user_models import User
+from backend.constants.permissions import PERMISSIONS
+
+router = APIRouter()
+
+
+def _require_feed_permissions(current_user: User) -> None:
+    # 变更流包含全部 RBAC 数据的变更，需要同时具备三类读取权限
+    require_permission(PERMISSIONS["ROLE_READ"])(current_user)
+    require_permission(PERMISSIONS["PERMISSION_READ"])(current_user)
+    require_permission(PERMISSIONS["USER_READ"])(current_user)
+
+
+@router.get("/changes", response_model=ChangeFeedPage)
+async def list_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    按序号增量读取 RBAC 变更事件，since 为上一次返回的 next_since
+    需要: role:read、permission:read 与 user:read 权限
+    """
+    _require_feed_permissions(current_user)
+    
+    changes, next_since, reset = get_changes(db, since, min(limit, settings.CHANGE_FEED_MAX_LIMIT))
+    page = ChangeFeedPage(
+        events=[ChangeEvent(**change) for change in changes],
+        next_since=next_since,
+        reset=reset
+    )
+    response = success_response(data=page, message="变更获取成功")
+    return create_json_response(response)
+
+
+def _sse(event: str, data, event_id: Optional[int] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@router.get("/changes/stream")
+async def stream_changes(
+    since: Optional[int] = Query(None, ge=0),
+    last_event_id: Optional[int] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    以 Server-Sent Events 推送 RBAC 变更事件，事件 id 为变更序号
+    断线重连时浏览器自动发送 Last-Event-ID；未指定 since 时只推送之后的新变更。
+    需要: role:read、permission:read 与 user:read 权限
+    """
+    _require_feed_permissions(current_user)
+    
+    position = last_event_id if last_event_id is not None else since
+    reset = position is not None and needs_reset(db, position)
+    if position is None or reset:
+        position = latest_sequence(db)
+    # 依赖的清理要等响应体结束才执行，长连接期间不能占用连接池；之后只使用进程内共享的轮询器
+    db.close()
+    
+    async def events():
+        if reset:
+            # 请求的位置之后的事件已被清理，消费者需要重新读取完整数据后从 since 继续
+            yield _sse("reset", {"since": position}, position)
+        async for change in change_feed.subscribe(position):
+            if change is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield _sse(change["event_type"], change, change["id"])
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,300 @@
+from typing import List
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.orm import Session
+from backend.database import get_db
+from backend.schemas.group import GroupCreate, GroupUpdate, GroupResponse, GroupMembersChange, GroupRolesReplace
+from backend.schemas.user import MembershipChange, UserInDB
+from backend.services.user.group_service import (
+    get_group_by_id, get_groups, create_group, update_group, delete_group, get_group_role_names,
+    get_parent_ids, get_child_ids, get_group_members, add_group_members, remove_group_members,
+    add_child_group, remove_child_group, replace_group_roles
+)
+from backend.utils.responses import success_response, error_response, create_json_response
+from backend.api.deps import require_permission, get_current_user
+from backend.database.user_models import User
+from backend.constants.permissions import PERMISSIONS
+
+router = APIRouter()
+
+
+def _group_response(db: Session, group) -> GroupResponse:
+    return GroupResponse(
+        id=group.id,
+        name=group.name,
+        description=group.description,
+        created_at=group.created_at,
+        updated_at=group.updated_at,
+        roles=get_group_role_names(db, group.id),
+        parent_ids=get_parent_ids(db, group.id),
+        child_ids=get_child_ids(db, group.id)
+    )
+
+
+def _group_not_found():
+    response = error_response(error="用户组未找到", message="用户组未找到", code=status.HTTP_404_NOT_FOUND)
+    return create_json_response(response)
+
+
+@router.get("/groups", response_model=List[GroupResponse])
+async def list_groups(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取用户组列表
+    需要: user:read 权限
+    """
+    # 检查用户是否有读取用户的权限
+    require_permission(PERMISSIONS["USER_READ"])(current_user)
+    
+    groups = get_groups(db, skip=skip, limit=limit)
+    response = success_response(data=[_group_response(db, group) for group in groups], message="用户组获取成功")
+    return create_json_response(response)
+
+
+@router.post("/groups", response_model=GroupResponse)
+async def create_new_group(
+    group_data: GroupCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    创建用户组
+    需要: user:create 权限
+    """
+    # 检查用户是否有创建用户的权限
+    require_permission(PERMISSIONS["USER_CREATE"])(current_user)
+    
+    try:
+        group = create_group(db, group_data)
+    except ValueError as e:
+        response = error_response(error=str(e), message="用户组创建失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
+    
+    response = success_response(data=_group_response(db, group), message="用户组创建成功")
+    return create_json_response(response)
+
+
+@router.get("/groups/{group_id}", response_model=GroupResponse)
+async def read_group(
+    group_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取用户组详情，包括角色与直接的父组、子组
+    需要: user:read 权限
+    """
+    # 检查用户是否有读取用户的权限
+    require_permission(PERMISSIONS["USER_READ"])(current_user)
+    
+    group = get_group_by_id(db, group_id)
+    if not group:
+        return _group_not_found()
+    
+    response = success_response(data=_group_response(db, group), message="用户组获取成功")
+    return create_json_response(response)
+
+
+@router.put("/groups/{group_id}", response_model=GroupResponse)
+async def update_existing_group(
+    group_id: int,
+    group_update: GroupUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    更新用户组
+    需要: user:update 权限
+    """
+    # 检查用户是否有更新用户的权限
+    require_permission(PERMISSIONS["USER_UPDATE"])(current_user)
+    
+    try:
+        group = update_group(db, group_id, group_update)
+    except ValueError as e:
+        response = error_response(error=str(e), message="用户组更新失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
+    
+    if not group:
+        return _group_not_found()
+    
+    response = success_response(data=_group_response(db, group), message="用户组更新成功")
+    return create_json_response(response)
+
+
+@router.delete("/groups/{group_id}")
+async def delete_existing_group(
+    group_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    删除用户组，其成员、角色与嵌套关系一并移除
+    需要: user:delete 权限
+    """
+    # 检查用户是否有删除用户的权限
+    require_permission(PERMISSIONS["USER_DELETE"])(current_user)
+    
+    if not delete_group(db, group_id):
+        return _group_not_found()
+    
+    response = success_response(message="用户组删除成功")
+    return create_json_response(response)
+
+
+@router.get("/groups/{group_id}/members", response_model=dict)
+async def list_group_members(
+    group_id: int,
+    cursor: int = 0,
+    limit: int = 100,
+    recursive: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取用户组的成员，cursor 为上一页最后一个用户ID
+    recursive 为 true 时包含全部嵌套子组的成员
+    需要: user:read 权限
+    """
+    # 检查用户是否有读取用户的权限
+    require_permission(PERMISSIONS["USER_READ"])(current_user)
+    
+    if not get_group_by_id(db, group_id):
+        return _group_not_found()
+    
+    limit = max(1, min(limit, 1000))
+    members = [
+        UserInDB.model_validate(user)
+        for user in get_group_members(db, group_id, after_id=cursor, limit=limit, recursive=recursive)
+    ]
+    next_cursor = members[-1].id if len(members) == limit else None
+    response = success_response(data={"users": members, "next_cursor": next_cursor}, message="成员获取成功")
+    return create_json_response(response)
+
+
+@router.post("/groups/{group_id}/members", response_model=MembershipChange)
+async def add_members_to_group(
+    group_id: int,
+    members_data: GroupMembersChange,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    将用户加入用户组，返回新加入的用户ID
+    需要: user:update 权限
+    """
+    # 检查用户是否有更新用户的权限
+    require_permission(PERMISSIONS["USER_UPDATE"])(current_user)
+    
+    try:
+        change = add_group_members(db, group_id, members_data.user_ids)
+    except ValueError as e:
+        response = error_response(error=str(e), message="添加成员失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
+    
+    if change is None:
+        return _group_not_found()
+    
+    response = success_response(data=change, message="成员添加成功")
+    return create_json_response(response)
+
+
+@router.delete("/groups/{group_id}/members", response_model=MembershipChange)
+async def remove_members_from_group(
+    group_id: int,
+    members_data: GroupMembersChange,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    将用户移出用户组，返回被移出的用户ID
+    需要: user:update 权限
+    """
+    # 检查用户是否有更新用户的权限
+    require_permission(PERMISSIONS["USER_UPDATE"])(current_user)
+    
+    change = remove_group_members(db, group_id, members_data.user_ids)
+    if change is None:
+        return _group_not_found()
+    
+    response = success_response(data=change, message="成员移除成功")
+    return create_json_response(response)
+
+
+@router.put("/groups/{group_id}/children/{child_id}")
+async def add_child_to_group(
+    group_id: int,
+    child_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    将 child_id 组嵌套到用户组中，不允许形成环
+    需要: user:update 权限
+    """
+    # 检查用户是否有更新用户的权限
+    require_permission(PERMISSIONS["USER_UPDATE"])(current_user)
+    
+    try:
+        success = add_child_group(db, group_id, child_id)
+    except ValueError as e:
+        response = error_response(error=str(e), message="嵌套失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
+    
+    if not success:
+        return _group_not_found()
+    
+    response = success_response(message="子组添加成功")
+    return create_json_response(response)
+
+
+@router.delete("/groups/{group_id}/children/{child_id}")
+async def remove_child_from_group(
+    group_id: int,
+    child_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    解除 child_id 组与用户组的嵌套关系
+    需要: user:update 权限
+    """
+    # 检查用户是否有更新用户的权限
+    require_permission(PERMISSIONS["USER_UPDATE"])(current_user)
+    
+    if not remove_child_group(db, group_id, child_id):
+        response = error_response(error="嵌套关系不存在", message="移除失败", code=status.HTTP_404_NOT_FOUND)
+        return create_json_response(response)
+    
+    response = success_response(message="子组已移除")
+    return create_json_response(response)
+
+
+@router.put("/groups/{group_id}/roles", response_model=MembershipChange)
+async def replace_group_roles_endpoint(
+    group_id: int,
+    roles_data: GroupRolesReplace,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    以集合语义替换用户组的全部角色，返回新增和移除的角色ID
+    需要: user:update 权限
+    """
+    # 检查用户是否有更新用户的权限
+    require_permission(PERMISSIONS["USER_UPDATE"])(current_user)
+    
+    try:
+        change = replace_group_roles(db, group_id, roles_data.role_ids)
+    except ValueError as e:
+        response = error_response(error=str(e), message="角色替换失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
+    
+    if change is None:
+        return _group_not_found()
+    
+    response = success_response(data=change, message="角色替换成功")
+    return create_json_response(response)
@@ -0,0 +1,95 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.orm import Session
+from backend.database import get_db
+from backend.schemas.job import JobCreate, JobResponse
+from backend.services.user.job_service import enqueue_job, get_job_by_id, get_jobs
+from backend.services.user.job_worker import job_worker
+from backend.utils.responses import success_response, error_response, create_json_response
+from backend.api.deps import require_permission, get_current_user
+from backend.database.user_models import User
+from backend.constants.permissions import PERMISSIONS
+
+router = APIRouter()
+
+# 创建各类任务所需的权限
+JOB_PERMISSIONS = {
+    "role_delete": PERMISSIONS["ROLE_DELETE"],
+    "role_reassign": PERMISSIONS["USER_UPDATE"],
+    "permission_grant_all": PERMISSIONS["ROLE_UPDATE"],
+    "bulk_import": PERMISSIONS["USER_CREATE"],
+    "cache_rebuild": PERMISSIONS["PERMISSION_UPDATE"],
+    "effective_permissions_rebuild": PERMISSIONS["PERMISSION_UPDATE"],
+    "change_feed_prune": PERMISSIONS["PERMISSION_UPDATE"],
+}
+
+
+@router.post("/jobs", response_model=JobResponse)
+async def create_job(
+    job_data: JobCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    创建后台任务
+    需要: 与任务类型对应的权限
+    """
+    required_permission = JOB_PERMISSIONS.get(job_data.type)
+    if required_permission is None:
+        response = error_response(error=f"不支持的任务类型: {job_data.type}", message="任务创建失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
+
+    # 检查用户是否有执行该任务的权限
+    require_permission(required_permission)(current_user)
+
+    try:
+        db_job = enqueue_job(db, job_data.type, job_data.params, created_by=current_user.id)
+    except ValueError as e:
+        response = error_response(error=str(e), message="任务创建失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
+    job_worker.notify()
+
+    response = success_response(data=JobResponse.model_validate(db_job), message="任务已创建", code=status.HTTP_202_ACCEPTED)
+    return create_json_response(response)
+
+
+@router.get("/jobs", response_model=dict)
+async def list_jobs(
+    status_filter: Optional[str] = Query(None, alias="status"),
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    分页获取任务列表
+    需要: role:read 权限
+    """
+    # 检查用户是否有读取角色的权限
+    require_permission(PERMISSIONS["ROLE_READ"])(current_user)
+
+    jobs_response = [JobResponse.model_validate(job) for job in get_jobs(db, status_filter, skip, limit)]
+    response = success_response(data={"jobs": jobs_response, "total": len(jobs_response)}, message="任务获取成功")
+    return create_json_response(response)
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    查询任务状态与进度
+    需要: role:read 权限
+    """
+    # 检查用户是否有读取角色的权限
+    require_permission(PERMISSIONS["ROLE_READ"])(current_user)
+
+    db_job = get_job_by_id(db, job_id)
+    if not db_job:
+        response = error_response(error="任务未找到", message="任务未找到", code=status.HTTP_404_NOT_FOUND)
+        return create_json_response(response)
+
+    response = success_response(data=JobResponse.model_validate(db_job), message="任务获取成功")
+    return create_json_response(response)
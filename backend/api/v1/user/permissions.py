@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
 from backend.database import get_db
-from backend.schemas.user import PermissionCreate, PermissionUpdate, PermissionInDB
-from backend.services.permission_service import (
+from backend.schemas.user import PermissionCreate, PermissionUpdate, PermissionInDB, UserInDB
+from backend.services.user.permission_service import (
     get_permission_by_id, get_permission_by_name, get_permissions, 
-    create_permission, update_permission, delete_permission
+    create_permission, update_permission, delete_permission,
+    get_permission_holders, count_permission_holders, iter_permissions
 )
+from backend.services.user.table_version_service import get_versions
+from backend.database.version_models import PERMISSIONS_VERSION
+from backend.utils.http_cache import make_etag, etag_matches, not_modified, with_cache_headers, catalog_cache_control
 from backend.utils.responses import success_response, error_response, create_json_response
+from backend.utils.streaming import ndjson_response
 from backend.api.deps import require_permission, get_current_user
 from backend.database.user_models import User
 from backend.constants.permissions import PERMISSIONS
@@ -14,35 +19,48 @@ from backend.constants.permissions import PERMISSIONS
 router = APIRouter()
 
 
+def _permission_response(permission) -> PermissionInDB:
+    return PermissionInDB(
+        id=permission.id,
+        name=permission.name,
+        description=permission.description,
+        created_at=permission.created_at,
+        updated_at=permission.updated_at
+    )
+
+
 @router.get("/", response_model=dict)
 async def list_permissions(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
+    response_format: str = Query("json", alias="format"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    分页获取权限列表
+    分页获取权限列表，支持 ETag 条件请求
+    format=ndjson 时逐行流式输出（limit=0 表示不限制数量），客户端接受时使用 gzip 压缩
     需要: permission:read 权限
     """
     # 检查用户是否有读取权限的权限
     require_permission(PERMISSIONS["PERMISSION_READ"])(current_user)
     
-    db_permissions = get_permissions(db, skip=skip, limit=limit)
-    permissions_response = []
+    if response_format == "ndjson":
+        return ndjson_response(request, lambda stream_db: (
+            _permission_response(permission).model_dump_json() + "\n"
+            for permission in iter_permissions(stream_db, skip, limit)
+        ))
     
-    for permission in db_permissions:
-        permission_response = PermissionInDB(
-            id=permission.id,
-            name=permission.name,
-            description=permission.description,
-            created_at=permission.created_at,
-            updated_at=permission.updated_at
-        )
-        permissions_response.append(permission_response)
+    etag = make_etag("permissions", get_versions(db, [PERMISSIONS_VERSION]), skip, limit)
+    if etag_matches(request, etag):
+        return not_modified(etag, catalog_cache_control())
+    
+    db_permissions = get_permissions(db, skip=skip, limit=limit)
+    permissions_response = [_permission_response(permission) for permission in db_permissions]
     
     response = success_response(data={"permissions": permissions_response, "total": len(permissions_response)}, message="权限获取成功")
-    return create_json_response(response)
+    return with_cache_headers(create_json_response(response), etag, catalog_cache_control())
 
 
 @router.get("/{permission_id}", response_model=PermissionInDB)
@@ -157,4 +175,37 @@ async def delete_existing_permission(
         return create_json_response(response)
     
     response = success_response(message="权限删除成功")
+    return create_json_response(response)
+
+
+@router.get("/{permission_id}/holders", response_model=dict)
+async def list_permission_holders(
+    permission_id: int,
+    cursor: int = 0,
+    limit: int = 100,
+    count_only: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取通过任一角色持有该权限的用户，cursor 为上一页最后一个用户ID
+    count_only 为 true 时只返回持有者数量
+    需要: permission:read 和 user:read 权限
+    """
+    # 检查用户是否有读取权限和用户的权限
+    require_permission(PERMISSIONS["PERMISSION_READ"])(current_user)
+    require_permission(PERMISSIONS["USER_READ"])(current_user)
+    
+    if not get_permission_by_id(db, permission_id):
+        response = error_response(error="权限未找到", message="权限未找到", code=status.HTTP_404_NOT_FOUND)
+        return create_json_response(response)
+    
+    if count_only:
+        response = success_response(data={"total": count_permission_holders(db, permission_id)}, message="持有者统计成功")
+        return create_json_response(response)
+    
+    limit = max(1, min(limit, 1000))
+    holders = [UserInDB.model_validate(user) for user in get_permission_holders(db, permission_id, after_id=cursor, limit=limit)]
+    next_cursor = holders[-1].id if len(holders) == limit else None
+    response = success_response(data={"users": holders, "next_cursor": next_cursor}, message="持有者获取成功")
     return create_json_response(response)
\ No newline at end of file
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.orm import Session
+from backend.database import get_db
+from backend.services.user.rbac_snapshot_service import export_snapshot, dumps, SNAPSHOT_VERSION_NAMES
+from backend.services.user.outbox_service import latest_sequence
+from backend.services.user.table_version_service import get_versions
+from backend.services.user.user_service import lapsed_role_assignment_count
+from backend.utils.http_cache import make_etag, etag_matches, not_modified, with_cache_headers
+from backend.api.deps import require_permission, get_current_user
+from backend.database.user_models import User
+from backend.constants.permissions import PERMISSIONS
+
+router = APIRouter()
+
+
+@router.get("/rbac/snapshot")
+async def get_rbac_snapshot(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    导出完整 RBAC 图的二进制快照，支持 ETag 条件请求
+    需要: role:read、permission:read 与 user:read 权限
+    """
+    # 快照包含全部成员关系，需要同时具备三类读取权限
+    require_permission(PERMISSIONS["ROLE_READ"])(current_user)
+    require_permission(PERMISSIONS["PERMISSION_READ"])(current_user)
+    require_permission(PERMISSIONS["USER_READ"])(current_user)
+    
+    # 快照只包含未到期的成员关系，临时分配到期后即使尚未清理也要重新导出
+    etag = make_etag("rbac-snapshot", get_versions(db, SNAPSHOT_VERSION_NAMES), lapsed_role_assignment_count(db))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    # 导出前的变更序号：消费者加载快照后从该序号开始读取变更流，不会漏掉导出期间的变更
+    sequence = latest_sequence(db)
+    response = Response(
+        content=dumps(export_snapshot(db)),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="rbac.snapshot"', "X-Change-Sequence": str(sequence)}
+    )
+    return with_cache_headers(response, etag)
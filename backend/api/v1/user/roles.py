@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
 from backend.database import get_db
-from backend.schemas.user import RoleCreate, RoleUpdate, RoleResponse
-from backend.services.role_service import (
+from backend.schemas.user import RoleCreate, RoleUpdate, RoleResponse, RolePermissionsReplace, MembershipChange, UserInDB
+from backend.services.user.role_service import (
     get_role_by_id, get_role_by_name, get_roles, create_role, 
-    update_role, delete_role, add_permission_to_role, remove_permission_from_role
+    update_role, delete_role, add_permission_to_role, remove_permission_from_role,
+    replace_role_permissions, get_role_members, count_role_members, iter_roles
 )
+from backend.schemas.job import JobResponse
+from backend.services.user.job_service import enqueue_job
+from backend.services.user.job_worker import job_worker
+from backend.services.user.table_version_service import get_versions
+from backend.database.version_models import ROLES_VERSION, PERMISSIONS_VERSION
+from backend.utils.http_cache import make_etag, etag_matches, not_modified, with_cache_headers, catalog_cache_control
 from backend.utils.responses import success_response, error_response, create_json_response
+from backend.utils.streaming import ndjson_response
 from backend.api.deps import require_permission, get_current_user
 from backend.database.user_models import User
 from backend.constants.permissions import PERMISSIONS
@@ -14,36 +22,49 @@ from backend.constants.permissions import PERMISSIONS
 router = APIRouter()
 
 
+def _role_response(role) -> RoleResponse:
+    return RoleResponse(
+        id=role.id,
+        name=role.name,
+        description=role.description,
+        created_at=role.created_at,
+        updated_at=role.updated_at,
+        permissions=[perm.name for perm in role.permissions]
+    )
+
+
 @router.get("/", response_model=dict)
 async def list_roles(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
+    response_format: str = Query("json", alias="format"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    分页获取角色列表
+    分页获取角色列表，支持 ETag 条件请求
+    format=ndjson 时逐行流式输出（limit=0 表示不限制数量），客户端接受时使用 gzip 压缩
     需要: role:read 权限
     """
     # 检查用户是否有读取角色的权限
     require_permission(PERMISSIONS["ROLE_READ"])(current_user)
     
-    db_roles = get_roles(db, skip=skip, limit=limit)
-    roles_response = []
+    if response_format == "ndjson":
+        return ndjson_response(request, lambda stream_db: (
+            _role_response(role).model_dump_json() + "\n" for role in iter_roles(stream_db, skip, limit)
+        ))
     
-    for role in db_roles:
-        role_response = RoleResponse(
-            id=role.id,
-            name=role.name,
-            description=role.description,
-            created_at=role.created_at,
-            updated_at=role.updated_at,
-            permissions=[perm.name for perm in role.permissions]
-        )
-        roles_response.append(role_response)
+    # 角色响应包含权限名称，ETag 同时取决于角色与权限的版本
+    etag = make_etag("roles", get_versions(db, [ROLES_VERSION, PERMISSIONS_VERSION]), skip, limit)
+    if etag_matches(request, etag):
+        return not_modified(etag, catalog_cache_control())
+    
+    db_roles = get_roles(db, skip=skip, limit=limit)
+    roles_response = [_role_response(role) for role in db_roles]
     
     response = success_response(data={"roles": roles_response, "total": len(roles_response)}, message="角色获取成功")
-    return create_json_response(response)
+    return with_cache_headers(create_json_response(response), etag, catalog_cache_control())
 
 
 @router.get("/{role_id}", response_model=RoleResponse)
@@ -145,16 +166,27 @@ async def update_existing_role(
 @router.delete("/{role_id}")
 async def delete_existing_role(
     role_id: int, 
+    background: bool = False,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     删除角色
+    background 为 true 时创建后台任务分块删除，立即返回任务信息
     需要: role:delete 权限
     """
     # 检查用户是否有删除角色的权限
     require_permission(PERMISSIONS["ROLE_DELETE"])(current_user)
     
+    if background:
+        if not get_role_by_id(db, role_id):
+            response = error_response(error="角色未找到", message="角色未找到", code=status.HTTP_404_NOT_FOUND)
+            return create_json_response(response)
+        db_job = enqueue_job(db, "role_delete", {"role_id": role_id}, created_by=current_user.id)
+        job_worker.notify()
+        response = success_response(data=JobResponse.model_validate(db_job), message="角色删除任务已创建", code=status.HTTP_202_ACCEPTED)
+        return create_json_response(response)
+    
     success = delete_role(db, role_id)
     if not success:
         response = error_response(error="角色未找到", message="角色未找到", code=status.HTTP_404_NOT_FOUND)
@@ -207,4 +239,65 @@ async def remove_permission_from_role_endpoint(
         return create_json_response(response)
     
     response = success_response(message="权限已成功从角色移除")
+    return create_json_response(response)
+
+
+@router.put("/{role_id}/permissions", response_model=MembershipChange)
+async def replace_role_permissions_endpoint(
+    role_id: int, 
+    permissions_data: RolePermissionsReplace, 
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    以集合语义替换角色的全部权限，返回新增和移除的权限ID
+    需要: role:update 权限
+    """
+    # 检查用户是否有更新角色的权限
+    require_permission(PERMISSIONS["ROLE_UPDATE"])(current_user)
+    
+    try:
+        change = replace_role_permissions(db, role_id, permissions_data.permission_ids)
+    except ValueError as e:
+        response = error_response(error=str(e), message="权限替换失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
+    
+    if change is None:
+        response = error_response(error="角色未找到", message="角色未找到", code=status.HTTP_404_NOT_FOUND)
+        return create_json_response(response)
+    
+    response = success_response(data=change, message="权限替换成功")
+    return create_json_response(response)
+
+
+@router.get("/{role_id}/members", response_model=dict)
+async def list_role_members(
+    role_id: int,
+    cursor: int = 0,
+    limit: int = 100,
+    count_only: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取拥有该角色的用户，cursor 为上一页最后一个用户ID
+    count_only 为 true 时只返回成员数量
+    需要: role:read 和 user:read 权限
+    """
+    # 检查用户是否有读取角色和用户的权限
+    require_permission(PERMISSIONS["ROLE_READ"])(current_user)
+    require_permission(PERMISSIONS["USER_READ"])(current_user)
+    
+    if not get_role_by_id(db, role_id):
+        response = error_response(error="角色未找到", message="角色未找到", code=status.HTTP_404_NOT_FOUND)
+        return create_json_response(response)
+    
+    if count_only:
+        response = success_response(data={"total": count_role_members(db, role_id)}, message="成员统计成功")
+        return create_json_response(response)
+    
+    limit = max(1, min(limit, 1000))
+    members = [UserInDB.model_validate(user) for user in get_role_members(db, role_id, after_id=cursor, limit=limit)]
+    next_cursor = members[-1].id if len(members) == limit else None
+    response = success_response(data={"users": members, "next_cursor": next_cursor}, message="成员获取成功")
     return create_json_response(response)
\ No newline at end of file
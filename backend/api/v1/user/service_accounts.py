@@ -0,0 +1,149 @@
+from typing import List
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.orm import Session
+from backend.database import get_db
+from backend.schemas.service_account import (
+    ServiceAccountCreate, ServiceAccountResponse, ApiKeyCreate, ApiKeyResponse, ApiKeyCreated
+)
+from backend.services.user.service_account_service import (
+    create_service_account, get_service_accounts, is_service_account, create_api_key, get_api_keys, revoke_api_key
+)
+from backend.utils.responses import success_response, error_response, create_json_response
+from backend.api.deps import require_permission, get_current_user
+from backend.database.user_models import User
+from backend.constants.permissions import PERMISSIONS
+
+router = APIRouter()
+
+
+def _service_account_response(user) -> ServiceAccountResponse:
+    return ServiceAccountResponse(
+        id=user.id,
+        username=user.username,
+        status=user.status,
+        created_at=user.created_at,
+        roles=[role.name for role in user.roles]
+    )
+
+
+@router.post("/service-accounts", response_model=ServiceAccountResponse)
+async def create_new_service_account(
+    account_data: ServiceAccountCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    创建服务账户
+    需要: user:create 权限，指定 role_ids 时还需要 user:update 权限
+    """
+    # 检查用户是否有创建用户的权限
+    require_permission(PERMISSIONS["USER_CREATE"])(current_user)
+    # 分配角色与为已有用户分配角色一样需要更新用户的权限
+    if account_data.role_ids:
+        require_permission(PERMISSIONS["USER_UPDATE"])(current_user)
+    
+    try:
+        account = create_service_account(
+            db, account_data.username, account_data.description, account_data.role_ids, created_by=current_user.id
+        )
+    except ValueError as e:
+        response = error_response(error=str(e), message="服务账户创建失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
+    
+    response = success_response(data=_service_account_response(account), message="服务账户创建成功")
+    return create_json_response(response)
+
+
+@router.get("/service-accounts", response_model=List[ServiceAccountResponse])
+async def list_service_accounts(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取服务账户列表
+    需要: user:read 权限
+    """
+    # 检查用户是否有读取用户的权限
+    require_permission(PERMISSIONS["USER_READ"])(current_user)
+    
+    accounts = get_service_accounts(db, skip=skip, limit=limit)
+    response = success_response(
+        data=[_service_account_response(account) for account in accounts],
+        message="服务账户获取成功"
+    )
+    return create_json_response(response)
+
+
+@router.post("/service-accounts/{user_id}/keys", response_model=ApiKeyCreated)
+async def create_service_account_key(
+    user_id: int,
+    key_data: ApiKeyCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    为服务账户创建 API 密钥，明文密钥只在响应中返回一次
+    需要: user:update 权限
+    """
+    # 检查用户是否有更新用户的权限
+    require_permission(PERMISSIONS["USER_UPDATE"])(current_user)
+    
+    try:
+        created = create_api_key(db, user_id, key_data.name, key_data.scopes, key_data.expires_in_days)
+    except ValueError as e:
+        response = error_response(error=str(e), message="API 密钥创建失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
+    
+    if created is None:
+        response = error_response(error="服务账户未找到", message="服务账户未找到", code=status.HTTP_404_NOT_FOUND)
+        return create_json_response(response)
+    
+    summary, key = created
+    response = success_response(data=ApiKeyCreated(**summary, key=key), message="API 密钥创建成功")
+    return create_json_response(response)
+
+
+@router.get("/service-accounts/{user_id}/keys", response_model=List[ApiKeyResponse])
+async def list_service_account_keys(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取服务账户的 API 密钥列表（不含明文）
+    需要: user:read 权限
+    """
+    # 检查用户是否有读取用户的权限
+    require_permission(PERMISSIONS["USER_READ"])(current_user)
+    
+    if not is_service_account(db, user_id):
+        response = error_response(error="服务账户未找到", message="服务账户未找到", code=status.HTTP_404_NOT_FOUND)
+        return create_json_response(response)
+    
+    keys = [ApiKeyResponse(**summary) for summary in get_api_keys(db, user_id)]
+    response = success_response(data=keys, message="API 密钥获取成功")
+    return create_json_response(response)
+
+
+@router.delete("/service-accounts/{user_id}/keys/{api_key_id}")
+async def revoke_service_account_key(
+    user_id: int,
+    api_key_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    吊销服务账户的 API 密钥
+    需要: user:update 权限
+    """
+    # 检查用户是否有更新用户的权限
+    require_permission(PERMISSIONS["USER_UPDATE"])(current_user)
+    
+    if not revoke_api_key(db, user_id, api_key_id):
+        response = error_response(error="API 密钥未找到或已吊销", message="吊销失败", code=status.HTTP_404_NOT_FOUND)
+        return create_json_response(response)
+    
+    response = success_response(message="API 密钥已吊销")
+    return create_json_response(response)
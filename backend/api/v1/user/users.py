@@ -1,12 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from backend.database import get_db
-from backend.schemas.user import UserCreate, UserUpdate, UserResponse
-from backend.services.user_service import (
+from backend.schemas.user import UserCreate, UserUpdate, UserResponse, UserRolesReplace, MembershipChange, RoleAssignment
+from backend.schemas.directory import DirectoryUser, DirectorySnapshot, DirectorySyncResult
+from backend.services.user.directory_sync_service import DirectorySync
+from backend.services.user.role_expiry_scheduler import role_expiry_scheduler
+from backend.services.user.user_search_service import search_users
+from backend.services.user.user_service import (
     get_user_by_id, get_user_by_username, get_users, create_user, 
-    update_user, delete_user, assign_role_to_user, remove_role_from_user
+    update_user, delete_user, assign_role_to_user, remove_role_from_user,
+    replace_user_roles, iter_users, get_user_cache_key
 )
+from backend.utils.http_cache import make_etag, etag_matches, not_modified, with_cache_headers
 from backend.utils.responses import success_response, error_response, create_json_response
+from backend.utils.streaming import ndjson_response
 from backend.api.deps import require_permission, require_role, get_current_user
 from backend.database.user_models import User
 from backend.constants.permissions import PERMISSIONS
@@ -14,25 +24,77 @@ from backend.constants.permissions import PERMISSIONS
 router = APIRouter()
 
 
+def _user_response(user: User) -> UserResponse:
+    return UserResponse(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        created_at=user.created_at,
+        updated_at=user.updated_at,
+        status=user.status,
+        roles=[role.name for role in user.roles]
+    )
+
+
 @router.get("/", response_model=dict)
 async def list_users(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
+    response_format: str = Query("json", alias="format"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     分页获取用户列表
+    format=ndjson 时逐行流式输出（limit=0 表示不限制数量），客户端接受时使用 gzip 压缩
     需要: user:read 权限
     """
     # 检查用户是否有读取用户的权限
     require_permission(PERMISSIONS["USER_READ"])(current_user)
     
+    if response_format == "ndjson":
+        return ndjson_response(request, lambda stream_db: (
+            _user_response(user).model_dump_json() + "\n" for user in iter_users(stream_db, skip, limit)
+        ))
+    
     db_users = get_users(db, skip=skip, limit=limit)
-    users_response = []
+    users_response = [_user_response(user) for user in db_users]
     
-    for user in db_users:
-        user_response = UserResponse(
+    response = success_response(data={"users": users_response, "total": len(users_response)}, message="用户获取成功")
+    return create_json_response(response)
+
+
+@router.get("/search", response_model=dict)
+async def search_users_endpoint(
+    q: str,
+    field: str = "username",
+    mode: str = "prefix",
+    role_id: Optional[int] = None,
+    status_filter: Optional[bool] = Query(None, alias="status"),
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    按用户名或邮箱搜索用户（前缀或子串），可按角色与状态过滤，使用游标分页
+    需要: user:read 权限
+    """
+    # 检查用户是否有读取用户的权限
+    require_permission(PERMISSIONS["USER_READ"])(current_user)
+    
+    try:
+        db_users, next_cursor = search_users(
+            db, q, field=field, mode=mode, role_id=role_id, status=status_filter,
+            cursor=cursor, limit=max(1, min(limit, 100))
+        )
+    except ValueError as e:
+        response = error_response(error=str(e), message="搜索失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
+    
+    users_response = [
+        UserResponse(
             id=user.id,
             username=user.username,
             email=user.email,
@@ -41,25 +103,36 @@ async def list_users(
             status=user.status,
             roles=[role.name for role in user.roles]
         )
-        users_response.append(user_response)
+        for user in db_users
+    ]
     
-    response = success_response(data={"users": users_response, "total": len(users_response)}, message="用户获取成功")
+    response = success_response(data={"users": users_response, "next_cursor": next_cursor}, message="用户搜索成功")
     return create_json_response(response)
 
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int, 
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    根据ID获取用户
+    根据ID获取用户，支持 ETag 条件请求
     需要: user:read 权限
     """
     # 检查用户是否有读取用户的权限
     require_permission(PERMISSIONS["USER_READ"])(current_user)
     
+    # ETag 取决于该用户的版本、角色版本及其尚未清理的到期分配数，其他用户的写入与到期不会使其失效
+    cache_key = get_user_cache_key(db, user_id)
+    if cache_key is None:
+        response = error_response(error="用户未找到", message="用户未找到", code=status.HTTP_404_NOT_FOUND)
+        return create_json_response(response)
+    etag = make_etag("user", user_id, cache_key)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
     db_user = get_user_by_id(db, user_id)
     if not db_user:
         response = error_response(error="用户未找到", message="用户未找到", code=status.HTTP_404_NOT_FOUND)
@@ -76,7 +149,7 @@ async def get_user(
     )
     
     response = success_response(data=user_response, message="用户获取成功")
-    return create_json_response(response)
+    return with_cache_headers(create_json_response(response), etag)
 
 
 @router.post("/", response_model=UserResponse)
@@ -172,21 +245,29 @@ async def delete_existing_user(
 async def assign_role_to_user_endpoint(
     user_id: int, 
     role_id: int, 
+    assignment: Optional[RoleAssignment] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    为用户分配角色
+    为用户分配角色，请求体中的 expires_at 不为空时为临时分配，到期后自动移除
     需要: user:update 权限
     """
     # 检查用户是否有更新用户的权限
     require_permission(PERMISSIONS["USER_UPDATE"])(current_user)
     
-    success = assign_role_to_user(db, user_id, role_id)
+    expires_at = assignment.expires_at if assignment else None
+    try:
+        success = assign_role_to_user(db, user_id, role_id, expires_at)
+    except ValueError as e:
+        response = error_response(error=str(e), message="分配失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
     if not success:
         response = error_response(error="用户或角色未找到", message="分配失败", code=status.HTTP_404_NOT_FOUND)
         return create_json_response(response)
     
+    if expires_at is not None:
+        role_expiry_scheduler.schedule(expires_at)
     response = success_response(message="角色分配成功")
     return create_json_response(response)
 
@@ -211,4 +292,91 @@ async def remove_role_from_user_endpoint(
         return create_json_response(response)
     
     response = success_response(message="角色移除成功")
+    return create_json_response(response)
+
+
+@router.put("/{user_id}/roles", response_model=MembershipChange)
+async def replace_user_roles_endpoint(
+    user_id: int, 
+    roles_data: UserRolesReplace, 
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    以集合语义替换用户的全部角色，返回新增和移除的角色ID
+    需要: user:update 权限
+    """
+    # 检查用户是否有更新用户的权限
+    require_permission(PERMISSIONS["USER_UPDATE"])(current_user)
+    
+    try:
+        change = replace_user_roles(db, user_id, roles_data.role_ids)
+    except ValueError as e:
+        response = error_response(error=str(e), message="角色替换失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
+    
+    if change is None:
+        response = error_response(error="用户未找到", message="用户未找到", code=status.HTTP_404_NOT_FOUND)
+        return create_json_response(response)
+    
+    response = success_response(data=change, message="角色替换成功")
+    return create_json_response(response)
+
+
+async def _ndjson_records(request: Request, batch_size: int):
+    """
+    逐行解析 NDJSON 请求体，按批次产出目录用户记录
+    """
+    buffer = b""
+    batch = []
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                batch.append(DirectoryUser.model_validate_json(line))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if buffer.strip():
+        batch.append(DirectoryUser.model_validate_json(buffer))
+    if batch:
+        yield batch
+
+
+@router.post("/sync", response_model=DirectorySyncResult)
+async def sync_directory_endpoint(
+    request: Request,
+    full: bool = True,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    按上游目录快照对账用户及其角色
+    请求体为 {"users": [...]} 的 JSON，或 Content-Type 为 application/x-ndjson 的逐行记录。
+    full 为 true 时不在快照中的用户会被停用（当前用户除外）。
+    需要: user:create 和 user:update 权限
+    """
+    # 检查用户是否有创建和更新用户的权限
+    require_permission(PERMISSIONS["USER_CREATE"])(current_user)
+    require_permission(PERMISSIONS["USER_UPDATE"])(current_user)
+    
+    # 对账是同步的数据库操作，放到线程池执行，不阻塞事件循环
+    sync = DirectorySync(db.get_bind(), full=full, protected_usernames=[current_user.username])
+    await run_in_threadpool(sync.__enter__)
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            async for batch in _ndjson_records(request, sync.chunk_size):
+                await run_in_threadpool(sync.load, batch)
+        else:
+            snapshot = DirectorySnapshot.model_validate_json(await request.body())
+            await run_in_threadpool(sync.load, snapshot.users)
+        result = await run_in_threadpool(sync.apply)
+    except (ValidationError, ValueError) as e:
+        response = error_response(error=str(e), message="目录同步失败", code=status.HTTP_400_BAD_REQUEST)
+        return create_json_response(response)
+    finally:
+        await run_in_threadpool(sync.__exit__, None, None, None)
+    
+    response = success_response(data=result, message="目录同步成功")
     return create_json_response(response)
\ No newline at end of file
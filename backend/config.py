@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -10,12 +10,121 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-here"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    TOKEN_PERMISSION_CLAIM_FORMAT: str = "names"  # 令牌中权限声明的格式：names（权限名称列表）、bitmap（权限ID位图与目录版本）或 both（迁移期间同时写入）
     
     # CORS 设置
     ALLOWED_ORIGINS: List[str] = ["http://localhost", "http://localhost:3000"]
     
     # 密码哈希
     PASSWORD_SALT: str = "your-salt-here"
+    PASSWORD_HASH_SCHEMES: List[str] = ["bcrypt"]  # 第一个用于新哈希，其余仅用于验证旧哈希
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_TIME_COST: int = 3
+    PASSWORD_ARGON2_MEMORY_COST: int = 65536  # KiB
+    PASSWORD_ARGON2_PARALLELISM: int = 4
+    
+    # API 密钥设置
+    API_KEY_PREFIX: str = "sk_"  # 以该前缀开头的 Bearer 凭据按 API 密钥认证
+    API_KEY_HMAC_SECRET: Optional[str] = None  # 计算密钥摘要的 HMAC 密钥，未配置时使用 SECRET_KEY
+    API_KEY_LAST_USED_INTERVAL_SECONDS: int = 300  # last_used_at 的最小更新间隔，避免每个请求都写库
+    
+    # 权限目录设置
+    PERMISSION_CATALOG_TTL_SECONDS: int = 300
+    PERMISSION_CATALOG_VERSION_CHECK_SECONDS: float = 1.0  # 两次比较权限数据版本的最小间隔，0 表示每次使用都比较
+    PERMISSION_CATALOG_STRICT: bool = False  # 为 True 时缺少内置权限将阻止启动
+    
+    # 目录同步设置
+    DIRECTORY_SYNC_CHUNK_SIZE: int = 5000
+    
+    # 后台任务设置
+    JOB_WORKER_ENABLED: bool = True
+    JOB_WORKER_CONCURRENCY: int = 2
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    JOB_CHUNK_SIZE: int = 1000
+    JOB_STALE_SECONDS: int = 300  # 心跳超过该时间的运行中任务可被重新领取
+    
+    # 临时角色分配的到期清理设置
+    ROLE_EXPIRY_ENABLED: bool = True
+    SCHEMA_UPGRADE_ON_STARTUP: bool = True  # 启动时为已有数据库补齐新增的列与索引
+    ROLE_EXPIRY_BATCH_SIZE: int = 1000
+    ROLE_EXPIRY_REFRESH_SECONDS: float = 60.0  # 探测其他进程写入的到期时间的间隔
+    
+    # 级联删除每批处理的行数
+    CASCADE_DELETE_BATCH_SIZE: int = 5000
+    
+    # 用户搜索设置（SQLite 进程内前缀索引的重建间隔）
+    USER_SEARCH_INDEX_TTL_SECONDS: int = 60
+    
+    # HTTP 缓存设置（角色、权限列表的 Cache-Control max-age，过期后按 ETag 重新验证）
+    CATALOG_CACHE_MAX_AGE_SECONDS: int = 0
+    
+    # RBAC 快照文件路径，配置后启动时优先从快照预热权限目录
+    RBAC_SNAPSHOT_PATH: Optional[str] = None
+    
+    # 跨进程共享的权限矩阵文件路径（建议放在 /dev/shm 等内存文件系统上），未配置时不启用
+    PERMISSION_MATRIX_PATH: Optional[str] = None
+    PERMISSION_MATRIX_REFRESH_SECONDS: float = 5.0
+    # 矩阵超过该时间未被刷新器确认时不再使用（经矩阵回答的授权最多落后这么久）
+    PERMISSION_MATRIX_MAX_STALENESS_SECONDS: float = 15.0
+    # 单次增量更新允许的最大事件数与受影响用户数，超过时全量重建
+    PERMISSION_MATRIX_PATCH_MAX_EVENTS: int = 10000
+    PERMISSION_MATRIX_PATCH_MAX_USERS: int = 50000
+    
+    # 资源 ACL 批量过滤单次请求允许的最大资源ID数量
+    ACL_FILTER_MAX_IDS: int = 10000
+    
+    # 变更流设置（SSE 轮询间隔、心跳间隔、进程内缓冲的事件数、单次读取上限与事件保留时间）
+    CHANGE_FEED_POLL_SECONDS: float = 1.0
+    CHANGE_FEED_HEARTBEAT_SECONDS: float = 15.0
+    CHANGE_FEED_BUFFER_SIZE: int = 10000
+    CHANGE_FEED_MAX_LIMIT: int = 1000
+    CHANGE_FEED_RETENTION_HOURS: int = 168
+    
+    # 指标端点设置（默认关闭；配置令牌后请求须携带 Authorization: Bearer <令牌>）
+    METRICS_ENABLED: bool = False
+    METRICS_TOKEN: Optional[str] = None
+    
+    # 准入控制设置（每个工作进程的并发上限默认取数据库连接池容量；排队超过等待阈值或队列已满时返回 503）
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENCY: Optional[int] = None
+    ADMISSION_QUEUE_SIZE: int = 50
+    ADMISSION_MAX_QUEUE_WAIT_SECONDS: float = 0.5
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+    # 以下按路由名称（端点函数名）配置，与路由的挂载路径无关
+    ADMISSION_EXEMPT_ROUTES: List[str] = [  # 不访问数据库或不占用连接的长连接（变更流在开始推送前归还连接）
+        "root", "read_metrics", "openapi", "swagger_ui_html", "swagger_ui_redirect", "redoc_html", "stream_changes",
+    ]
+    ADMISSION_HIGH_PRIORITY_ROUTES: List[str] = ["login", "filter_resource_acl"]
+    ADMISSION_LOW_PRIORITY_ROUTES: List[str] = [  # 管理端列表与导出
+        "list_users", "search_users_endpoint", "list_roles", "list_role_members", "list_permissions",
+        "list_permission_holders", "list_groups", "list_group_members", "list_jobs", "list_service_accounts",
+        "list_changes", "get_rbac_snapshot",
+    ]
+    
+    # 请求截止时间设置（X-Request-Timeout 请求头或按路由的默认预算，剩余预算传递为数据库语句超时）
+    REQUEST_DEADLINE_DEFAULT_SECONDS: float = 10.0
+    REQUEST_DEADLINE_MAX_SECONDS: float = 60.0  # 请求头可以申请的最大预算
+    REQUEST_DEADLINE_ROUTES: Dict[str, float] = {  # 路由名称 -> 默认预算（只约束到响应开始发送）
+        "sync_directory_endpoint": 300.0,
+        "list_users": 60.0,
+        "list_roles": 60.0,
+        "list_permissions": 60.0,
+        "get_rbac_snapshot": 60.0,
+    }
+    REQUEST_DEADLINE_EXEMPT_ROUTES: List[str] = ["read_metrics", "stream_changes"]
+    DB_STATEMENT_TIMEOUT_RESOLUTION_SECONDS: float = 0.1  # PostgreSQL 上复用已设置的 statement_timeout 的时长
+    
+    # NDJSON 流式导出每批写出的行数
+    STREAM_BATCH_SIZE: int = 1000
+    
+    # 登录限流设置（令牌桶，容量为突发上限，补充速率为每秒令牌数）
+    LOGIN_RATE_LIMIT_ENABLED: bool = True
+    LOGIN_RATE_LIMIT_IP_CAPACITY: int = 20
+    LOGIN_RATE_LIMIT_IP_REFILL_PER_SECOND: float = 0.5
+    LOGIN_RATE_LIMIT_USERNAME_CAPACITY: int = 5
+    LOGIN_RATE_LIMIT_USERNAME_REFILL_PER_SECOND: float = 0.1
+    RATE_LIMIT_REDIS_URL: Optional[str] = None  # 配置后多个实例共享限流状态
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False  # 仅在可信反向代理之后开启
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from backend.database.connection import Base
+
+# 资源授权的主体类型
+ACL_SUBJECT_USER = "user"
+ACL_SUBJECT_ROLE = "role"
+ACL_SUBJECT_TYPES = (ACL_SUBJECT_USER, ACL_SUBJECT_ROLE)
+
+
+class ResourceAcl(Base):
+    """
+    对象级授权：主体（用户或角色）对某个资源拥有某项权限，
+    例如用户 U 可以对 document 42 执行 document:update
+    """
+    __tablename__ = "resource_acls"
+
+    id = Column(Integer, primary_key=True)
+    resource_type = Column(String(64), nullable=False)
+    resource_id = Column(BigInteger, nullable=False)
+    permission_id = Column(Integer, ForeignKey("permissions.id"), nullable=False)
+    subject_type = Column(String(16), nullable=False)
+    subject_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # 批量过滤按 (主体, 资源类型, 权限) 等值定位后在 resource_id 上探测，整个查询只走这一个索引
+        Index(
+            "ux_resource_acls_subject_resource",
+            "subject_type", "subject_id", "resource_type", "permission_id", "resource_id",
+            unique=True,
+        ),
+        # 按资源查找或清理授权
+        Index("ix_resource_acls_resource", "resource_type", "resource_id"),
+        Index("ix_resource_acls_permission", "permission_id"),
+    )
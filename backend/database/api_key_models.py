@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, Text, Index
+from sqlalchemy.sql import func
+from backend.database.connection import Base
+
+# API 密钥-权限范围的关联表：密钥只能使用所属账户权限与范围的交集
+api_key_scopes = Table(
+    "api_key_scopes",
+    Base.metadata,
+    Column("api_key_id", Integer, ForeignKey("api_keys.id"), primary_key=True),
+    Column("permission_id", Integer, ForeignKey("permissions.id"), primary_key=True),
+    # 反向索引：删除权限时清理范围
+    Index("ix_api_key_scopes_permission_key", "permission_id", "api_key_id")
+)
+
+
+class ServiceAccount(Base):
+    """
+    服务账户：供机器客户端使用的用户，不能以密码登录，只能通过 API 密钥认证
+    """
+    __tablename__ = "service_accounts"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    description = Column(Text)
+    created_by = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ApiKey(Base):
+    __tablename__ = "api_keys"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    name = Column(String(100), nullable=False)
+    prefix = Column(String(16), nullable=False)  # 密钥开头的可见部分，便于识别
+    digest = Column(String(64), nullable=False, unique=True)  # 密钥的 HMAC-SHA256 十六进制摘要
+    expires_at = Column(DateTime(timezone=True))
+    revoked_at = Column(DateTime(timezone=True))
+    last_used_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
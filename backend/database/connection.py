@@ -2,10 +2,14 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from backend.config import settings
+from backend.database.statement_timeout import install_statement_timeouts
 
 # 创建数据库引擎
 engine = create_engine(settings.DATABASE_URL)
 
+# 将请求的截止时间传递为语句超时
+install_statement_timeouts(engine)
+
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -0,0 +1,121 @@
+import json
+
+from sqlalchemy import BigInteger, any_, bindparam, insert as generic_insert, literal, select, true, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+# 支持 INSERT ... ON CONFLICT 的方言
+_ON_CONFLICT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def dialect_name(bind) -> str:
+    """
+    获取会话、连接或引擎对应的数据库方言名称
+    """
+    if isinstance(bind, Session):
+        bind = bind.get_bind()
+    return bind.dialect.name
+
+
+def supports_on_conflict(bind) -> bool:
+    return dialect_name(bind) in _ON_CONFLICT_DIALECTS
+
+
+def dialect_insert(bind, table):
+    """
+    返回当前方言的 INSERT 构造，PostgreSQL 与 SQLite 上支持 on_conflict_do_* 方法
+    """
+    return _ON_CONFLICT_DIALECTS.get(dialect_name(bind), generic_insert)(table)
+
+
+def insert_returning(db: Session, table, values: dict):
+    """
+    单条语句插入一行并返回插入后的完整行
+
+    违反唯一约束时返回 None；支持 ON CONFLICT 的方言上冲突不会中断当前事务。
+    """
+    statement = dialect_insert(db, table).values(**values)
+    if supports_on_conflict(db):
+        statement = statement.on_conflict_do_nothing()
+        return db.execute(statement.returning(*table.c)).mappings().first()
+
+    try:
+        with db.begin_nested():
+            return db.execute(statement.returning(*table.c)).mappings().first()
+    except IntegrityError:
+        return None
+
+
+def insert_ignore_from_select(db: Session, table, values: dict, *conditions) -> int:
+    """
+    在条件成立且行不存在时插入一行关联记录，返回实际插入的行数
+
+    生成 INSERT ... SELECT ... WHERE <conditions> ON CONFLICT DO NOTHING，
+    存在性检查与插入在同一条语句中完成。
+    """
+    source = select(
+        *[literal(value, type_=table.c[column].type).label(column) for column, value in values.items()]
+    ).where(*(conditions or (true(),)))
+    statement = dialect_insert(db, table).from_select(list(values), source)
+    if supports_on_conflict(db):
+        return db.execute(statement.on_conflict_do_nothing()).rowcount
+
+    try:
+        with db.begin_nested():
+            return db.execute(statement).rowcount
+    except IntegrityError:
+        return 0
+
+
+def replace_association_set(db: Session, table, owner_column: str, owner_id: int,
+                            target_column: str, target_id_column, target_ids):
+    """
+    以集合语义替换某个所有者的全部关联，返回 (新增的目标 ID, 移除的目标 ID)
+
+    差异完全在 SQL 中计算：一条 DELETE 移除不在目标集合中的关联，
+    一条 INSERT ... SELECT 补齐缺失的关联，语句数量与集合大小无关。
+    target_id_column 为目标实体表的主键列，只有仍然存在的目标才会被插入。
+    """
+    owner = table.c[owner_column]
+    target = table.c[target_column]
+    desired = sorted(set(target_ids))
+
+    removed = db.execute(
+        table.delete()
+        .where(owner == owner_id, target.not_in(desired))
+        .returning(target)
+    ).scalars().all()
+
+    added = []
+    if desired:
+        source = select(literal(owner_id, type_=owner.type), target_id_column).where(
+            target_id_column.in_(desired),
+            ~select(target).where(owner == owner_id, target == target_id_column).exists(),
+        )
+        statement = dialect_insert(db, table).from_select([owner_column, target_column], source)
+        if supports_on_conflict(db):
+            statement = statement.on_conflict_do_nothing()
+        added = db.execute(statement.returning(target)).scalars().all()
+
+    return sorted(added), sorted(removed)
+
+
+def in_id_list(bind, column, ids):
+    """
+    column IN (ids) 条件，ID 列表以单个参数传递
+
+    PostgreSQL 上为 column = ANY(:array)，SQLite 上从 json_each(:json) 读取，
+    语句文本与 ID 数量无关（可复用执行计划，也不受绑定参数数量上限限制）。
+    """
+    ids = list(ids)
+    name = dialect_name(bind)
+    if name == "postgresql":
+        return column == any_(bindparam(None, ids, type_=postgresql.ARRAY(BigInteger)))
+    if name == "sqlite":
+        values = func.json_each(json.dumps(ids)).table_valued("value")
+        return column.in_(select(values.c.value))
+    return column.in_(ids)
@@ -0,0 +1,53 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, Text, Index
+from sqlalchemy.sql import func
+from backend.database.connection import Base
+
+# 用户组-用户的直接成员关系
+group_users = Table(
+    "group_users",
+    Base.metadata,
+    Column("group_id", Integer, ForeignKey("groups.id"), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    # 反向索引：按用户查找所属组
+    Index("ix_group_users_user_group", "user_id", "group_id")
+)
+
+# 用户组的嵌套关系：child 是 parent 的成员
+group_children = Table(
+    "group_children",
+    Base.metadata,
+    Column("parent_id", Integer, ForeignKey("groups.id"), primary_key=True),
+    Column("child_id", Integer, ForeignKey("groups.id"), primary_key=True),
+    Index("ix_group_children_child_parent", "child_id", "parent_id")
+)
+
+# 用户组-角色关系：组内（含嵌套子组）的全部用户获得这些角色
+group_roles = Table(
+    "group_roles",
+    Base.metadata,
+    Column("group_id", Integer, ForeignKey("groups.id"), primary_key=True),
+    Column("role_id", Integer, ForeignKey("roles.id"), primary_key=True),
+    Index("ix_group_roles_role_group", "role_id", "group_id")
+)
+
+# 嵌套关系的传递闭包：(ancestor, descendant) 存在当且仅当 descendant 直接或间接属于 ancestor，
+# 每个组与自身也有一行。path_count 为两者之间的路径数，删除边时据此判断行是否仍有其他路径支撑
+group_closure = Table(
+    "group_closure",
+    Base.metadata,
+    Column("ancestor_id", Integer, ForeignKey("groups.id"), primary_key=True),
+    Column("descendant_id", Integer, ForeignKey("groups.id"), primary_key=True),
+    Column("path_count", Integer, nullable=False, default=1),
+    # 反向索引：按组查找其全部祖先
+    Index("ix_group_closure_descendant_ancestor", "descendant_id", "ancestor_id")
+)
+
+
+class Group(Base):
+    __tablename__ = "groups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), unique=True, nullable=False)
+    description = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
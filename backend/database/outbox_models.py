@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text
+from sqlalchemy.sql import func
+from backend.database.connection import Base
+
+
+class OutboxEvent(Base):
+    """
+    RBAC 变更事件（事务性发件箱）
+
+    写操作在修改数据的同一事务中插入事件，id 即变更序号；
+    变更流按 id 顺序读取，消费者只需记住最后处理的序号。
+    """
+    __tablename__ = "outbox_events"
+
+    # SQLite 只有 INTEGER PRIMARY KEY 才是自增的 rowid
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    event_type = Column(String(64), nullable=False)  # 如 role_permissions.added
+    entity_id = Column(Integer)  # 事件主体的ID，批量事件为空
+    payload = Column(Text)  # JSON 格式的事件内容
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -0,0 +1,67 @@
+"""
+已有数据库的结构升级
+
+新库由 Base.metadata.create_all 一次建好；已部署的库在模型新增列或索引后需要补齐，
+这里的每一步都可以重复执行：列已存在时跳过，索引使用 CREATE INDEX IF NOT EXISTS。
+应用启动时（SCHEMA_UPGRADE_ON_STARTUP）与 backend.scripts.upgrade_schema 脚本都调用 upgrade_schema。
+"""
+
+import logging
+from typing import List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateIndex
+
+from backend.database.user_models import User, user_roles
+
+logger = logging.getLogger(__name__)
+
+# 需要补齐的列：(表, 列名)
+_ADDED_COLUMNS = [
+    (user_roles, "expires_at"),
+    (User.__table__, "version"),
+]
+
+# 需要补齐的索引
+_ADDED_INDEXES = [
+    index for index in user_roles.indexes
+    if index.name in ("ix_user_roles_temporary_user", "ix_user_roles_expires_at")
+]
+
+
+def _add_missing_columns(connection: Connection) -> List[str]:
+    added = []
+    inspector = inspect(connection)
+    for table, name in _ADDED_COLUMNS:
+        if not inspector.has_table(table.name):
+            continue
+        if name in {column["name"] for column in inspector.get_columns(table.name)}:
+            continue
+        column = table.c[name]
+        definition = column.type.compile(dialect=connection.dialect)
+        if column.server_default is not None:
+            # 带默认值的 NOT NULL 列：已有行取默认值
+            definition += f" DEFAULT {column.server_default.arg}"
+            if not column.nullable:
+                definition += " NOT NULL"
+        # PostgreSQL 上多个工作进程可能同时启动，IF NOT EXISTS 避免并发补列时失败
+        if_not_exists = "IF NOT EXISTS " if connection.dialect.name == "postgresql" else ""
+        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {if_not_exists}{name} {definition}"))
+        added.append(f"{table.name}.{name}")
+    return added
+
+
+def upgrade_schema(engine: Engine) -> List[str]:
+    """
+    补齐已有数据库中缺少的列与索引，返回新增的列；表尚未创建时不做任何操作
+    """
+    with engine.begin() as connection:
+        if not inspect(connection).has_table(user_roles.name):
+            return []
+        added = _add_missing_columns(connection)
+        for index in _ADDED_INDEXES:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+    if added:
+        logger.info("已补齐数据库列: %s", ", ".join(added))
+    return added
@@ -0,0 +1,16 @@
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+def attach_detached(db: Session, model, values: dict, **collections):
+    """
+    使用已知的列值构造持久化实例并挂到会话上，不产生额外的 SELECT
+
+    collections 中给出的关系属性会被标记为已加载，访问时不再触发延迟加载。
+    """
+    instance = model(**values)
+    make_transient_to_detached(instance)
+    instance = db.merge(instance, load=False)
+    for name, value in collections.items():
+        set_committed_value(instance, name, value)
+    return instance
@@ -0,0 +1,94 @@
+"""
+将请求的剩余时间预算传递为数据库语句超时
+
+PostgreSQL 上在语句之前执行 SET LOCAL statement_timeout（只对当前事务生效）；
+剩余预算随时间减少，设置过的值在 DB_STATEMENT_TIMEOUT_RESOLUTION_SECONDS 内复用，
+语句最多比截止时间晚这么久被取消，避免每条语句都多一次往返。
+SQLite 上安装进度回调，截止时间到达后中断正在执行的语句。
+超时导致的数据库错误统一转换为 DeadlineExceeded。
+"""
+
+import sqlite3
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from backend.config import settings
+from backend.utils.deadline import DeadlineExceeded, get_deadline
+
+# 连接 info 中记录本事务最近一次设置 statement_timeout 的时间
+_TIMEOUT_SET_AT = "statement_timeout_set_at"
+# 连接 info 中记录是否安装了 SQLite 进度回调
+_PROGRESS_HANDLER = "deadline_progress_handler"
+
+# SQLite 每执行多少条虚拟机指令检查一次截止时间
+_SQLITE_PROGRESS_STEPS = 1000
+
+# PostgreSQL 因 statement_timeout 取消语句时的 SQLSTATE
+_PG_QUERY_CANCELED = "57014"
+
+
+def _before_cursor_execute_postgresql(conn, cursor, statement, parameters, context, executemany):
+    deadline = get_deadline()
+    if deadline is None:
+        # 截止时间已解除（如流式响应开始发送），恢复本事务中已设置的语句超时
+        if conn.info.pop(_TIMEOUT_SET_AT, None) is not None:
+            cursor.execute("SET LOCAL statement_timeout TO DEFAULT")
+        return
+    now = time.monotonic()
+    if deadline <= now:
+        raise DeadlineExceeded("请求超出时间预算")
+    set_at = conn.info.get(_TIMEOUT_SET_AT)
+    if set_at is not None and now - set_at < settings.DB_STATEMENT_TIMEOUT_RESOLUTION_SECONDS:
+        return
+    cursor.execute("SET LOCAL statement_timeout = %d" % max(1, int((deadline - now) * 1000)))
+    conn.info[_TIMEOUT_SET_AT] = now
+
+
+def _sqlite_deadline_reached() -> bool:
+    # 回调在执行语句的线程中运行，每次读取当前截止时间：语句执行期间解除的截止时间同样生效
+    deadline = get_deadline()
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def _before_cursor_execute_sqlite(conn, cursor, statement, parameters, context, executemany):
+    deadline = get_deadline()
+    dbapi_connection = conn.connection.dbapi_connection
+    if deadline is None:
+        # 连接会被其他请求复用，移除上一个请求留下的回调
+        if conn.info.pop(_PROGRESS_HANDLER, False):
+            dbapi_connection.set_progress_handler(None, 0)
+        return
+    if deadline <= time.monotonic():
+        raise DeadlineExceeded("请求超出时间预算")
+    dbapi_connection.set_progress_handler(_sqlite_deadline_reached, _SQLITE_PROGRESS_STEPS)
+    conn.info[_PROGRESS_HANDLER] = True
+
+
+def _reset_transaction_timeout(conn):
+    # SET LOCAL 随事务结束失效
+    conn.info.pop(_TIMEOUT_SET_AT, None)
+
+
+def _translate_timeout_error(context):
+    deadline = get_deadline()
+    if deadline is None or time.monotonic() < deadline:
+        return
+    original = context.original_exception
+    if isinstance(original, sqlite3.OperationalError) and "interrupted" in str(original):
+        raise DeadlineExceeded("请求超出时间预算") from original
+    if getattr(original, "pgcode", None) == _PG_QUERY_CANCELED:
+        raise DeadlineExceeded("请求超出时间预算") from original
+
+
+def install_statement_timeouts(engine: Engine) -> None:
+    """
+    为引擎注册截止时间相关的事件
+    """
+    if engine.dialect.name == "postgresql":
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute_postgresql)
+        event.listen(engine, "begin", _reset_transaction_timeout)
+    elif engine.dialect.name == "sqlite":
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute_sqlite)
+    event.listen(engine, "handle_error", _translate_timeout_error)
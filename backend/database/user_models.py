@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Table, Text
+from sqlalchemy import BigInteger, Column, Integer, String, Boolean, DateTime, ForeignKey, Table, Text, Index, DDL, and_, event, or_, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from backend.database.connection import Base
@@ -8,15 +8,47 @@ user_roles = Table(
     "user_roles",
     Base.metadata,
     Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
-    Column("role_id", Integer, ForeignKey("roles.id"), primary_key=True)
+    Column("role_id", Integer, ForeignKey("roles.id"), primary_key=True),
+    # 临时分配的到期时间，为空表示永久分配
+    Column("expires_at", DateTime(timezone=True), nullable=True),
+    # 反向索引：按角色查找成员
+    Index("ix_user_roles_role_user", "role_id", "user_id"),
+    # 部分索引只包含临时分配：按用户读取未到期的临时角色，以及按到期时间清理
+    Index("ix_user_roles_temporary_user", "user_id", "expires_at", "role_id",
+          postgresql_where=text("expires_at IS NOT NULL"), sqlite_where=text("expires_at IS NOT NULL")),
+    Index("ix_user_roles_expires_at", "expires_at",
+          postgresql_where=text("expires_at IS NOT NULL"), sqlite_where=text("expires_at IS NOT NULL")),
 )
 
+
+def _active_user_role():
+    """
+    关系条件：永久分配或尚未到期的临时分配
+
+    与数据库当前时间比较，到期后即使清理任务尚未运行，User.roles 与 Role.users 中也不再出现该分配。
+    """
+    return or_(user_roles.c.expires_at.is_(None), user_roles.c.expires_at > func.now())
+
+
 # 角色-权限关系的关联表
 role_permissions = Table(
     "role_permissions",
     Base.metadata,
     Column("role_id", Integer, ForeignKey("roles.id"), primary_key=True),
-    Column("permission_id", Integer, ForeignKey("permissions.id"), primary_key=True)
+    Column("permission_id", Integer, ForeignKey("permissions.id"), primary_key=True),
+    # 反向索引：按权限查找角色
+    Index("ix_role_permissions_permission_role", "permission_id", "role_id")
+)
+
+# 用户有效权限的物化表：(user_id, permission_id) 存在当且仅当用户通过某个角色获得该权限，
+# 由服务层在成员或授权变化时同步维护
+user_effective_permissions = Table(
+    "user_effective_permissions",
+    Base.metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("permission_id", Integer, ForeignKey("permissions.id"), primary_key=True),
+    # 反向索引：按权限查找持有者
+    Index("ix_user_effective_permissions_permission_user", "permission_id", "user_id")
 )
 
 
@@ -30,9 +62,17 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
     status = Column(Boolean, default=True)  # 激活/非激活状态
+    # 用户详情（含直接分配的角色）每次变化时递增，用于生成单个用户的 ETag
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
 
     # 关系
-    roles = relationship("Role", secondary=user_roles, back_populates="users")
+    roles = relationship(
+        "Role",
+        secondary=user_roles,
+        primaryjoin=lambda: and_(User.id == user_roles.c.user_id, _active_user_role()),
+        secondaryjoin=lambda: Role.id == user_roles.c.role_id,
+        back_populates="users",
+    )
     permission_logs = relationship("PermissionLog", back_populates="user")
 
 
@@ -46,7 +86,13 @@ class Role(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
     # 关系
-    users = relationship("User", secondary=user_roles, back_populates="roles")
+    users = relationship(
+        "User",
+        secondary=user_roles,
+        primaryjoin=lambda: and_(Role.id == user_roles.c.role_id, _active_user_role()),
+        secondaryjoin=lambda: User.id == user_roles.c.user_id,
+        back_populates="roles",
+    )
     permissions = relationship("Permission", secondary=role_permissions, back_populates="roles")
 
 
@@ -74,4 +120,39 @@ class PermissionLog(Base):
 
     # 关系
     user = relationship("User", back_populates="permission_logs")
-    permission = relationship("Permission")
\ No newline at end of file
+    permission = relationship("Permission")
+
+# PostgreSQL 上的用户搜索索引：前缀匹配使用 text_pattern_ops，子串匹配使用 pg_trgm
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+Index(
+    "ix_users_username_lower_prefix",
+    func.lower(User.username).label("username_lower"),
+    User.id,
+    postgresql_ops={"username_lower": "text_pattern_ops"},
+).ddl_if(dialect="postgresql")
+
+Index(
+    "ix_users_email_lower_prefix",
+    func.lower(User.email).label("email_lower"),
+    User.id,
+    postgresql_ops={"email_lower": "text_pattern_ops"},
+).ddl_if(dialect="postgresql")
+
+Index(
+    "ix_users_username_trgm",
+    User.username,
+    postgresql_using="gin",
+    postgresql_ops={"username": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
+Index(
+    "ix_users_email_trgm",
+    User.email,
+    postgresql_using="gin",
+    postgresql_ops={"email": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, BigInteger, String
+from backend.database.connection import Base
+
+# 各资源的版本名称
+USERS_VERSION = "users"
+ROLES_VERSION = "roles"
+PERMISSIONS_VERSION = "permissions"
+
+
+class TableVersion(Base):
+    """
+    资源版本计数器，每次相关数据变更时在同一事务中递增，用于生成 ETag
+    """
+    __tablename__ = "table_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
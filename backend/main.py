@@ -1,7 +1,25 @@
-from fastapi import FastAPI
+import hmac
+import logging
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from backend.api.v1.user import users, roles, permissions, auth
+from backend.api.v1.user import users, roles, permissions, auth, jobs, rbac, acl, service_accounts, groups, changes
 from backend.config import settings
+from backend.middleware.admission import AdmissionControlMiddleware
+from backend.middleware.deadline import DeadlineMiddleware
+from backend.database import SessionLocal, engine
+from backend.database.schema_upgrade import upgrade_schema
+from backend.services.user.effective_permission_service import backfill_effective_permissions
+from backend.services.user.permission_catalog import permission_catalog, validate_permission_constants
+from backend.services.user.rbac_snapshot_service import warm_from_snapshot
+from backend.services.user.job_worker import job_worker
+from backend.services.user.permission_matrix import permission_matrix_refresher
+from backend.services.user.change_feed import change_feed
+from backend.services.user.role_expiry_scheduler import role_expiry_scheduler
+from backend.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="FastAPI 权限管理系统",
@@ -9,6 +27,13 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# 准入控制：按连接池容量限制并发请求，过载时快速返回 503
+# 先于 CORS 添加，使 CORS 位于外层，503 响应同样带有 CORS 头
+app.add_middleware(AdmissionControlMiddleware)
+
+# 请求截止时间：位于准入控制外层，排队时间同样计入预算
+app.add_middleware(DeadlineMiddleware)
+
 # 添加 CORS 中间件
 app.add_middleware(
     CORSMiddleware,
@@ -20,10 +45,122 @@ app.add_middleware(
 
 # 包含 API 路由
 app.include_router(auth.router, prefix="/api/v1", tags=["认证"])
-app.include_router(users.router, prefix="/api/v1", tags=["用户"])
-app.include_router(roles.router, prefix="/api/v1", tags=["角色"])
-app.include_router(permissions.router, prefix="/api/v1", tags=["权限"])
+# 用户、角色、权限路由内部使用 "/" 与 "/{id}" 等相对路径，必须各自挂载在资源前缀下，
+# 否则 GET /api/v1/{user_id} 会遮蔽其他路由的 GET 端点（如 /api/v1/jobs）
+app.include_router(users.router, prefix="/api/v1/users", tags=["用户"])
+app.include_router(roles.router, prefix="/api/v1/roles", tags=["角色"])
+app.include_router(permissions.router, prefix="/api/v1/permissions", tags=["权限"])
+app.include_router(jobs.router, prefix="/api/v1", tags=["任务"])
+app.include_router(rbac.router, prefix="/api/v1", tags=["RBAC"])
+app.include_router(acl.router, prefix="/api/v1", tags=["资源授权"])
+app.include_router(service_accounts.router, prefix="/api/v1", tags=["服务账户"])
+app.include_router(groups.router, prefix="/api/v1", tags=["用户组"])
+app.include_router(changes.router, prefix="/api/v1", tags=["变更流"])
+
+@app.on_event("startup")
+def upgrade_database_schema():
+    """
+    为已有数据库补齐新增的列与索引并回填为空的有效权限表，须在其他启动步骤读取数据库之前执行
+    """
+    if settings.SCHEMA_UPGRADE_ON_STARTUP:
+        upgrade_schema(engine)
+        db = SessionLocal()
+        try:
+            if backfill_effective_permissions(db):
+                logger.info("已回填用户有效权限表")
+        finally:
+            db.close()
+
+
+@app.on_event("startup")
+def load_permission_catalog():
+    """
+    启动时加载权限目录，并校验内置权限常量是否都已存在
+
+    配置了 RBAC 快照且快照与数据库版本一致时直接从快照预热。
+    """
+    db = SessionLocal()
+    try:
+        if not (settings.RBAC_SNAPSHOT_PATH and warm_from_snapshot(db, settings.RBAC_SNAPSHOT_PATH)):
+            permission_catalog.load(db)
+    finally:
+        db.close()
+    
+    missing = validate_permission_constants()
+    if missing:
+        message = f"数据库中缺少以下内置权限: {', '.join(missing)}"
+        if settings.PERMISSION_CATALOG_STRICT:
+            raise RuntimeError(message)
+        logger.warning(message)
+
+
+@app.on_event("startup")
+async def start_job_worker():
+    """
+    启动进程内后台任务工作者
+    """
+    if settings.JOB_WORKER_ENABLED:
+        await job_worker.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_worker():
+    await job_worker.stop()
+
+
+@app.on_event("startup")
+async def start_permission_matrix():
+    """
+    启用共享权限矩阵时，在后台保持矩阵文件与数据库版本一致
+    """
+    await permission_matrix_refresher.start()
+
+
+@app.on_event("shutdown")
+async def stop_permission_matrix():
+    await permission_matrix_refresher.stop()
+
+
+@app.on_event("startup")
+async def start_role_expiry_scheduler():
+    """
+    启动临时角色分配的到期调度器
+    """
+    if settings.ROLE_EXPIRY_ENABLED:
+        await role_expiry_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_role_expiry_scheduler():
+    await role_expiry_scheduler.stop()
+
+
+@app.on_event("shutdown")
+async def stop_change_feed():
+    await change_feed.stop()
+
 
 @app.get("/")
 async def root():
-    return {"message": "欢迎使用 FastAPI 权限管理系统"}
\ No newline at end of file
+    return {"message": "欢迎使用 FastAPI 权限管理系统"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics(authorization: Optional[str] = Header(None)):
+    """
+    以 Prometheus 文本格式输出进程内指标
+
+    METRICS_ENABLED 关闭时返回 404；配置了 METRICS_TOKEN 时需要以 Bearer 方式携带该令牌。
+    端点不参与准入控制，过载时仍可抓取，因此不走数据库认证。
+    """
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if authorization is None or not hmac.compare_digest(authorization.encode(), expected.encode()):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="无效的指标令牌",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+    return metrics.render()
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+按数据库连接池容量进行准入控制的 ASGI 中间件
+
+每个工作进程同时处理的请求数不超过连接池容量，超出的请求进入一个短的优先级队列：
+登录与授权检查优先，管理端的列表与导出最后。排队超过阈值或队列已满时立即返回
+503 与 Retry-After，而不是让请求堆积在连接池上使所有请求的延迟一起失控。
+
+纯 ASGI 实现，不缓冲响应体，流式响应在发送完成后才释放名额。
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import List, Optional, Tuple
+
+from fastapi import status
+from sqlalchemy.pool import QueuePool
+
+from backend.config import settings
+from backend.database import engine
+from backend.middleware.routing import resolve_route_name
+from backend.utils.metrics import metrics
+from backend.utils.responses import error_response, create_json_response
+
+# 优先级，数值越小越优先
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+_PRIORITY_NAMES = {PRIORITY_HIGH: "high", PRIORITY_NORMAL: "normal", PRIORITY_LOW: "low"}
+
+metrics.describe("admission_admitted_total", "准入控制放行的请求数（含排队后放行）")
+metrics.describe("admission_queued_total", "因并发已满而进入队列的请求数")
+metrics.describe("admission_shed_total", "被拒绝（503）的请求数，reason 为 queue_full、timeout 或 evicted")
+metrics.describe("admission_queue_wait_seconds_total", "排队后放行的请求累计等待时间")
+metrics.describe("admission_in_flight", "当前正在处理的请求数")
+metrics.describe("admission_queue_depth", "当前排队的请求数")
+
+
+def pool_capacity(bind) -> Optional[int]:
+    """
+    连接池允许的最大连接数，池不限制连接数时返回 None
+    """
+    pool = bind.pool
+    if isinstance(pool, QueuePool) and pool._max_overflow >= 0:
+        return pool.size() + pool._max_overflow
+    return None
+
+
+class AdmissionController:
+    """
+    并发上限加优先级等待队列
+
+    释放名额时直接交给队列中优先级最高、最早到达的请求，in_flight 不变，
+    避免刚释放的名额被新到达的请求抢走。只在事件循环线程中使用，不需要加锁。
+    """
+
+    def __init__(self, capacity: int, queue_size: int, max_wait: float):
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._queued = 0
+        self._sequence = itertools.count()
+
+    def _publish(self) -> None:
+        metrics.set("admission_in_flight", self.in_flight)
+        metrics.set("admission_queue_depth", self._queued)
+
+    def _evict_lowest(self, priority: int) -> bool:
+        """
+        队列已满时让出优先级低于 priority 的最晚到达的等待者
+        """
+        candidates = [entry for entry in self._waiters if not entry[2].done() and entry[0] > priority]
+        if not candidates:
+            return False
+        victim = max(candidates, key=lambda entry: (entry[0], entry[1]))
+        victim[2].set_result(False)
+        return True
+
+    async def acquire(self, priority: int) -> Tuple[bool, str]:
+        """
+        获取处理名额，返回 (是否放行, 拒绝原因)
+        """
+        label = _PRIORITY_NAMES[priority]
+        if self.in_flight < self.capacity and not self._queued:
+            self.in_flight += 1
+            metrics.inc("admission_admitted_total", priority=label)
+            self._publish()
+            return True, ""
+        if self._queued >= self.queue_size and not self._evict_lowest(priority):
+            metrics.inc("admission_shed_total", priority=label, reason="queue_full")
+            return False, "queue_full"
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._queued += 1
+        metrics.inc("admission_queued_total", priority=label)
+        self._publish()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # 客户端断开：名额可能已在取消前交给了本请求
+            if future.done() and not future.cancelled() and future.result():
+                self.release()
+            raise
+        finally:
+            self._queued -= 1
+            self._publish()
+
+        if future.done() and not future.cancelled():
+            if future.result():
+                metrics.inc("admission_admitted_total", priority=label)
+                metrics.inc("admission_queue_wait_seconds_total", time.monotonic() - started)
+                return True, ""
+            metrics.inc("admission_shed_total", priority=label, reason="evicted")
+            return False, "evicted"
+        metrics.inc("admission_shed_total", priority=label, reason="timeout")
+        return False, "timeout"
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(True)
+                return
+        self.in_flight -= 1
+        self._publish()
+
+
+class AdmissionControlMiddleware:
+    """
+    为使用数据库的 HTTP 请求进行准入控制
+
+    豁免的路由（根路径、指标、文档、长连接的变更流等）与 OPTIONS 预检请求不占用名额。
+    路由按名称识别（见 resolve_route_name），未匹配任何路由的请求按普通优先级处理。
+    """
+
+    def __init__(self, app, capacity: Optional[int] = None, queue_size: Optional[int] = None,
+                 max_wait: Optional[float] = None):
+        self.app = app
+        capacity = capacity or settings.ADMISSION_MAX_CONCURRENCY or pool_capacity(engine) or 16
+        self.controller = AdmissionController(
+            capacity,
+            settings.ADMISSION_QUEUE_SIZE if queue_size is None else queue_size,
+            max_wait or settings.ADMISSION_MAX_QUEUE_WAIT_SECONDS,
+        )
+        self.exempt_routes = set(settings.ADMISSION_EXEMPT_ROUTES)
+        self.high_priority_routes = set(settings.ADMISSION_HIGH_PRIORITY_ROUTES)
+        self.low_priority_routes = set(settings.ADMISSION_LOW_PRIORITY_ROUTES)
+
+    def classify(self, route_name: Optional[str]) -> int:
+        if route_name in self.high_priority_routes:
+            return PRIORITY_HIGH
+        if route_name in self.low_priority_routes:
+            return PRIORITY_LOW
+        return PRIORITY_NORMAL
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_CONTROL_ENABLED or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        route_name = resolve_route_name(scope)
+        if route_name in self.exempt_routes:
+            await self.app(scope, receive, send)
+            return
+
+        admitted, reason = await self.controller.acquire(self.classify(route_name))
+        if not admitted:
+            response = create_json_response(error_response(
+                error=f"请求被准入控制拒绝: {reason}",
+                message="服务繁忙，请稍后重试",
+                code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            ))
+            response.headers["Retry-After"] = str(settings.ADMISSION_RETRY_AFTER_SECONDS)
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
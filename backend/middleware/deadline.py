@@ -0,0 +1,103 @@
+"""
+请求截止时间中间件
+
+每个请求的时间预算来自 X-Request-Timeout 请求头（秒），未提供时使用按路由名称配置的默认值，
+上限为 REQUEST_DEADLINE_MAX_SECONDS 与路由默认值中的较大者。预算写入 contextvar，
+由数据库层传递为语句超时；预算用完时取消请求并返回 504。
+
+预算只约束到响应开始发送（首字节）为止：响应开始后解除截止时间，
+流式响应体（如 NDJSON 导出）的发送时间不受预算限制。
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import status
+
+from backend.config import settings
+from backend.middleware.routing import resolve_route_name
+from backend.utils.deadline import DeadlineExceeded, deadline_scope
+from backend.utils.metrics import metrics
+from backend.utils.responses import error_response, create_json_response
+
+DEADLINE_HEADER = b"x-request-timeout"
+
+metrics.describe("request_deadline_exceeded_total", "因超出时间预算而被取消的请求数")
+
+
+class DeadlineMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.exempt_routes = set(settings.REQUEST_DEADLINE_EXEMPT_ROUTES)
+        self.routes = dict(settings.REQUEST_DEADLINE_ROUTES)
+
+    def budget_for(self, scope, route_name: Optional[str] = None) -> float:
+        if route_name is None:
+            route_name = resolve_route_name(scope)
+        default = self.routes.get(route_name, settings.REQUEST_DEADLINE_DEFAULT_SECONDS)
+        requested = self._requested_budget(scope)
+        if requested is None:
+            return default
+        return min(requested, max(default, settings.REQUEST_DEADLINE_MAX_SECONDS))
+
+    @staticmethod
+    def _requested_budget(scope) -> Optional[float]:
+        for name, value in scope["headers"]:
+            if name == DEADLINE_HEADER:
+                try:
+                    seconds = float(value)
+                except ValueError:
+                    return None
+                return seconds if seconds > 0 else None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route_name = resolve_route_name(scope)
+        if route_name in self.exempt_routes:
+            await self.app(scope, receive, send)
+            return
+
+        budget = self.budget_for(scope, route_name)
+        with deadline_scope(budget) as deadline:
+            response_started = asyncio.Event()
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    deadline.lift()
+                    response_started.set()
+                await send(message)
+
+            # 任务创建时复制了包含截止时间的上下文，lift() 修改的是同一个 Deadline 对象
+            task = asyncio.create_task(self.app(scope, receive, send_wrapper))
+            started = asyncio.create_task(response_started.wait())
+            try:
+                await asyncio.wait({task, started}, timeout=budget, return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                started.cancel()
+
+            timed_out = not response_started.is_set() and not task.done()
+            if timed_out:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            else:
+                try:
+                    await task
+                    return
+                except DeadlineExceeded:
+                    if response_started.is_set():
+                        # 响应已经开始发送，只能中断连接
+                        raise
+
+        metrics.inc("request_deadline_exceeded_total")
+        response = create_json_response(error_response(
+            error=f"请求超出 {budget:g} 秒的时间预算",
+            message="请求超时",
+            code=status.HTTP_504_GATEWAY_TIMEOUT,
+        ))
+        await response(scope, receive, send)
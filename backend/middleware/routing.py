@@ -0,0 +1,25 @@
+"""
+在路由之前识别请求对应的路由
+
+纯 ASGI 中间件运行在路由之前，scope 中还没有 route。这里按应用的路由表匹配请求，
+返回路由名称（默认为端点函数名），配置可以按路由名称而不是手写的 URL 正则区分请求，
+路由挂载前缀的变化不会让配置失效。
+"""
+
+from typing import Optional
+
+from starlette.routing import Match
+
+
+def resolve_route_name(scope) -> Optional[str]:
+    """
+    返回与请求（路径与方法）完全匹配的路由名称，没有匹配的路由时返回 None
+    """
+    router = getattr(scope.get("app"), "router", None)
+    if router is None:
+        return None
+    for route in router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.name
+    return None
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+
+# 资源 ACL 模式
+class ResourceAclGrant(BaseModel):
+    resource_type: str = Field(..., max_length=64)
+    resource_ids: List[int]
+    permission: str
+    subject_type: Literal["user", "role"]
+    subject_id: int
+
+
+class ResourceAclFilter(BaseModel):
+    resource_type: str = Field(..., max_length=64)
+    permission: str
+    resource_ids: List[int]
+    user_id: Optional[int] = None  # 默认为当前用户
+
+
+class ResourceAclFilterResult(BaseModel):
+    resource_ids: List[int]
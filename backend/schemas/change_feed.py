@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+
+# 变更流模式
+class ChangeEvent(BaseModel):
+    id: int  # 变更序号
+    event_type: str
+    entity_id: Optional[int] = None
+    payload: Dict[str, Any] = {}
+    created_at: Optional[datetime] = None
+
+
+class ChangeFeedPage(BaseModel):
+    events: List[ChangeEvent]
+    next_since: int  # 下一次请求的 since
+    reset: bool = False  # 为真时 since 之后的事件已被清理，需要重新读取完整数据
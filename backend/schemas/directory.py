@@ -0,0 +1,25 @@
+from pydantic import BaseModel, EmailStr
+from typing import List, Optional
+
+
+# 目录同步模式
+class DirectoryUser(BaseModel):
+    username: str
+    email: Optional[EmailStr] = None
+    status: bool = True
+    roles: List[str] = []
+
+
+class DirectorySnapshot(BaseModel):
+    users: List[DirectoryUser]
+
+
+class DirectorySyncResult(BaseModel):
+    total: int = 0
+    inserted: int = 0
+    updated: int = 0
+    deactivated: int = 0
+    roles_added: int = 0
+    roles_removed: int = 0
+    conflicts: List[str] = []
+    unknown_roles: List[str] = []
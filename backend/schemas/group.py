@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+
+# 用户组模式
+class GroupCreate(BaseModel):
+    name: str = Field(..., max_length=255)
+    description: Optional[str] = None
+
+
+class GroupUpdate(BaseModel):
+    name: Optional[str] = Field(None, max_length=255)
+    description: Optional[str] = None
+
+
+class GroupResponse(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    roles: List[str] = []
+    parent_ids: List[int] = []
+    child_ids: List[int] = []
+
+
+class GroupMembersChange(BaseModel):
+    user_ids: List[int]
+
+
+class GroupRolesReplace(BaseModel):
+    role_ids: List[int]
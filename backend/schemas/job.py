@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+
+# 后台任务模式
+class JobCreate(BaseModel):
+    type: str
+    params: Dict[str, Any] = {}
+
+
+class JobResponse(BaseModel):
+    id: int
+    type: str
+    status: str
+    progress: int = 0
+    total: Optional[int] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,40 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+
+# 服务账户模式
+class ServiceAccountCreate(BaseModel):
+    username: str
+    description: Optional[str] = None
+    role_ids: List[int] = []
+
+
+class ServiceAccountResponse(BaseModel):
+    id: int
+    username: str
+    status: Optional[bool] = True
+    created_at: Optional[datetime] = None
+    roles: List[str] = []
+
+
+# API 密钥模式
+class ApiKeyCreate(BaseModel):
+    name: str = Field(..., max_length=100)
+    scopes: List[str]  # 权限名称，密钥只能使用账户权限与范围的交集
+    expires_in_days: Optional[int] = Field(None, gt=0)
+
+
+class ApiKeyResponse(BaseModel):
+    id: int
+    name: str
+    prefix: str
+    scopes: List[str] = []
+    expires_at: Optional[datetime] = None
+    revoked_at: Optional[datetime] = None
+    last_used_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+
+
+class ApiKeyCreated(ApiKeyResponse):
+    key: str  # 明文密钥，只在创建时返回一次
@@ -91,6 +91,24 @@ class PermissionInDB(PermissionBase):
         from_attributes = True
 
 
+# 关联集合替换模式
+class UserRolesReplace(BaseModel):
+    role_ids: List[int]
+
+
+class RoleAssignment(BaseModel):
+    expires_at: Optional[datetime] = None  # 为空表示永久分配
+
+
+class RolePermissionsReplace(BaseModel):
+    permission_ids: List[int]
+
+
+class MembershipChange(BaseModel):
+    added: List[int] = []
+    removed: List[int] = []
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
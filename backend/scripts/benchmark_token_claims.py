@@ -0,0 +1,90 @@
+"""
+令牌权限声明格式的基准测试脚本
+
+为不同权限数量构造令牌，比较 names（权限名称列表）与 bitmap（权限ID位图）两种格式的
+Authorization 请求头大小，以及验证签名并取出权限集合的耗时。
+
+names 格式按旧实现逐个角色展开权限，同一权限被多个角色共享时会重复出现，
+--roles 控制每个权限平均出现在多少个角色中。
+
+用法:
+    python -m backend.scripts.benchmark_token_claims
+    python -m backend.scripts.benchmark_token_claims --counts 20 200 2000 --roles 3 --samples 2000
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+from backend.utils.security import (
+    create_access_token, verify_token, encode_permission_bitmap, decode_permission_claim,
+    PERMISSION_VERSION_CLAIM, PERMISSION_BITMAP_CLAIM,
+)
+
+# 与 backend/constants/permissions.py 中的命名风格一致，名称长度接近真实权限
+_RESOURCES = ["user", "role", "permission", "group", "acl", "service_account", "report", "audit"]
+_ACTIONS = ["create", "read", "update", "delete", "export", "assign"]
+
+
+def _permission_names(count: int) -> List[str]:
+    return [
+        f"{_RESOURCES[i % len(_RESOURCES)]}_{i // len(_RESOURCES)}:{_ACTIONS[i % len(_ACTIONS)]}"
+        for i in range(count)
+    ]
+
+
+def _measure(decode: Callable[[], object], samples: int) -> float:
+    """
+    返回单次解码耗时的中位数（微秒）
+    """
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        decode()
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    return statistics.median(timings)
+
+
+def benchmark(count: int, roles: int, samples: int) -> List[tuple]:
+    names = _permission_names(count)
+    base = {"sub": "benchmark-user", "user_id": 1}
+
+    names_token = create_access_token({**base, "permissions": names * roles})
+    bitmap_token = create_access_token({
+        **base,
+        PERMISSION_VERSION_CLAIM: 1,
+        PERMISSION_BITMAP_CLAIM: encode_permission_bitmap(range(1, count + 1)),
+    })
+
+    def decode_names():
+        return frozenset(verify_token(names_token)["permissions"])
+
+    def decode_bitmap():
+        return decode_permission_claim(verify_token(bitmap_token), 1)
+
+    assert len(decode_names()) == count and decode_bitmap() == frozenset(range(1, count + 1))
+    return [
+        ("names", len("Bearer " + names_token), _measure(decode_names, samples)),
+        ("bitmap", len("Bearer " + bitmap_token), _measure(decode_bitmap, samples)),
+    ]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="比较令牌权限声明格式的大小与解码耗时")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 50, 200, 1000], help="令牌中的权限数量")
+    parser.add_argument("--roles", type=int, default=2, help="names 格式中每个权限的重复次数（共享该权限的角色数）")
+    parser.add_argument("--samples", type=int, default=1000, help="每种格式的解码次数")
+    args = parser.parse_args(argv)
+
+    print(f"{'权限数':>8} {'格式':>8} {'请求头字节':>10} {'解码耗时(us)':>12}")
+    for count in args.counts:
+        results = benchmark(count, args.roles, args.samples)
+        for label, header_bytes, elapsed in results:
+            print(f"{count:>8} {label:>8} {header_bytes:>10} {elapsed:>12.1f}")
+        (_, names_bytes, _), (_, bitmap_bytes, _) = results
+        print(f"{'':>8} {'':>8} 位图格式为名称格式的 {bitmap_bytes / names_bytes:.1%}")
+
+
+if __name__ == "__main__":
+    main()
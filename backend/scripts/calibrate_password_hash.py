@@ -0,0 +1,111 @@
+"""
+密码哈希工作因子校准脚本
+
+在当前硬件上测量不同工作因子的哈希耗时，选出不超过目标延迟的最大工作因子，
+并输出可直接写入 .env 的配置。
+
+用法:
+    python -m backend.scripts.calibrate_password_hash --target-ms 250
+    python -m backend.scripts.calibrate_password_hash --scheme argon2 --target-ms 250 --memory-cost 65536
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.config import settings
+from backend.utils.security import create_password_context
+
+SAMPLE_PASSWORD = "calibration-password"
+BCRYPT_ROUNDS_RANGE = range(8, 17)
+ARGON2_TIME_COST_RANGE = range(1, 21)
+
+
+def _measure(context, samples: int) -> float:
+    """
+    返回哈希耗时的中位数（毫秒）；验证与哈希的耗时相同
+    """
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash(SAMPLE_PASSWORD)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def _calibrate(candidates, make_context: Callable[[int], object], target_ms: float,
+               samples: int) -> Tuple[Optional[int], List[Tuple[int, float]]]:
+    """
+    从小到大尝试工作因子，耗时超过目标后停止（耗时随工作因子单调增长）
+    """
+    chosen, results = None, []
+    for cost in candidates:
+        elapsed = _measure(make_context(cost), samples)
+        results.append((cost, elapsed))
+        if elapsed > target_ms:
+            break
+        chosen = cost
+    return chosen, results
+
+
+def calibrate_bcrypt(target_ms: float, samples: int) -> Tuple[Dict[str, object], List[Tuple[int, float]]]:
+    chosen, results = _calibrate(
+        BCRYPT_ROUNDS_RANGE,
+        lambda rounds: create_password_context(["bcrypt"], bcrypt_rounds=rounds),
+        target_ms, samples,
+    )
+    return {"PASSWORD_BCRYPT_ROUNDS": chosen or BCRYPT_ROUNDS_RANGE.start}, results
+
+
+def calibrate_argon2(target_ms: float, samples: int, memory_cost: int,
+                     parallelism: int) -> Tuple[Dict[str, object], List[Tuple[int, float]]]:
+    # 内存开销决定抗 GPU 能力，按部署内存预算固定；只校准时间开销
+    chosen, results = _calibrate(
+        ARGON2_TIME_COST_RANGE,
+        lambda time_cost: create_password_context(
+            ["argon2"], argon2_time_cost=time_cost, argon2_memory_cost=memory_cost, argon2_parallelism=parallelism
+        ),
+        target_ms, samples,
+    )
+    return {
+        "PASSWORD_ARGON2_TIME_COST": chosen or ARGON2_TIME_COST_RANGE.start,
+        "PASSWORD_ARGON2_MEMORY_COST": memory_cost,
+        "PASSWORD_ARGON2_PARALLELISM": parallelism,
+    }, results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="校准密码哈希工作因子")
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2"], default=settings.PASSWORD_HASH_SCHEMES[0])
+    parser.add_argument("--target-ms", type=float, default=250, help="单次登录哈希验证的目标耗时（毫秒）")
+    parser.add_argument("--samples", type=int, default=3, help="每个工作因子的测量次数")
+    parser.add_argument("--memory-cost", type=int, default=settings.PASSWORD_ARGON2_MEMORY_COST,
+                        help="argon2 内存开销（KiB）")
+    parser.add_argument("--parallelism", type=int, default=settings.PASSWORD_ARGON2_PARALLELISM,
+                        help="argon2 并行度")
+    args = parser.parse_args(argv)
+
+    if args.scheme == "bcrypt":
+        config, results = calibrate_bcrypt(args.target_ms, args.samples)
+        label = "rounds"
+    else:
+        config, results = calibrate_argon2(args.target_ms, args.samples, args.memory_cost, args.parallelism)
+        label = "time_cost"
+
+    for cost, elapsed in results:
+        print(f"{args.scheme} {label}={cost}: {elapsed:.1f}ms")
+    if all(elapsed > args.target_ms for _, elapsed in results):
+        print(f"警告: 最低工作因子仍超过目标耗时 {args.target_ms:g}ms")
+    print("\n# 建议配置")
+    if args.scheme != settings.PASSWORD_HASH_SCHEMES[0]:
+        # 保留原有方案用于验证旧哈希，用户登录时自动迁移到新方案
+        schemes = [args.scheme] + [scheme for scheme in settings.PASSWORD_HASH_SCHEMES if scheme != args.scheme]
+        print("PASSWORD_HASH_SCHEMES=" + json.dumps(schemes))
+    for name, value in config.items():
+        print(f"{name}={value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+RBAC 快照导出与检查脚本
+
+用法:
+    python -m backend.scripts.rbac_snapshot export /var/lib/app/rbac.snapshot
+    python -m backend.scripts.rbac_snapshot inspect /var/lib/app/rbac.snapshot
+
+配置 RBAC_SNAPSHOT_PATH 后，应用启动时会从该文件预热权限目录。
+"""
+
+import argparse
+import time
+
+from backend.database import SessionLocal
+from backend.services.user.rbac_snapshot_service import export_snapshot, read_snapshot, write_snapshot, is_current
+
+
+def _export(path: str) -> None:
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        snapshot = export_snapshot(db)
+    finally:
+        db.close()
+    size = write_snapshot(path, snapshot)
+    print(f"已导出 {snapshot.counts()} 到 {path}: {size} 字节, 耗时 {time.perf_counter() - started:.2f}s")
+
+
+def _inspect(path: str) -> None:
+    started = time.perf_counter()
+    snapshot = read_snapshot(path)
+    elapsed = time.perf_counter() - started
+    db = SessionLocal()
+    try:
+        current = is_current(db, snapshot)
+    finally:
+        db.close()
+    print(f"数据版本: {snapshot.versions}")
+    print(f"导出时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot.created_at))}")
+    print(f"内容: {snapshot.counts()}")
+    print(f"加载耗时: {elapsed * 1000:.1f}ms, 与数据库一致: {'是' if current else '否'}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="导出或检查 RBAC 二进制快照")
+    parser.add_argument("command", choices=["export", "inspect"])
+    parser.add_argument("path", help="快照文件路径")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        _export(args.path)
+    else:
+        _inspect(args.path)
+
+
+if __name__ == "__main__":
+    main()
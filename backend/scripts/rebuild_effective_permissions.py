@@ -0,0 +1,33 @@
+"""
+有效权限表全量重建脚本
+
+按用户ID区间分批根据 user_roles 与 role_permissions 重新生成 user_effective_permissions，
+每批在独立事务中提交。用于首次上线、直接改库之后或怀疑物化表与关联表不一致时。
+
+用法:
+    python -m backend.scripts.rebuild_effective_permissions --batch-size 5000
+"""
+
+import argparse
+import time
+
+from backend.database import SessionLocal
+from backend.services.user.effective_permission_service import rebuild_effective_permissions
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="全量重建用户有效权限表")
+    parser.add_argument("--batch-size", type=int, default=None, help="每批处理的用户ID区间大小")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        max_id = rebuild_effective_permissions(db, args.batch_size)
+    finally:
+        db.close()
+    print(f"完成: 用户ID上界 {max_id}, 耗时 {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+压测数据生成脚本
+
+按给定规模生成用户、角色、权限以及服从幂律分布的用户-角色、角色-权限关联，
+用于对 list_users、require_permission 以及关联表进行压测。
+
+用法:
+    python -m backend.scripts.seed_data --users 1000000 --roles 500 --permissions 2000 --seed 42
+
+PostgreSQL 通过 COPY 批量导入，其他数据库（如 SQLite）通过 executemany 导入。
+所有用户共用一个预先计算好的密码哈希，避免逐行执行 bcrypt。
+同一个 seed 在空库上总是生成完全相同的数据。
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import random
+import time
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from backend.constants.permissions import PERMISSIONS
+from backend.database import engine as default_engine, Base
+from backend.database.user_models import User, Role, Permission, user_roles, role_permissions
+from backend.database.version_models import USERS_VERSION, ROLES_VERSION, PERMISSIONS_VERSION
+from backend.database import job_models  # noqa: F401  注册 jobs 表，供 --create-tables 使用
+from backend.database import acl_models  # noqa: F401  注册 resource_acls 表，供 --create-tables 使用
+from backend.database import api_key_models  # noqa: F401  注册服务账户与 API 密钥表，供 --create-tables 使用
+from backend.database import group_models  # noqa: F401  注册用户组相关表，供 --create-tables 使用
+from backend.database import outbox_models  # noqa: F401  注册 outbox_events 表，供 --create-tables 使用
+from backend.services.user.effective_permission_service import rebuild_user_range
+from backend.services.user.table_version_service import bump_versions
+from backend.utils.security import get_password_hash
+
+DEFAULT_PASSWORD = "password123"
+DEFAULT_BATCH_SIZE = 10000
+
+
+def _batched(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    """
+    将行迭代器切分为固定大小的批次
+    """
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _next_id(connection: Connection, model) -> int:
+    """
+    获取表中下一个可用的主键，生成的数据从该值开始编号
+    """
+    current = connection.execute(select(func.max(model.id))).scalar()
+    return (current or 0) + 1
+
+
+def _power_law_cum_weights(count: int, alpha: float) -> List[float]:
+    """
+    生成按排名衰减的累计权重，第 k 名的权重为 1 / k^alpha
+    """
+    return list(itertools.accumulate(1.0 / (rank ** alpha) for rank in range(1, count + 1)))
+
+
+def _copy_rows(connection: Connection, table, columns: Sequence[str], rows: Iterable[tuple], batch_size: int) -> int:
+    """
+    使用 PostgreSQL COPY 批量导入行
+    """
+    total = 0
+    dbapi_connection = connection.connection.dbapi_connection
+    copy_sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    with dbapi_connection.cursor() as cursor:
+        for batch in _batched(rows, batch_size):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+            total += len(batch)
+    return total
+
+
+def _executemany_rows(connection: Connection, table, columns: Sequence[str], rows: Iterable[tuple], batch_size: int) -> int:
+    """
+    使用 executemany 批量导入行
+    """
+    total = 0
+    statement = table.insert()
+    for batch in _batched(rows, batch_size):
+        connection.execute(statement, [dict(zip(columns, row)) for row in batch])
+        total += len(batch)
+    return total
+
+
+def bulk_load(bind: Engine, table, columns: Sequence[str], rows: Iterable[tuple], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    根据数据库方言选择最快的批量导入方式，每张表在一个事务中完成
+    """
+    loader = _copy_rows if bind.dialect.name == "postgresql" else _executemany_rows
+    with bind.begin() as connection:
+        return loader(connection, table, columns, rows, batch_size)
+
+
+def _reset_sequences(bind: Engine) -> None:
+    """
+    显式指定主键导入后，重置 PostgreSQL 自增序列
+    """
+    if bind.dialect.name != "postgresql":
+        return
+    with bind.begin() as connection:
+        for model in (User, Role, Permission):
+            table = model.__tablename__
+            connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+            ))
+
+
+def generate_permissions(first_id: int, count: int, missing_names: Sequence[str] = ()) -> List[Tuple[int, str, str]]:
+    """
+    生成权限行，先补齐数据库中缺失的 PERMISSIONS 常量，其余使用合成名称
+    """
+    names = list(missing_names)[:count]
+    names += [f"seed:perm_{first_id + offset}" for offset in range(len(names), count)]
+    return [
+        (first_id + offset, name, f"压测权限 {name}")
+        for offset, name in enumerate(names)
+    ]
+
+
+def generate_roles(first_id: int, count: int) -> List[Tuple[int, str, str]]:
+    """
+    生成角色行
+    """
+    return [
+        (first_id + offset, f"seed_role_{first_id + offset}", f"压测角色 {first_id + offset}")
+        for offset in range(count)
+    ]
+
+
+def generate_users(rng: random.Random, first_id: int, count: int, password_hash: str,
+                   inactive_ratio: float) -> Iterator[Tuple[int, str, str, str, bool]]:
+    """
+    逐行生成用户，所有用户共享同一个预计算的密码哈希
+    """
+    for user_id in range(first_id, first_id + count):
+        yield (
+            user_id,
+            f"seed_user_{user_id}",
+            f"seed_user_{user_id}@example.com",
+            password_hash,
+            rng.random() >= inactive_ratio,
+        )
+
+
+def generate_memberships(rng: random.Random, owner_ids: Iterable[int], target_ids: Sequence[int],
+                         alpha: float, max_per_owner: int) -> Iterator[Tuple[int, int]]:
+    """
+    生成幂律分布的关联关系
+
+    每个所有者关联的数量服从帕累托分布，被关联的目标按排名以 1 / k^alpha 的概率被选中，
+    因此少数热门角色（或权限）会拥有绝大多数成员。
+    """
+    if not target_ids or max_per_owner <= 0:
+        return
+    cum_weights = _power_law_cum_weights(len(target_ids), alpha)
+    for owner_id in owner_ids:
+        wanted = min(max_per_owner, len(target_ids), int(rng.paretovariate(1.5)))
+        chosen = set(rng.choices(target_ids, cum_weights=cum_weights, k=wanted))
+        for target_id in sorted(chosen):
+            yield owner_id, target_id
+
+
+def seed(bind: Engine, users: int, roles: int, permissions: int, seed_value: int = 0,
+         password_hash: str = None, alpha: float = 1.1, max_roles_per_user: int = 8,
+         max_permissions_per_role: int = 64, inactive_ratio: float = 0.05,
+         batch_size: int = DEFAULT_BATCH_SIZE, log=print) -> dict:
+    """
+    生成并导入压测数据，返回各表导入的行数
+    """
+    rng = random.Random(seed_value)
+    if password_hash is None:
+        password_hash = get_password_hash(DEFAULT_PASSWORD)
+
+    with bind.connect() as connection:
+        first_permission_id = _next_id(connection, Permission)
+        first_role_id = _next_id(connection, Role)
+        first_user_id = _next_id(connection, User)
+        existing_constants = dict(connection.execute(
+            select(Permission.name, Permission.id).where(Permission.name.in_(list(PERMISSIONS.values())))
+        ).all())
+
+    counts = {}
+
+    def load(label, table, columns, rows):
+        started = time.perf_counter()
+        counts[label] = bulk_load(bind, table, columns, rows, batch_size)
+        log(f"{label}: {counts[label]} 行, 耗时 {time.perf_counter() - started:.1f}s")
+
+    missing_constants = [name for name in PERMISSIONS.values() if name not in existing_constants]
+    permission_rows = generate_permissions(first_permission_id, permissions, missing_constants)
+    role_rows = generate_roles(first_role_id, roles)
+    # 内置权限排在最前面，按幂律分布它们会被授予给最多的角色
+    permission_ids = [existing_constants[name] for name in PERMISSIONS.values() if name in existing_constants]
+    permission_ids += [row[0] for row in permission_rows]
+    role_ids = [row[0] for row in role_rows]
+
+    load("permissions", Permission.__table__, ("id", "name", "description"), permission_rows)
+    load("roles", Role.__table__, ("id", "name", "description"), role_rows)
+    load("users", User.__table__, ("id", "username", "email", "password", "status"),
+         generate_users(rng, first_user_id, users, password_hash, inactive_ratio))
+    load("role_permissions", role_permissions, ("role_id", "permission_id"),
+         generate_memberships(rng, role_ids, permission_ids, alpha, max_permissions_per_role))
+    load("user_roles", user_roles, ("user_id", "role_id"),
+         generate_memberships(rng, range(first_user_id, first_user_id + users), role_ids, alpha, max_roles_per_user))
+
+    # 关联是直接批量导入的，需要为新用户生成有效权限
+    started = time.perf_counter()
+    end_user_id = first_user_id + users
+    with Session(bind) as db:
+        for start_id in range(first_user_id, end_user_id, batch_size):
+            rebuild_user_range(db, start_id, min(start_id + batch_size, end_user_id))
+            db.commit()
+        # 数据是绕过服务层导入的，使已有的 ETag 失效
+        bump_versions(db, USERS_VERSION, ROLES_VERSION, PERMISSIONS_VERSION)
+        db.commit()
+    log(f"user_effective_permissions: 耗时 {time.perf_counter() - started:.1f}s")
+
+    _reset_sequences(bind)
+    return counts
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="生成用户、角色、权限压测数据")
+    parser.add_argument("--users", type=int, default=10000, help="生成的用户数量")
+    parser.add_argument("--roles", type=int, default=100, help="生成的角色数量")
+    parser.add_argument("--permissions", type=int, default=500, help="生成的权限数量")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，相同种子生成相同数据")
+    parser.add_argument("--alpha", type=float, default=1.1, help="角色/权限热度的幂律指数")
+    parser.add_argument("--max-roles-per-user", type=int, default=8)
+    parser.add_argument("--max-permissions-per-role", type=int, default=64)
+    parser.add_argument("--inactive-ratio", type=float, default=0.05, help="停用用户比例")
+    parser.add_argument("--password-hash", default=None,
+                        help="预先计算的密码哈希；未提供时对默认密码只计算一次")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--create-tables", action="store_true", help="导入前创建缺失的表")
+    args = parser.parse_args(argv)
+
+    if args.create_tables:
+        Base.metadata.create_all(bind=default_engine)
+
+    counts = seed(
+        default_engine,
+        users=args.users,
+        roles=args.roles,
+        permissions=args.permissions,
+        seed_value=args.seed,
+        password_hash=args.password_hash,
+        alpha=args.alpha,
+        max_roles_per_user=args.max_roles_per_user,
+        max_permissions_per_role=args.max_permissions_per_role,
+        inactive_ratio=args.inactive_ratio,
+        batch_size=args.batch_size,
+    )
+    print(f"完成: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+数据库结构升级脚本
+
+为已部署的数据库补齐新增的列与索引（如临时角色分配的 user_roles.expires_at 及其部分索引），
+并在 user_effective_permissions 为空时按现有角色授权回填，可以重复执行。启用 SCHEMA_UPGRADE_ON_STARTUP 时应用启动也会执行同样的升级。
+
+用法:
+    python -m backend.scripts.upgrade_schema
+"""
+
+from backend.database import SessionLocal, engine
+from backend.database.schema_upgrade import upgrade_schema
+from backend.services.user.effective_permission_service import backfill_effective_permissions
+
+
+def main() -> None:
+    added = upgrade_schema(engine)
+    db = SessionLocal()
+    try:
+        backfilled = backfill_effective_permissions(db)
+    finally:
+        db.close()
+    print(f"完成: 新增列 {', '.join(added) if added else '无'}, 有效权限表{'已回填' if backfilled else '无需回填'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+对象级授权（资源 ACL）的服务层
+
+全局权限回答“能否读取用户”，资源 ACL 回答“能否编辑 document 42”。
+授权主体可以是用户或角色；角色授权对其全部成员（含通过用户组获得该角色的用户）生效。
+批量过滤以一条集合查询完成，由 (主体, 资源类型, 权限, 资源ID) 唯一索引支撑。
+"""
+
+from typing import AbstractSet, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, union
+from sqlalchemy.orm import Session
+
+from backend.database.acl_models import ResourceAcl, ACL_SUBJECT_USER, ACL_SUBJECT_ROLE, ACL_SUBJECT_TYPES
+from backend.database.dialects import dialect_insert, in_id_list, supports_on_conflict
+from backend.database.user_models import User, Role, Permission
+from backend.services.user.effective_permission_service import has_permission, user_role_ids
+from backend.services.user.outbox_service import record_change
+from backend.services.user.permission_catalog import permission_catalog
+
+acls = ResourceAcl.__table__
+
+_SUBJECT_MODELS = {ACL_SUBJECT_USER: User, ACL_SUBJECT_ROLE: Role}
+_INSERT_CHUNK_SIZE = 1000
+
+
+def resolve_permission_id(db: Session, name: str) -> Optional[int]:
+    """
+    通过权限目录将权限名称解析为ID，目录未命中时回退到数据库
+    """
+    permission_catalog.ensure_fresh(db)
+    permission_id = permission_catalog.get_id(name)
+    if permission_id is None:
+        permission_id = db.execute(select(Permission.id).where(Permission.name == name)).scalar()
+    return permission_id
+
+
+def _subject_exists(db: Session, subject_type: str, subject_id: int) -> bool:
+    if subject_type not in ACL_SUBJECT_TYPES:
+        raise ValueError(f"不支持的授权主体类型: {subject_type}")
+    model = _SUBJECT_MODELS[subject_type]
+    return db.execute(select(model.id).where(model.id == subject_id)).first() is not None
+
+
+def grant_resource_access(db: Session, resource_type: str, resource_ids: Iterable[int], permission_name: str,
+                          subject_type: str, subject_id: int) -> Optional[int]:
+    """
+    授予主体对一批资源的指定权限，已存在的授权保持不变
+
+    返回新增的授权数量；权限或主体不存在时返回 None。
+    """
+    permission_id = resolve_permission_id(db, permission_name)
+    if permission_id is None or not _subject_exists(db, subject_type, subject_id):
+        return None
+
+    resource_ids = sorted(set(resource_ids))
+    if not resource_ids:
+        return 0
+    key = {
+        "subject_type": subject_type,
+        "subject_id": subject_id,
+        "resource_type": resource_type,
+        "permission_id": permission_id,
+    }
+    if not supports_on_conflict(db):
+        existing = set(db.execute(
+            select(acls.c.resource_id).where(
+                *(acls.c[column] == value for column, value in key.items()),
+                acls.c.resource_id.in_(resource_ids),
+            )
+        ).scalars())
+        resource_ids = [resource_id for resource_id in resource_ids if resource_id not in existing]
+        if not resource_ids:
+            return 0
+
+    granted = []
+    # 多行 VALUES 分块插入，避免超出数据库的绑定参数数量上限
+    for start in range(0, len(resource_ids), _INSERT_CHUNK_SIZE):
+        chunk = resource_ids[start:start + _INSERT_CHUNK_SIZE]
+        statement = dialect_insert(db, acls).values([{**key, "resource_id": resource_id} for resource_id in chunk])
+        if supports_on_conflict(db):
+            statement = statement.on_conflict_do_nothing()
+        granted.extend(db.execute(statement.returning(acls.c.resource_id)).scalars())
+    if granted:
+        record_change(db, "acl.granted", **key, resource_ids=sorted(granted))
+    db.commit()
+    return len(granted)
+
+
+def revoke_resource_access(db: Session, resource_type: str, resource_ids: Iterable[int], permission_name: str,
+                           subject_type: str, subject_id: int) -> Optional[int]:
+    """
+    撤销主体对一批资源的指定权限，返回撤销的授权数量；权限不存在时返回 None
+    """
+    if subject_type not in ACL_SUBJECT_TYPES:
+        raise ValueError(f"不支持的授权主体类型: {subject_type}")
+    permission_id = resolve_permission_id(db, permission_name)
+    if permission_id is None:
+        return None
+
+    revoked = db.execute(
+        acls.delete().where(
+            acls.c.subject_type == subject_type,
+            acls.c.subject_id == subject_id,
+            acls.c.resource_type == resource_type,
+            acls.c.permission_id == permission_id,
+            in_id_list(db, acls.c.resource_id, set(resource_ids)),
+        ).returning(acls.c.resource_id)
+    ).scalars().all()
+    if revoked:
+        record_change(
+            db, "acl.revoked", subject_type=subject_type, subject_id=subject_id, resource_type=resource_type,
+            permission_id=permission_id, resource_ids=sorted(revoked),
+        )
+    db.commit()
+    return len(revoked)
+
+
+def filter_accessible(db: Session, user_id: int, resource_type: str, permission_name: str,
+                      resource_ids: Iterable[int], permission_ids: Optional[AbstractSet[int]] = None,
+                      scope_ids: Optional[AbstractSet[int]] = None) -> List[int]:
+    """
+    将资源ID过滤为用户有权访问的部分，保持输入顺序并去重
+
+    拥有该全局权限的用户可以访问全部资源；否则通过直接授予用户或其所属角色的 ACL 判断。
+    ID 列表作为单个数组参数传入，用户与角色两部分授权在一条 UNION 查询中完成。
+
+    permission_ids 为认证主体的有效权限ID（API 密钥已与其范围取交集），提供时全局权限据此判断，
+    不再查询数据库；scope_ids 为 API 密钥的权限范围，权限不在范围内时 ACL 授权同样不生效。
+    """
+    resource_ids = list(dict.fromkeys(resource_ids))
+    permission_id = resolve_permission_id(db, permission_name)
+    if permission_id is None or not resource_ids:
+        return []
+    if scope_ids is not None and permission_id not in scope_ids:
+        return []
+    if permission_ids is not None:
+        if permission_id in permission_ids:
+            return resource_ids
+    elif has_permission(db, user_id, permission_id):
+        return resource_ids
+
+    def granted_to(*subject_conditions):
+        return select(acls.c.resource_id).where(
+            *subject_conditions,
+            acls.c.resource_type == resource_type,
+            acls.c.permission_id == permission_id,
+            in_id_list(db, acls.c.resource_id, resource_ids),
+        )
+
+    allowed = set(db.execute(union(
+        granted_to(acls.c.subject_type == ACL_SUBJECT_USER, acls.c.subject_id == user_id),
+        granted_to(
+            acls.c.subject_type == ACL_SUBJECT_ROLE,
+            acls.c.subject_id.in_(user_role_ids(user_id)),
+        ),
+    )).scalars().all())
+    return [resource_id for resource_id in resource_ids if resource_id in allowed]
+
+
+def delete_acls_batch(db: Session, conditions: Dict[str, object], limit: int) -> int:
+    """
+    删除一批匹配 conditions（列名 -> 值）的授权（不提交），返回删除的行数
+    """
+    ids = db.execute(
+        select(acls.c.id).where(*(acls.c[column] == value for column, value in conditions.items())).limit(limit)
+    ).scalars().all()
+    if ids:
+        db.execute(acls.delete().where(acls.c.id.in_(ids)))
+    return len(ids)
@@ -2,64 +2,90 @@
 认证相关操作的服务层
 """
 
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
-from backend.database.user_models import User
+from backend.database.user_models import User, Permission
 from backend.schemas.user import UserCreate, UserLogin
-from backend.utils.security import verify_password, get_password_hash, create_access_token
+from backend.services.user.user_service import create_user
+from backend.database.version_models import PERMISSIONS_VERSION
+from backend.services.user.effective_permission_service import get_permission_ids
+from backend.services.user.permission_catalog import permission_catalog
+from backend.services.user.table_version_service import get_versions
+from backend.utils.security import (
+    verify_and_update_password, dummy_verify_password, create_access_token, encode_permission_bitmap,
+    PERMISSION_VERSION_CLAIM, PERMISSION_BITMAP_CLAIM,
+)
 from datetime import timedelta
-from typing import Optional
+from typing import List, Optional
 from backend.config import settings
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     """
     通过用户名和密码验证用户
     """
     user = db.query(User).filter(User.username == username).first()
-    if not user or not verify_password(password, user.password):
+    if not user:
+        # 用户不存在时同样执行一次哈希计算，避免通过响应时间探测用户名
+        dummy_verify_password()
         return None
+
+    verified, new_hash = verify_and_update_password(password, user.password)
+    if not verified:
+        return None
+    if new_hash is not None:
+        _rehash_password(db, user, new_hash)
     return user
 
-def register_user(db: Session, user_data: UserCreate) -> User:
+
+def _rehash_password(db: Session, user: User, new_hash: str) -> None:
     """
-    注册新用户
+    以当前哈希配置重新保存密码
+
+    只在密码未被并发修改时写入，并保留 updated_at：重新哈希不是对用户资料的修改。
     """
-    # 检查用户名是否已存在
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
-    if existing_user:
-        raise ValueError("用户名已存在")
-    
-    # 检查邮箱是否已存在
-    if user_data.email:
-        existing_email = db.query(User).filter(User.email == user_data.email).first()
-        if existing_email:
-            raise ValueError("邮箱已存在")
-    
-    # 创建新用户
-    hashed_password = get_password_hash(user_data.password)
-    db_user = User(
-        username=user_data.username,
-        email=user_data.email,
-        password=hashed_password,
-        status=user_data.status
+    db.execute(
+        update(User)
+        .where(User.id == user.id, User.password == user.password)
+        .values(password=new_hash, updated_at=User.updated_at)
+        .execution_options(synchronize_session=False)
     )
-    db.add(db_user)
     db.commit()
-    db.refresh(db_user)
-    return db_user
 
-def create_access_token_for_user(user: User) -> str:
+def register_user(db: Session, user_data: UserCreate) -> User:
+    """
+    注册新用户
+    """
+    return create_user(db, user_data)
+
+def _permission_names(db: Session, permission_ids) -> List[str]:
+    """
+    通过权限目录将权限ID解析为名称，目录中没有的ID（其他进程刚创建）回退到数据库
+    """
+    permission_catalog.ensure_fresh(db)
+    names = {permission_id: permission_catalog.get_name(permission_id) for permission_id in permission_ids}
+    missing = [permission_id for permission_id, name in names.items() if name is None]
+    if missing:
+        names.update(db.execute(select(Permission.id, Permission.name).where(Permission.id.in_(missing))).all())
+    return [name for name in names.values() if name is not None]
+
+def create_access_token_for_user(db: Session, user: User) -> str:
     """
     为用户创建访问令牌
+
+    权限声明默认为去重后的权限名称列表（permissions）。TOKEN_PERMISSION_CLAIM_FORMAT 为 bitmap 时
+    改为紧凑格式：权限ID位图（pb）加上签发时的权限目录版本（pv），消费方按版本缓存 ID 到名称的映射；
+    为 both 时两者都写入，供客户端迁移期间使用。
     """
-    # 从角色获取用户权限
-    permissions = []
-    for role in user.roles:
-        for perm in role.permissions:
-            permissions.append(perm.name)
-    
+    # 一次查询取得去重后的有效权限（含通过用户组获得的权限）
+    permission_ids = get_permission_ids(db, user.id)
     data = {
         "sub": user.username,
-        "permissions": permissions,
         "user_id": user.id
     }
+    claim_format = settings.TOKEN_PERMISSION_CLAIM_FORMAT
+    if claim_format in ("names", "both"):
+        data["permissions"] = _permission_names(db, permission_ids)
+    if claim_format in ("bitmap", "both"):
+        data[PERMISSION_VERSION_CLAIM] = get_versions(db, [PERMISSIONS_VERSION])[PERMISSIONS_VERSION]
+        data[PERMISSION_BITMAP_CLAIM] = encode_permission_bitmap(permission_ids)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    return create_access_token(data=data, expires_delta=access_token_expires)
\ No newline at end of file
+    return create_access_token(data=data, expires_delta=access_token_expires)
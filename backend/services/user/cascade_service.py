@@ -0,0 +1,245 @@
+"""
+级联删除的服务层
+
+直接使用 DELETE / UPDATE 语句分批清理 user_roles、role_permissions、
+user_effective_permissions、resource_acls、api_key_scopes 关联以及 permission_logs 引用，每批单独提交以缩短锁持有时间，
+内存占用与成员数量无关（不会加载 ORM 关联集合）。
+"""
+
+from typing import List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.config import settings
+from backend.database.user_models import (
+    User, Role, Permission, PermissionLog, user_roles, role_permissions, user_effective_permissions
+)
+from backend.database.version_models import USERS_VERSION, ROLES_VERSION, PERMISSIONS_VERSION
+from backend.database.acl_models import ACL_SUBJECT_USER, ACL_SUBJECT_ROLE
+from backend.database.api_key_models import ApiKey, ServiceAccount, api_key_scopes
+from backend.database.group_models import Group, group_users, group_roles, group_closure
+from backend.services.user.acl_service import delete_acls_batch
+from backend.services.user.effective_permission_service import lock_memberships, prune_effective_permissions
+from backend.services.user.group_service import detach_group_edges
+from backend.services.user.outbox_service import record_change
+from backend.services.user.table_version_service import bump_user_versions, bump_versions
+
+permission_logs = PermissionLog.__table__
+
+
+def _delete_links(db: Session, table, column: str, value: int, key_column: str, limit: int) -> List[int]:
+    keys = db.execute(
+        select(table.c[key_column]).where(table.c[column] == value).limit(limit)
+    ).scalars().all()
+    if keys:
+        db.execute(table.delete().where(table.c[column] == value, table.c[key_column].in_(keys)))
+    return keys
+
+
+def delete_links_batch(db: Session, table, column: str, value: int, key_column: str, limit: int) -> int:
+    """
+    删除一批 column = value 的关联行（不提交），返回删除的行数
+    """
+    return len(_delete_links(db, table, column, value, key_column, limit))
+
+
+def delete_role_members_batch(db: Session, role_id: int, limit: int) -> int:
+    """
+    移除一批角色成员并清理这些用户失去支撑的有效权限（不提交），返回移除的成员数
+
+    变更事件在行锁与清理之后记录：与其他写入路径一样，变更日志的咨询锁总是最后获取。
+    """
+    user_ids = _delete_links(db, user_roles, "role_id", role_id, "user_id", limit)
+    if user_ids:
+        lock_memberships(db, user_ids, [role_id])
+        uep = user_effective_permissions
+        prune_effective_permissions(
+            db,
+            uep.c.user_id.in_(user_ids),
+            uep.c.permission_id.in_(
+                select(role_permissions.c.permission_id).where(role_permissions.c.role_id == role_id)
+            ),
+        )
+        record_change(db, "user_roles.removed", user_ids=user_ids, role_ids=[role_id])
+        bump_user_versions(db, user_ids)
+    return len(user_ids)
+
+
+def _group_subtree_member_ids(db: Session, group_id: int) -> List[int]:
+    """
+    组及其全部子组的直接成员
+    """
+    return db.execute(
+        select(group_users.c.user_id).distinct()
+        .join(group_closure, group_closure.c.descendant_id == group_users.c.group_id)
+        .where(group_closure.c.ancestor_id == group_id)
+        .order_by(group_users.c.user_id)
+    ).scalars().all()
+
+
+def delete_role_groups_batch(db: Session, role_id: int, limit: int) -> int:
+    """
+    从一批用户组移除角色（不提交），返回移除的组数
+
+    每个组记录一条 group_roles.removed 事件，附带因此失去该角色的用户（组及其子组的成员）。
+    """
+    group_ids = _delete_links(db, group_roles, "role_id", role_id, "group_id", limit)
+    for group_id in group_ids:
+        record_change(db, "group_roles.removed", group_id, group_id=group_id, role_ids=[role_id],
+                      user_ids=_group_subtree_member_ids(db, group_id))
+    return len(group_ids)
+
+
+def delete_group_members_batch(db: Session, group_id: int, limit: int) -> int:
+    """
+    移除用户组的一批直接成员（不提交）并记录 group_members.removed 事件，返回移除的成员数
+    """
+    user_ids = sorted(_delete_links(db, group_users, "group_id", group_id, "user_id", limit))
+    if user_ids:
+        record_change(db, "group_members.removed", group_id, group_id=group_id, user_ids=user_ids)
+    return len(user_ids)
+
+
+def delete_api_keys_batch(db: Session, user_id: int, limit: int) -> int:
+    """
+    删除用户的一批 API 密钥及其权限范围（不提交），返回删除的密钥数
+    """
+    key_ids = db.execute(
+        select(ApiKey.id).where(ApiKey.user_id == user_id).limit(limit)
+    ).scalars().all()
+    if key_ids:
+        db.execute(api_key_scopes.delete().where(api_key_scopes.c.api_key_id.in_(key_ids)))
+        db.execute(ApiKey.__table__.delete().where(ApiKey.id.in_(key_ids)))
+    return len(key_ids)
+
+
+def nullify_references_batch(db: Session, table, column: str, value: int, limit: int) -> int:
+    """
+    将一批引用 value 的外键置空（不提交），返回更新的行数
+    """
+    ids = db.execute(
+        select(table.c.id).where(table.c[column] == value).limit(limit)
+    ).scalars().all()
+    if not ids:
+        return 0
+    db.execute(table.update().where(table.c.id.in_(ids)).values({column: None}))
+    return len(ids)
+
+
+def _drain(db: Session, batch, *args, batch_size: int, versions: Tuple[str, ...] = ()) -> int:
+    """
+    重复执行批处理直到没有剩余行，每批提交一次；有变更的批次同时递增 versions 中的资源版本
+    """
+    total = 0
+    while True:
+        count = batch(db, *args, batch_size)
+        if count and versions:
+            bump_versions(db, *versions)
+        db.commit()
+        total += count
+        if count < batch_size:
+            return total
+
+
+def _delete_role_grants_batch(db: Session, role_id: int, limit: int) -> int:
+    return delete_links_batch(db, role_permissions, "role_id", role_id, "permission_id", limit)
+
+
+def _delete_role_acls_batch(db: Session, role_id: int, limit: int) -> int:
+    return delete_acls_batch(db, {"subject_type": ACL_SUBJECT_ROLE, "subject_id": role_id}, limit)
+
+
+# 删除角色的分批阶段：(名称, 批处理函数(db, role_id, limit), 有变更时递增的版本)。
+# 成员全部移除之后再删除角色授权，后者不再影响有效权限。后台任务 role_delete 按同样的阶段分步执行
+ROLE_DELETE_PHASES = (
+    ("members", delete_role_members_batch, (USERS_VERSION,)),
+    ("groups", delete_role_groups_batch, (USERS_VERSION,)),
+    ("grants", _delete_role_grants_batch, (ROLES_VERSION,)),
+    ("acls", _delete_role_acls_batch, ()),
+)
+
+
+def delete_role_row(db: Session, role_id: int) -> None:
+    """
+    在全部阶段完成后删除角色本身并记录事件（不提交）
+    """
+    db.execute(Role.__table__.delete().where(Role.id == role_id))
+    record_change(db, "role.deleted", role_id)
+    bump_versions(db, ROLES_VERSION)
+
+
+def delete_role_cascade(db: Session, role_id: int, batch_size: int = None) -> None:
+    """
+    分批移除角色的成员、用户组关联、权限关联与资源授权，然后删除角色
+    """
+    batch_size = batch_size or settings.CASCADE_DELETE_BATCH_SIZE
+    for _, batch, versions in ROLE_DELETE_PHASES:
+        _drain(db, batch, role_id, batch_size=batch_size, versions=versions)
+    delete_role_row(db, role_id)
+    db.commit()
+
+
+def delete_permission_cascade(db: Session, permission_id: int, batch_size: int = None) -> None:
+    """
+    分批移除权限的角色关联、有效权限行与资源授权并置空日志引用，然后删除权限
+    """
+    batch_size = batch_size or settings.CASCADE_DELETE_BATCH_SIZE
+    _drain(db, delete_links_batch, role_permissions, "permission_id", permission_id, "role_id", batch_size=batch_size,
+           versions=(ROLES_VERSION,))
+    # 授权已全部移除，之后不会再产生该权限的有效权限行
+    _drain(db, delete_links_batch, user_effective_permissions, "permission_id", permission_id, "user_id",
+           batch_size=batch_size)
+    _drain(db, delete_acls_batch, {"permission_id": permission_id}, batch_size=batch_size)
+    _drain(db, delete_links_batch, api_key_scopes, "permission_id", permission_id, "api_key_id", batch_size=batch_size)
+    _drain(db, nullify_references_batch, permission_logs, "permission_id", permission_id, batch_size=batch_size)
+    db.execute(Permission.__table__.delete().where(Permission.id == permission_id))
+    record_change(db, "permission.deleted", permission_id)
+    bump_versions(db, PERMISSIONS_VERSION)
+    db.commit()
+
+
+def delete_user_cascade(db: Session, user_id: int, batch_size: int = None) -> None:
+    """
+    分批移除用户的角色关联、组成员关系、有效权限行、资源授权与 API 密钥并置空日志引用，然后删除用户
+    """
+    batch_size = batch_size or settings.CASCADE_DELETE_BATCH_SIZE
+    _drain(db, delete_links_batch, user_roles, "user_id", user_id, "role_id", batch_size=batch_size,
+           versions=(USERS_VERSION,))
+    _drain(db, delete_links_batch, group_users, "user_id", user_id, "group_id", batch_size=batch_size,
+           versions=(USERS_VERSION,))
+    _drain(db, delete_links_batch, user_effective_permissions, "user_id", user_id, "permission_id",
+           batch_size=batch_size)
+    _drain(db, delete_acls_batch, {"subject_type": ACL_SUBJECT_USER, "subject_id": user_id}, batch_size=batch_size)
+    _drain(db, delete_api_keys_batch, user_id, batch_size=batch_size)
+    _drain(db, nullify_references_batch, permission_logs, "user_id", user_id, batch_size=batch_size)
+    db.execute(ServiceAccount.__table__.delete().where(ServiceAccount.user_id == user_id))
+    db.execute(User.__table__.delete().where(User.id == user_id))
+    # 成员关系已在前面的批次中移除并递增了版本
+    record_change(db, "user.deleted", user_id)
+    db.commit()
+
+
+def delete_group_cascade(db: Session, group_id: int, batch_size: int = None) -> None:
+    """
+    解除用户组的嵌套关系并移除其角色，然后分批移除成员，最后删除用户组
+
+    第一个事务提交后组成员已不再因该组获得任何权限，之后的成员批次不影响有效权限。
+    """
+    batch_size = batch_size or settings.CASCADE_DELETE_BATCH_SIZE
+    # 解除嵌套之前读取组及其子组的成员，他们都会失去该组的角色
+    member_ids = _group_subtree_member_ids(db, group_id)
+    detach_group_edges(db, group_id)
+    role_ids = sorted(db.execute(
+        group_roles.delete().where(group_roles.c.group_id == group_id).returning(group_roles.c.role_id)
+    ).scalars().all())
+    if role_ids:
+        record_change(db, "group_roles.removed", group_id, group_id=group_id, role_ids=role_ids, user_ids=member_ids)
+    bump_versions(db, USERS_VERSION)
+    db.commit()
+    _drain(db, delete_group_members_batch, group_id, batch_size=batch_size, versions=(USERS_VERSION,))
+    db.execute(group_closure.delete().where(group_closure.c.ancestor_id == group_id))
+    db.execute(Group.__table__.delete().where(Group.id == group_id))
+    record_change(db, "group.deleted", group_id)
+    bump_versions(db, USERS_VERSION)
+    db.commit()
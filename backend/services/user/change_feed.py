@@ -0,0 +1,130 @@
+"""
+进程内共享的变更流轮询器
+
+所有 SSE 连接共享一个轮询任务：轮询器按序号读取新事件放入有界缓冲并唤醒订阅者，
+数据库查询次数与连接数无关。订阅者的位置早于缓冲起点时直接从数据库补读。
+没有订阅者时轮询任务自动结束。
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Deque, List, Optional
+
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from backend.config import settings
+from backend.database import SessionLocal
+from backend.services.user.outbox_service import latest_sequence, read_events
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeed:
+    def __init__(self, session_factory: sessionmaker = SessionLocal, poll_interval: Optional[float] = None,
+                 heartbeat_interval: Optional[float] = None, buffer_size: Optional[int] = None):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval or settings.CHANGE_FEED_POLL_SECONDS
+        self.heartbeat_interval = heartbeat_interval or settings.CHANGE_FEED_HEARTBEAT_SECONDS
+        self._buffer: Deque[dict] = deque(maxlen=buffer_size or settings.CHANGE_FEED_BUFFER_SIZE)
+        self._last_id: Optional[int] = None
+        self._condition: Optional[asyncio.Condition] = None
+        self._task: Optional[asyncio.Task] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._subscribers = 0
+
+    def _read(self, since: int) -> List[dict]:
+        db = self.session_factory()
+        try:
+            return read_events(db, since, settings.CHANGE_FEED_MAX_LIMIT)
+        finally:
+            db.close()
+
+    def _latest(self) -> int:
+        db = self.session_factory()
+        try:
+            return latest_sequence(db)
+        finally:
+            db.close()
+
+    async def _ensure_running(self) -> None:
+        # 检查与启动之间有 await，同时到达的订阅者必须串行，否则会启动多个轮询任务并重复写入缓冲
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._task is not None and not self._task.done():
+                return
+            self._condition = asyncio.Condition()
+            if self._last_id is None:
+                # 缓冲只保存启动之后的事件
+                self._last_id = await run_in_threadpool(self._latest)
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while self._subscribers:
+            try:
+                changes = await run_in_threadpool(self._read, self._last_id)
+            except Exception:
+                logger.exception("读取变更事件失败")
+                changes = []
+            if changes:
+                async with self._condition:
+                    self._buffer.extend(changes)
+                    self._last_id = changes[-1]["id"]
+                    self._condition.notify_all()
+                if len(changes) == settings.CHANGE_FEED_MAX_LIMIT:
+                    continue
+            await asyncio.sleep(self.poll_interval)
+
+    def _buffered_after(self, since: int) -> Optional[List[dict]]:
+        """
+        缓冲覆盖 since 之后的全部事件时返回这些事件，否则返回 None
+
+        轮询器连续读取，缓冲中第一条事件之后的事件都在缓冲中。
+        """
+        if since >= self._last_id:
+            return []
+        buffer = self._buffer
+        if not buffer or since < buffer[0]["id"]:
+            return None
+        return [change for change in buffer if change["id"] > since]
+
+    async def subscribe(self, since: int) -> AsyncIterator[Optional[dict]]:
+        """
+        按序号顺序产出 since 之后的事件；超过心跳间隔没有新事件时产出 None
+        """
+        self._subscribers += 1
+        try:
+            await self._ensure_running()
+            while True:
+                changes = self._buffered_after(since)
+                if changes is None:
+                    changes = await run_in_threadpool(self._read, since)
+                if changes:
+                    for change in changes:
+                        yield change
+                    since = changes[-1]["id"]
+                    continue
+
+                condition = self._condition
+                async with condition:
+                    try:
+                        await asyncio.wait_for(
+                            condition.wait_for(lambda: self._last_id > since), self.heartbeat_interval
+                        )
+                        continue
+                    except asyncio.TimeoutError:
+                        pass
+                yield None
+        finally:
+            self._subscribers -= 1
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,316 @@
+"""
+目录快照同步的服务层
+
+将上游目录的用户及其角色名称快照加载到临时表中，通过集合运算与 users、user_roles 对比，
+只执行必要的插入、更新、停用以及角色关联变更。每个分块在独立的短事务中提交。
+"""
+
+import secrets
+from typing import Iterable, List, Optional
+
+from sqlalchemy import (
+    Boolean, Column, Integer, MetaData, String, Table, and_, exists, false, func, literal, or_, select, true
+)
+from sqlalchemy.engine import Connection, Engine
+
+from backend.config import settings
+from backend.database.api_key_models import ServiceAccount
+from backend.database.dialects import dialect_insert, supports_on_conflict
+from backend.database.user_models import User, Role, user_roles
+from backend.schemas.directory import DirectoryUser, DirectorySyncResult
+from backend.database.version_models import USERS_VERSION
+from backend.services.user.effective_permission_service import lock_memberships, refresh_users
+from backend.services.user.outbox_service import record_change
+from backend.services.user.table_version_service import bump_user_versions, bump_versions
+from backend.services.user.user_search_service import invalidate_user_search_index
+from backend.utils.security import get_password_hash
+
+users = User.__table__
+roles = Role.__table__
+service_accounts = ServiceAccount.__table__
+
+# 快照临时表只存在于同步所用的连接上
+_snapshot_metadata = MetaData()
+
+snapshot_users = Table(
+    "directory_snapshot_users",
+    _snapshot_metadata,
+    Column("seq", Integer, primary_key=True),  # 快照中的顺序，用于分块
+    Column("username", String(255), nullable=False, unique=True),
+    Column("email", String(255)),
+    Column("status", Boolean, nullable=False),
+    Column("conflict", Boolean, nullable=False, default=False),  # 邮箱与其他用户冲突
+    prefixes=["TEMPORARY"],
+)
+
+snapshot_roles = Table(
+    "directory_snapshot_roles",
+    _snapshot_metadata,
+    Column("username", String(255), primary_key=True),
+    Column("role_name", String(255), primary_key=True),
+    prefixes=["TEMPORARY"],
+)
+
+# 报告中最多列出的冲突用户和未知角色数量
+_REPORT_LIMIT = 100
+
+
+class DirectorySync:
+    """
+    目录快照同步
+
+    用法:
+        with DirectorySync(engine, full=True) as sync:
+            sync.load(records)      # 可多次调用，用于流式快照
+            result = sync.apply()
+
+    full 为 True 时快照被视为完整目录，不在快照中的用户（服务账户除外）会被停用。
+    """
+
+    def __init__(self, bind: Engine, full: bool = True, chunk_size: Optional[int] = None,
+                 protected_usernames: Iterable[str] = ()):
+        self.bind = bind
+        self.full = full
+        self.chunk_size = chunk_size or settings.DIRECTORY_SYNC_CHUNK_SIZE
+        self.protected_usernames = list(protected_usernames)
+        self.connection: Optional[Connection] = None
+        self._loaded = 0
+
+    def __enter__(self) -> "DirectorySync":
+        self.connection = self.bind.connect()
+        with self.connection.begin():
+            _snapshot_metadata.create_all(self.connection)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            with self.connection.begin():
+                _snapshot_metadata.drop_all(self.connection)
+        finally:
+            self.connection.close()
+            self.connection = None
+
+    def load(self, records: Iterable[DirectoryUser]) -> int:
+        """
+        将一批快照记录写入临时表，同一用户名重复出现时以最后一次为准
+        """
+        first_seq = self._loaded + 1
+        user_rows = {}
+        role_rows = {}
+        for record in records:
+            self._loaded += 1
+            # 批内重复出现的用户名以最后一次记录为准，用户与角色一起覆盖
+            user_rows[record.username] = {
+                "seq": self._loaded,
+                "username": record.username,
+                "email": record.email,
+                "status": record.status,
+                "conflict": False,
+            }
+            role_rows[record.username] = [
+                {"username": record.username, "role_name": name} for name in set(record.roles)
+            ]
+        if not user_rows:
+            return 0
+        role_rows = [row for rows in role_rows.values() for row in rows]
+
+        conn = self.connection
+        with conn.begin():
+            usernames = list(user_rows)
+            # 之前批次中加载过的同名用户同样以这一次为准，先清除其记录与角色
+            conn.execute(snapshot_roles.delete().where(snapshot_roles.c.username.in_(usernames)))
+            conn.execute(snapshot_users.delete().where(snapshot_users.c.username.in_(usernames)))
+            conn.execute(snapshot_users.insert(), list(user_rows.values()))
+            if role_rows:
+                statement = dialect_insert(conn, snapshot_roles)
+                if supports_on_conflict(conn):
+                    statement = statement.on_conflict_do_nothing()
+                conn.execute(statement, role_rows)
+        return self._loaded - first_seq + 1
+
+    def apply(self) -> DirectorySyncResult:
+        """
+        对比快照与现有数据并按分块应用差异
+        """
+        conn = self.connection
+        result = DirectorySyncResult()
+        with conn.begin():
+            result.total = conn.execute(select(func.count()).select_from(snapshot_users)).scalar()
+            if self.full and result.total == 0:
+                raise ValueError("全量同步的快照不能为空")
+            result.conflicts = self._mark_conflicts(conn)
+            result.unknown_roles = conn.execute(
+                select(snapshot_roles.c.role_name).distinct()
+                .where(~exists().where(roles.c.name == snapshot_roles.c.role_name))
+                .order_by(snapshot_roles.c.role_name)
+                .limit(_REPORT_LIMIT)
+            ).scalars().all()
+            max_seq = conn.execute(select(func.max(snapshot_users.c.seq))).scalar() or 0
+
+        # 快照中新用户的密码不可用，整个同步只计算一次哈希
+        unusable_password = get_password_hash(secrets.token_urlsafe(32))
+        for low in range(1, max_seq + 1, self.chunk_size):
+            in_chunk = snapshot_users.c.seq.between(low, low + self.chunk_size - 1)
+            with conn.begin():
+                inserted = self._insert_users(conn, in_chunk, unusable_password)
+                updated = self._update_users(conn, in_chunk)
+                result.inserted += inserted
+                result.updated += updated
+                lock_memberships(
+                    conn, self._chunk_user_ids(in_chunk),
+                    select(self._desired_memberships(in_chunk).subquery().c.role_id),
+                )
+                added = self._add_memberships(conn, in_chunk)
+                removed = self._remove_memberships(conn, in_chunk)
+                if added or removed:
+                    # 有效权限与成员变更在同一事务中按分块重新同步
+                    refresh_users(conn, self._chunk_user_ids(in_chunk))
+                    bump_user_versions(conn, self._chunk_user_ids(in_chunk))
+                    bump_versions(conn, USERS_VERSION)
+                result.roles_added += added
+                result.roles_removed += removed
+                if inserted or updated or added or removed:
+                    # 分块粒度的事件：列出的用户可能被新增、更新或变更了角色
+                    user_ids = conn.execute(self._chunk_user_ids(in_chunk).order_by(users.c.id)).scalars().all()
+                    record_change(conn, "user.synced", user_ids=user_ids)
+
+        if self.full:
+            result.deactivated = self._deactivate_missing(conn)
+        if result.inserted or result.updated:
+            invalidate_user_search_index()
+        return result
+
+    def _mark_conflicts(self, conn: Connection) -> List[str]:
+        """
+        标记邮箱与快照外用户或快照内其他用户重复的记录，这些记录不会被插入或更新
+        """
+        other_snapshot = snapshot_users.alias("other_snapshot")
+        conn.execute(
+            snapshot_users.update()
+            .where(snapshot_users.c.email.is_not(None))
+            .where(or_(
+                exists().where(users.c.email == snapshot_users.c.email,
+                               users.c.username != snapshot_users.c.username),
+                exists().where(other_snapshot.c.email == snapshot_users.c.email,
+                               other_snapshot.c.username != snapshot_users.c.username),
+            ))
+            .values(conflict=True)
+        )
+        return conn.execute(
+            select(snapshot_users.c.username)
+            .where(snapshot_users.c.conflict == true())
+            .order_by(snapshot_users.c.seq)
+            .limit(_REPORT_LIMIT)
+        ).scalars().all()
+
+    def _insert_users(self, conn: Connection, in_chunk, password: str) -> int:
+        source = select(
+            snapshot_users.c.username,
+            snapshot_users.c.email,
+            literal(password, type_=String(255)),
+            snapshot_users.c.status,
+        ).where(
+            in_chunk,
+            snapshot_users.c.conflict == false(),
+            ~exists().where(users.c.username == snapshot_users.c.username),
+        )
+        return conn.execute(
+            users.insert().from_select(["username", "email", "password", "status"], source)
+        ).rowcount
+
+    def _update_users(self, conn: Connection, in_chunk) -> int:
+        return conn.execute(
+            users.update()
+            .where(
+                users.c.username == snapshot_users.c.username,
+                in_chunk,
+                snapshot_users.c.conflict == false(),
+                or_(
+                    users.c.email.is_distinct_from(snapshot_users.c.email),
+                    users.c.status.is_distinct_from(snapshot_users.c.status),
+                ),
+            )
+            .values(email=snapshot_users.c.email, status=snapshot_users.c.status, version=users.c.version + 1)
+        ).rowcount
+
+    def _desired_memberships(self, in_chunk):
+        """
+        分块内快照用户期望拥有的 (user_id, role_id) 集合
+        """
+        return (
+            select(users.c.id.label("user_id"), roles.c.id.label("role_id"))
+            .select_from(
+                snapshot_roles
+                .join(snapshot_users, snapshot_users.c.username == snapshot_roles.c.username)
+                .join(users, users.c.username == snapshot_roles.c.username)
+                .join(roles, roles.c.name == snapshot_roles.c.role_name)
+            )
+            .where(in_chunk)
+        )
+
+    def _add_memberships(self, conn: Connection, in_chunk) -> int:
+        desired = self._desired_memberships(in_chunk).subquery()
+        source = select(desired.c.user_id, desired.c.role_id).where(
+            ~exists().where(user_roles.c.user_id == desired.c.user_id,
+                            user_roles.c.role_id == desired.c.role_id)
+        )
+        return conn.execute(user_roles.insert().from_select(["user_id", "role_id"], source)).rowcount
+
+    def _chunk_user_ids(self, in_chunk):
+        return (
+            select(users.c.id)
+            .join(snapshot_users, snapshot_users.c.username == users.c.username)
+            .where(in_chunk)
+        )
+
+    def _remove_memberships(self, conn: Connection, in_chunk) -> int:
+        desired = self._desired_memberships(in_chunk).subquery()
+        return conn.execute(
+            user_roles.delete().where(
+                user_roles.c.user_id.in_(self._chunk_user_ids(in_chunk)),
+                ~exists().where(and_(desired.c.user_id == user_roles.c.user_id,
+                                     desired.c.role_id == user_roles.c.role_id)),
+            )
+        ).rowcount
+
+    def _deactivate_missing(self, conn: Connection) -> int:
+        """
+        分块停用不在快照中的激活用户
+
+        服务账户由本系统创建，不属于上游目录，不会因缺席快照而被停用。
+        """
+        deactivated = 0
+        last_id = 0
+        while True:
+            with conn.begin():
+                ids = conn.execute(
+                    select(users.c.id)
+                    .where(
+                        users.c.id > last_id,
+                        users.c.status == true(),
+                        users.c.username.not_in(self.protected_usernames),
+                        users.c.id.not_in(select(service_accounts.c.user_id)),
+                        ~exists().where(snapshot_users.c.username == users.c.username),
+                    )
+                    .order_by(users.c.id)
+                    .limit(self.chunk_size)
+                ).scalars().all()
+                if not ids:
+                    return deactivated
+                count = conn.execute(
+                    users.update().where(users.c.id.in_(ids)).values(status=False, version=users.c.version + 1)
+                ).rowcount
+                if count:
+                    record_change(conn, "user.updated", user_ids=ids, fields=["status"], status=False)
+                deactivated += count
+                last_id = ids[-1]
+
+
+def sync_directory(bind: Engine, records: Iterable[DirectoryUser], full: bool = True,
+                   protected_usernames: Iterable[str] = ()) -> DirectorySyncResult:
+    """
+    一次性同步完整的目录快照
+    """
+    with DirectorySync(bind, full=full, protected_usernames=protected_usernames) as sync:
+        sync.load(records)
+        return sync.apply()
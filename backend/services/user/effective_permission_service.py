@@ -0,0 +1,386 @@
+"""
+用户有效权限物化表的服务层
+
+user_effective_permissions 保存每个用户通过直接分配的永久角色获得的 (user_id, permission_id)，
+成员或授权变化时由服务层在同一事务中增量维护：
+新增关联时插入新产生的组合，移除关联时删除已没有任何角色支撑的组合。
+权限检查与反向查找因此只需一次主键 / 索引探测。
+
+通过用户组获得的权限不物化：用户的直接所属组经 group_closure 展开为全部祖先组，
+再连接 group_roles 与 role_permissions，连接的行数只取决于用户所属组与祖先的数量，
+与组的规模无关，组织结构调整也只需维护闭包表。
+临时分配（user_roles.expires_at 不为空）同样不物化：读取时按 expires_at > 当前时间过滤，
+经 user_roles 上只包含临时分配的部分索引探测，到期的分配立即失效，不依赖清理任务的进度。
+下面的读取函数统一合并三种来源。
+
+增量维护在 READ COMMITTED 下不能只靠语句本身：一个事务移除角色时的支撑探测看不到另一个事务
+尚未提交的新授权，两者提交后物化表会缺行或多行。PostgreSQL 上修改成员或授权的事务先调用
+lock_memberships / lock_grants 锁定相关的用户、角色与权限行，冲突的维护因此按顺序执行，
+后执行的语句读到先提交的变更。
+"""
+
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, exists, func, or_, select, true, union
+from sqlalchemy.orm import Session
+
+from backend.config import settings
+from backend.database.dialects import dialect_insert, dialect_name, supports_on_conflict
+from backend.database.group_models import group_users, group_roles, group_closure
+from backend.database.user_models import (
+    User, Role, Permission, user_roles, role_permissions, user_effective_permissions
+)
+
+uep = user_effective_permissions
+
+
+def active_membership():
+    """
+    条件：user_roles 中的分配为永久分配或尚未到期
+    """
+    return or_(user_roles.c.expires_at.is_(None), user_roles.c.expires_at > datetime.now(timezone.utc))
+
+
+def _temporary_granted_pairs(*conditions):
+    """
+    通过尚未到期的临时角色获得的 (user_id, permission_id)
+    """
+    return (
+        select(user_roles.c.user_id, role_permissions.c.permission_id)
+        .join(role_permissions, role_permissions.c.role_id == user_roles.c.role_id)
+        .where(user_roles.c.expires_at > datetime.now(timezone.utc), *conditions)
+    )
+
+
+def _temporary_granted(user_id: int, *conditions):
+    return exists(_temporary_granted_pairs(user_roles.c.user_id == user_id, *conditions))
+
+
+def _group_granted_pairs(*conditions):
+    """
+    通过用户组获得的 (user_id, permission_id)：直接所属组 -> 闭包祖先 -> 组角色 -> 角色权限
+    """
+    return (
+        select(group_users.c.user_id, role_permissions.c.permission_id)
+        .join(group_closure, group_closure.c.descendant_id == group_users.c.group_id)
+        .join(group_roles, group_roles.c.group_id == group_closure.c.ancestor_id)
+        .join(role_permissions, role_permissions.c.role_id == group_roles.c.role_id)
+        .where(*(conditions or (true(),)))
+    )
+
+
+def _group_granted(user_id: int, *conditions):
+    return exists(_group_granted_pairs(group_users.c.user_id == user_id, *conditions))
+
+
+def user_role_ids(user_id: int):
+    """
+    子查询：用户直接分配（未到期）及通过用户组获得的全部角色ID
+    """
+    return union(
+        select(user_roles.c.role_id).where(user_roles.c.user_id == user_id, active_membership()),
+        select(group_roles.c.role_id)
+        .join(group_closure, group_closure.c.ancestor_id == group_roles.c.group_id)
+        .join(group_users, group_users.c.group_id == group_closure.c.descendant_id)
+        .where(group_users.c.user_id == user_id),
+    )
+
+
+def _effective_pairs():
+    """
+    全部用户的有效权限：物化的直接角色权限、临时角色权限与用户组权限的并集
+    """
+    return union(
+        select(uep.c.user_id, uep.c.permission_id),
+        _temporary_granted_pairs(),
+        _group_granted_pairs(),
+    ).subquery()
+
+
+def _granted_pairs(*conditions):
+    """
+    由永久分配的 user_roles 与 role_permissions 推导出的 (user_id, permission_id)
+    """
+    return (
+        select(user_roles.c.user_id, role_permissions.c.permission_id)
+        .join(role_permissions, role_permissions.c.role_id == user_roles.c.role_id)
+        .where(user_roles.c.expires_at.is_(None), *conditions)
+        .distinct()
+    )
+
+
+def _is_granted():
+    """
+    关联子查询：uep 中的当前行仍有永久分配的角色支撑
+    """
+    return exists().where(
+        user_roles.c.user_id == uep.c.user_id,
+        user_roles.c.expires_at.is_(None),
+        role_permissions.c.role_id == user_roles.c.role_id,
+        role_permissions.c.permission_id == uep.c.permission_id,
+    )
+
+
+def _lock_rows(db, column, condition, shared: bool = False) -> None:
+    """
+    按主键顺序锁定满足条件的行直到事务结束
+
+    排他锁使用 FOR NO KEY UPDATE，不与插入关联行时外键检查持有的 FOR KEY SHARE 冲突。
+    """
+    db.execute(
+        select(column).where(condition).order_by(column)
+        .with_for_update(read=shared, key_share=not shared)
+    )
+
+
+def lock_memberships(db, user_ids, role_ids=()) -> None:
+    """
+    修改一批用户的角色前锁定相关行（不提交），只在 PostgreSQL 上生效
+
+    按ID顺序以排他锁锁定用户行，再以共享锁锁定这些用户当前的全部角色及 role_ids（本次新增或移除的角色）。
+    同一用户的成员变更之间互相等待；成员变更与其中任一角色的授权变更（lock_grants 的排他锁）也互相等待，
+    移除角色时对其余角色的支撑探测因此不会漏掉并发新增的授权。
+    user_ids 与 role_ids 可以是ID列表或返回ID的子查询。
+    SQLite 的写事务本身串行执行，不需要行锁。
+    """
+    if dialect_name(db) != "postgresql":
+        return
+    held = Role.id.in_(select(user_roles.c.role_id).where(user_roles.c.user_id.in_(user_ids)))
+    _lock_rows(db, User.id, User.id.in_(user_ids))
+    _lock_rows(db, Role.id, or_(held, Role.id.in_(role_ids)), shared=True)
+
+
+def lock_grants(db, role_ids: Iterable[int], permission_ids: Iterable[int]) -> None:
+    """
+    修改角色授权前锁定相关行（不提交），只在 PostgreSQL 上生效
+
+    按ID顺序以排他锁锁定角色行与权限行：与这些角色成员的成员变更互相等待，
+    不同角色对同一权限的授权变更之间也互相等待。
+    """
+    if dialect_name(db) != "postgresql":
+        return
+    _lock_rows(db, Role.id, Role.id.in_(list(role_ids)))
+    _lock_rows(db, Permission.id, Permission.id.in_(list(permission_ids)))
+
+
+def add_effective_permissions(db: Session, *conditions) -> int:
+    """
+    插入满足条件的成员/授权组合中尚不存在的有效权限（不提交），返回插入的行数
+
+    conditions 作用于 user_roles 与 role_permissions 的连接。
+    """
+    source = _granted_pairs(*conditions)
+    stmt = dialect_insert(db, uep)
+    if supports_on_conflict(db):
+        stmt = stmt.from_select(["user_id", "permission_id"], source).on_conflict_do_nothing()
+    else:
+        source = source.where(~exists().where(
+            uep.c.user_id == user_roles.c.user_id, uep.c.permission_id == role_permissions.c.permission_id
+        ))
+        stmt = stmt.from_select(["user_id", "permission_id"], source)
+    return db.execute(stmt).rowcount
+
+
+def prune_effective_permissions(db: Session, *conditions) -> int:
+    """
+    删除满足条件且已没有任何角色支撑的有效权限（不提交），返回删除的行数
+
+    conditions 作用于 user_effective_permissions。
+    """
+    return db.execute(delete(uep).where(*conditions, ~_is_granted())).rowcount
+
+
+def refresh_users(db: Session, user_ids) -> None:
+    """
+    按当前成员与授权重新同步一组用户的有效权限（不提交）
+
+    user_ids 可以是ID列表或返回用户ID的子查询。
+    """
+    add_effective_permissions(db, user_roles.c.user_id.in_(user_ids))
+    prune_effective_permissions(db, uep.c.user_id.in_(user_ids))
+
+
+def on_user_roles_added(db: Session, user_id: int, role_ids: Iterable[int]) -> None:
+    """
+    用户新增角色后补充有效权限
+    """
+    role_ids = list(role_ids)
+    if role_ids:
+        add_effective_permissions(db, user_roles.c.user_id == user_id, user_roles.c.role_id.in_(role_ids))
+
+
+def on_user_roles_removed(db: Session, user_id: int, role_ids: Iterable[int]) -> None:
+    """
+    用户移除角色后清理失去支撑的有效权限
+    """
+    role_ids = list(role_ids)
+    if role_ids:
+        prune_effective_permissions(
+            db,
+            uep.c.user_id == user_id,
+            uep.c.permission_id.in_(
+                select(role_permissions.c.permission_id).where(role_permissions.c.role_id.in_(role_ids))
+            ),
+        )
+
+
+def on_role_permissions_added(db: Session, role_id: int, permission_ids: Iterable[int]) -> None:
+    """
+    角色新增权限后为其全部成员补充有效权限
+    """
+    permission_ids = list(permission_ids)
+    if permission_ids:
+        add_effective_permissions(
+            db, user_roles.c.role_id == role_id, role_permissions.c.permission_id.in_(permission_ids)
+        )
+
+
+def on_role_permissions_removed(db: Session, role_id: int, permission_ids: Iterable[int]) -> None:
+    """
+    角色移除权限后清理其成员失去支撑的有效权限
+    """
+    permission_ids = list(permission_ids)
+    if permission_ids:
+        prune_effective_permissions(
+            db,
+            uep.c.permission_id.in_(permission_ids),
+            uep.c.user_id.in_(select(user_roles.c.user_id).where(user_roles.c.role_id == role_id)),
+        )
+
+
+def has_permission(db: Session, user_id: int, permission_id: Optional[int]) -> bool:
+    """
+    主键探测：用户是否拥有指定权限
+    """
+    if permission_id is None:
+        return False
+    return db.execute(select(or_(
+        exists().where(uep.c.user_id == user_id, uep.c.permission_id == permission_id),
+        _temporary_granted(user_id, role_permissions.c.permission_id == permission_id),
+        _group_granted(user_id, role_permissions.c.permission_id == permission_id),
+    ))).scalar()
+
+
+def has_any_permission(db: Session, user_id: int, permission_ids: Iterable[int]) -> bool:
+    """
+    用户是否拥有任意一个指定权限
+    """
+    permission_ids = [permission_id for permission_id in permission_ids if permission_id is not None]
+    if not permission_ids:
+        return False
+    return db.execute(select(or_(
+        exists().where(uep.c.user_id == user_id, uep.c.permission_id.in_(permission_ids)),
+        _temporary_granted(user_id, role_permissions.c.permission_id.in_(permission_ids)),
+        _group_granted(user_id, role_permissions.c.permission_id.in_(permission_ids)),
+    ))).scalar()
+
+
+def get_permission_ids(db: Session, user_id: int) -> List[int]:
+    """
+    获取用户的全部有效权限ID（含临时角色与通过用户组获得的权限）
+    """
+    permission_ids = union(
+        select(uep.c.permission_id).where(uep.c.user_id == user_id),
+        _temporary_granted_pairs(user_roles.c.user_id == user_id).with_only_columns(role_permissions.c.permission_id),
+        _group_granted_pairs(group_users.c.user_id == user_id).with_only_columns(role_permissions.c.permission_id),
+    ).subquery()
+    return db.execute(
+        select(permission_ids.c.permission_id).order_by(permission_ids.c.permission_id)
+    ).scalars().all()
+
+
+def _holders_after(permission_id: int, after_id: int):
+    """
+    子查询：用户ID大于 after_id 的权限持有者，直接部分走 (permission_id, user_id) 反向索引，
+    临时分配从持有该权限的角色经 (role_id, user_id) 索引展开，
+    用户组部分从持有该权限的角色反向展开到组及其全部子组的成员
+    """
+    direct = select(uep.c.user_id).where(uep.c.permission_id == permission_id, uep.c.user_id > after_id)
+    temporary = _temporary_granted_pairs(
+        role_permissions.c.permission_id == permission_id, user_roles.c.user_id > after_id
+    ).with_only_columns(user_roles.c.user_id)
+    via_groups = _group_granted_pairs(
+        role_permissions.c.permission_id == permission_id, group_users.c.user_id > after_id
+    ).with_only_columns(group_users.c.user_id)
+    return union(direct, temporary, via_groups).subquery()
+
+
+def get_holder_ids(db: Session, permission_id: int, after_id: int = 0, limit: int = 100) -> List[int]:
+    """
+    按用户ID顺序分页获取权限持有者ID
+    """
+    holders = _holders_after(permission_id, after_id)
+    return db.execute(
+        select(holders.c.user_id).order_by(holders.c.user_id).limit(limit)
+    ).scalars().all()
+
+
+def count_holders(db: Session, permission_id: int) -> int:
+    """
+    统计权限持有者数量
+    """
+    holders = _holders_after(permission_id, 0)
+    return db.execute(select(func.count()).select_from(holders)).scalar()
+
+
+def iter_user_permission_ids(db: Session, batch_size: int = 10000,
+                             user_ids: Optional[List[int]] = None) -> Iterator[Tuple[int, List[int]]]:
+    """
+    按用户ID顺序产出 (用户ID, 有效权限ID列表)，只包含至少拥有一个权限的用户；可限定用户范围
+    """
+    pairs = _effective_pairs()
+    query = select(pairs.c.user_id, pairs.c.permission_id).order_by(pairs.c.user_id)
+    if user_ids is not None:
+        query = query.where(pairs.c.user_id.in_(user_ids))
+    current_user, current = None, []
+    for user_id, permission_id in db.execute(query.execution_options(yield_per=batch_size)):
+        if user_id != current_user:
+            if current_user is not None:
+                yield current_user, current
+            current_user, current = user_id, []
+        current.append(permission_id)
+    if current_user is not None:
+        yield current_user, current
+
+
+def rebuild_user_range(db: Session, start_id: int, end_id: int) -> None:
+    """
+    重建用户ID位于 [start_id, end_id) 的有效权限（不提交）
+    """
+    db.execute(delete(uep).where(uep.c.user_id >= start_id, uep.c.user_id < end_id))
+    add_effective_permissions(db, and_(user_roles.c.user_id >= start_id, user_roles.c.user_id < end_id))
+
+
+def rebuild_effective_permissions(db: Session, batch_size: int = None) -> int:
+    """
+    按用户ID区间分批全量重建有效权限，每批提交一次，返回处理的用户ID区间上界
+    """
+    batch_size = batch_size or settings.CASCADE_DELETE_BATCH_SIZE
+    max_id = db.execute(select(func.max(User.id))).scalar() or 0
+    # 清理已不存在的用户遗留的行
+    db.execute(delete(uep).where(uep.c.user_id > max_id))
+    db.commit()
+    start_id = 0
+    while start_id <= max_id:
+        rebuild_user_range(db, start_id, start_id + batch_size)
+        db.commit()
+        start_id += batch_size
+    return max_id
+
+
+def backfill_effective_permissions(db: Session) -> bool:
+    """
+    有效权限表为空而存在永久角色授权时全量重建，返回是否执行了重建
+
+    已部署的数据库升级到物化表后该表为空，不重建则所有权限检查（包括管理员）都会失败。
+    重建可以重复执行，多个工作进程同时启动时结果相同。
+    """
+    if db.execute(select(exists().select_from(uep))).scalar():
+        return False
+    if not db.execute(select(exists().where(
+        user_roles.c.expires_at.is_(None), role_permissions.c.role_id == user_roles.c.role_id
+    ))).scalar():
+        return False
+    rebuild_effective_permissions(db)
+    return True
@@ -0,0 +1,380 @@
+"""
+用户组相关操作的服务层
+
+用户组可以包含用户与其他用户组（嵌套），并被授予角色；组内（含全部子组）的用户获得这些角色。
+嵌套关系的传递闭包保存在 group_closure 中，每对 (祖先, 后代) 记录两者之间的路径数：
+增删一条边只需更新 祖先数 × 后代数 行，与组内用户数量无关。
+"""
+
+from typing import List, Optional
+
+from sqlalchemy import exists, func, literal, select, true
+from sqlalchemy.orm import Session
+
+from backend.database.dialects import dialect_name, dialect_insert, insert_returning, replace_association_set, \
+    supports_on_conflict
+from backend.database.group_models import Group, group_users, group_children, group_roles, group_closure
+from backend.database.session_utils import attach_detached
+from backend.database.user_models import User, Role
+from backend.database.version_models import USERS_VERSION
+from backend.schemas.group import GroupCreate, GroupUpdate
+from backend.schemas.user import MembershipChange
+from backend.services.user.outbox_service import record_change
+from backend.services.user.table_version_service import bump_versions
+
+
+def get_group_by_id(db: Session, group_id: int) -> Optional[Group]:
+    """
+    根据ID获取用户组
+    """
+    return db.query(Group).filter(Group.id == group_id).first()
+
+
+def get_groups(db: Session, skip: int = 0, limit: int = 100) -> List[Group]:
+    """
+    分页获取用户组列表
+    """
+    return db.query(Group).order_by(Group.id).offset(skip).limit(limit).all()
+
+
+def _group_exists(db: Session, group_id: int) -> bool:
+    return db.execute(select(exists().where(Group.id == group_id))).scalar()
+
+
+def create_group(db: Session, group_data: GroupCreate) -> Group:
+    """
+    创建用户组，并写入闭包中组到自身的一行
+    """
+    row = insert_returning(db, Group.__table__, {
+        "name": group_data.name,
+        "description": group_data.description,
+    })
+    if row is None:
+        db.rollback()
+        raise ValueError("用户组名称已存在")
+
+    db.execute(group_closure.insert().values(ancestor_id=row["id"], descendant_id=row["id"], path_count=1))
+    record_change(db, "group.created", row["id"], name=row["name"])
+    db.commit()
+    return attach_detached(db, Group, dict(row))
+
+
+def update_group(db: Session, group_id: int, group_update: GroupUpdate) -> Optional[Group]:
+    """
+    更新用户组名称或描述
+    """
+    db_group = get_group_by_id(db, group_id)
+    if not db_group:
+        return None
+
+    if group_update.name and group_update.name != db_group.name:
+        if db.query(Group).filter(Group.name == group_update.name).first():
+            raise ValueError("用户组名称已存在")
+        db_group.name = group_update.name
+    if group_update.description is not None:
+        db_group.description = group_update.description
+
+    record_change(db, "group.updated", group_id, name=db_group.name)
+    db.commit()
+    db.refresh(db_group)
+    return db_group
+
+
+def get_group_role_names(db: Session, group_id: int) -> List[str]:
+    return db.execute(
+        select(Role.name).join(group_roles, group_roles.c.role_id == Role.id)
+        .where(group_roles.c.group_id == group_id).order_by(Role.name)
+    ).scalars().all()
+
+
+def get_parent_ids(db: Session, group_id: int) -> List[int]:
+    return db.execute(
+        select(group_children.c.parent_id).where(group_children.c.child_id == group_id)
+        .order_by(group_children.c.parent_id)
+    ).scalars().all()
+
+
+def get_child_ids(db: Session, group_id: int) -> List[int]:
+    return db.execute(
+        select(group_children.c.child_id).where(group_children.c.parent_id == group_id)
+        .order_by(group_children.c.child_id)
+    ).scalars().all()
+
+
+def get_group_members(db: Session, group_id: int, after_id: int = 0, limit: int = 100,
+                      recursive: bool = False) -> List[User]:
+    """
+    按用户ID游标分页获取组成员，recursive 为真时包含全部子组的成员
+    """
+    if recursive:
+        member_ids = (
+            select(group_users.c.user_id)
+            .join(group_closure, group_closure.c.descendant_id == group_users.c.group_id)
+            .where(group_closure.c.ancestor_id == group_id, group_users.c.user_id > after_id)
+            .distinct()
+            .order_by(group_users.c.user_id)
+            .limit(limit)
+        ).subquery()
+    else:
+        member_ids = (
+            select(group_users.c.user_id)
+            .where(group_users.c.group_id == group_id, group_users.c.user_id > after_id)
+            .order_by(group_users.c.user_id)
+            .limit(limit)
+        ).subquery()
+    return db.execute(
+        select(User).join(member_ids, member_ids.c.user_id == User.id).order_by(User.id)
+    ).scalars().all()
+
+
+def get_user_groups(db: Session, user_id: int) -> List[Group]:
+    """
+    获取用户直接或通过嵌套间接所属的全部用户组
+    """
+    return db.execute(
+        select(Group).where(Group.id.in_(
+            select(group_closure.c.ancestor_id)
+            .join(group_users, group_users.c.group_id == group_closure.c.descendant_id)
+            .where(group_users.c.user_id == user_id)
+        )).order_by(Group.id)
+    ).scalars().all()
+
+
+def add_group_members(db: Session, group_id: int, user_ids: List[int]) -> Optional[MembershipChange]:
+    """
+    将用户加入用户组，已是成员的用户保持不变
+
+    组不存在时返回 None；包含不存在的用户时抛出 ValueError。
+    """
+    if not _group_exists(db, group_id):
+        return None
+
+    desired = set(user_ids)
+    found = set(db.execute(select(User.id).where(User.id.in_(desired))).scalars()) if desired else set()
+    unknown = desired - found
+    if unknown:
+        raise ValueError(f"用户不存在: {', '.join(str(i) for i in sorted(unknown))}")
+    if not desired:
+        return MembershipChange()
+
+    source = select(literal(group_id, type_=group_users.c.group_id.type), User.id).where(
+        User.id.in_(desired),
+        ~exists().where(group_users.c.group_id == group_id, group_users.c.user_id == User.id),
+    )
+    statement = dialect_insert(db, group_users).from_select(["group_id", "user_id"], source)
+    if supports_on_conflict(db):
+        statement = statement.on_conflict_do_nothing()
+    added = sorted(db.execute(statement.returning(group_users.c.user_id)).scalars().all())
+    if added:
+        record_change(db, "group_members.added", group_id, group_id=group_id, user_ids=added)
+        bump_versions(db, USERS_VERSION)
+    db.commit()
+    return MembershipChange(added=added)
+
+
+def remove_group_members(db: Session, group_id: int, user_ids: List[int]) -> Optional[MembershipChange]:
+    """
+    将用户移出用户组，组不存在时返回 None
+    """
+    if not _group_exists(db, group_id):
+        return None
+
+    removed = []
+    if user_ids:
+        removed = sorted(db.execute(
+            group_users.delete()
+            .where(group_users.c.group_id == group_id, group_users.c.user_id.in_(set(user_ids)))
+            .returning(group_users.c.user_id)
+        ).scalars().all())
+    if removed:
+        record_change(db, "group_members.removed", group_id, group_id=group_id, user_ids=removed)
+        bump_versions(db, USERS_VERSION)
+    db.commit()
+    return MembershipChange(removed=removed)
+
+
+def replace_group_roles(db: Session, group_id: int, role_ids: List[int]) -> Optional[MembershipChange]:
+    """
+    以集合语义替换用户组的角色
+
+    组不存在时返回 None；包含不存在的角色时抛出 ValueError。
+    """
+    if not _group_exists(db, group_id):
+        return None
+
+    desired = set(role_ids)
+    found = set(db.execute(select(Role.id).where(Role.id.in_(desired))).scalars()) if desired else set()
+    unknown = desired - found
+    if unknown:
+        raise ValueError(f"角色不存在: {', '.join(str(i) for i in sorted(unknown))}")
+
+    added, removed = replace_association_set(db, group_roles, "group_id", group_id, "role_id", Role.id, desired)
+    if added:
+        record_change(db, "group_roles.added", group_id, group_id=group_id, role_ids=added)
+    if removed:
+        record_change(db, "group_roles.removed", group_id, group_id=group_id, role_ids=removed)
+    if added or removed:
+        # 组角色决定组内全部用户的有效权限
+        bump_versions(db, USERS_VERSION)
+    db.commit()
+    return MembershipChange(added=added, removed=removed)
+
+
+def _lock_group_structure(db: Session) -> None:
+    """
+    串行化嵌套结构的修改，保证并发加边时的环检测与闭包计数正确
+
+    PostgreSQL 上锁住 group_children（不阻塞读取）；SQLite 的写事务本身是串行的。
+    """
+    if dialect_name(db) == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(func.hashtext("group_children"))))
+
+
+def _closure_products(parent_id: int, child_id: int):
+    """
+    边 parent -> child 为闭包贡献的路径：parent 的每个祖先 × child 的每个后代
+    """
+    above = group_closure.alias("above")
+    below = group_closure.alias("below")
+    return (
+        select(
+            above.c.ancestor_id,
+            below.c.descendant_id,
+            (above.c.path_count * below.c.path_count).label("path_count"),
+        )
+        .select_from(above.join(below, true()))
+        .where(above.c.descendant_id == parent_id, below.c.ancestor_id == child_id)
+    )
+
+
+def _add_edge_paths(db: Session, parent_id: int, child_id: int) -> None:
+    source = _closure_products(parent_id, child_id)
+    columns = ["ancestor_id", "descendant_id", "path_count"]
+    if supports_on_conflict(db):
+        statement = dialect_insert(db, group_closure).from_select(columns, source)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[group_closure.c.ancestor_id, group_closure.c.descendant_id],
+            set_={"path_count": group_closure.c.path_count + statement.excluded.path_count},
+        ))
+        return
+
+    products = source.subquery()
+    db.execute(
+        group_closure.update()
+        .where(
+            group_closure.c.ancestor_id == products.c.ancestor_id,
+            group_closure.c.descendant_id == products.c.descendant_id,
+        )
+        .values(path_count=group_closure.c.path_count + products.c.path_count)
+    )
+    db.execute(group_closure.insert().from_select(columns, source.where(~exists().where(
+        group_closure.c.ancestor_id == source.selected_columns.ancestor_id,
+        group_closure.c.descendant_id == source.selected_columns.descendant_id,
+    ))))
+
+
+def _remove_edge_paths(db: Session, parent_id: int, child_id: int) -> None:
+    above = group_closure.alias("above")
+    below = group_closure.alias("below")
+    # 读取的 (祖先, parent) 与 (child, 后代) 行本身不会被修改：否则图中已存在环
+    contribution = (
+        select(above.c.path_count * below.c.path_count)
+        .where(
+            above.c.ancestor_id == group_closure.c.ancestor_id,
+            above.c.descendant_id == parent_id,
+            below.c.ancestor_id == child_id,
+            below.c.descendant_id == group_closure.c.descendant_id,
+        )
+        .scalar_subquery()
+    )
+    affected = (
+        group_closure.c.ancestor_id.in_(
+            select(above.c.ancestor_id).where(above.c.descendant_id == parent_id)
+        ),
+        group_closure.c.descendant_id.in_(
+            select(below.c.descendant_id).where(below.c.ancestor_id == child_id)
+        ),
+    )
+    db.execute(group_closure.update().where(*affected).values(path_count=group_closure.c.path_count - contribution))
+    db.execute(group_closure.delete().where(*affected, group_closure.c.path_count <= 0))
+
+
+def add_child_group(db: Session, parent_id: int, child_id: int) -> bool:
+    """
+    将 child 组嵌套到 parent 组中，已存在时保持不变
+
+    任一组不存在时返回 False；会形成环（包括组包含自身）时抛出 ValueError。
+    """
+    _lock_group_structure(db)
+    if not (_group_exists(db, parent_id) and _group_exists(db, child_id)):
+        db.rollback()
+        return False
+    if db.execute(select(exists().where(
+        group_children.c.parent_id == parent_id, group_children.c.child_id == child_id
+    ))).scalar():
+        db.rollback()
+        return True
+    # child 已经是 parent 的祖先（或就是 parent）时加边会形成环
+    if db.execute(select(exists().where(
+        group_closure.c.ancestor_id == child_id, group_closure.c.descendant_id == parent_id
+    ))).scalar():
+        db.rollback()
+        raise ValueError("嵌套关系不能形成环")
+
+    db.execute(group_children.insert().values(parent_id=parent_id, child_id=child_id))
+    _add_edge_paths(db, parent_id, child_id)
+    record_change(db, "group_children.added", parent_id, parent_id=parent_id, child_id=child_id)
+    bump_versions(db, USERS_VERSION)
+    db.commit()
+    return True
+
+
+def remove_child_group(db: Session, parent_id: int, child_id: int) -> bool:
+    """
+    解除 child 组与 parent 组的嵌套关系，关系不存在时返回 False
+    """
+    _lock_group_structure(db)
+    removed = db.execute(group_children.delete().where(
+        group_children.c.parent_id == parent_id, group_children.c.child_id == child_id
+    )).rowcount
+    if not removed:
+        db.rollback()
+        return False
+
+    _remove_edge_paths(db, parent_id, child_id)
+    record_change(db, "group_children.removed", parent_id, parent_id=parent_id, child_id=child_id)
+    bump_versions(db, USERS_VERSION)
+    db.commit()
+    return True
+
+
+def detach_group_edges(db: Session, group_id: int) -> None:
+    """
+    解除组的全部父子嵌套关系并更新闭包（不提交），用于删除组之前
+    """
+    _lock_group_structure(db)
+    for parent_id in get_parent_ids(db, group_id):
+        db.execute(group_children.delete().where(
+            group_children.c.parent_id == parent_id, group_children.c.child_id == group_id
+        ))
+        _remove_edge_paths(db, parent_id, group_id)
+        record_change(db, "group_children.removed", parent_id, parent_id=parent_id, child_id=group_id)
+    for child_id in get_child_ids(db, group_id):
+        db.execute(group_children.delete().where(
+            group_children.c.parent_id == group_id, group_children.c.child_id == child_id
+        ))
+        _remove_edge_paths(db, group_id, child_id)
+        record_change(db, "group_children.removed", group_id, parent_id=group_id, child_id=child_id)
+
+
+def delete_group(db: Session, group_id: int) -> bool:
+    """
+    删除用户组，成员关系按批次直接删除
+    """
+    from backend.services.user.cascade_service import delete_group_cascade
+
+    if not _group_exists(db, group_id):
+        return False
+
+    delete_group_cascade(db, group_id)
+    return True
@@ -0,0 +1,391 @@
+"""
+后台任务相关操作的服务层
+
+任务保存在 jobs 表中，由进程内的异步工作者领取执行。每个任务类型对应一个分步处理函数，
+每一步处理一个分块：数据变更与任务进度、断点在同一个事务中提交，
+因此进程崩溃后任务可以从最后一次提交的断点继续执行。
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, exists, func, literal, or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend.config import settings
+from backend.database.dialects import dialect_insert, supports_on_conflict
+from backend.database.job_models import Job, JOB_PENDING, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+from backend.database.user_models import User, Role, Permission, user_roles, role_permissions
+from backend.database.version_models import USERS_VERSION, ROLES_VERSION
+from backend.schemas.directory import DirectoryUser
+from backend.services.user.cascade_service import ROLE_DELETE_PHASES, delete_role_row
+from backend.services.user.directory_sync_service import sync_directory
+from backend.services.user.effective_permission_service import (
+    add_effective_permissions, lock_grants, lock_memberships, refresh_users, rebuild_user_range
+)
+from backend.services.user.outbox_service import record_change, prune_events
+from backend.services.user.permission_catalog import permission_catalog
+from backend.services.user.table_version_service import bump_user_versions, bump_versions
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobStep:
+    """
+    单步执行结果
+    """
+    cursor: Optional[Dict[str, Any]]
+    processed: int = 0
+    total: Optional[int] = None
+    done: bool = False
+
+
+# 任务类型 -> 分步处理函数
+JOB_HANDLERS: Dict[str, Callable[[Session, dict, Optional[dict], int], JobStep]] = {}
+
+
+def job_handler(job_type: str):
+    """
+    注册任务类型的分步处理函数
+
+    处理函数每次调用只处理一个分块且不能自行提交事务。
+    """
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return decorator
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue_job(db: Session, job_type: str, params: Optional[dict] = None, created_by: Optional[int] = None) -> Job:
+    """
+    创建新任务
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"不支持的任务类型: {job_type}")
+
+    db_job = Job(
+        type=job_type,
+        status=JOB_PENDING,
+        params=json.dumps(params or {}),
+        created_by=created_by
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def get_job_by_id(db: Session, job_id: int) -> Optional[Job]:
+    """
+    根据ID获取任务
+    """
+    return db.query(Job).filter(Job.id == job_id).first()
+
+
+def get_jobs(db: Session, status: Optional[str] = None, skip: int = 0, limit: int = 100) -> List[Job]:
+    """
+    分页获取任务列表，最新的任务在前
+    """
+    query = db.query(Job)
+    if status:
+        query = query.filter(Job.status == status)
+    return query.order_by(Job.id.desc()).offset(skip).limit(limit).all()
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[int]:
+    """
+    领取一个待执行的任务
+
+    心跳超时的运行中任务视为其工作者已退出，可以被重新领取并从断点继续。
+    """
+    stale_before = _now() - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    claimable = or_(
+        Job.status == JOB_PENDING,
+        and_(Job.status == JOB_RUNNING, Job.heartbeat_at < stale_before),
+    )
+    candidate = select(Job.id).where(claimable).order_by(Job.id).limit(1)
+    if db.get_bind().dialect.name == "postgresql":
+        candidate = candidate.with_for_update(skip_locked=True)
+
+    job_id = db.execute(candidate).scalar()
+    if job_id is None:
+        db.rollback()
+        return None
+
+    # 带条件的更新保证同一任务只会被一个工作者领取
+    now = _now()
+    claimed = db.execute(
+        update(Job)
+        .where(Job.id == job_id, claimable)
+        .values(
+            status=JOB_RUNNING,
+            worker_id=worker_id,
+            heartbeat_at=now,
+            started_at=func.coalesce(Job.started_at, now),
+            attempts=Job.attempts + 1,
+        )
+    ).rowcount
+    db.commit()
+    return job_id if claimed else None
+
+
+def run_job(session_factory: sessionmaker, job_id: int, worker_id: str) -> None:
+    """
+    逐步执行已领取的任务，直到完成、失败或租约被其他工作者接管
+    """
+    db = session_factory()
+    try:
+        while True:
+            job = db.get(Job, job_id, populate_existing=True)
+            if job is None or job.status != JOB_RUNNING or job.worker_id != worker_id:
+                db.rollback()
+                return
+
+            handler = JOB_HANDLERS.get(job.type)
+            params = json.loads(job.params or "{}")
+            cursor = json.loads(job.cursor) if job.cursor else None
+            try:
+                if handler is None:
+                    raise ValueError(f"不支持的任务类型: {job.type}")
+                step = handler(db, params, cursor, settings.JOB_CHUNK_SIZE)
+            except Exception as e:
+                db.rollback()
+                logger.exception("任务 %s 执行失败", job_id)
+                db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.worker_id == worker_id)
+                    .values(status=JOB_FAILED, error=str(e), finished_at=_now())
+                )
+                db.commit()
+                return
+
+            values = {
+                "cursor": json.dumps(step.cursor) if step.cursor is not None else None,
+                "progress": Job.progress + step.processed,
+                "heartbeat_at": _now(),
+            }
+            if step.total is not None:
+                values["total"] = step.total
+            if step.done:
+                values.update(status=JOB_SUCCEEDED, finished_at=_now())
+
+            # 数据变更与进度在同一事务中提交；租约已丢失时放弃本步的全部变更
+            fenced = db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.worker_id == worker_id, Job.status == JOB_RUNNING)
+                .values(**values)
+            ).rowcount
+            if not fenced:
+                db.rollback()
+                return
+            db.commit()
+            if step.done:
+                return
+    finally:
+        db.close()
+
+
+def _next_ids(db: Session, column, *conditions, after: int, limit: int) -> List[int]:
+    """
+    按主键顺序获取下一批 ID
+    """
+    return db.execute(
+        select(column).where(column > after, *conditions).order_by(column).limit(limit)
+    ).scalars().all()
+
+
+@job_handler("role_delete")
+def _role_delete_step(db: Session, params: dict, cursor: Optional[dict], chunk_size: int) -> JobStep:
+    """
+    分块删除角色：按 ROLE_DELETE_PHASES 依次移除成员、用户组关联、权限关联与资源授权，最后删除角色本身
+    """
+    role_id = params["role_id"]
+    cursor = cursor or {"phase": ROLE_DELETE_PHASES[0][0]}
+    total = None
+    if "total" not in cursor:
+        if not db.execute(select(exists().where(Role.id == role_id))).scalar():
+            raise ValueError("角色不存在")
+        total = db.execute(
+            select(func.count()).select_from(user_roles).where(user_roles.c.role_id == role_id)
+        ).scalar()
+        cursor["total"] = total
+    if cursor["phase"] == "done":
+        return JobStep(cursor=cursor, total=total, done=True)
+
+    names = [name for name, _, _ in ROLE_DELETE_PHASES]
+    for name, batch, versions in ROLE_DELETE_PHASES[names.index(cursor["phase"]):]:
+        cursor["phase"] = name
+        deleted = batch(db, role_id, chunk_size)
+        if deleted:
+            if versions:
+                bump_versions(db, *versions)
+            return JobStep(cursor=cursor, processed=deleted if name == "members" else 0, total=total)
+
+    delete_role_row(db, role_id)
+    return JobStep(cursor={**cursor, "phase": "done"}, total=total, done=True)
+
+
+@job_handler("role_reassign")
+def _role_reassign_step(db: Session, params: dict, cursor: Optional[dict], chunk_size: int) -> JobStep:
+    """
+    将一个角色的成员分块转移（或复制）到另一个角色
+    """
+    from_role_id = params["from_role_id"]
+    to_role_id = params["to_role_id"]
+    keep_source = params.get("keep_source", False)
+    cursor = cursor or {"last_user_id": 0}
+    total = None
+    if "total" not in cursor:
+        if not db.execute(select(exists().where(Role.id == to_role_id))).scalar():
+            raise ValueError("目标角色不存在")
+        total = db.execute(
+            select(func.count()).select_from(user_roles).where(user_roles.c.role_id == from_role_id)
+        ).scalar()
+        cursor["total"] = total
+
+    user_ids = _next_ids(
+        db, user_roles.c.user_id, user_roles.c.role_id == from_role_id,
+        after=cursor["last_user_id"], limit=chunk_size
+    )
+    if not user_ids:
+        return JobStep(cursor=cursor, total=total, done=True)
+
+    lock_memberships(db, user_ids, [from_role_id, to_role_id])
+    existing = set(db.execute(
+        select(user_roles.c.user_id).where(
+            user_roles.c.role_id == to_role_id, user_roles.c.user_id.in_(user_ids)
+        )
+    ).scalars())
+    missing = [user_id for user_id in user_ids if user_id not in existing]
+    if missing:
+        # 临时分配转移后保留原到期时间
+        db.execute(user_roles.insert().from_select(
+            ["user_id", "role_id", "expires_at"],
+            select(user_roles.c.user_id, literal(to_role_id), user_roles.c.expires_at).where(
+                user_roles.c.role_id == from_role_id, user_roles.c.user_id.in_(missing)
+            ),
+        ))
+        record_change(db, "user_roles.added", user_ids=missing, role_ids=[to_role_id])
+    if not keep_source:
+        db.execute(user_roles.delete().where(
+            user_roles.c.role_id == from_role_id, user_roles.c.user_id.in_(user_ids)
+        ))
+        record_change(db, "user_roles.removed", user_ids=user_ids, role_ids=[from_role_id])
+    refresh_users(db, user_ids)
+    bump_user_versions(db, user_ids)
+    bump_versions(db, USERS_VERSION)
+    cursor["last_user_id"] = user_ids[-1]
+    return JobStep(cursor=cursor, processed=len(user_ids), total=total)
+
+
+@job_handler("permission_grant_all")
+def _permission_grant_all_step(db: Session, params: dict, cursor: Optional[dict], chunk_size: int) -> JobStep:
+    """
+    分块将一个权限授予所有角色
+    """
+    permission_id = params["permission_id"]
+    cursor = cursor or {"last_role_id": 0}
+    total = None
+    if "total" not in cursor:
+        if not db.execute(select(exists().where(Permission.id == permission_id))).scalar():
+            raise ValueError("权限不存在")
+        total = db.execute(select(func.count()).select_from(Role)).scalar()
+        cursor["total"] = total
+
+    role_ids = _next_ids(db, Role.id, after=cursor["last_role_id"], limit=chunk_size)
+    if not role_ids:
+        return JobStep(cursor=cursor, total=total, done=True)
+
+    granted = set(db.execute(
+        select(role_permissions.c.role_id).where(
+            role_permissions.c.permission_id == permission_id, role_permissions.c.role_id.in_(role_ids)
+        )
+    ).scalars())
+    missing = [role_id for role_id in role_ids if role_id not in granted]
+    if missing:
+        lock_grants(db, missing, [permission_id])
+        # 并发的授权可能在检查之后插入了同一行：冲突的行跳过，只处理实际插入的角色
+        source = select(Role.id, literal(permission_id, type_=role_permissions.c.permission_id.type)).where(
+            Role.id.in_(missing),
+            ~exists().where(role_permissions.c.role_id == Role.id, role_permissions.c.permission_id == permission_id),
+        )
+        statement = dialect_insert(db, role_permissions).from_select(["role_id", "permission_id"], source)
+        if supports_on_conflict(db):
+            statement = statement.on_conflict_do_nothing()
+        missing = sorted(db.execute(statement.returning(role_permissions.c.role_id)).scalars())
+    if missing:
+        add_effective_permissions(
+            db, user_roles.c.role_id.in_(missing), role_permissions.c.permission_id == permission_id
+        )
+        record_change(db, "role_permissions.added", role_ids=missing, permission_ids=[permission_id])
+        bump_versions(db, ROLES_VERSION)
+    cursor["last_role_id"] = role_ids[-1]
+    return JobStep(cursor=cursor, processed=len(role_ids), total=total)
+
+
+@job_handler("bulk_import")
+def _bulk_import_step(db: Session, params: dict, cursor: Optional[dict], chunk_size: int) -> JobStep:
+    """
+    分块导入用户及其角色
+
+    每块通过增量目录同步写入（在独立连接上提交），重复执行同一块是幂等的。
+    """
+    records = params.get("users", [])
+    offset = (cursor or {}).get("offset", 0)
+    batch = [DirectoryUser.model_validate(record) for record in records[offset:offset + chunk_size]]
+    if batch:
+        sync_directory(db.get_bind(), batch, full=False)
+    offset += len(batch)
+    return JobStep(
+        cursor={"offset": offset},
+        processed=len(batch),
+        total=len(records),
+        done=offset >= len(records),
+    )
+
+
+@job_handler("cache_rebuild")
+def _cache_rebuild_step(db: Session, params: dict, cursor: Optional[dict], chunk_size: int) -> JobStep:
+    """
+    重新加载进程内权限目录
+    """
+    permission_catalog.load(db)
+    return JobStep(cursor=None, processed=1, total=1, done=True)
+
+
+@job_handler("effective_permissions_rebuild")
+def _effective_permissions_rebuild_step(db: Session, params: dict, cursor: Optional[dict], chunk_size: int) -> JobStep:
+    """
+    按用户ID区间分块全量重建有效权限表
+    """
+    cursor = cursor or {"start_id": 0}
+    total = None
+    if "max_id" not in cursor:
+        cursor["max_id"] = db.execute(select(func.max(User.id))).scalar() or 0
+        total = cursor["max_id"]
+
+    start_id = cursor["start_id"]
+    if start_id > cursor["max_id"]:
+        return JobStep(cursor=cursor, total=total, done=True)
+    end_id = min(start_id + chunk_size, cursor["max_id"] + 1)
+    rebuild_user_range(db, start_id, end_id)
+    cursor["start_id"] = end_id
+    return JobStep(cursor=cursor, processed=end_id - start_id, total=total, done=end_id > cursor["max_id"])
+
+
+@job_handler("change_feed_prune")
+def _change_feed_prune_step(db: Session, params: dict, cursor: Optional[dict], chunk_size: int) -> JobStep:
+    """
+    分块删除超过保留时间的变更事件
+    """
+    retention_hours = params.get("retention_hours", settings.CHANGE_FEED_RETENTION_HOURS)
+    deleted = prune_events(db, chunk_size, retention_hours)
+    return JobStep(cursor=cursor, processed=deleted, done=deleted < chunk_size)
@@ -0,0 +1,92 @@
+"""
+进程内的异步任务工作者
+
+无需外部消息队列：工作者轮询 jobs 表领取任务，并在线程池中执行同步的数据库操作。
+本进程创建任务后可以调用 notify() 立即唤醒空闲的工作者。
+每个工作协程有自己的唤醒事件，并在领取任务之前清除：领取期间到达的通知不会被自己或其他协程吞掉。
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import List, Optional
+
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from backend.config import settings
+from backend.database import SessionLocal
+from backend.services.user.job_service import claim_next_job, run_job
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    def __init__(self, session_factory: sessionmaker = SessionLocal, concurrency: Optional[int] = None,
+                 poll_interval: Optional[float] = None):
+        self.session_factory = session_factory
+        self.concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self.poll_interval = poll_interval or settings.JOB_POLL_INTERVAL_SECONDS
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeups: List[asyncio.Event] = []
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._wakeups = [asyncio.Event() for _ in range(self.concurrency)]
+        self._tasks = [asyncio.create_task(self._loop(index)) for index in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self.notify()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """
+        唤醒空闲的工作者立即检查新任务（领取是原子的，多余的唤醒只多一次空查询）
+        """
+        for wakeup in self._wakeups:
+            wakeup.set()
+
+    async def _loop(self, index: int) -> None:
+        worker_id = f"{self.worker_id}#{index}"
+        wakeup = self._wakeups[index]
+        while not self._stopping:
+            # 先清除再领取：领取期间收到的通知保持置位，随后的等待立即返回
+            wakeup.clear()
+            try:
+                job_id = await run_in_threadpool(self._claim, worker_id)
+            except Exception:
+                logger.exception("领取任务失败")
+                job_id = None
+
+            if job_id is None:
+                await self._idle(wakeup)
+                continue
+
+            try:
+                await run_in_threadpool(run_job, self.session_factory, job_id, worker_id)
+            except Exception:
+                logger.exception("执行任务 %s 时发生异常", job_id)
+
+    def _claim(self, worker_id: str) -> Optional[int]:
+        db = self.session_factory()
+        try:
+            return claim_next_job(db, worker_id)
+        finally:
+            db.close()
+
+    async def _idle(self, wakeup: asyncio.Event) -> None:
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+job_worker = JobWorker()
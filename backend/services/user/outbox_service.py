@@ -0,0 +1,114 @@
+"""
+事务性发件箱与变更流的服务层
+
+每个修改 RBAC 数据的服务函数在同一事务中调用 record_change 写入一条事件，
+事件与数据变更一起提交或回滚，不存在“数据已变更但事件丢失”的窗口。
+下游缓存按序号增量读取事件（get_changes），无需重新读取整张表。
+
+事件类型为 <实体>.<动作>，例如:
+    user.created / user.updated / user.deleted / user.synced
+    user_roles.added / user_roles.removed             {"user_ids": [...], "role_ids": [...]}
+                                                      临时分配附带 expires_at，到期移除附带 reason="expired"
+    role.created / role.updated / role.deleted
+    role_permissions.added / role_permissions.removed {"role_ids": [...], "permission_ids": [...]}
+    permission.created / permission.updated / permission.deleted
+    group.* / group_members.* / group_children.* / group_roles.*
+    acl.granted / acl.revoked / api_key.created / api_key.revoked
+关联事件表示列出的每个主体都获得（或失去）了列出的每个目标。
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from backend.database.dialects import dialect_name
+from backend.database.outbox_models import OutboxEvent
+
+events = OutboxEvent.__table__
+
+
+def record_change(db, event_type: str, entity_id: Optional[int] = None, **payload) -> None:
+    """
+    在当前事务中写入一条变更事件（不提交），db 可以是会话或连接
+
+    PostgreSQL 上先获取事务级咨询锁，使序号的分配顺序与提交顺序一致：
+    否则序号较小的事务可能晚于序号较大的事务提交，已读到较大序号的消费者会漏掉它。
+    锁在提交时释放，应在事务的最后阶段调用（与 bump_versions 相同）。
+    """
+    if dialect_name(db) == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(func.hashtext("outbox_events"))))
+    db.execute(events.insert().values(
+        event_type=event_type,
+        entity_id=entity_id,
+        payload=json.dumps(payload, ensure_ascii=False, sort_keys=True),
+    ))
+
+
+def _event_dict(row) -> dict:
+    return {
+        "id": row.id,
+        "event_type": row.event_type,
+        "entity_id": row.entity_id,
+        "payload": json.loads(row.payload) if row.payload else {},
+        "created_at": row.created_at,
+    }
+
+
+def latest_sequence(db) -> int:
+    """
+    当前最大的事件序号，尚无事件时为 0
+    """
+    return db.execute(select(func.max(events.c.id))).scalar() or 0
+
+
+def read_events(db, since: int, limit: int) -> List[dict]:
+    """
+    按序号顺序读取 since 之后的事件，沿主键范围扫描
+    """
+    rows = db.execute(
+        select(events).where(events.c.id > since).order_by(events.c.id).limit(limit)
+    ).all()
+    return [_event_dict(row) for row in rows]
+
+
+def needs_reset(db, since: int) -> bool:
+    """
+    since 之后的事件是否可能已被清理
+
+    序号因回滚可能不连续，这里宁可误报也不漏掉事件。
+    """
+    oldest = db.execute(select(func.min(events.c.id))).scalar()
+    return oldest is not None and since < oldest - 1
+
+
+def get_changes(db, since: int, limit: int) -> Tuple[List[dict], int, bool]:
+    """
+    读取 since 之后的变更，返回 (事件列表, 下一次的 since, 是否需要重置)
+
+    需要重置时消费者应重新读取完整数据，并从返回的 since（读取前的最新序号）继续增量消费。
+    """
+    if needs_reset(db, since):
+        return [], latest_sequence(db), True
+
+    changes = read_events(db, since, limit)
+    return changes, changes[-1]["id"] if changes else since, False
+
+
+def prune_events(db, limit: int, retention_hours: int) -> int:
+    """
+    删除一批超过保留时间的事件（不提交），返回删除的行数
+
+    始终保留最新的一条事件，使 get_changes 能够判断消费者是否落后于清理位置。
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=retention_hours)
+    ids = db.execute(
+        select(events.c.id)
+        .where(events.c.created_at < cutoff, events.c.id < latest_sequence(db))
+        .order_by(events.c.id)
+        .limit(limit)
+    ).scalars().all()
+    if ids:
+        db.execute(events.delete().where(events.c.id.in_(ids)))
+    return len(ids)
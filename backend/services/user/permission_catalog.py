@@ -0,0 +1,188 @@
+"""
+进程内权限目录
+
+权限数量少且很少变化，因此在启动时一次性加载所有权限，
+将名称驻留并映射到 ID，按 ID / 名称的查询直接由内存提供。
+本进程内的写操作会立即刷新目录；其他进程的写入会递增 PERMISSIONS_VERSION，
+使用目录前比较该版本（一次主键读取），不一致时重新加载，因此删除或重命名的权限不会在目录中残留。
+版本比较至多每 version_check_seconds 秒进行一次，其间的查询完全不访问数据库：
+代价是其他进程的权限写入最多延迟这么久才在本进程可见（设为 0 时每次使用都比较）。
+TTL 只作为绕过服务层直接改库时的兜底。
+"""
+
+import sys
+import threading
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from backend.config import settings
+from backend.constants.permissions import PERMISSIONS
+from backend.database.session_utils import attach_detached
+from backend.database.user_models import Permission
+from backend.database.version_models import PERMISSIONS_VERSION
+from backend.services.user.table_version_service import get_versions
+
+
+@dataclass(frozen=True)
+class PermissionEntry:
+    id: int
+    name: str
+    description: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, permission: Permission) -> "PermissionEntry":
+        return cls(
+            id=permission.id,
+            name=sys.intern(permission.name),
+            description=permission.description,
+            created_at=permission.created_at,
+            updated_at=permission.updated_at,
+        )
+
+
+class PermissionCatalog:
+    """
+    权限目录
+
+    读操作不加锁：每次修改都会构造新的字典并整体替换引用（写时复制）。
+    """
+
+    def __init__(self, ttl_seconds: float = 0, version_check_seconds: float = 0):
+        self._lock = threading.Lock()
+        self._by_id: Dict[int, PermissionEntry] = {}
+        self._ids_by_name: Dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+        # 加载时数据库中的 PERMISSIONS_VERSION，未知时为 None
+        self._data_version: Optional[int] = None
+        # 上一次确认数据版本未变化（或加载）的时间
+        self._checked_at: Optional[float] = None
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+        self.version = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def is_stale(self) -> bool:
+        if not self.loaded:
+            return True
+        return bool(self.ttl_seconds) and time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    def load(self, db: Session) -> None:
+        """
+        从数据库重新加载全部权限
+
+        先读取版本再读取权限：两者之间提交的变更会使下一次检查再次加载。
+        """
+        data_version = _data_version(db)
+        entries = [PermissionEntry.from_model(p) for p in db.query(Permission).all()]
+        self.replace(entries, data_version)
+
+    def replace(self, entries: Iterable[PermissionEntry], data_version: Optional[int] = None) -> None:
+        by_id = {entry.id: entry for entry in entries}
+        ids_by_name = {entry.name: entry.id for entry in by_id.values()}
+        with self._lock:
+            self._by_id = by_id
+            self._ids_by_name = ids_by_name
+            self._loaded_at = self._checked_at = time.monotonic()
+            self._data_version = data_version
+            self.version += 1
+
+    def ensure_fresh(self, db: Session) -> None:
+        """
+        目录未加载、已超过 TTL 或数据库中的权限版本已变化（其他进程写入）时重新加载
+
+        距上一次版本比较不足 version_check_seconds 秒时直接使用当前目录。
+        """
+        if self.is_stale():
+            self.load(db)
+            return
+        now = time.monotonic()
+        if self.version_check_seconds and now - self._checked_at < self.version_check_seconds:
+            return
+        if _data_version(db) != self._data_version:
+            self.load(db)
+        else:
+            self._checked_at = now
+
+    def upsert(self, permission: Permission) -> None:
+        """
+        写入或替换单个权限（处理重命名）
+        """
+        entry = PermissionEntry.from_model(permission)
+        with self._lock:
+            by_id = dict(self._by_id)
+            ids_by_name = dict(self._ids_by_name)
+            previous = by_id.get(entry.id)
+            if previous is not None and ids_by_name.get(previous.name) == entry.id:
+                del ids_by_name[previous.name]
+            by_id[entry.id] = entry
+            ids_by_name[entry.name] = entry.id
+            self._by_id = by_id
+            self._ids_by_name = ids_by_name
+            self.version += 1
+
+    def remove(self, permission_id: int) -> None:
+        with self._lock:
+            by_id = dict(self._by_id)
+            entry = by_id.pop(permission_id, None)
+            if entry is None:
+                return
+            ids_by_name = dict(self._ids_by_name)
+            if ids_by_name.get(entry.name) == permission_id:
+                del ids_by_name[entry.name]
+            self._by_id = by_id
+            self._ids_by_name = ids_by_name
+            self.version += 1
+
+    def get(self, permission_id: int) -> Optional[PermissionEntry]:
+        return self._by_id.get(permission_id)
+
+    def get_id(self, name: str) -> Optional[int]:
+        return self._ids_by_name.get(name)
+
+    def get_by_name(self, name: str) -> Optional[PermissionEntry]:
+        permission_id = self._ids_by_name.get(name)
+        return None if permission_id is None else self._by_id.get(permission_id)
+
+    def get_name(self, permission_id: int) -> Optional[str]:
+        entry = self._by_id.get(permission_id)
+        return None if entry is None else entry.name
+
+    def entries(self) -> List[PermissionEntry]:
+        return list(self._by_id.values())
+
+    def missing(self, names: Iterable[str]) -> List[str]:
+        ids_by_name = self._ids_by_name
+        return [name for name in names if name not in ids_by_name]
+
+
+def _data_version(db: Session) -> int:
+    return get_versions(db, [PERMISSIONS_VERSION])[PERMISSIONS_VERSION]
+
+
+permission_catalog = PermissionCatalog(
+    ttl_seconds=settings.PERMISSION_CATALOG_TTL_SECONDS,
+    version_check_seconds=settings.PERMISSION_CATALOG_VERSION_CHECK_SECONDS,
+)
+
+
+def attach_permission(db: Session, entry: PermissionEntry) -> Permission:
+    """
+    将目录条目作为 Permission 实例挂到会话上，不查询数据库
+    """
+    return attach_detached(db, Permission, asdict(entry))
+
+
+def validate_permission_constants(catalog: PermissionCatalog = permission_catalog) -> List[str]:
+    """
+    返回 PERMISSIONS 常量中在数据库里不存在的权限名称
+    """
+    return catalog.missing(PERMISSIONS.values())
@@ -0,0 +1,475 @@
+"""
+跨进程共享的用户权限矩阵
+
+以用户ID为行、权限ID为位的稠密位图写入一个文件，各 uvicorn 工作进程只读 mmap 映射，
+页面由操作系统在进程之间共享，不会按进程复制。
+
+文件格式（小端序）:
+    头部  magic(8s) 格式版本(H) 保留(H) 变更序号(q) 最近确认时间(d) 行数(I) 每行字节数(I)
+          填充到 HEADER_SIZE 字节
+    数据  第 user_id 行从 HEADER_SIZE + user_id * 每行字节数 开始：
+          首字节为标志（_ROW_TEMPORARY 表示用户有临时角色分配），其后第 permission_id 位表示拥有该权限
+
+矩阵的代即它反映到的变更流序号（outbox_events.id）。刷新器每隔 PERMISSION_MATRIX_REFRESH_SECONDS
+在一个进程中（flock 互斥）读取该序号之后的变更事件，只重算受影响用户的行并原地写入（各进程的共享映射立即可见），
+再把新的序号与确认时间写入头部；事件无法增量应用（权限、角色或用户组被删除、新权限超出位宽、新用户超出预留行数、
+变更过多或事件已被清理）时全量重建并 os.replace 原子替换，各进程发现 inode 变化后重新映射。
+
+读取不查询数据库：头部的确认时间在 PERMISSION_MATRIX_MAX_STALENESS_SECONDS 以内时直接使用矩阵，
+否则（刷新器停止或正在全量重建）调用方回退到有效权限表。因此经矩阵回答的授权最多落后这么久，
+撤销权限在该时间内可能仍然有效，这是用每请求少一次查询换来的有意取舍。
+临时角色到期不产生事件，有临时分配的用户行带有标志，读取时回退到数据库按到期时间过滤。
+"""
+
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from backend.config import settings
+from backend.database import SessionLocal
+from backend.database.group_models import group_users, group_roles, group_closure
+from backend.database.user_models import User, Permission, user_roles
+from backend.services.user.effective_permission_service import iter_user_permission_ids
+from backend.services.user.outbox_service import latest_sequence, needs_reset, read_events
+from backend.services.user.rbac_snapshot_service import SNAPSHOT_VERSION_NAMES, installed_snapshot
+from backend.services.user.table_version_service import get_versions
+from backend.utils.metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows 上不支持 flock，重建不加跨进程锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MATRIX_MAGIC = b"RBACMAT1"
+MATRIX_FORMAT_VERSION = 2
+HEADER_SIZE = 64
+
+_HEADER = struct.Struct("<8sHHqdII")
+# 头部中 变更序号 与 最近确认时间 的位置，增量更新时原地改写
+_STAMP = struct.Struct("<qd")
+_STAMP_OFFSET = 12
+_CHECKED_AT = struct.Struct("<d")
+_CHECKED_AT_OFFSET = 20
+
+# 行首标志字节
+_ROW_TEMPORARY = 0x01
+
+# 一次读取的变更事件数
+_EVENT_PAGE_SIZE = 1000
+
+metrics.describe("permission_matrix_hits_total", "由共享权限矩阵直接回答的主体加载次数")
+metrics.describe("permission_matrix_misses_total", "因矩阵缺失、过期、用户超出行数或有临时分配而回退到数据库的次数")
+metrics.describe("permission_matrix_builds_total", "本进程完成的权限矩阵重建次数")
+metrics.describe("permission_matrix_patched_rows_total", "本进程按变更事件原地重写的矩阵行数")
+metrics.describe("permission_matrix_rows", "当前映射的权限矩阵行数")
+
+
+class MatrixError(ValueError):
+    """
+    矩阵文件损坏或格式版本不受支持
+    """
+
+
+@dataclass(frozen=True)
+class _Mapping:
+    buffer: mmap.mmap
+    inode: Tuple[int, int]
+    row_count: int
+    row_bytes: int
+
+
+@dataclass(frozen=True)
+class _Header:
+    sequence: int
+    checked_at: float
+    row_count: int
+    row_bytes: int
+
+
+def _read_header(data, size: int) -> _Header:
+    if size < HEADER_SIZE or len(data) < HEADER_SIZE:
+        raise MatrixError("矩阵文件不完整")
+    magic, format_version, _, sequence, checked_at, row_count, row_bytes = _HEADER.unpack_from(data)
+    if magic != MATRIX_MAGIC:
+        raise MatrixError("不是权限矩阵文件")
+    if format_version != MATRIX_FORMAT_VERSION:
+        raise MatrixError(f"不支持的矩阵格式版本: {format_version}")
+    if size < HEADER_SIZE + row_count * row_bytes:
+        raise MatrixError("矩阵文件长度与头部不一致")
+    return _Header(sequence, checked_at, row_count, row_bytes)
+
+
+def _file_identity(stat: os.stat_result) -> Tuple[int, int]:
+    return stat.st_dev, stat.st_ino
+
+
+def _is_fresh(buffer) -> bool:
+    checked_at, = _CHECKED_AT.unpack_from(buffer, _CHECKED_AT_OFFSET)
+    return time.time() - checked_at <= settings.PERMISSION_MATRIX_MAX_STALENESS_SECONDS
+
+
+class PermissionMatrix:
+    """
+    进程内的矩阵映射句柄
+
+    读操作不加锁：先取得当前映射的引用再读取，重新映射只整体替换引用。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mapping: Optional[_Mapping] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def refresh(self) -> bool:
+        """
+        文件被替换后重新映射，返回当前是否有可用的映射
+        """
+        if not self.enabled:
+            return False
+        try:
+            identity = _file_identity(os.stat(self.path))
+        except FileNotFoundError:
+            return self._mapping is not None
+        mapping = self._mapping
+        if mapping is not None and mapping.inode == identity:
+            return True
+
+        with self._lock:
+            mapping = self._mapping
+            if mapping is not None and mapping.inode == identity:
+                return True
+            try:
+                with open(self.path, "rb") as f:
+                    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    identity = _file_identity(os.fstat(f.fileno()))
+                header = _read_header(buffer, len(buffer))
+            except (OSError, ValueError) as e:
+                logger.warning("无法映射权限矩阵 %s: %s", self.path, e)
+                return mapping is not None
+            self._mapping = _Mapping(buffer, identity, header.row_count, header.row_bytes)
+            metrics.set("permission_matrix_rows", header.row_count)
+            return True
+
+    def lookup(self, user_id: int) -> Optional[FrozenSet[int]]:
+        """
+        返回用户的有效权限ID集合，不查询数据库
+
+        矩阵不可用或超过最大陈旧时间未被确认、用户超出矩阵行数或有临时角色分配时返回 None，
+        调用方应回退到有效权限表。
+        """
+        mapping = self._mapping
+        if mapping is None or not _is_fresh(mapping.buffer):
+            # 其他进程可能已经完成全量重建，检查文件是否已被替换
+            if not self.refresh() or not _is_fresh(self._mapping.buffer):
+                metrics.inc("permission_matrix_misses_total")
+                return None
+            mapping = self._mapping
+
+        if user_id < 0 or user_id >= mapping.row_count:
+            metrics.inc("permission_matrix_misses_total")
+            return None
+        offset = HEADER_SIZE + user_id * mapping.row_bytes
+        row = mapping.buffer[offset:offset + mapping.row_bytes]
+        if row[0] & _ROW_TEMPORARY:
+            metrics.inc("permission_matrix_misses_total")
+            return None
+
+        metrics.inc("permission_matrix_hits_total")
+        bits = int.from_bytes(row[1:], "little")
+        permission_ids = []
+        while bits:
+            low = bits & -bits
+            permission_ids.append(low.bit_length() - 1)
+            bits ^= low
+        return frozenset(permission_ids)
+
+
+def _encode_row(permission_ids: Iterable[int], temporary: bool, row_bytes: int) -> Optional[bytes]:
+    """
+    编码一行；权限ID超出位宽时返回 None
+    """
+    bits = 0
+    capacity = (row_bytes - 1) * 8
+    for permission_id in permission_ids:
+        if permission_id >= capacity:
+            return None
+        bits |= 1 << permission_id
+    return bytes([_ROW_TEMPORARY if temporary else 0]) + bits.to_bytes(row_bytes - 1, "little")
+
+
+def _temporary_user_ids(db: Session, user_ids: Optional[List[int]] = None) -> Set[int]:
+    """
+    有临时角色分配（含已到期尚未清理的）的用户，经只包含临时分配的部分索引读取
+    """
+    query = select(user_roles.c.user_id).where(user_roles.c.expires_at.is_not(None)).distinct()
+    if user_ids is not None:
+        query = query.where(user_roles.c.user_id.in_(user_ids))
+    return set(db.execute(query).scalars())
+
+
+def _write_matrix(path: str, sequence: int, checked_at: float, row_count: int, row_bytes: int,
+                  rows: Iterable[Tuple[int, Iterable[int]]], temporary: Set[int]) -> int:
+    """
+    将 (用户ID, 权限ID集合) 写入新文件并原子替换，返回文件字节数
+    """
+    size = HEADER_SIZE + row_count * row_bytes
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".permission-matrix-")
+    try:
+        with os.fdopen(fd, "w+b") as f:
+            # 预分配后原地写行，未出现的用户保持全零
+            f.truncate(size)
+            with mmap.mmap(f.fileno(), size) as buffer:
+                header = _HEADER.pack(
+                    MATRIX_MAGIC, MATRIX_FORMAT_VERSION, 0, sequence, checked_at, row_count, row_bytes,
+                )
+                buffer[:len(header)] = header
+                for user_id, permission_ids in rows:
+                    # 读取最大ID之后才出现的用户不写入，查询时超出行数回退到数据库
+                    if user_id >= row_count:
+                        continue
+                    offset = HEADER_SIZE + user_id * row_bytes
+                    row = _encode_row(permission_ids, user_id in temporary, row_bytes)
+                    if row is None:
+                        # 权限ID超出位宽（读取最大ID之后新建），该行回退到数据库
+                        buffer[offset] = _ROW_TEMPORARY
+                        continue
+                    buffer[offset:offset + row_bytes] = row
+                for user_id in temporary:
+                    if user_id < row_count:
+                        offset = HEADER_SIZE + user_id * row_bytes
+                        buffer[offset] |= _ROW_TEMPORARY
+                buffer.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return size
+
+
+def build_matrix(db: Session, path: str) -> int:
+    """
+    根据当前数据全量构建矩阵文件，返回矩阵的代（变更序号）
+
+    已安装的 RBAC 快照与数据库版本一致时直接由快照构建，否则从数据库读取有效权限（含用户组权限）。
+    序号在读取数据之前获取：构建期间提交的变更会在下一次刷新时再次应用，重算同一行结果相同。
+    行数与位宽都留有余量，之后新建的用户与权限可以增量写入而不必重建。
+    """
+    checked_at = time.time()
+    sequence = latest_sequence(db)
+    max_user_id = db.execute(select(User.id).order_by(User.id.desc()).limit(1)).scalar() or 0
+    max_permission_id = db.execute(
+        select(Permission.id).order_by(Permission.id.desc()).limit(1)
+    ).scalar() or 0
+    row_count = max_user_id + 1 + max(1024, max_user_id // 8)
+    # 标志字节 + 权限位，至少留出 8 个新权限ID的位置
+    row_bytes = 1 + max_permission_id // 8 + 2
+
+    snapshot = installed_snapshot()
+    if snapshot is not None and snapshot.versions == get_versions(db, SNAPSHOT_VERSION_NAMES):
+        rows = snapshot.iter_user_permissions()
+    else:
+        rows = iter_user_permission_ids(db)
+    _write_matrix(path, sequence, checked_at, row_count, row_bytes, rows, _temporary_user_ids(db))
+    metrics.inc("permission_matrix_builds_total")
+    return sequence
+
+
+def _members_of_groups(group_ids):
+    """
+    子查询：组及其全部子组的直接成员
+    """
+    return (
+        select(group_users.c.user_id)
+        .join(group_closure, group_closure.c.descendant_id == group_users.c.group_id)
+        .where(group_closure.c.ancestor_id.in_(group_ids))
+    )
+
+
+def _affected_users(db: Session, events: List[dict], row_bytes: int) -> Optional[Set[int]]:
+    """
+    变更事件影响到的用户；无法增量应用时返回 None
+    """
+    user_ids, role_ids, group_ids = set(), set(), set()
+    capacity = (row_bytes - 1) * 8
+    for event in events:
+        event_type, payload = event["event_type"], event["payload"]
+        if event_type in ("permission.deleted", "role.deleted", "group.deleted"):
+            # 级联删除先移除关联再提交删除事件，读取事件时已无法从关联表推导出受影响的用户，只能重建
+            return None
+        if event_type == "permission.created" and event["entity_id"] >= capacity:
+            return None
+        if event_type in ("user_roles.added", "user_roles.removed", "user.synced",
+                          "group_members.added", "group_members.removed"):
+            user_ids.update(payload.get("user_ids", ()))
+        elif event_type == "user.deleted":
+            user_ids.add(event["entity_id"])
+        elif event_type in ("role_permissions.added", "role_permissions.removed"):
+            role_ids.update(payload.get("role_ids", ()))
+        elif event_type in ("group_roles.added", "group_roles.removed"):
+            # 级联删除时组的成员或嵌套关系可能随后被移除，事件中附带了当时受影响的用户
+            user_ids.update(payload.get("user_ids", ()))
+            group_ids.add(payload["group_id"])
+        elif event_type in ("group_children.added", "group_children.removed"):
+            group_ids.add(payload["child_id"])
+
+    if role_ids:
+        user_ids.update(db.execute(
+            select(user_roles.c.user_id).where(user_roles.c.role_id.in_(role_ids))
+        ).scalars())
+        user_ids.update(db.execute(_members_of_groups(
+            select(group_roles.c.group_id).where(group_roles.c.role_id.in_(role_ids))
+        )).scalars())
+    if group_ids:
+        user_ids.update(db.execute(_members_of_groups(list(group_ids))).scalars())
+    return user_ids
+
+
+def _read_events_since(db: Session, since: int, until: int) -> Optional[List[dict]]:
+    """
+    读取 (since, until] 之间的事件；超过增量更新的上限时返回 None
+    """
+    events = []
+    while since < until:
+        page = [event for event in read_events(db, since, _EVENT_PAGE_SIZE) if event["id"] <= until]
+        if not page:
+            break
+        events.extend(page)
+        if len(events) > settings.PERMISSION_MATRIX_PATCH_MAX_EVENTS:
+            return None
+        since = page[-1]["id"]
+    return events
+
+
+def patch_matrix(db: Session, path: str, header: _Header, checked_at: float) -> bool:
+    """
+    将矩阵文件增量更新到数据库当前的变更序号，无法增量更新时返回 False
+
+    受影响用户的行按当前数据重算后原地写入，最后写入新的序号与确认时间。
+    """
+    until = latest_sequence(db)
+    if needs_reset(db, header.sequence):
+        return False
+    events = _read_events_since(db, header.sequence, until)
+    if events is None:
+        return False
+    user_ids = _affected_users(db, events, header.row_bytes)
+    if user_ids is None or len(user_ids) > settings.PERMISSION_MATRIX_PATCH_MAX_USERS:
+        return False
+    if any(user_id >= header.row_count for user_id in user_ids):
+        return False
+
+    user_ids = sorted(user_ids)
+    rows = []
+    if user_ids:
+        permissions = dict(iter_user_permission_ids(db, user_ids=user_ids))
+        temporary = _temporary_user_ids(db, user_ids)
+        for user_id in user_ids:
+            row = _encode_row(permissions.get(user_id, ()), user_id in temporary, header.row_bytes)
+            if row is None:
+                return False
+            rows.append((user_id, row))
+
+    with open(path, "r+b") as f:
+        with mmap.mmap(f.fileno(), 0) as buffer:
+            for user_id, row in rows:
+                offset = HEADER_SIZE + user_id * header.row_bytes
+                buffer[offset:offset + header.row_bytes] = row
+            _STAMP.pack_into(buffer, _STAMP_OFFSET, until, checked_at)
+            buffer.flush()
+    metrics.inc("permission_matrix_patched_rows_total", len(rows))
+    return True
+
+
+def _read_file_header(path: str) -> Optional[_Header]:
+    try:
+        with open(path, "rb") as f:
+            return _read_header(f.read(HEADER_SIZE), os.fstat(f.fileno()).st_size)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_matrix(db: Session, path: str) -> bool:
+    """
+    将矩阵文件更新到数据库当前的变更序号并刷新确认时间，返回是否执行了全量重建
+
+    多个工作进程通过 flock 互斥：拿不到锁说明其他进程正在更新，直接跳过。
+    """
+    with open(path + ".lock", "a") as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+        try:
+            # 确认时间取读取数据库之前的时刻，矩阵至少与该时刻一样新
+            checked_at = time.time()
+            header = _read_file_header(path)
+            if header is not None and patch_matrix(db, path, header, checked_at):
+                return False
+            build_matrix(db, path)
+            return True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class PermissionMatrixRefresher:
+    """
+    定期将矩阵增量更新到最新的变更序号或全量重建（同一时刻只有一个进程更新），并重新映射
+    """
+
+    def __init__(self, matrix: PermissionMatrix, session_factory: sessionmaker = SessionLocal,
+                 interval: Optional[float] = None):
+        self.matrix = matrix
+        self.session_factory = session_factory
+        self.interval = interval or settings.PERMISSION_MATRIX_REFRESH_SECONDS
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self.matrix.enabled:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def refresh_once(self) -> None:
+        db = self.session_factory()
+        try:
+            ensure_matrix(db, self.matrix.path)
+        finally:
+            db.close()
+        self.matrix.refresh()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await run_in_threadpool(self.refresh_once)
+            except Exception:
+                logger.exception("刷新权限矩阵失败")
+            await asyncio.sleep(self.interval)
+
+
+permission_matrix = PermissionMatrix(settings.PERMISSION_MATRIX_PATH)
+permission_matrix_refresher = PermissionMatrixRefresher(permission_matrix)
@@ -2,24 +2,51 @@
 权限相关操作的服务层
 """
 
+from sqlalchemy import exists, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from backend.database.user_models import Permission
+from backend.database.dialects import insert_returning
+from backend.database.session_utils import attach_detached
+from backend.database.user_models import User, Permission
+from backend.database.version_models import PERMISSIONS_VERSION
 from backend.schemas.user import PermissionCreate, PermissionUpdate
-from typing import List, Optional
+from backend.services.user.cascade_service import delete_permission_cascade
+from backend.services.user.effective_permission_service import get_holder_ids, count_holders
+from backend.services.user.outbox_service import record_change
+from backend.services.user.permission_catalog import permission_catalog, attach_permission
+from backend.services.user.table_version_service import bump_versions
+from typing import Iterator, List, Optional
 
 
 def get_permission_by_id(db: Session, permission_id: int) -> Optional[Permission]:
     """
-    根据ID获取权限
+    根据ID获取权限，优先从权限目录读取
     """
-    return db.query(Permission).filter(Permission.id == permission_id).first()
+    permission_catalog.ensure_fresh(db)
+    entry = permission_catalog.get(permission_id)
+    if entry is not None:
+        return attach_permission(db, entry)
+    
+    # 目录未命中时回退到数据库，以感知其他进程刚创建的权限
+    db_permission = db.query(Permission).filter(Permission.id == permission_id).first()
+    if db_permission:
+        permission_catalog.upsert(db_permission)
+    return db_permission
 
 
 def get_permission_by_name(db: Session, name: str) -> Optional[Permission]:
     """
-    根据名称获取权限
+    根据名称获取权限，优先从权限目录读取
     """
-    return db.query(Permission).filter(Permission.name == name).first()
+    permission_catalog.ensure_fresh(db)
+    entry = permission_catalog.get_by_name(name)
+    if entry is not None:
+        return attach_permission(db, entry)
+    
+    db_permission = db.query(Permission).filter(Permission.name == name).first()
+    if db_permission:
+        permission_catalog.upsert(db_permission)
+    return db_permission
 
 
 def get_permissions(db: Session, skip: int = 0, limit: int = 100) -> List[Permission]:
@@ -29,22 +56,41 @@ def get_permissions(db: Session, skip: int = 0, limit: int = 100) -> List[Permis
     return db.query(Permission).offset(skip).limit(limit).all()
 
 
+def iter_permissions(db: Session, skip: int = 0, limit: Optional[int] = None,
+                     batch_size: int = 1000) -> Iterator[Permission]:
+    """
+    按ID顺序逐批流式读取权限，limit 为空时不限制数量
+    """
+    query = select(Permission).order_by(Permission.id).offset(skip)
+    if limit:
+        query = query.limit(limit)
+    yield from db.execute(query.execution_options(yield_per=batch_size)).scalars()
+
+
 def create_permission(db: Session, permission_data: PermissionCreate) -> Permission:
     """
     创建新权限
+
+    目录命中时直接拒绝；否则由 INSERT ... ON CONFLICT DO NOTHING RETURNING
+    在同一条语句中完成唯一性检查与插入。
     """
-    # 检查权限名称是否已存在
-    existing_permission = db.query(Permission).filter(Permission.name == permission_data.name).first()
-    if existing_permission:
+    permission_catalog.ensure_fresh(db)
+    if permission_catalog.get_id(permission_data.name) is not None:
         raise ValueError("权限名称已存在")
     
-    db_permission = Permission(
-        name=permission_data.name,
-        description=permission_data.description
-    )
-    db.add(db_permission)
+    row = insert_returning(db, Permission.__table__, {
+        "name": permission_data.name,
+        "description": permission_data.description,
+    })
+    if row is None:
+        db.rollback()
+        raise ValueError("权限名称已存在")
+    
+    record_change(db, "permission.created", row["id"], name=row["name"])
+    bump_versions(db, PERMISSIONS_VERSION)
     db.commit()
-    db.refresh(db_permission)
+    db_permission = attach_detached(db, Permission, dict(row), roles=[])
+    permission_catalog.upsert(db_permission)
     return db_permission
 
 
@@ -52,14 +98,15 @@ def update_permission(db: Session, permission_id: int, permission_update: Permis
     """
     更新权限
     """
-    db_permission = db.query(Permission).filter(Permission.id == permission_id).first()
+    # 从数据库重新读取：会话中可能挂着由权限目录构造、未经数据库确认的实例
+    db_permission = db.query(Permission).filter(Permission.id == permission_id).populate_existing().first()
     if not db_permission:
         return None
     
     # 检查新名称是否与现有权限冲突
     if permission_update.name and permission_update.name != db_permission.name:
-        existing_permission = db.query(Permission).filter(Permission.name == permission_update.name).first()
-        if existing_permission:
+        permission_catalog.ensure_fresh(db)
+        if permission_catalog.get_id(permission_update.name) is not None:
             raise ValueError("权限名称已存在")
     
     # 更新字段
@@ -68,19 +115,45 @@ def update_permission(db: Session, permission_id: int, permission_update: Permis
     if permission_update.description is not None:
         db_permission.description = permission_update.description
     
-    db.commit()
+    try:
+        db.flush()
+        record_change(db, "permission.updated", permission_id, name=db_permission.name)
+        bump_versions(db, PERMISSIONS_VERSION)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise ValueError("权限名称已存在")
     db.refresh(db_permission)
+    permission_catalog.upsert(db_permission)
     return db_permission
 
 
 def delete_permission(db: Session, permission_id: int) -> bool:
     """
-    删除权限
+    删除权限，角色关联与日志引用按批次直接处理，不加载关联集合
     """
-    db_permission = db.query(Permission).filter(Permission.id == permission_id).first()
-    if not db_permission:
+    if not db.execute(select(exists().where(Permission.id == permission_id))).scalar():
         return False
     
-    db.delete(db_permission)
-    db.commit()
-    return True
\ No newline at end of file
+    delete_permission_cascade(db, permission_id)
+    permission_catalog.remove(permission_id)
+    return True
+
+
+def get_permission_holders(db: Session, permission_id: int, after_id: int = 0, limit: int = 100) -> List[User]:
+    """
+    按用户ID游标分页获取持有某权限的用户
+    """
+    holder_ids = get_holder_ids(db, permission_id, after_id, limit)
+    if not holder_ids:
+        return []
+    return db.execute(
+        select(User).where(User.id.in_(holder_ids)).order_by(User.id)
+    ).scalars().all()
+
+
+def count_permission_holders(db: Session, permission_id: int) -> int:
+    """
+    统计持有某权限的用户数量，只扫描有效权限表的反向索引
+    """
+    return count_holders(db, permission_id)
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+认证主体加载的服务层
+
+同一用户的并发请求合并为一次数据库读取：读取用户列值与有效权限ID，
+每个请求再将结果挂到自己的会话上（不产生额外的 SELECT）。
+启用共享权限矩阵且矩阵在最大陈旧时间内被确认过时，有效权限ID直接从矩阵读取，不再查询数据库；
+有临时角色分配的用户在矩阵中带有标志，始终按到期时间过滤读取。
+"""
+
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.database.session_utils import attach_detached
+from backend.database.user_models import User
+from backend.services.user.effective_permission_service import get_permission_ids
+from backend.services.user.permission_matrix import permission_matrix
+from backend.utils.singleflight import SingleFlight
+
+principal_flight = SingleFlight("principal")
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    用户列值与有效权限ID的只读快照，可在请求之间安全共享
+    """
+    values: dict
+    permission_ids: FrozenSet[int]
+
+
+def _fetch_principal(db: Session, user_id: Optional[int], username: str) -> Optional[Principal]:
+    condition = User.id == user_id if user_id is not None else User.username == username
+    row = db.execute(select(User.__table__).where(condition)).mappings().first()
+    if row is None:
+        return None
+
+    permission_ids = None
+    if permission_matrix.enabled:
+        permission_ids = permission_matrix.lookup(row["id"])
+    if permission_ids is None:
+        permission_ids = frozenset(get_permission_ids(db, row["id"]))
+    return Principal(values=dict(row), permission_ids=permission_ids)
+
+
+def load_principal(db: Session, user_id: Optional[int], username: str) -> Optional[User]:
+    """
+    加载令牌对应的用户，并将其有效权限ID记录在 effective_permission_ids 上
+
+    并发加载同一用户时共享同一次读取；令牌中的用户名与数据库不一致时视为用户不存在。
+    """
+    key = user_id if user_id is not None else ("username", username)
+    principal = principal_flight.do(key, lambda: _fetch_principal(db, user_id, username))
+    if principal is None or principal.values["username"] != username:
+        return None
+
+    user = attach_detached(db, User, principal.values)
+    user.effective_permission_ids = principal.permission_ids
+    return user
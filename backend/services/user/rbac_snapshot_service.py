@@ -0,0 +1,364 @@
+"""
+RBAC 快照的服务层
+
+将角色、权限、角色授权、用户成员关系与用户组导出为紧凑的二进制快照。
+新进程启动时快照与数据库版本一致则用于加载权限目录，并供共享权限矩阵的全量构建代替数据库读取；
+授权检查不直接读取快照。三个版本覆盖了快照中的全部内容（USERS_VERSION 只随成员关系与用户组变化），
+版本一致即内容一致；临时分配的到期不递增版本，矩阵对有临时分配的用户始终回退到数据库。
+
+文件格式（小端序）:
+    头部  magic(8s) 格式版本(H) 保留(H) users/roles/permissions 数据版本(3q) 导出时间(d)
+          压缩后载荷长度(I) 载荷 sha256(32s)
+    载荷  zlib 压缩的若干分段，每段为 长度(I) + 内容；
+          整数列使用 array('i') 按列存储，字符串列为 长度数组 + UTF-8 拼接内容。
+"""
+
+import array
+import hashlib
+import logging
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.database.group_models import Group, group_users, group_roles, group_closure
+from backend.database.user_models import Role, Permission, user_roles, role_permissions
+from backend.database.version_models import USERS_VERSION, ROLES_VERSION, PERMISSIONS_VERSION
+from backend.services.user.effective_permission_service import active_membership
+from backend.services.user.permission_catalog import PermissionEntry, permission_catalog
+from backend.services.user.table_version_service import get_versions
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"RBACSNP1"
+SNAPSHOT_FORMAT_VERSION = 2
+SNAPSHOT_VERSION_NAMES = (USERS_VERSION, ROLES_VERSION, PERMISSIONS_VERSION)
+
+_HEADER = struct.Struct("<8sHH3qdI32s")
+_SECTION = struct.Struct("<I")
+# 字符串列中表示 NULL 的长度
+_NULL_LENGTH = 0xFFFFFFFF
+
+
+class SnapshotError(ValueError):
+    """
+    快照文件损坏、校验失败或格式版本不受支持
+    """
+
+
+def _int_array(values=()) -> array.array:
+    # 主键为 32 位整数
+    return array.array("i", values)
+
+
+@dataclass
+class RbacSnapshot:
+    versions: Dict[str, int]
+    created_at: float
+    permission_ids: array.array = field(default_factory=_int_array)
+    permission_names: List[str] = field(default_factory=list)
+    permission_descriptions: List[Optional[str]] = field(default_factory=list)
+    permission_created_at: List[Optional[str]] = field(default_factory=list)
+    permission_updated_at: List[Optional[str]] = field(default_factory=list)
+    role_ids: array.array = field(default_factory=_int_array)
+    role_names: List[str] = field(default_factory=list)
+    grant_role_ids: array.array = field(default_factory=_int_array)
+    grant_permission_ids: array.array = field(default_factory=_int_array)
+    member_user_ids: array.array = field(default_factory=_int_array)
+    member_role_ids: array.array = field(default_factory=_int_array)
+    group_ids: array.array = field(default_factory=_int_array)
+    group_names: List[str] = field(default_factory=list)
+    group_member_group_ids: array.array = field(default_factory=_int_array)
+    group_member_user_ids: array.array = field(default_factory=_int_array)
+    group_role_group_ids: array.array = field(default_factory=_int_array)
+    group_role_role_ids: array.array = field(default_factory=_int_array)
+    closure_ancestor_ids: array.array = field(default_factory=_int_array)
+    closure_descendant_ids: array.array = field(default_factory=_int_array)
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "permissions": len(self.permission_ids),
+            "roles": len(self.role_ids),
+            "grants": len(self.grant_role_ids),
+            "memberships": len(self.member_user_ids),
+            "groups": len(self.group_ids),
+            "group_memberships": len(self.group_member_user_ids),
+        }
+
+    def permission_entries(self) -> List[PermissionEntry]:
+        """
+        快照中的权限，可直接用于预热权限目录
+        """
+        return [
+            PermissionEntry(
+                id=permission_id,
+                name=sys.intern(name),
+                description=description,
+                created_at=_parse_time(created_at),
+                updated_at=_parse_time(updated_at),
+            )
+            for permission_id, name, description, created_at, updated_at in zip(
+                self.permission_ids, self.permission_names, self.permission_descriptions,
+                self.permission_created_at, self.permission_updated_at,
+            )
+        ]
+
+    def iter_user_permissions(self) -> Iterator[Tuple[int, Set[int]]]:
+        """
+        按用户ID顺序产出 (用户ID, 有效权限ID集合)，包含直接角色与用户组（经闭包展开）获得的权限
+        """
+        permissions_by_role: Dict[int, List[int]] = {}
+        for role_id, permission_id in zip(self.grant_role_ids, self.grant_permission_ids):
+            permissions_by_role.setdefault(role_id, []).append(permission_id)
+
+        # 每个组（含其全部祖先组）授予的权限
+        roles_by_group: Dict[int, List[int]] = {}
+        for group_id, role_id in zip(self.group_role_group_ids, self.group_role_role_ids):
+            roles_by_group.setdefault(group_id, []).append(role_id)
+        permissions_by_group: Dict[int, Set[int]] = {}
+        for ancestor_id, descendant_id in zip(self.closure_ancestor_ids, self.closure_descendant_ids):
+            for role_id in roles_by_group.get(ancestor_id, ()):
+                permissions_by_group.setdefault(descendant_id, set()).update(permissions_by_role.get(role_id, ()))
+
+        permissions: Dict[int, Set[int]] = {}
+        for user_id, role_id in zip(self.member_user_ids, self.member_role_ids):
+            permissions.setdefault(user_id, set()).update(permissions_by_role.get(role_id, ()))
+        for group_id, user_id in zip(self.group_member_group_ids, self.group_member_user_ids):
+            if group_id in permissions_by_group:
+                permissions.setdefault(user_id, set()).update(permissions_by_group[group_id])
+        for user_id in sorted(permissions):
+            yield user_id, permissions[user_id]
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _format_time(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def export_snapshot(db: Session) -> RbacSnapshot:
+    """
+    在一个事务中读取完整的 RBAC 图
+
+    数据版本在读取数据之前获取：导出期间发生的写入只会使快照显得更旧，而不会被误认为最新。
+    """
+    snapshot = RbacSnapshot(versions=get_versions(db, SNAPSHOT_VERSION_NAMES), created_at=time.time())
+    for row in db.execute(
+        select(Permission.id, Permission.name, Permission.description, Permission.created_at, Permission.updated_at)
+        .order_by(Permission.id)
+    ):
+        snapshot.permission_ids.append(row.id)
+        snapshot.permission_names.append(row.name)
+        snapshot.permission_descriptions.append(row.description)
+        snapshot.permission_created_at.append(_format_time(row.created_at))
+        snapshot.permission_updated_at.append(_format_time(row.updated_at))
+    for role_id, name in db.execute(select(Role.id, Role.name).order_by(Role.id)):
+        snapshot.role_ids.append(role_id)
+        snapshot.role_names.append(name)
+    for role_id, permission_id in db.execute(
+        select(role_permissions.c.role_id, role_permissions.c.permission_id)
+        .order_by(role_permissions.c.role_id, role_permissions.c.permission_id)
+        .execution_options(yield_per=10000)
+    ):
+        snapshot.grant_role_ids.append(role_id)
+        snapshot.grant_permission_ids.append(permission_id)
+    for user_id, role_id in db.execute(
+        select(user_roles.c.user_id, user_roles.c.role_id)
+        .where(active_membership())
+        .order_by(user_roles.c.user_id, user_roles.c.role_id)
+        .execution_options(yield_per=10000)
+    ):
+        snapshot.member_user_ids.append(user_id)
+        snapshot.member_role_ids.append(role_id)
+    for group_id, name in db.execute(select(Group.id, Group.name).order_by(Group.id)):
+        snapshot.group_ids.append(group_id)
+        snapshot.group_names.append(name)
+    for group_id, user_id in db.execute(
+        select(group_users.c.group_id, group_users.c.user_id)
+        .order_by(group_users.c.group_id, group_users.c.user_id)
+        .execution_options(yield_per=10000)
+    ):
+        snapshot.group_member_group_ids.append(group_id)
+        snapshot.group_member_user_ids.append(user_id)
+    for group_id, role_id in db.execute(
+        select(group_roles.c.group_id, group_roles.c.role_id).order_by(group_roles.c.group_id, group_roles.c.role_id)
+    ):
+        snapshot.group_role_group_ids.append(group_id)
+        snapshot.group_role_role_ids.append(role_id)
+    for ancestor_id, descendant_id in db.execute(
+        select(group_closure.c.ancestor_id, group_closure.c.descendant_id)
+        .order_by(group_closure.c.ancestor_id, group_closure.c.descendant_id)
+        .execution_options(yield_per=10000)
+    ):
+        snapshot.closure_ancestor_ids.append(ancestor_id)
+        snapshot.closure_descendant_ids.append(descendant_id)
+    return snapshot
+
+
+def _pack_ints(values: array.array) -> bytes:
+    if sys.byteorder == "big":
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack_ints(data: bytes) -> array.array:
+    values = _int_array()
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _pack_strings(values: List[Optional[str]]) -> bytes:
+    encoded = [None if value is None else value.encode() for value in values]
+    lengths = [_NULL_LENGTH if item is None else len(item) for item in encoded]
+    return (
+        _SECTION.pack(len(values))
+        + struct.pack(f"<{len(lengths)}I", *lengths)
+        + b"".join(item for item in encoded if item)
+    )
+
+
+def _unpack_strings(data: bytes) -> List[Optional[str]]:
+    (count,) = _SECTION.unpack_from(data)
+    lengths = struct.unpack_from(f"<{count}I", data, _SECTION.size)
+    values, offset = [], _SECTION.size + count * 4
+    for length in lengths:
+        if length == _NULL_LENGTH:
+            values.append(None)
+            continue
+        values.append(data[offset:offset + length].decode())
+        offset += length
+    return values
+
+
+_INT_SECTIONS = ("permission_ids", "role_ids", "grant_role_ids", "grant_permission_ids",
+                 "member_user_ids", "member_role_ids", "group_ids", "group_member_group_ids",
+                 "group_member_user_ids", "group_role_group_ids", "group_role_role_ids",
+                 "closure_ancestor_ids", "closure_descendant_ids")
+_STRING_SECTIONS = ("permission_names", "permission_descriptions", "permission_created_at",
+                    "permission_updated_at", "role_names", "group_names")
+
+
+def dumps(snapshot: RbacSnapshot) -> bytes:
+    """
+    将快照序列化为二进制
+    """
+    sections = [_pack_ints(getattr(snapshot, name)) for name in _INT_SECTIONS]
+    sections += [_pack_strings(getattr(snapshot, name)) for name in _STRING_SECTIONS]
+    payload = zlib.compress(b"".join(_SECTION.pack(len(section)) + section for section in sections), 6)
+    header = _HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, 0,
+        *(snapshot.versions.get(name, 0) for name in SNAPSHOT_VERSION_NAMES),
+        snapshot.created_at, len(payload), hashlib.sha256(payload).digest(),
+    )
+    return header + payload
+
+
+def loads(data: bytes) -> RbacSnapshot:
+    """
+    解析并校验二进制快照
+    """
+    if len(data) < _HEADER.size:
+        raise SnapshotError("快照文件不完整")
+    magic, format_version, _, *versions, created_at, length, digest = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("不是 RBAC 快照文件")
+    if format_version != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f"不支持的快照格式版本: {format_version}")
+    payload = data[_HEADER.size:_HEADER.size + length]
+    if len(payload) != length or hashlib.sha256(payload).digest() != digest:
+        raise SnapshotError("快照校验和不匹配")
+
+    raw = zlib.decompress(payload)
+    sections, offset = [], 0
+    while offset < len(raw):
+        (size,) = _SECTION.unpack_from(raw, offset)
+        offset += _SECTION.size
+        sections.append(raw[offset:offset + size])
+        offset += size
+    if len(sections) != len(_INT_SECTIONS) + len(_STRING_SECTIONS):
+        raise SnapshotError("快照分段数量不正确")
+
+    snapshot = RbacSnapshot(versions=dict(zip(SNAPSHOT_VERSION_NAMES, versions)), created_at=created_at)
+    for name, section in zip(_INT_SECTIONS, sections):
+        setattr(snapshot, name, _unpack_ints(section))
+    for name, section in zip(_STRING_SECTIONS, sections[len(_INT_SECTIONS):]):
+        setattr(snapshot, name, _unpack_strings(section))
+    return snapshot
+
+
+def write_snapshot(path: str, snapshot: RbacSnapshot) -> int:
+    """
+    原子地写入快照文件（先写临时文件再重命名），返回写入的字节数
+    """
+    data = dumps(snapshot)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".rbac-snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(data)
+
+
+def read_snapshot(path: str) -> RbacSnapshot:
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def is_current(db: Session, snapshot: RbacSnapshot) -> bool:
+    """
+    快照的数据版本与数据库当前版本一致时可以直接使用
+    """
+    return get_versions(db, SNAPSHOT_VERSION_NAMES) == snapshot.versions
+
+
+_installed: Optional[RbacSnapshot] = None
+
+
+def installed_snapshot() -> Optional[RbacSnapshot]:
+    """
+    启动时成功加载的快照
+    """
+    return _installed
+
+
+def warm_from_snapshot(db: Session, path: str) -> Optional[RbacSnapshot]:
+    """
+    读取快照并预热进程内的权限目录
+
+    文件缺失、损坏或数据版本已落后于数据库时返回 None，调用方应回退到从数据库加载。
+    """
+    global _installed
+    try:
+        snapshot = read_snapshot(path)
+    except FileNotFoundError:
+        logger.info("RBAC 快照 %s 不存在", path)
+        return None
+    except (OSError, SnapshotError) as e:
+        logger.warning("无法读取 RBAC 快照 %s: %s", path, e)
+        return None
+    if not is_current(db, snapshot):
+        logger.info("RBAC 快照 %s 已过期", path)
+        return None
+
+    permission_catalog.replace(snapshot.permission_entries(), snapshot.versions[PERMISSIONS_VERSION])
+    _installed = snapshot
+    return snapshot
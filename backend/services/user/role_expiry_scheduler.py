@@ -0,0 +1,136 @@
+"""
+临时角色分配的进程内到期调度器
+
+调度器维护到期时间的最小堆，在最早的到期时间到达时唤醒，分批删除已到期的分配并递增用户版本，
+权限矩阵、RBAC 快照与 HTTP 缓存因此在到期时刻失效，无需周期性地扫描整张表。
+堆中的时间来自本进程的分配（schedule），以及对 expires_at 部分索引的最小值探测：
+每次清理之后与每隔 ROLE_EXPIRY_REFRESH_SECONDS 探测一次，以获知其他进程写入的分配。
+
+有效权限的读取本身按到期时间过滤，调度器晚于到期时间运行也不会延长授权。
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Set
+
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from backend.config import settings
+from backend.database import SessionLocal
+from backend.services.user.user_service import expire_role_assignments, next_role_expiry
+from backend.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("role_expiry_removed_total", "到期后被删除的临时角色分配数")
+
+
+class RoleExpiryScheduler:
+    def __init__(self, session_factory: sessionmaker = SessionLocal, batch_size: Optional[int] = None,
+                 refresh_interval: Optional[float] = None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.ROLE_EXPIRY_BATCH_SIZE
+        self.refresh_interval = refresh_interval or settings.ROLE_EXPIRY_REFRESH_SECONDS
+        self._heap: List[datetime] = []
+        self._scheduled: Set[datetime] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._loop = None
+
+    def schedule(self, expires_at: datetime) -> None:
+        """
+        登记一个到期时间，可在任意线程中调用；调度器未启动时忽略
+        """
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._push, expires_at)
+
+    def _push(self, expires_at: datetime) -> None:
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at in self._scheduled:
+            return
+        self._scheduled.add(expires_at)
+        heapq.heappush(self._heap, expires_at)
+        if self._heap[0] == expires_at and self._wakeup is not None:
+            # 新的到期时间早于原来最早的一个，重新计算等待时间
+            self._wakeup.set()
+
+    def _pop_due(self, now: datetime) -> bool:
+        due = False
+        while self._heap and self._heap[0] <= now:
+            self._scheduled.discard(heapq.heappop(self._heap))
+            due = True
+        return due
+
+    def _probe(self) -> Optional[datetime]:
+        db = self.session_factory()
+        try:
+            return next_role_expiry(db)
+        finally:
+            db.close()
+
+    def _sweep(self) -> int:
+        """
+        分批删除全部已到期的分配，每批一个事务
+        """
+        db = self.session_factory()
+        try:
+            total = 0
+            while True:
+                removed = expire_role_assignments(db, self.batch_size)
+                total += removed
+                if removed < self.batch_size:
+                    return total
+        finally:
+            db.close()
+
+    async def _run(self) -> None:
+        next_probe = 0.0
+        while True:
+            if time.monotonic() >= next_probe:
+                try:
+                    expires_at = await run_in_threadpool(self._probe)
+                except Exception:
+                    logger.exception("读取临时角色分配的到期时间失败")
+                    expires_at = None
+                if expires_at is not None:
+                    self._push(expires_at)
+                next_probe = time.monotonic() + self.refresh_interval
+
+            if self._pop_due(datetime.now(timezone.utc)):
+                try:
+                    metrics.inc("role_expiry_removed_total", await run_in_threadpool(self._sweep))
+                    # 清理后立即探测下一个到期时间
+                    next_probe = 0.0
+                except Exception:
+                    logger.exception("清理到期的临时角色分配失败")
+                continue
+
+            timeout = next_probe - time.monotonic()
+            if self._heap:
+                timeout = min(timeout, (self._heap[0] - datetime.now(timezone.utc)).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+role_expiry_scheduler = RoleExpiryScheduler()
@@ -2,10 +2,20 @@
 角色相关操作的服务层
 """
 
-from sqlalchemy.orm import Session
-from backend.database.user_models import Role, Permission
-from backend.schemas.user import RoleCreate, RoleUpdate
-from typing import List, Optional
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import Session, selectinload
+from backend.database.dialects import insert_returning, insert_ignore_from_select, replace_association_set
+from backend.database.session_utils import attach_detached
+from backend.database.user_models import User, Role, Permission, user_roles, role_permissions
+from backend.database.version_models import ROLES_VERSION
+from backend.schemas.user import RoleCreate, RoleUpdate, MembershipChange
+from backend.services.user.cascade_service import delete_role_cascade
+from backend.services.user.effective_permission_service import (
+    lock_grants, on_role_permissions_added, on_role_permissions_removed
+)
+from backend.services.user.outbox_service import record_change
+from backend.services.user.table_version_service import bump_versions
+from typing import Iterator, List, Optional
 
 
 def get_role_by_id(db: Session, role_id: int) -> Optional[Role]:
@@ -26,23 +36,31 @@ def get_roles(db: Session, skip: int = 0, limit: int = 100) -> List[Role]:
     """
     return db.query(Role).offset(skip).limit(limit).all()
 
+def iter_roles(db: Session, skip: int = 0, limit: Optional[int] = None, batch_size: int = 1000) -> Iterator[Role]:
+    """
+    按ID顺序逐批流式读取角色及其权限，limit 为空时不限制数量
+    """
+    query = select(Role).options(selectinload(Role.permissions)).order_by(Role.id).offset(skip)
+    if limit:
+        query = query.limit(limit)
+    yield from db.execute(query.execution_options(yield_per=batch_size)).scalars()
+
 def create_role(db: Session, role_data: RoleCreate) -> Role:
     """
-    创建新角色
+    创建新角色，名称冲突由 INSERT ... ON CONFLICT 在同一条语句中检测
     """
-    # 检查角色名称是否已存在
-    existing_role = db.query(Role).filter(Role.name == role_data.name).first()
-    if existing_role:
+    row = insert_returning(db, Role.__table__, {
+        "name": role_data.name,
+        "description": role_data.description,
+    })
+    if row is None:
+        db.rollback()
         raise ValueError("角色名称已存在")
     
-    db_role = Role(
-        name=role_data.name,
-        description=role_data.description
-    )
-    db.add(db_role)
+    record_change(db, "role.created", row["id"], name=row["name"])
+    bump_versions(db, ROLES_VERSION)
     db.commit()
-    db.refresh(db_role)
-    return db_role
+    return attach_detached(db, Role, dict(row), users=[], permissions=[])
 
 def update_role(db: Session, role_id: int, role_update: RoleUpdate) -> Optional[Role]:
     """
@@ -64,50 +82,119 @@ def update_role(db: Session, role_id: int, role_update: RoleUpdate) -> Optional[
     if role_update.description is not None:
         db_role.description = role_update.description
     
+    # 用户详情中的角色名称按 ROLES_VERSION 失效
+    record_change(db, "role.updated", role_id, name=db_role.name)
+    bump_versions(db, ROLES_VERSION)
     db.commit()
     db.refresh(db_role)
     return db_role
 
 def delete_role(db: Session, role_id: int) -> bool:
     """
-    删除角色
+    删除角色，成员与权限关联按批次直接删除，不加载关联集合
     """
-    db_role = db.query(Role).filter(Role.id == role_id).first()
-    if not db_role:
+    if not db.execute(select(exists().where(Role.id == role_id))).scalar():
         return False
     
-    db.delete(db_role)
-    db.commit()
+    delete_role_cascade(db, role_id)
     return True
 
 def add_permission_to_role(db: Session, role_id: int, permission_id: int) -> bool:
     """
     为角色添加权限
+
+    角色与权限的存在性检查和关联插入在同一条语句中完成，不加载任何集合。
     """
-    role = db.query(Role).filter(Role.id == role_id).first()
-    permission = db.query(Permission).filter(Permission.id == permission_id).first()
-    
-    if not role or not permission:
-        return False
-    
-    if permission not in role.permissions:
-        role.permissions.append(permission)
+    lock_grants(db, [role_id], [permission_id])
+    inserted = insert_ignore_from_select(
+        db, role_permissions, {"role_id": role_id, "permission_id": permission_id},
+        exists().where(Role.id == role_id),
+        exists().where(Permission.id == permission_id),
+    )
+    if inserted:
+        on_role_permissions_added(db, role_id, [permission_id])
+        record_change(db, "role_permissions.added", role_id, role_ids=[role_id], permission_ids=[permission_id])
+        bump_versions(db, ROLES_VERSION)
         db.commit()
+        return True
     
-    return True
+    # 未插入：要么关联已存在，要么角色或权限不存在
+    db.rollback()
+    return db.execute(
+        select(exists().where(
+            role_permissions.c.role_id == role_id,
+            role_permissions.c.permission_id == permission_id,
+        ))
+    ).scalar()
 
 def remove_permission_from_role(db: Session, role_id: int, permission_id: int) -> bool:
     """
     从角色移除权限
     """
     role = db.query(Role).filter(Role.id == role_id).first()
-    permission = db.query(Permission).filter(Permission.id == permission_id).first()
+    permission = db.query(Permission).filter(Permission.id == permission_id).populate_existing().first()
     
     if not role or not permission:
         return False
     
     if permission in role.permissions:
+        lock_grants(db, [role_id], [permission_id])
         role.permissions.remove(permission)
+        db.flush()
+        on_role_permissions_removed(db, role_id, [permission_id])
+        record_change(db, "role_permissions.removed", role_id, role_ids=[role_id], permission_ids=[permission_id])
+        bump_versions(db, ROLES_VERSION)
         db.commit()
     
-    return True
\ No newline at end of file
+    return True
+
+def replace_role_permissions(db: Session, role_id: int, permission_ids: List[int]) -> Optional[MembershipChange]:
+    """
+    以集合语义替换角色的权限
+
+    角色不存在时返回 None；包含不存在的权限时抛出 ValueError。
+    """
+    if not db.execute(select(exists().where(Role.id == role_id))).scalar():
+        return None
+    
+    desired = set(permission_ids)
+    found = set(db.execute(select(Permission.id).where(Permission.id.in_(desired))).scalars()) if desired else set()
+    unknown = desired - found
+    if unknown:
+        raise ValueError(f"权限不存在: {', '.join(str(i) for i in sorted(unknown))}")
+    
+    added, removed = replace_association_set(
+        db, role_permissions, "role_id", role_id, "permission_id", Permission.id, desired
+    )
+    # 新增与移除的权限一次加锁，保持加锁顺序一致
+    lock_grants(db, [role_id], added + removed)
+    on_role_permissions_removed(db, role_id, removed)
+    on_role_permissions_added(db, role_id, added)
+    if added:
+        record_change(db, "role_permissions.added", role_id, role_ids=[role_id], permission_ids=added)
+    if removed:
+        record_change(db, "role_permissions.removed", role_id, role_ids=[role_id], permission_ids=removed)
+    if added or removed:
+        bump_versions(db, ROLES_VERSION)
+    db.commit()
+    return MembershipChange(added=added, removed=removed)
+
+def get_role_members(db: Session, role_id: int, after_id: int = 0, limit: int = 100) -> List[User]:
+    """
+    按用户ID游标分页获取角色成员，沿 user_roles(role_id, user_id) 索引顺序读取
+    """
+    return db.execute(
+        select(User)
+        .join(user_roles, user_roles.c.user_id == User.id)
+        .where(user_roles.c.role_id == role_id, user_roles.c.user_id > after_id)
+        .order_by(user_roles.c.user_id)
+        .limit(limit)
+    ).scalars().all()
+
+def count_role_members(db: Session, role_id: int) -> int:
+    """
+    统计角色成员数量，只访问 user_roles 索引
+    """
+    return db.execute(
+        select(func.count()).select_from(user_roles).where(user_roles.c.role_id == role_id)
+    ).scalar()
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""
+服务账户与 API 密钥的服务层
+
+API 密钥为高熵随机串，数据库只保存其 HMAC-SHA256 摘要（唯一索引）。
+认证时计算摘要后做一次索引查找并以常量时间比较，无需 bcrypt 级别的哈希计算：
+密钥本身有 256 位熵，不存在可被字典攻击的低熵输入。
+"""
+
+import hashlib
+import hmac
+import secrets
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from backend.config import settings
+from backend.database.api_key_models import ApiKey, ServiceAccount, api_key_scopes
+from backend.database.dialects import insert_returning
+from backend.database.user_models import User, Role, Permission, user_roles
+from backend.database.version_models import USERS_VERSION
+from backend.services.user.effective_permission_service import lock_memberships, on_user_roles_added
+from backend.services.user.outbox_service import record_change
+from backend.services.user.table_version_service import bump_versions
+from backend.services.user.user_search_service import update_user_search_index
+from backend.utils.security import get_password_hash
+
+api_keys = ApiKey.__table__
+service_accounts = ServiceAccount.__table__
+
+# 密钥中作为可见前缀保存的长度（含 API_KEY_PREFIX）
+_VISIBLE_PREFIX_LENGTH = 12
+
+
+@dataclass(frozen=True)
+class ApiKeyPrincipal:
+    """
+    通过 API 密钥认证的主体：账户与该密钥允许使用的权限ID
+    """
+    api_key_id: int
+    user_id: int
+    username: str
+    scope_ids: FrozenSet[int]
+
+
+def _digest(key: str) -> str:
+    secret = (settings.API_KEY_HMAC_SECRET or settings.SECRET_KEY).encode()
+    return hmac.new(secret, key.encode(), hashlib.sha256).hexdigest()
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite 返回不带时区的时间，按 UTC 处理
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def is_api_key(credentials: str) -> bool:
+    return credentials.startswith(settings.API_KEY_PREFIX)
+
+
+def create_service_account(db: Session, username: str, description: Optional[str] = None,
+                           role_ids: Optional[List[int]] = None, created_by: Optional[int] = None) -> User:
+    """
+    创建服务账户
+
+    服务账户的密码不可用（随机值的哈希），只能通过 API 密钥认证。
+    用户名已存在或包含不存在的角色时抛出 ValueError。
+    账户、服务账户标记与角色在同一事务中写入，失败时不会留下没有角色的半成品账户。
+    """
+    desired = set(role_ids or ())
+    unknown = desired - set(db.execute(select(Role.id).where(Role.id.in_(desired))).scalars()) if desired else set()
+    if unknown:
+        raise ValueError(f"角色不存在: {', '.join(str(i) for i in sorted(unknown))}")
+
+    row = insert_returning(db, User.__table__, {
+        "username": username,
+        "password": get_password_hash(secrets.token_urlsafe(32)),
+        "status": True,
+    })
+    if row is None:
+        db.rollback()
+        raise ValueError("用户名已存在")
+    user_id = row["id"]
+    db.execute(service_accounts.insert().values(user_id=user_id, description=description, created_by=created_by))
+    role_ids = sorted(desired)
+    if role_ids:
+        db.execute(user_roles.insert(), [{"user_id": user_id, "role_id": role_id} for role_id in role_ids])
+        lock_memberships(db, [user_id], role_ids)
+        on_user_roles_added(db, user_id, role_ids)
+    record_change(db, "user.created", user_id, username=row["username"], service_account=True)
+    if role_ids:
+        record_change(db, "user_roles.added", user_id, user_ids=[user_id], role_ids=role_ids)
+        bump_versions(db, USERS_VERSION)
+    db.commit()
+    update_user_search_index(user_id, row["username"])
+    return db.get(User, user_id)
+
+
+def get_service_accounts(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
+    """
+    分页获取服务账户
+    """
+    return db.execute(
+        select(User).join(ServiceAccount, ServiceAccount.user_id == User.id)
+        .order_by(User.id).offset(skip).limit(limit)
+    ).scalars().all()
+
+
+def is_service_account(db: Session, user_id: int) -> bool:
+    return db.execute(
+        select(service_accounts.c.user_id).where(service_accounts.c.user_id == user_id)
+    ).first() is not None
+
+
+def _key_summary(db: Session, rows) -> List[dict]:
+    key_ids = [row["id"] for row in rows]
+    scopes = {}
+    if key_ids:
+        for key_id, name in db.execute(
+            select(api_key_scopes.c.api_key_id, Permission.name)
+            .join(Permission, Permission.id == api_key_scopes.c.permission_id)
+            .where(api_key_scopes.c.api_key_id.in_(key_ids))
+            .order_by(Permission.name)
+        ):
+            scopes.setdefault(key_id, []).append(name)
+    return [
+        {
+            "id": row["id"],
+            "name": row["name"],
+            "prefix": row["prefix"],
+            "scopes": scopes.get(row["id"], []),
+            "expires_at": row["expires_at"],
+            "revoked_at": row["revoked_at"],
+            "last_used_at": row["last_used_at"],
+            "created_at": row["created_at"],
+        }
+        for row in rows
+    ]
+
+
+def create_api_key(db: Session, user_id: int, name: str, scopes: List[str],
+                   expires_in_days: Optional[int] = None) -> Optional[Tuple[dict, str]]:
+    """
+    为服务账户创建 API 密钥，返回 (密钥信息, 明文密钥)；明文密钥只在此时返回一次
+
+    账户不存在或不是服务账户时返回 None；范围包含不存在的权限时抛出 ValueError。
+    """
+    if not is_service_account(db, user_id):
+        return None
+
+    names = sorted(set(scopes))
+    if not names:
+        raise ValueError("至少需要一个权限范围")
+    permission_ids = dict(db.execute(select(Permission.name, Permission.id).where(Permission.name.in_(names))).all())
+    unknown = [name for name in names if name not in permission_ids]
+    if unknown:
+        raise ValueError(f"权限不存在: {', '.join(unknown)}")
+
+    key = settings.API_KEY_PREFIX + secrets.token_urlsafe(32)
+    expires_at = None
+    if expires_in_days:
+        expires_at = datetime.now(timezone.utc) + timedelta(days=expires_in_days)
+    row = insert_returning(db, api_keys, {
+        "user_id": user_id,
+        "name": name,
+        "prefix": key[:_VISIBLE_PREFIX_LENGTH],
+        "digest": _digest(key),
+        "expires_at": expires_at,
+    })
+    db.execute(api_key_scopes.insert(), [
+        {"api_key_id": row["id"], "permission_id": permission_id} for permission_id in permission_ids.values()
+    ])
+    record_change(db, "api_key.created", row["id"], user_id=user_id, scopes=names)
+    db.commit()
+    return _key_summary(db, [row])[0], key
+
+
+def get_api_keys(db: Session, user_id: int) -> List[dict]:
+    """
+    获取账户的全部 API 密钥信息（不含明文与摘要）
+    """
+    rows = db.execute(select(api_keys).where(api_keys.c.user_id == user_id).order_by(api_keys.c.id)).mappings().all()
+    return _key_summary(db, rows)
+
+
+def revoke_api_key(db: Session, user_id: int, api_key_id: int) -> bool:
+    """
+    吊销 API 密钥，密钥不存在或已吊销时返回 False
+    """
+    revoked = db.execute(
+        update(api_keys)
+        .where(api_keys.c.id == api_key_id, api_keys.c.user_id == user_id, api_keys.c.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    ).rowcount
+    if revoked:
+        record_change(db, "api_key.revoked", api_key_id, user_id=user_id)
+    db.commit()
+    return bool(revoked)
+
+
+def authenticate_api_key(db: Session, key: str) -> Optional[ApiKeyPrincipal]:
+    """
+    验证 API 密钥，无效、已吊销或已过期时返回 None
+
+    按摘要做一次唯一索引查找，再以常量时间比较摘要。
+    """
+    digest = _digest(key)
+    row = db.execute(
+        select(api_keys.c.id, api_keys.c.user_id, api_keys.c.digest, api_keys.c.expires_at,
+               api_keys.c.revoked_at, api_keys.c.last_used_at, User.username)
+        .join(User, User.id == api_keys.c.user_id)
+        .where(api_keys.c.digest == digest)
+    ).first()
+    if row is None or not hmac.compare_digest(row.digest, digest) or row.revoked_at is not None:
+        return None
+
+    now = datetime.now(timezone.utc)
+    expires_at = _as_utc(row.expires_at)
+    if expires_at is not None and expires_at <= now:
+        return None
+
+    scope_ids = frozenset(db.execute(
+        select(api_key_scopes.c.permission_id).where(api_key_scopes.c.api_key_id == row.id)
+    ).scalars())
+
+    last_used_at = _as_utc(row.last_used_at)
+    if last_used_at is None or (now - last_used_at).total_seconds() >= settings.API_KEY_LAST_USED_INTERVAL_SECONDS:
+        db.execute(update(api_keys).where(api_keys.c.id == row.id).values(last_used_at=now))
+        db.commit()
+
+    return ApiKeyPrincipal(api_key_id=row.id, user_id=row.user_id, username=row.username, scope_ids=scope_ids)
@@ -0,0 +1,64 @@
+"""
+资源版本计数器的服务层
+
+写操作在提交前调用 bump_versions 递增相关资源的版本，读接口据此生成 ETag，
+无需加载任何数据行即可判断客户端缓存是否仍然有效。
+
+全局版本只用于集合（角色、权限列表与 RBAC 快照）：USERS_VERSION 只随成员关系与用户组变化递增，
+用户资料的修改不递增。单个用户的详情按 users.version 生成 ETag，由 bump_user_versions 递增，
+并发写不同用户时不会争用同一个版本行。
+"""
+
+from typing import Dict, Iterable
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from backend.database.dialects import dialect_insert, supports_on_conflict
+from backend.database.user_models import User
+from backend.database.version_models import TableVersion
+
+versions = TableVersion.__table__
+
+
+def bump_versions(db: Session, *names: str) -> None:
+    """
+    递增一个或多个资源的版本（不提交）
+
+    版本行是热点行，应在事务的最后一步调用以缩短锁持有时间。
+    """
+    for name in sorted(set(names)):
+        if supports_on_conflict(db):
+            statement = dialect_insert(db, versions).values(name=name, version=1)
+            db.execute(statement.on_conflict_do_update(
+                index_elements=[versions.c.name],
+                set_={"version": versions.c.version + 1},
+            ))
+        elif not db.execute(
+            update(versions).where(versions.c.name == name).values(version=versions.c.version + 1)
+        ).rowcount:
+            db.execute(versions.insert().values(name=name, version=1))
+
+
+def bump_user_versions(db, user_ids) -> None:
+    """
+    递增一批用户的详情版本（不提交），user_ids 可以是ID列表或返回用户ID的子查询
+
+    显式保留 updated_at：成员关系变化不修改用户资料的更新时间。
+    """
+    users = User.__table__
+    db.execute(
+        update(users).where(users.c.id.in_(user_ids))
+        .values(version=users.c.version + 1, updated_at=users.c.updated_at)
+    )
+
+
+def get_versions(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """
+    读取资源的当前版本，尚未变更过的资源版本为 0
+    """
+    names = list(names)
+    found = dict(db.execute(
+        select(versions.c.name, versions.c.version).where(versions.c.name.in_(names))
+    ).all())
+    return {name: found.get(name, 0) for name in names}
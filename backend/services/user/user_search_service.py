@@ -0,0 +1,241 @@
+"""
+用户搜索的服务层
+
+按用户名或邮箱进行前缀 / 子串搜索，可按角色与状态过滤，使用键集分页。
+PostgreSQL 上依赖 lower(...) text_pattern_ops 与 pg_trgm 索引；
+SQLite 上前缀搜索由进程内的有序前缀索引提供。
+
+排序键与分页游标统一取数据库 lower() 的结果，搜索词也在数据库一侧（SQLite 上按相同的 ASCII 规则）转换，
+Python 的 str.lower() 会转换非 ASCII 字符而 SQLite 的 lower() 不会，两侧混用会使前缀匹配与游标比较不一致。
+"""
+
+import base64
+import bisect
+import itertools
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import exists, func, literal, select, tuple_
+from sqlalchemy.orm import Session, selectinload
+
+from backend.config import settings
+from backend.database.dialects import dialect_name
+from backend.database.user_models import User, user_roles
+
+SEARCH_FIELDS = ("username", "email")
+SEARCH_MODES = ("prefix", "contains")
+
+# SQLite 回退路径每次按 ID 批量回表的候选数量
+_CANDIDATE_BATCH = 200
+
+
+def encode_cursor(value: str, user_id: int) -> str:
+    raw = json.dumps([value, user_id], ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, user_id = json.loads(raw)
+        return str(value), int(user_id)
+    except (ValueError, TypeError):
+        raise ValueError("无效的分页游标")
+
+
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def sqlite_lower(value: str) -> str:
+    """
+    与 SQLite 内置 lower() 相同的转换：只转换 ASCII 字母
+    """
+    return value.translate(_ASCII_LOWER)
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class PrefixIndex:
+    """
+    进程内有序前缀索引（只用于 SQLite）
+
+    保存按 (小写值, 用户ID) 排序的列表，前缀查询通过二分查找定位。
+    本进程的用户写操作按用户增量更新索引；其他进程的写入通过 TTL 重新构建感知。
+    更新时复制列表后整体替换引用，正在遍历旧列表的搜索不受影响。
+    """
+
+    def __init__(self, field: str, ttl_seconds: float = 0):
+        self.field = field
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._keys: List[Tuple[str, int]] = []
+        self._values: Dict[int, str] = {}
+        self._built_at: Optional[float] = None
+
+    def invalidate(self) -> None:
+        self._built_at = None
+
+    def update(self, user_id: int, value: Optional[str]) -> None:
+        """
+        写入或移除单个用户的值，value 为空时移除；索引尚未构建时无需处理
+        """
+        with self._lock:
+            if self._built_at is None:
+                return
+            keys = self._keys
+            previous = self._values.get(user_id)
+            value = sqlite_lower(value) if value is not None else None
+            if previous == value:
+                return
+            keys = list(keys)
+            values = dict(self._values)
+            if previous is not None:
+                del keys[bisect.bisect_left(keys, (previous, user_id))]
+                del values[user_id]
+            if value is not None:
+                bisect.insort(keys, (value, user_id))
+                values[user_id] = value
+            self._keys, self._values = keys, values
+
+    def _ensure_built(self, db: Session) -> List[Tuple[str, int]]:
+        built_at = self._built_at
+        if built_at is not None and (not self.ttl_seconds or time.monotonic() - built_at <= self.ttl_seconds):
+            return self._keys
+        with self._lock:
+            if self._built_at is None or self._built_at == built_at:
+                column = getattr(User, self.field)
+                rows = db.execute(
+                    select(func.lower(column), User.id).where(column.is_not(None))
+                ).all()
+                self._keys = sorted((value, user_id) for value, user_id in rows)
+                self._values = {user_id: value for value, user_id in self._keys}
+                self._built_at = time.monotonic()
+            return self._keys
+
+    def iter_ids(self, db: Session, prefix: str, after: Optional[Tuple[str, int]] = None):
+        """
+        按排序顺序产出以 prefix 开头的 (小写值, 用户ID)
+        """
+        keys = self._ensure_built(db)
+        start = bisect.bisect_right(keys, after) if after else bisect.bisect_left(keys, (prefix, 0))
+        for index in range(start, len(keys)):
+            key = keys[index]
+            if not key[0].startswith(prefix):
+                return
+            yield key
+
+
+prefix_indexes = {
+    field: PrefixIndex(field, ttl_seconds=settings.USER_SEARCH_INDEX_TTL_SECONDS) for field in SEARCH_FIELDS
+}
+
+
+def invalidate_user_search_index() -> None:
+    """
+    批量修改用户名或邮箱后使进程内前缀索引失效，下次搜索时重新构建
+    """
+    for index in prefix_indexes.values():
+        index.invalidate()
+
+
+def update_user_search_index(user_id: int, username: Optional[str] = None, email: Optional[str] = None) -> None:
+    """
+    用户创建、改名、修改邮箱或删除后增量更新进程内前缀索引；两个值都为空时从索引中移除该用户
+    """
+    prefix_indexes["username"].update(user_id, username)
+    prefix_indexes["email"].update(user_id, email)
+
+
+def _filters(role_id: Optional[int], status: Optional[bool]) -> list:
+    conditions = []
+    if role_id is not None:
+        conditions.append(exists().where(user_roles.c.user_id == User.id, user_roles.c.role_id == role_id))
+    if status is not None:
+        conditions.append(User.status == status)
+    return conditions
+
+
+def search_users(db: Session, q: str, field: str = "username", mode: str = "prefix",
+                 role_id: Optional[int] = None, status: Optional[bool] = None,
+                 cursor: Optional[str] = None, limit: int = 20) -> Tuple[List[User], Optional[str]]:
+    """
+    搜索用户，返回 (当前页用户, 下一页游标)
+
+    结果按 (lower(field), id) 排序，游标记录上一页最后一行的排序键。
+    """
+    if field not in SEARCH_FIELDS:
+        raise ValueError(f"不支持的搜索字段: {field}")
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"不支持的搜索模式: {mode}")
+
+    after = decode_cursor(cursor) if cursor else None
+    if mode == "prefix" and dialect_name(db) == "sqlite":
+        rows = _search_prefix_in_memory(db, sqlite_lower(q), field, role_id, status, after, limit + 1)
+    else:
+        rows = _search_sql(db, q, field, mode, role_id, status, after, limit + 1)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        sort_value, last = rows[-1]
+        next_cursor = encode_cursor(sort_value, last.id)
+    return [user for _, user in rows], next_cursor
+
+
+def _search_sql(db: Session, q: str, field: str, mode: str, role_id: Optional[int],
+                status: Optional[bool], after: Optional[Tuple[str, int]], limit: int) -> List[Tuple[str, User]]:
+    """
+    返回 (排序键, 用户)，排序键即数据库 lower(field) 的结果
+    """
+    sort_key = func.lower(getattr(User, field))
+    if mode == "prefix":
+        # lower(field) LIKE lower('q') || '%' 可以使用 text_pattern_ops 表达式索引，两侧由同一函数转换
+        match = sort_key.like(func.lower(literal(_escape_like(q))) + "%", escape="\\")
+    else:
+        # ILIKE '%q%' 可以使用 pg_trgm GIN 索引
+        match = getattr(User, field).ilike("%" + _escape_like(q) + "%", escape="\\")
+
+    query = (
+        select(sort_key, User)
+        .options(selectinload(User.roles))
+        .where(match, *_filters(role_id, status))
+        .order_by(sort_key, User.id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(tuple_(sort_key, User.id) > tuple_(*after))
+    return [tuple(row) for row in db.execute(query).all()]
+
+
+def _search_prefix_in_memory(db: Session, term: str, field: str, role_id: Optional[int],
+                             status: Optional[bool], after: Optional[Tuple[str, int]],
+                             limit: int) -> List[Tuple[str, User]]:
+    """
+    SQLite 上的前缀搜索：由内存索引按顺序给出候选ID，再分批回表应用过滤条件
+
+    term 已按 SQLite lower() 的规则转换；返回 (排序键, 用户)。
+    """
+    results: List[Tuple[str, User]] = []
+    candidates = prefix_indexes[field].iter_ids(db, term, after)
+    sort_key = func.lower(getattr(User, field))
+    while len(results) < limit:
+        batch = [user_id for _, user_id in itertools.islice(candidates, _CANDIDATE_BATCH)]
+        if not batch:
+            break
+        # 回表时再次校验前缀，避免其他进程的改名在索引重建前造成误匹配
+        rows = db.execute(
+            select(sort_key, User)
+            .options(selectinload(User.roles))
+            .where(
+                User.id.in_(batch),
+                sort_key.like(_escape_like(term) + "%", escape="\\"),
+                *_filters(role_id, status),
+            )
+        ).all()
+        by_id = {user.id: (value, user) for value, user in rows}
+        results.extend(by_id[user_id] for user_id in batch if user_id in by_id)
+    return results[:limit]
@@ -2,11 +2,23 @@
 用户相关操作的服务层
 """
 
-from sqlalchemy.orm import Session
-from backend.database.user_models import User, Role
-from backend.schemas.user import UserCreate, UserUpdate, UserInDB
+from datetime import datetime, timezone
+from sqlalchemy import delete, exists, func, select, tuple_, update
+from sqlalchemy.orm import Session, selectinload
+from backend.database.dialects import insert_returning, insert_ignore_from_select, replace_association_set
+from backend.database.session_utils import attach_detached
+from backend.database.user_models import User, Role, user_roles
+from backend.database.version_models import ROLES_VERSION, USERS_VERSION, TableVersion
+from backend.schemas.user import UserCreate, UserUpdate, UserInDB, MembershipChange
+from backend.services.user.cascade_service import delete_user_cascade
+from backend.services.user.effective_permission_service import (
+    lock_memberships, on_user_roles_added, on_user_roles_removed
+)
+from backend.services.user.outbox_service import record_change
+from backend.services.user.table_version_service import bump_user_versions, bump_versions
+from backend.services.user.user_search_service import update_user_search_index
 from backend.utils.security import get_password_hash
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
 
 def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
@@ -23,6 +35,24 @@ def get_user_by_username(db: Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.username == username).first()
 
 
+def get_user_cache_key(db: Session, user_id: int) -> Optional[tuple]:
+    """
+    单个用户详情的缓存键，用户不存在时返回 None
+
+    一次主键探测读取用户行的版本；响应中的角色名称随角色改名变化，同时包含角色版本。
+    到期本身不递增版本，键中还包含该用户已到期但尚未清理的分配数（只探测该用户在部分索引上的临时分配），
+    其他用户的分配到期不影响该键。
+    """
+    roles_version = select(TableVersion.version).where(TableVersion.name == ROLES_VERSION).scalar_subquery()
+    lapsed = select(func.count()).select_from(user_roles).where(
+        user_roles.c.user_id == user_id, user_roles.c.expires_at <= datetime.now(timezone.utc)
+    ).scalar_subquery()
+    row = db.execute(
+        select(User.version, func.coalesce(roles_version, 0), lapsed).where(User.id == user_id)
+    ).first()
+    return tuple(row) if row is not None else None
+
+
 def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
     """
     分页获取用户列表
@@ -30,33 +60,50 @@ def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
     return db.query(User).offset(skip).limit(limit).all()
 
 
+def iter_users(db: Session, skip: int = 0, limit: Optional[int] = None, batch_size: int = 1000) -> Iterator[User]:
+    """
+    按ID顺序逐批流式读取用户及其角色，limit 为空时不限制数量
+
+    使用 yield_per（PostgreSQL 上为服务端游标），内存占用与结果集大小无关。
+    """
+    query = select(User).options(selectinload(User.roles)).order_by(User.id).offset(skip)
+    if limit:
+        query = query.limit(limit)
+    yield from db.execute(query.execution_options(yield_per=batch_size)).scalars()
+
+
 def create_user(db: Session, user_data: UserCreate) -> User:
     """
     创建新用户
+
+    唯一性检查与插入在同一条 INSERT ... ON CONFLICT DO NOTHING RETURNING 语句中完成，
+    仅在冲突时再查询具体是哪个字段重复。
     """
-    # 检查用户名是否已存在
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
-    if existing_user:
-        raise ValueError("用户名已存在")
-    
-    # 检查邮箱是否已存在
-    if user_data.email:
-        existing_email = db.query(User).filter(User.email == user_data.email).first()
-        if existing_email:
-            raise ValueError("邮箱已存在")
-    
-    # 创建新用户
     hashed_password = get_password_hash(user_data.password)
-    db_user = User(
-        username=user_data.username,
-        email=user_data.email,
-        password=hashed_password,
-        status=user_data.status
-    )
-    db.add(db_user)
+    row = insert_returning(db, User.__table__, {
+        "username": user_data.username,
+        "email": user_data.email,
+        "password": hashed_password,
+        "status": user_data.status,
+    })
+    if row is None:
+        db.rollback()
+        raise ValueError(_user_conflict_message(db, user_data.username))
+    
+    # 新用户没有成员关系，不影响任何集合的版本
+    record_change(db, "user.created", row["id"], username=row["username"])
     db.commit()
-    db.refresh(db_user)
-    return db_user
+    update_user_search_index(row["id"], row["username"], row["email"])
+    return attach_detached(db, User, dict(row), roles=[])
+
+
+def _user_conflict_message(db: Session, username: str) -> str:
+    """
+    插入冲突时确定重复的字段
+    """
+    if db.execute(select(exists().where(User.username == username))).scalar():
+        return "用户名已存在"
+    return "邮箱已存在"
 
 
 def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[User]:
@@ -89,53 +136,205 @@ def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[
     if user_update.password is not None:
         db_user.password = get_password_hash(user_update.password)
     
+    # 事件只记录变更的字段名与状态，不包含密码
+    changed = sorted(field for field, value in user_update.model_dump(exclude_unset=True).items() if value is not None)
+    record_change(db, "user.updated", user_id, fields=changed, status=db_user.status)
+    db_user.version = User.version + 1
     db.commit()
     db.refresh(db_user)
+    if user_update.username is not None or user_update.email is not None:
+        update_user_search_index(db_user.id, db_user.username, db_user.email)
     return db_user
 
 
 def delete_user(db: Session, user_id: int) -> bool:
     """
-    删除用户
+    删除用户，角色关联与日志引用按批次直接处理，不加载关联集合
     """
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if not db_user:
+    if not db.execute(select(exists().where(User.id == user_id))).scalar():
         return False
     
-    db.delete(db_user)
+    delete_user_cascade(db, user_id)
+    update_user_search_index(user_id)
+    return True
+
+
+def assign_role_to_user(db: Session, user_id: int, role_id: int, expires_at: Optional[datetime] = None) -> bool:
+    """
+    为用户分配角色，expires_at 不为空时为临时分配，到期后自动失效
+
+    用户与角色的存在性检查和关联插入在同一条语句中完成，不加载任何集合。
+    关联已存在时改为新的到期时间；永久与临时之间的转换同步维护物化的有效权限。
+    到期时间不晚于当前时间时抛出 ValueError，不带时区的到期时间按 UTC 处理。
+    """
+    if expires_at is not None:
+        # SQLite 不保存时区，统一以 UTC 写入
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        expires_at = expires_at.astimezone(timezone.utc)
+        if expires_at <= datetime.now(timezone.utc):
+            raise ValueError("到期时间必须晚于当前时间")
+    lock_memberships(db, [user_id], [role_id])
+    inserted = insert_ignore_from_select(
+        db, user_roles, {"user_id": user_id, "role_id": role_id, "expires_at": expires_at},
+        exists().where(User.id == user_id),
+        exists().where(Role.id == role_id),
+    )
+    if not inserted:
+        # 未插入：要么关联已存在，要么用户或角色不存在
+        previous = db.execute(
+            select(user_roles.c.expires_at).where(user_roles.c.user_id == user_id, user_roles.c.role_id == role_id)
+        ).first()
+        if previous is None or (previous.expires_at is None and expires_at is None):
+            db.rollback()
+            return previous is not None
+        db.execute(
+            update(user_roles)
+            .where(user_roles.c.user_id == user_id, user_roles.c.role_id == role_id)
+            .values(expires_at=expires_at)
+        )
+        if previous.expires_at is None:
+            # 永久分配改为临时分配：临时分配不物化
+            on_user_roles_removed(db, user_id, [role_id])
+
+    if expires_at is None:
+        on_user_roles_added(db, user_id, [role_id])
+        record_change(db, "user_roles.added", user_id, user_ids=[user_id], role_ids=[role_id])
+    else:
+        record_change(db, "user_roles.added", user_id, user_ids=[user_id], role_ids=[role_id],
+                      expires_at=expires_at.isoformat())
+    bump_user_versions(db, [user_id])
+    bump_versions(db, USERS_VERSION)
     db.commit()
     return True
 
 
-def assign_role_to_user(db: Session, user_id: int, role_id: int) -> bool:
+def expire_role_assignments(db: Session, limit: int) -> int:
     """
-    为用户分配角色
+    删除一批已到期的临时角色分配并提交，返回删除的行数
+
+    沿 expires_at 部分索引按 (到期时间, 用户ID, 角色ID) 顺序读取最多 limit 个分配再按主键删除，
+    批量授予的大量分配共享同一个到期时间时也按 limit 分批。
+    删除时再次确认仍已到期（期间可能被延长），多个进程同时清理时每行只会被一个进程删除并记录事件。
+    临时分配不物化，删除后无需维护有效权限，只需记录变更并递增版本使缓存失效。
     """
-    user = db.query(User).filter(User.id == user_id).first()
-    role = db.query(Role).filter(Role.id == role_id).first()
-    
-    if not user or not role:
+    now = datetime.now(timezone.utc)
+    keys = db.execute(
+        select(user_roles.c.user_id, user_roles.c.role_id)
+        .where(user_roles.c.expires_at <= now)
+        .order_by(user_roles.c.expires_at, user_roles.c.user_id, user_roles.c.role_id)
+        .limit(limit)
+    ).all()
+    if not keys:
+        db.rollback()
+        return 0
+    removed = db.execute(
+        delete(user_roles)
+        .where(
+            tuple_(user_roles.c.user_id, user_roles.c.role_id).in_([tuple(key) for key in keys]),
+            user_roles.c.expires_at <= now,
+        )
+        .returning(user_roles.c.user_id, user_roles.c.role_id)
+    ).all()
+    if not removed:
+        db.rollback()
+        return 0
+
+    user_ids_by_role = {}
+    for user_id, role_id in removed:
+        user_ids_by_role.setdefault(role_id, []).append(user_id)
+    for role_id, user_ids in sorted(user_ids_by_role.items()):
+        record_change(db, "user_roles.removed", user_ids=sorted(user_ids), role_ids=[role_id], reason="expired")
+    bump_user_versions(db, sorted({user_id for user_id, _ in removed}))
+    bump_versions(db, USERS_VERSION)
+    db.commit()
+    return len(removed)
+
+
+def next_role_expiry(db: Session) -> Optional[datetime]:
+    """
+    最早的临时角色分配到期时间，没有临时分配时返回 None
+    """
+    expires_at = db.execute(select(func.min(user_roles.c.expires_at))).scalar()
+    if expires_at is not None and expires_at.tzinfo is None:
+        # SQLite 不保存时区，写入的到期时间统一为 UTC
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at
+
+
+def lapsed_role_assignment_count(db: Session) -> int:
+    """
+    已到期但尚未被清理的临时角色分配数
+
+    到期本身不递增数据版本，按版本生成的 RBAC 快照 ETag 需要同时包含该数：分配到期时该数增加，
+    清理后归零但版本已递增，缓存键都会变化。清理及时运行时只探测部分索引上的少量行。
+    单个用户的详情使用 get_user_cache_key 中按用户的探测。
+    """
+    return db.execute(
+        select(func.count()).select_from(user_roles).where(user_roles.c.expires_at <= datetime.now(timezone.utc))
+    ).scalar()
+
+
+def remove_role_from_user(db: Session, user_id: int, role_id: int) -> bool:
+    """
+    从用户移除角色
+
+    直接删除关联行而不经过 User.roles：该关系不包含已到期的临时分配，尚未清理的到期分配同样可以移除。
+    """
+    user_exists, role_exists = db.execute(
+        select(exists().where(User.id == user_id), exists().where(Role.id == role_id))
+    ).one()
+    if not (user_exists and role_exists):
         return False
     
-    if role not in user.roles:
-        user.roles.append(role)
+    lock_memberships(db, [user_id], [role_id])
+    removed = db.execute(
+        delete(user_roles).where(user_roles.c.user_id == user_id, user_roles.c.role_id == role_id)
+    ).rowcount
+    if removed:
+        on_user_roles_removed(db, user_id, [role_id])
+        record_change(db, "user_roles.removed", user_id, user_ids=[user_id], role_ids=[role_id])
+        bump_user_versions(db, [user_id])
+        bump_versions(db, USERS_VERSION)
         db.commit()
     
     return True
 
 
-def remove_role_from_user(db: Session, user_id: int, role_id: int) -> bool:
+def replace_user_roles(db: Session, user_id: int, role_ids: List[int]) -> Optional[MembershipChange]:
     """
-    从用户移除角色
+    以集合语义替换用户的角色
+
+    用户不存在时返回 None；包含不存在的角色时抛出 ValueError。
+    目标集合中已有的临时分配（包括已到期但尚未清理的）改为永久分配，并作为新增报告。
     """
-    user = db.query(User).filter(User.id == user_id).first()
-    role = db.query(Role).filter(Role.id == role_id).first()
-    
-    if not user or not role:
-        return False
+    if not db.execute(select(exists().where(User.id == user_id))).scalar():
+        return None
     
-    if role in user.roles:
-        user.roles.remove(role)
-        db.commit()
+    desired = set(role_ids)
+    found = set(db.execute(select(Role.id).where(Role.id.in_(desired))).scalars()) if desired else set()
+    unknown = desired - found
+    if unknown:
+        raise ValueError(f"角色不存在: {', '.join(str(i) for i in sorted(unknown))}")
     
-    return True
\ No newline at end of file
+    lock_memberships(db, [user_id], sorted(desired))
+    promoted = db.execute(
+        update(user_roles)
+        .where(user_roles.c.user_id == user_id, user_roles.c.role_id.in_(desired),
+               user_roles.c.expires_at.is_not(None))
+        .values(expires_at=None)
+        .returning(user_roles.c.role_id)
+    ).scalars().all() if desired else []
+    added, removed = replace_association_set(db, user_roles, "user_id", user_id, "role_id", Role.id, desired)
+    added = sorted(set(added) | set(promoted))
+    on_user_roles_removed(db, user_id, removed)
+    on_user_roles_added(db, user_id, added)
+    if added:
+        record_change(db, "user_roles.added", user_id, user_ids=[user_id], role_ids=added)
+    if removed:
+        record_change(db, "user_roles.removed", user_id, user_ids=[user_id], role_ids=removed)
+    if added or removed:
+        bump_user_versions(db, [user_id])
+        bump_versions(db, USERS_VERSION)
+    db.commit()
+    return MembershipChange(added=added, removed=removed)
\ No newline at end of file
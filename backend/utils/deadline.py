@@ -0,0 +1,76 @@
+"""
+请求截止时间
+
+截止时间保存在 contextvar 中（time.monotonic 时间），由截止时间中间件在请求开始时设置。
+FastAPI 在线程池中执行同步端点与依赖时会复制上下文，因此数据库层可以读到当前请求的剩余预算，
+并将其传递为语句超时。contextvar 中保存的是可变的 Deadline 对象，复制后的上下文共享同一个对象，
+中间件在响应开始后调用 lift() 即可对已在运行的任务解除截止时间。
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+class Deadline:
+    """
+    一个作用域的截止时间，at 为 None 表示不限时
+    """
+    __slots__ = ("at",)
+
+    def __init__(self, at: Optional[float]):
+        self.at = at
+
+    def lift(self) -> None:
+        self.at = None
+
+
+_deadline: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """
+    请求的时间预算已用完
+    """
+
+
+def get_deadline() -> Optional[float]:
+    deadline = _deadline.get()
+    return deadline.at if deadline is not None else None
+
+
+def remaining() -> Optional[float]:
+    """
+    剩余的时间预算（秒），没有截止时间时返回 None
+    """
+    deadline = get_deadline()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+    """
+    预算已用完时抛出 DeadlineExceeded，供长循环在每批之间调用
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("请求超出时间预算")
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Deadline]:
+    """
+    在作用域内设置截止时间并返回其 Deadline 对象；已有更早的截止时间时保持不变
+    """
+    at = None if seconds is None else time.monotonic() + seconds
+    current = get_deadline()
+    if current is not None and (at is None or current < at):
+        at = current
+    deadline = Deadline(at)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
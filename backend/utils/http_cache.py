@@ -0,0 +1,51 @@
+"""
+HTTP 条件请求工具
+
+根据资源版本生成强 ETag，客户端携带匹配的 If-None-Match 时直接返回 304。
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+from backend.config import settings
+
+
+def make_etag(*parts) -> str:
+    """
+    由资源版本及请求参数生成强 ETag
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    检查 If-None-Match 是否命中当前 ETag（按弱比较，忽略 W/ 前缀）
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def catalog_cache_control() -> str:
+    """
+    目录类接口（角色、权限列表）的 Cache-Control：私有缓存，过期后必须重新验证
+    """
+    return f"private, max-age={settings.CATALOG_CACHE_MAX_AGE_SECONDS}, must-revalidate"
+
+
+def not_modified(etag: str, cache_control: Optional[str] = None) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    return with_cache_headers(response, etag, cache_control)
+
+
+def with_cache_headers(response: Response, etag: str, cache_control: Optional[str] = None) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control or "private, no-cache"
+    return response
@@ -0,0 +1,77 @@
+"""
+进程内指标计数器
+
+以 Prometheus 文本格式通过 /metrics 暴露，无需额外依赖。
+"""
+
+import threading
+from typing import Dict, Tuple
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[_LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[_LabelKey, float]] = {}
+        self._help: Dict[str, str] = {}
+
+    @staticmethod
+    def _key(labels: Dict[str, object]) -> _LabelKey:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, amount: float = 1, /, **labels) -> None:
+        """
+        累加计数器
+        """
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, /, **labels) -> None:
+        """
+        设置仪表值
+        """
+        with self._lock:
+            self._gauges.setdefault(name, {})[self._key(labels)] = value
+
+    def add(self, name: str, amount: float, /, **labels) -> None:
+        """
+        增减仪表值
+        """
+        key = self._key(labels)
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def value(self, name: str, /, **labels) -> float:
+        key = self._key(labels)
+        with self._lock:
+            for metrics in (self._counters, self._gauges):
+                if name in metrics:
+                    return metrics[name].get(key, 0)
+        return 0
+
+    def render(self) -> str:
+        """
+        以 Prometheus 文本格式输出全部指标
+        """
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted(metrics):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in sorted(metrics[name].items()):
+                        labels = ",".join(f'{label}="{text}"' for label, text in key)
+                        lines.append(f"{name}{{{labels}}} {value:g}" if labels else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,210 @@
+"""
+令牌桶限流
+
+每个键对应一个容量为 capacity、每秒补充 refill_per_second 个令牌的桶，每次请求消耗一个令牌。
+桶状态默认保存在进程内；多实例部署时可改用共享存储适配器，
+适配器只要求客户端提供 Redis 兼容的 eval(script, numkeys, *keys_and_args) 方法。
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from backend.config import settings
+from backend.utils.metrics import metrics
+
+metrics.describe("rate_limit_allowed_total", "限流器放行的请求数")
+metrics.describe("rate_limit_rejected_total", "限流器拒绝的请求数")
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float = 0.0
+
+    def headers(self) -> dict:
+        """
+        限流相关的响应头
+        """
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class MemoryTokenBucketStore:
+    """
+    进程内的令牌桶存储
+
+    按最近使用顺序保留至多 max_keys 个桶，超出时淘汰最久未使用的桶。
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def consume(self, key: str, capacity: int, refill_per_second: float, cost: int = 1) -> Tuple[bool, float]:
+        """
+        尝试从桶中取出 cost 个令牌，返回 (是否成功, 剩余令牌数)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+# 在共享存储中原子地补充并消耗令牌；空闲的桶在补满所需时间后过期
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class SharedTokenBucketStore:
+    """
+    基于共享存储的令牌桶，多个进程 / 实例共用同一组桶
+    """
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    def consume(self, key: str, capacity: int, refill_per_second: float, cost: int = 1) -> Tuple[bool, float]:
+        allowed, tokens = self.client.eval(
+            _TOKEN_BUCKET_SCRIPT, 1, self.prefix + key, capacity, refill_per_second, time.time(), cost
+        )
+        if isinstance(tokens, bytes):
+            tokens = tokens.decode()
+        return bool(int(allowed)), float(tokens)
+
+
+class TokenBucketLimiter:
+    def __init__(self, scope: str, capacity: int, refill_per_second: float, store=None):
+        self.scope = scope
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.store = store or MemoryTokenBucketStore()
+
+    def hit(self, key: str, cost: int = 1) -> RateLimitResult:
+        """
+        为 key 消耗令牌并返回限流结果
+        """
+        allowed, tokens = self.store.consume(f"{self.scope}:{key}", self.capacity, self.refill_per_second, cost)
+        retry_after = 0.0 if allowed else (cost - tokens) / self.refill_per_second
+        metrics.inc("rate_limit_allowed_total" if allowed else "rate_limit_rejected_total", scope=self.scope)
+        return RateLimitResult(allowed=allowed, limit=self.capacity, remaining=int(tokens), retry_after=retry_after)
+
+    def peek(self, key: str) -> RateLimitResult:
+        """
+        检查 key 的桶中是否还有令牌，不消耗令牌
+        """
+        _, tokens = self.store.consume(f"{self.scope}:{key}", self.capacity, self.refill_per_second, 0)
+        allowed = tokens >= 1
+        if not allowed:
+            metrics.inc("rate_limit_rejected_total", scope=self.scope)
+        return RateLimitResult(allowed=allowed, limit=self.capacity, remaining=int(tokens),
+                               retry_after=0.0 if allowed else (1 - tokens) / self.refill_per_second)
+
+
+class LoginRateLimiter:
+    """
+    登录限流：按客户端IP限制全部登录尝试，按 (客户端IP, 用户名) 限制认证失败的尝试，任意一个桶耗尽即拒绝
+
+    用户名桶只在认证失败时消耗且按来源IP区分：成功的登录不计数，
+    其他来源反复提交错误密码也无法把该用户锁定在外。
+    """
+
+    def __init__(self, store=None):
+        self.by_ip = TokenBucketLimiter(
+            "login_ip", settings.LOGIN_RATE_LIMIT_IP_CAPACITY,
+            settings.LOGIN_RATE_LIMIT_IP_REFILL_PER_SECOND, store
+        )
+        self.by_username = TokenBucketLimiter(
+            "login_username", settings.LOGIN_RATE_LIMIT_USERNAME_CAPACITY,
+            settings.LOGIN_RATE_LIMIT_USERNAME_REFILL_PER_SECOND, store
+        )
+
+    def check(self, client_ip: Optional[str], username: str) -> RateLimitResult:
+        """
+        认证之前调用：消耗IP桶的令牌，并检查该来源对此用户名的失败次数是否已超限
+        """
+        result = self.by_ip.hit(client_ip or "unknown")
+        if not result.allowed:
+            return result
+        by_username = self.by_username.peek(self._username_key(client_ip, username))
+        if not by_username.allowed:
+            return by_username
+        return min(result, by_username, key=lambda r: r.remaining)
+
+    def record_failure(self, client_ip: Optional[str], username: str) -> None:
+        """
+        认证失败后调用：消耗该来源对此用户名的一个令牌
+        """
+        self.by_username.hit(self._username_key(client_ip, username))
+
+    @staticmethod
+    def _username_key(client_ip: Optional[str], username: str) -> str:
+        # 用户名不区分大小写，避免通过改变大小写绕过限流
+        return f"{client_ip or 'unknown'}:{username.strip().lower()}"
+
+
+def create_store(url: Optional[str] = None):
+    """
+    根据配置创建令牌桶存储：未配置共享存储地址时使用进程内存储
+    """
+    url = url or settings.RATE_LIMIT_REDIS_URL
+    if not url:
+        return MemoryTokenBucketStore()
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError("使用共享限流存储需要安装 redis 包")
+    return SharedTokenBucketStore(redis.Redis.from_url(url))
+
+
+def client_ip(request) -> Optional[str]:
+    """
+    获取客户端IP；仅在部署于可信代理之后时使用 X-Forwarded-For
+    """
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+
+login_rate_limiter = LoginRateLimiter(create_store())
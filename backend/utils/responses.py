@@ -46,5 +46,6 @@ def create_json_response(response: APIResponse) -> JSONResponse:
     """
     return JSONResponse(
         status_code=response.code,
-        content=response.model_dump()
+        # 以 JSON 模式序列化，datetime 等字段转换为字符串
+        content=response.model_dump(mode="json")
     )
\ No newline at end of file
@@ -1,11 +1,37 @@
+import base64
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Tuple, Iterable, FrozenSet
 import jwt
 from passlib.context import CryptContext
 from backend.config import settings
 
+def create_password_context(schemes: Optional[List[str]] = None, bcrypt_rounds: Optional[int] = None,
+                            argon2_time_cost: Optional[int] = None, argon2_memory_cost: Optional[int] = None,
+                            argon2_parallelism: Optional[int] = None) -> CryptContext:
+    """
+    根据配置创建密码哈希上下文
+
+    第一个方案用于生成新哈希，其余方案只用于验证旧哈希并被标记为过时；
+    工作因子与配置不一致的哈希同样视为过时，在下次登录成功时重新哈希。
+    """
+    schemes = list(schemes or settings.PASSWORD_HASH_SCHEMES)
+    options = {}
+    if "bcrypt" in schemes:
+        rounds = bcrypt_rounds or settings.PASSWORD_BCRYPT_ROUNDS
+        # 上下界都设为目标轮数，调高或调低轮数都会触发重新哈希
+        options.update(bcrypt__rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds)
+    if "argon2" in schemes:
+        # argon2 需要安装 argon2-cffi
+        options.update(
+            argon2__time_cost=argon2_time_cost or settings.PASSWORD_ARGON2_TIME_COST,
+            argon2__memory_cost=argon2_memory_cost or settings.PASSWORD_ARGON2_MEMORY_COST,
+            argon2__parallelism=argon2_parallelism or settings.PASSWORD_ARGON2_PARALLELISM,
+        )
+    return CryptContext(schemes=schemes, deprecated="auto", **options)
+
+
 # 密码哈希上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = create_password_context()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -15,6 +41,22 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    验证密码，哈希方案或工作因子已过时则同时返回按当前配置生成的新哈希
+
+    返回 (是否匹配, 新哈希或 None)。
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def dummy_verify_password() -> None:
+    """
+    执行一次与真实验证耗时相当的哈希计算，用于用户不存在时抹平响应时间差异
+    """
+    pwd_context.dummy_verify()
+
+
 def get_password_hash(password: str) -> str:
     """
     为给定密码生成哈希值
@@ -47,4 +89,58 @@ def verify_token(token: str) -> Optional[dict]:
     except jwt.exceptions.ExpiredSignatureError:
         return None
     except jwt.exceptions.InvalidTokenError:
-        return None
\ No newline at end of file
+        return None
+
+
+# 紧凑格式的权限声明：pv 为权限目录版本，pb 为权限ID位图
+PERMISSION_VERSION_CLAIM = "pv"
+PERMISSION_BITMAP_CLAIM = "pb"
+
+# 每个字节值中置位的位序号，解码时按字节查表
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def encode_permission_bitmap(permission_ids: Iterable[int]) -> str:
+    """
+    将权限ID编码为 base64url 位图（第 n 位表示ID为 n 的权限，小端序，去掉填充）
+
+    重复的ID自然合并，长度只取决于最大的权限ID。
+    """
+    bits = 0
+    for permission_id in permission_ids:
+        bits |= 1 << permission_id
+    raw = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_permission_bitmap(encoded: str) -> FrozenSet[int]:
+    """
+    将 base64url 位图解码为权限ID集合，格式无效时抛出 ValueError
+    """
+    try:
+        raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+    except (TypeError, ValueError) as e:
+        raise ValueError("无效的权限位图") from e
+    return frozenset(
+        offset * 8 + bit
+        for offset, value in enumerate(raw) if value
+        for bit in _BYTE_BITS[value]
+    )
+
+
+def decode_permission_claim(payload: dict, catalog_version: Optional[int] = None) -> Optional[FrozenSet[int]]:
+    """
+    从令牌载荷中读取紧凑格式的权限ID集合
+
+    令牌不含位图、位图无效，或签发时的权限目录版本与 catalog_version 不一致时返回 None，
+    调用方应改为从数据库读取权限；ID 到名称的映射通过 GET /api/v1/permissions 获取。
+    """
+    encoded = payload.get(PERMISSION_BITMAP_CLAIM)
+    if not isinstance(encoded, str):
+        return None
+    if catalog_version is not None and payload.get(PERMISSION_VERSION_CLAIM) != catalog_version:
+        return None
+    try:
+        return decode_permission_bitmap(encoded)
+    except ValueError:
+        return None
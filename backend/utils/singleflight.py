@@ -0,0 +1,65 @@
+"""
+并发请求合并（singleflight）
+
+同一个键同时只执行一次加载：第一个调用者执行加载函数，
+加载期间到达的其他调用者等待并共享同一结果（或同一异常）。
+结果不会被缓存，加载完成后的下一次调用会重新执行。
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from backend.utils.metrics import metrics
+
+metrics.describe("singleflight_executions_total", "实际执行的加载次数")
+metrics.describe("singleflight_coalesced_total", "合并到进行中加载的等待者数量")
+metrics.describe("singleflight_waiters", "当前正在等待进行中加载的调用者数量")
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        执行 fn 或等待同一键上进行中的调用，返回其结果
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.inc("singleflight_coalesced_total", name=self.name)
+            metrics.add("singleflight_waiters", 1, name=self.name)
+            try:
+                call.done.wait()
+            finally:
+                metrics.add("singleflight_waiters", -1, name=self.name)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.inc("singleflight_executions_total", name=self.name)
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
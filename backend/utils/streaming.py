@@ -0,0 +1,71 @@
+"""
+NDJSON 流式响应
+
+每行一个 JSON 对象，按批写出；客户端接受 gzip 时对流进行增量压缩。
+生成器在独立的会话中读取数据，因为请求依赖中的会话在响应开始发送后可能已被关闭。
+"""
+
+import zlib
+from typing import Callable, Iterable, Iterator, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from backend.config import settings
+from backend.database import SessionLocal
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def accepts_gzip(request: Request) -> bool:
+    encodings = request.headers.get("accept-encoding", "")
+    return any(
+        part.split(";")[0].strip() == "gzip" and not part.replace(" ", "").endswith(";q=0")
+        for part in encodings.split(",")
+    )
+
+
+def _stream_lines(produce: Callable[[Session], Iterable[str]], compress: bool, batch_size: int) -> Iterator[bytes]:
+    db = SessionLocal()
+    # wbits=31 生成带 gzip 头的压缩流
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    try:
+        buffer = []
+        for line in produce(db):
+            buffer.append(line)
+            if len(buffer) >= batch_size:
+                yield _encode(buffer, compressor)
+                buffer.clear()
+        if buffer:
+            yield _encode(buffer, compressor)
+        if compressor is not None:
+            yield compressor.flush()
+    finally:
+        db.close()
+
+
+def _encode(lines, compressor) -> bytes:
+    data = "".join(lines).encode()
+    if compressor is None:
+        return data
+    # 同步刷新使客户端能够逐批解压，而不必等待整个流结束
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def ndjson_response(request: Request, produce: Callable[[Session], Iterable[str]],
+                    batch_size: Optional[int] = None) -> StreamingResponse:
+    """
+    创建 NDJSON 流式响应
+
+    produce 接收一个新会话并逐行产出以换行结尾的 JSON 字符串。
+    """
+    compress = accepts_gzip(request)
+    headers = {"Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        _stream_lines(produce, compress, batch_size or settings.STREAM_BATCH_SIZE),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers=headers,
+    )
@@ -0,0 +1,77 @@
+"""
+测试夹具
+
+测试使用临时目录中的 SQLite 数据库，环境变量必须在导入 backend 之前设置。
+"""
+
+import os
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="permission-system-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ["JOB_WORKER_ENABLED"] = "false"
+os.environ["ROLE_EXPIRY_ENABLED"] = "false"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.constants.permissions import PERMISSIONS
+from backend.database import Base, SessionLocal, engine
+from backend.database import user_models, version_models, job_models  # noqa: F401
+from backend.database import acl_models, api_key_models, group_models, outbox_models  # noqa: F401
+from backend.schemas.user import RoleCreate, UserCreate
+from backend.services.user.role_service import create_role, replace_role_permissions
+from backend.services.user.user_service import assign_role_to_user, create_user
+from backend.utils.security import create_access_token
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        db.execute(user_models.Permission.__table__.insert(), [{"name": name} for name in PERMISSIONS.values()])
+        db.execute(user_models.User.__table__.insert(), [{"username": "admin", "password": "x"}])
+        db.commit()
+        role = create_role(db, RoleCreate(name="admin"))
+        replace_role_permissions(db, role.id, [p.id for p in db.query(user_models.Permission).all()])
+        assign_role_to_user(db, 1, role.id)
+    finally:
+        db.close()
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    from backend.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def admin_headers():
+    return {"Authorization": "Bearer " + create_access_token({"sub": "admin", "user_id": 1})}
+
+
+@pytest.fixture
+def make_user(db):
+    """
+    创建一个没有角色的用户，返回 (用户ID, 认证请求头)
+    """
+    def factory(username):
+        user = create_user(db, UserCreate(username=username, password="password123"))
+        token = create_access_token({"sub": user.username, "user_id": user.id})
+        return user.id, {"Authorization": "Bearer " + token}
+
+    return factory
@@ -0,0 +1,27 @@
+"""
+资源 ACL 过滤端点测试
+"""
+
+from backend.constants.permissions import PERMISSIONS
+from backend.services.user.acl_service import grant_resource_access
+
+
+def _filter(client, headers, resource_ids):
+    response = client.post("/api/v1/acl/filter", headers=headers, json={
+        "resource_type": "document",
+        "permission": PERMISSIONS["USER_READ"],
+        "resource_ids": resource_ids,
+    })
+    assert response.status_code == 200
+    return response.json()["data"]["resource_ids"]
+
+
+def test_global_permission_grants_every_resource(client, admin_headers):
+    assert _filter(client, admin_headers, [3, 1, 3]) == [3, 1]
+
+
+def test_acl_grants_only_listed_resources(client, db, make_user):
+    user_id, headers = make_user("acl-reader")
+    grant_resource_access(db, "document", [2], PERMISSIONS["USER_READ"], "user", user_id)
+
+    assert _filter(client, headers, [1, 2, 3]) == [2]
@@ -0,0 +1,52 @@
+"""
+准入控制中间件测试：请求按实际挂载的路由分级
+"""
+
+from backend.config import settings
+from backend.utils.metrics import metrics
+
+
+def _admitted(priority):
+    return metrics.value("admission_admitted_total", priority=priority)
+
+
+def _assert_priority(client, method, path, priority, **kwargs):
+    before = {name: _admitted(name) for name in ("high", "normal", "low")}
+    client.request(method, path, **kwargs)
+    after = {name: _admitted(name) for name in ("high", "normal", "low")}
+    assert {name: after[name] - before[name] for name in after} == {
+        name: int(name == priority) for name in after
+    }
+
+
+def test_admin_listings_are_low_priority(client, admin_headers):
+    _assert_priority(client, "GET", "/api/v1/users/", "low", headers=admin_headers)
+    _assert_priority(client, "GET", "/api/v1/roles/1/members", "low", headers=admin_headers)
+    _assert_priority(client, "GET", "/api/v1/permissions/1/holders", "low", headers=admin_headers)
+
+
+def test_reads_of_single_resources_are_normal_priority(client, admin_headers):
+    _assert_priority(client, "GET", "/api/v1/users/1", "normal", headers=admin_headers)
+
+
+def test_login_is_high_priority(client):
+    _assert_priority(client, "POST", "/api/v1/login", "high", data={"username": "nobody", "password": "wrong"})
+
+
+def test_exempt_routes_bypass_admission(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    before = sum(_admitted(name) for name in ("high", "normal", "low"))
+    assert client.get("/metrics").status_code == 200
+    assert sum(_admitted(name) for name in ("high", "normal", "low")) == before
+
+
+def test_metrics_are_disabled_by_default_and_can_require_a_token(client, monkeypatch):
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-token")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200
+    assert "admission_admitted_total" in response.text
@@ -0,0 +1,151 @@
+"""
+登录认证测试：过时的密码哈希在登录成功时按当前配置重新保存且不修改 updated_at，用户不存在时同样执行一次哈希计算；
+登录限流按IP计算全部尝试，按 (IP, 用户名) 只计算失败的尝试，超限时返回 429 与 Retry-After
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select, update
+
+from backend.api.v1.user import auth as auth_api
+from backend.config import settings
+from backend.database.user_models import User
+from backend.services.user import auth_service
+from backend.services.user.auth_service import authenticate_user
+from backend.utils import rate_limit, security
+from backend.utils.rate_limit import LoginRateLimiter, TokenBucketLimiter
+from backend.utils.security import create_password_context
+
+_UPDATED_AT = datetime(2020, 1, 1, 12, 0, 0)
+
+
+def _store_hash(db, user_id, password_hash):
+    db.execute(update(User).where(User.id == user_id).values(password=password_hash, updated_at=_UPDATED_AT))
+    db.commit()
+
+
+def _stored(db, user_id):
+    return db.execute(select(User.password, User.updated_at).where(User.id == user_id)).one()
+
+
+@pytest.fixture
+def fast_context(monkeypatch):
+    # 当前配置：bcrypt 5 轮，sha256_crypt 只用于验证旧哈希
+    context = create_password_context(schemes=["bcrypt", "sha256_crypt"], bcrypt_rounds=5)
+    monkeypatch.setattr(security, "pwd_context", context)
+    return context
+
+
+@pytest.mark.parametrize("old_context", [
+    create_password_context(schemes=["bcrypt"], bcrypt_rounds=4),
+    create_password_context(schemes=["sha256_crypt"]),
+], ids=["lower-cost", "deprecated-scheme"])
+def test_outdated_hash_is_replaced_on_login_without_touching_updated_at(db, make_user, fast_context, old_context):
+    user_id, _ = make_user(f"rehash-{old_context.default_scheme()}")
+    username = db.get(User, user_id).username
+    _store_hash(db, user_id, old_context.hash("password123"))
+
+    assert authenticate_user(db, username, "password123").id == user_id
+    password_hash, updated_at = _stored(db, user_id)
+    assert password_hash.startswith("$2b$05$")
+    assert not fast_context.needs_update(password_hash)
+    assert updated_at.replace(tzinfo=None) == _UPDATED_AT
+
+    # 已是当前配置的哈希不再重写
+    assert authenticate_user(db, username, "password123").id == user_id
+    assert _stored(db, user_id).password == password_hash
+
+
+def test_failed_login_does_not_rehash(db, make_user, fast_context):
+    user_id, _ = make_user("rehash-wrong-password")
+    old_hash = create_password_context(schemes=["bcrypt"], bcrypt_rounds=4).hash("password123")
+    _store_hash(db, user_id, old_hash)
+
+    assert authenticate_user(db, "rehash-wrong-password", "wrong-password") is None
+    assert _stored(db, user_id).password == old_hash
+
+
+def test_unknown_user_still_performs_a_hash_verification(db, fast_context, monkeypatch):
+    calls = []
+
+    def spy():
+        calls.append(True)
+        security.dummy_verify_password()
+
+    monkeypatch.setattr(auth_service, "dummy_verify_password", spy)
+    assert authenticate_user(db, "no-such-user", "password123") is None
+    assert calls == [True]
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """
+    每个测试使用独立的进程内限流器：IP桶 3 个令牌，用户名桶 2 个令牌，补充极慢
+    """
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_IP_CAPACITY", 3)
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_USERNAME_CAPACITY", 2)
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_IP_REFILL_PER_SECOND", 0.001)
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_USERNAME_REFILL_PER_SECOND", 0.001)
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED_FOR", True)
+    rate_limiter = LoginRateLimiter()
+    monkeypatch.setattr(auth_api, "login_rate_limiter", rate_limiter)
+    return rate_limiter
+
+
+def _login(client, username, password, ip):
+    return client.post("/api/v1/login", data={"username": username, "password": password},
+                       headers={"X-Forwarded-For": ip})
+
+
+def test_token_bucket_refills_over_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    bucket = TokenBucketLimiter("refill-test", capacity=2, refill_per_second=0.5)
+
+    assert bucket.hit("key").allowed and bucket.hit("key").allowed
+    rejected = bucket.hit("key")
+    assert not rejected.allowed and rejected.retry_after == pytest.approx(2.0)
+    now[0] += 2.0
+    assert bucket.hit("key").allowed
+    # 补充不超过容量
+    now[0] += 60.0
+    assert bucket.hit("key").remaining == 1
+
+
+def test_failed_logins_exhaust_the_username_bucket(client, make_user, fast_context, limiter):
+    make_user("limited-user")
+
+    assert _login(client, "limited-user", "wrong", "10.0.0.1").status_code == 401
+    # 用户名不区分大小写
+    assert _login(client, "Limited-User", "wrong", "10.0.0.1").status_code == 401
+    response = _login(client, "LIMITED-USER", "password123", "10.0.0.1")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.headers["X-RateLimit-Remaining"] == "0"
+
+
+def test_successful_logins_do_not_consume_the_username_bucket(client, make_user, fast_context, limiter):
+    make_user("limited-success")
+
+    for ip in ("10.0.1.1", "10.0.1.2", "10.0.1.3"):
+        assert _login(client, "limited-success", "password123", ip).status_code == 200
+        assert _login(client, "limited-success", "password123", ip).status_code == 200
+
+
+def test_other_clients_cannot_lock_out_a_username(client, make_user, fast_context, limiter):
+    make_user("limited-target")
+    for _ in range(2):
+        assert _login(client, "limited-target", "wrong", "10.0.2.1").status_code == 401
+    assert _login(client, "limited-target", "wrong", "10.0.2.1").status_code == 429
+
+    assert _login(client, "limited-target", "password123", "10.0.2.2").status_code == 200
+
+
+def test_ip_bucket_counts_every_attempt(client, fast_context, limiter):
+    for name in ("ip-limited-a", "ip-limited-b", "ip-limited-c"):
+        assert _login(client, name, "wrong", "10.0.3.1").status_code == 401
+    response = _login(client, "ip-limited-d", "wrong", "10.0.3.1")
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    assert _login(client, "ip-limited-d", "wrong", "10.0.3.2").status_code == 401
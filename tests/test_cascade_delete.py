@@ -0,0 +1,104 @@
+"""
+级联删除测试：批次很小时删除角色、权限与用户也不留下任何关联行，并清理物化的有效权限
+"""
+
+import pytest
+from sqlalchemy import select
+
+from backend.config import settings
+from backend.constants.permissions import PERMISSIONS
+from backend.database.acl_models import ACL_SUBJECT_ROLE, ACL_SUBJECT_USER, ResourceAcl
+from backend.database.group_models import group_roles, group_users
+from backend.database.user_models import Permission, Role, User, role_permissions, user_effective_permissions, user_roles
+from backend.schemas.group import GroupCreate
+from backend.schemas.user import PermissionCreate, RoleCreate
+from backend.services.user.acl_service import grant_resource_access
+from backend.services.user.effective_permission_service import get_permission_ids
+from backend.services.user.group_service import add_group_members, create_group, replace_group_roles
+from backend.services.user.permission_service import create_permission
+from backend.services.user.role_service import create_role, replace_role_permissions
+from backend.services.user.user_service import assign_role_to_user
+
+acls = ResourceAcl.__table__
+uep = user_effective_permissions
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    # 每批只处理两行，迫使每个阶段跨越多个批次
+    monkeypatch.setattr(settings, "CASCADE_DELETE_BATCH_SIZE", 2)
+
+
+def _rows(db, table, *conditions):
+    return db.execute(select(table).where(*conditions)).all()
+
+
+def test_deleting_a_role_removes_every_link_and_effective_permission(client, db, make_user, admin_headers):
+    members = [make_user(f"cascade-role-member-{i}")[0] for i in range(5)]
+    group_member, _ = make_user("cascade-role-group-member")
+    role = create_role(db, RoleCreate(name="cascade-role")).id
+    replace_role_permissions(db, role, [1, 2, 3])
+    for user_id in members:
+        assign_role_to_user(db, user_id, role)
+    groups = [create_group(db, GroupCreate(name=f"cascade-role-group-{i}")).id for i in range(3)]
+    add_group_members(db, groups[0], [group_member])
+    for group in groups:
+        replace_group_roles(db, group, [role])
+    grant_resource_access(db, "document", [1, 2, 3], PERMISSIONS["USER_READ"], ACL_SUBJECT_ROLE, role)
+
+    response = client.delete(f"/api/v1/roles/{role}", headers=admin_headers)
+    assert response.status_code == 200
+    db.expire_all()
+
+    assert db.get(Role, role) is None
+    for table in (user_roles, group_roles, role_permissions):
+        assert _rows(db, table, table.c.role_id == role) == []
+    assert _rows(db, acls, acls.c.subject_type == ACL_SUBJECT_ROLE, acls.c.subject_id == role) == []
+    for user_id in members + [group_member]:
+        assert _rows(db, uep, uep.c.user_id == user_id) == []
+        assert get_permission_ids(db, user_id) == []
+
+
+def test_deleting_a_permission_removes_grants_and_effective_permissions(client, db, make_user, admin_headers):
+    permission_id = create_permission(db, PermissionCreate(name="cascade:permission")).id
+    holders = [make_user(f"cascade-permission-holder-{i}")[0] for i in range(3)]
+    for i, user_id in enumerate(holders):
+        role = create_role(db, RoleCreate(name=f"cascade-permission-role-{i}")).id
+        replace_role_permissions(db, role, [permission_id])
+        assign_role_to_user(db, user_id, role)
+    grant_resource_access(db, "document", [1, 2, 3], "cascade:permission", ACL_SUBJECT_USER, holders[0])
+    assert permission_id in get_permission_ids(db, holders[0])
+
+    response = client.delete(f"/api/v1/permissions/{permission_id}", headers=admin_headers)
+    assert response.status_code == 200
+    db.expire_all()
+
+    assert db.get(Permission, permission_id) is None
+    assert _rows(db, role_permissions, role_permissions.c.permission_id == permission_id) == []
+    assert _rows(db, uep, uep.c.permission_id == permission_id) == []
+    assert _rows(db, acls, acls.c.permission_id == permission_id) == []
+
+
+def test_deleting_a_user_removes_memberships_and_effective_permissions(client, db, make_user, admin_headers):
+    user_id, _ = make_user("cascade-user")
+    for i in range(3):
+        role = create_role(db, RoleCreate(name=f"cascade-user-role-{i}")).id
+        replace_role_permissions(db, role, [i + 1])
+        assign_role_to_user(db, user_id, role)
+    for i in range(3):
+        add_group_members(db, create_group(db, GroupCreate(name=f"cascade-user-group-{i}")).id, [user_id])
+    grant_resource_access(db, "document", [1, 2, 3], PERMISSIONS["USER_READ"], ACL_SUBJECT_USER, user_id)
+
+    response = client.delete(f"/api/v1/users/{user_id}", headers=admin_headers)
+    assert response.status_code == 200
+    db.expire_all()
+
+    assert db.get(User, user_id) is None
+    assert _rows(db, user_roles, user_roles.c.user_id == user_id) == []
+    assert _rows(db, group_users, group_users.c.user_id == user_id) == []
+    assert _rows(db, uep, uep.c.user_id == user_id) == []
+    assert _rows(db, acls, acls.c.subject_type == ACL_SUBJECT_USER, acls.c.subject_id == user_id) == []
+
+
+def test_deleting_a_missing_role_is_not_found(client, admin_headers):
+    assert client.delete("/api/v1/roles/999999", headers=admin_headers).status_code == 404
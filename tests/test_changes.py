@@ -0,0 +1,127 @@
+"""
+变更流测试：轮询与 SSE 推送，级联删除为移除的组角色与组成员记录事件，以及变更日志锁的获取顺序
+"""
+
+import asyncio
+
+from backend.database import SessionLocal, engine
+from backend.api.v1.user.changes import stream_changes
+from backend.schemas.group import GroupCreate
+from backend.schemas.user import RoleCreate
+from backend.services.user import cascade_service
+from backend.services.user.cascade_service import delete_group_cascade, delete_role_cascade
+from backend.services.user.change_feed import ChangeFeed
+from backend.services.user.group_service import add_child_group, add_group_members, create_group, replace_group_roles
+from backend.services.user.outbox_service import latest_sequence, read_events, record_change
+from backend.services.user.role_service import create_role
+from backend.services.user.principal_service import load_principal
+from backend.services.user.user_service import assign_role_to_user
+
+
+def test_changes_polling_is_reachable(client, admin_headers):
+    response = client.get("/api/v1/changes?since=0", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+
+
+def test_stream_releases_its_connection_before_streaming(db):
+    admin = load_principal(db, 1, "admin")
+    # 会话在认证时已取得连接
+    checked_out = engine.pool.checkedout()
+    assert checked_out >= 1
+
+    response = asyncio.run(stream_changes(since=None, last_event_id=None, db=db, current_user=admin))
+
+    assert response.media_type == "text/event-stream"
+    assert engine.pool.checkedout() == checked_out - 1
+
+
+class CountingChangeFeed(ChangeFeed):
+    pollers = 0
+
+    async def _loop(self):
+        self.pollers += 1
+        await super()._loop()
+
+
+def test_concurrent_subscribers_start_a_single_poller(db):
+    feed = CountingChangeFeed(SessionLocal, poll_interval=0.01, heartbeat_interval=0.05)
+
+    async def first_event(subscription):
+        async for change in subscription:
+            if change is not None:
+                return change["id"]
+
+    async def scenario():
+        subscriptions = [feed.subscribe(0) for _ in range(2)]
+        readers = [asyncio.create_task(first_event(subscription)) for subscription in subscriptions]
+        await asyncio.sleep(0.1)
+        record_change(db, "test.event")
+        db.commit()
+        results = await asyncio.wait_for(asyncio.gather(*readers), 5)
+        for subscription in subscriptions:
+            await subscription.aclose()
+        await feed.stop()
+        return results
+
+    first, second = asyncio.run(scenario())
+    assert first == second
+    assert feed.pollers == 1
+    buffered = [change["id"] for change in feed._buffer]
+    assert len(buffered) == len(set(buffered))
+
+
+def _events_since(db, since, event_type):
+    return [event for event in read_events(db, since, 1000) if event["event_type"] == event_type]
+
+
+def test_role_cascade_reports_group_members_who_lose_the_role(db, make_user):
+    members = [make_user(f"cascade-group-member-{i}")[0] for i in range(3)]
+    role = create_role(db, RoleCreate(name="cascade-group-role")).id
+    parent = create_group(db, GroupCreate(name="cascade-parent")).id
+    child = create_group(db, GroupCreate(name="cascade-child")).id
+    other = create_group(db, GroupCreate(name="cascade-other")).id
+    add_child_group(db, parent, child)
+    add_group_members(db, parent, members[:1])
+    add_group_members(db, child, members[1:2])
+    add_group_members(db, other, members[2:])
+    replace_group_roles(db, parent, [role])
+    replace_group_roles(db, other, [role])
+    since = latest_sequence(db)
+
+    delete_role_cascade(db, role, batch_size=1)
+    events = _events_since(db, since, "group_roles.removed")
+    assert {event["payload"]["group_id"]: event["payload"]["user_ids"] for event in events} == {
+        parent: sorted(members[:2]), other: members[2:],
+    }
+    assert all(event["payload"]["role_ids"] == [role] for event in events)
+
+
+def test_group_cascade_reports_every_removed_member(db, make_user):
+    members = sorted(make_user(f"cascade-deleted-member-{i}")[0] for i in range(5))
+    role = create_role(db, RoleCreate(name="cascade-deleted-group-role")).id
+    group = create_group(db, GroupCreate(name="cascade-deleted-group")).id
+    add_group_members(db, group, members)
+    replace_group_roles(db, group, [role])
+    since = latest_sequence(db)
+
+    delete_group_cascade(db, group, batch_size=2)
+    assert [event["payload"]["user_ids"] for event in _events_since(db, since, "group_roles.removed")] == [members]
+    removed = _events_since(db, since, "group_members.removed")
+    assert len(removed) == 3
+    assert sorted(user_id for event in removed for user_id in event["payload"]["user_ids"]) == members
+
+
+def test_role_cascade_takes_the_outbox_lock_after_membership_locks(db, make_user, monkeypatch):
+    user_id, _ = make_user("cascade-lock-order")
+    role_id = create_role(db, RoleCreate(name="cascade-lock-order-role")).id
+    assign_role_to_user(db, user_id, role_id)
+
+    calls = []
+    monkeypatch.setattr(cascade_service, "lock_memberships", lambda *args: calls.append("lock_memberships"))
+    monkeypatch.setattr(cascade_service, "record_change",
+                        lambda db, event_type, *args, **payload: calls.append(event_type))
+    delete_role_cascade(db, role_id)
+
+    # PostgreSQL 上 record_change 获取咨询锁，必须在成员关系行锁之后
+    assert calls.index("lock_memberships") < calls.index("user_roles.removed")
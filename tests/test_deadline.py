@@ -0,0 +1,62 @@
+"""
+请求截止时间中间件测试：按路由名称取预算，预算只约束到响应开始发送
+"""
+
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend.config import settings
+from backend.main import app
+from backend.middleware.deadline import DeadlineMiddleware
+from backend.utils.deadline import remaining
+
+
+def _scope(method, path, headers=()):
+    return {"type": "http", "app": app, "method": method, "path": path, "root_path": "", "headers": list(headers)}
+
+
+def test_sync_route_resolves_its_budget():
+    middleware = DeadlineMiddleware(app)
+    assert middleware.budget_for(_scope("POST", "/api/v1/users/sync")) == 300.0
+    assert middleware.budget_for(_scope("GET", "/api/v1/users/")) == 60.0
+    # 请求头可以缩短预算，但不能超过路由默认值与上限中的较大者
+    assert middleware.budget_for(_scope("POST", "/api/v1/users/sync", [(b"x-request-timeout", b"5")])) == 5.0
+    assert middleware.budget_for(_scope("POST", "/api/v1/users/sync", [(b"x-request-timeout", b"9999")])) == 300.0
+
+
+def _slow_app(monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_ROUTES", {"slow_endpoint": 0.1, "stream_endpoint": 0.1})
+    slow = FastAPI()
+    slow.add_middleware(DeadlineMiddleware)
+
+    @slow.get("/slow")
+    async def slow_endpoint():
+        await asyncio.sleep(1)
+        return {"ok": True}
+
+    @slow.get("/stream")
+    async def stream_endpoint():
+        async def body():
+            for _ in range(3):
+                await asyncio.sleep(0.1)
+                # 响应开始后截止时间已解除
+                yield b"x" if remaining() is None else b"!"
+        return StreamingResponse(body())
+
+    return slow
+
+
+def test_deadline_cancels_requests_before_first_byte(monkeypatch):
+    with TestClient(_slow_app(monkeypatch)) as client:
+        response = client.get("/slow")
+    assert response.status_code == 504
+
+
+def test_deadline_does_not_cut_streaming_bodies(monkeypatch):
+    with TestClient(_slow_app(monkeypatch)) as client:
+        response = client.get("/stream")
+    assert response.status_code == 200
+    assert response.content == b"xxx"
@@ -0,0 +1,73 @@
+"""
+目录同步测试：同一用户名重复出现时以最后一次记录（含角色）为准，全量同步不停用服务账户
+"""
+
+import json
+
+from sqlalchemy import select
+
+from backend.database.user_models import Role, User, user_roles
+from backend.schemas.directory import DirectoryUser
+from backend.schemas.user import RoleCreate
+from backend.services.user.directory_sync_service import sync_directory
+from backend.services.user.role_service import create_role
+from backend.services.user.service_account_service import create_service_account
+
+
+def _roles(client, headers, username):
+    users = client.get("/api/v1/users/search", headers=headers, params={"q": username}).json()["data"]["users"]
+    return [user["roles"] for user in users if user["username"] == username][0]
+
+
+def test_duplicate_usernames_keep_the_last_records_roles(client, db, admin_headers):
+    create_role(db, RoleCreate(name="sync-first"))
+    create_role(db, RoleCreate(name="sync-last"))
+    snapshot = {"users": [
+        {"username": "sync-duplicate", "roles": ["sync-first"]},
+        {"username": "sync-duplicate", "roles": ["sync-last"]},
+    ]}
+
+    response = client.post("/api/v1/users/sync?full=false", headers=admin_headers, json=snapshot)
+    assert response.status_code == 200
+    assert response.json()["data"]["total"] == 1
+    assert _roles(client, admin_headers, "sync-duplicate") == ["sync-last"]
+
+
+def test_ndjson_duplicates_across_lines_keep_the_last_record(client, db, admin_headers):
+    create_role(db, RoleCreate(name="sync-ndjson"))
+    lines = [
+        {"username": "sync-ndjson-user", "roles": ["sync-ndjson"]},
+        {"username": "sync-ndjson-user", "roles": []},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines)
+
+    response = client.post(
+        "/api/v1/users/sync?full=false", content=body,
+        headers={**admin_headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    assert _roles(client, admin_headers, "sync-ndjson-user") == []
+
+
+def _current_directory(db, exclude):
+    """
+    以数据库现状构造完整快照，使全量同步除 exclude 外不改变任何用户
+    """
+    names = {}
+    for user_id, role_name in db.execute(select(user_roles.c.user_id, Role.name).join(Role)).all():
+        names.setdefault(user_id, []).append(role_name)
+    return [
+        DirectoryUser(username=user.username, email=user.email, status=user.status, roles=names.get(user.id, []))
+        for user in db.query(User).all() if user.username not in exclude
+    ]
+
+
+def test_full_sync_keeps_service_accounts_active(db):
+    account = create_service_account(db, "svc-directory-sync")
+    records = _current_directory(db, exclude={"svc-directory-sync"})
+
+    result = sync_directory(db.get_bind(), records, full=True)
+
+    assert result.deactivated == 0
+    db.refresh(account)
+    assert account.status is True
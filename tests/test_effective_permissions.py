@@ -0,0 +1,113 @@
+"""
+有效权限物化表测试：经过成员与授权的增删与替换后与关联表推导的结果一致，空表在升级时回填
+"""
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.database.user_models import Permission, Role, User, user_roles, role_permissions
+from backend.database.user_models import user_effective_permissions as uep
+from backend.schemas.user import PermissionCreate, RoleCreate
+from backend.services.user import effective_permission_service
+from backend.services.user.effective_permission_service import backfill_effective_permissions
+from backend.services.user.permission_service import create_permission
+from backend.services.user.role_service import (
+    add_permission_to_role, create_role, remove_permission_from_role, replace_role_permissions
+)
+from backend.services.user.user_service import assign_role_to_user, remove_role_from_user, replace_user_roles
+
+
+def _materialized(db, user_ids):
+    return set(db.execute(select(uep.c.user_id, uep.c.permission_id).where(uep.c.user_id.in_(user_ids))).all())
+
+
+def _ground_truth(db, user_ids):
+    return set(db.execute(
+        select(user_roles.c.user_id, role_permissions.c.permission_id)
+        .join(role_permissions, role_permissions.c.role_id == user_roles.c.role_id)
+        .where(user_roles.c.expires_at.is_(None), user_roles.c.user_id.in_(user_ids))
+    ).all())
+
+
+def test_table_matches_joined_ground_truth_after_membership_and_grant_changes(db, make_user):
+    users = [make_user(f"uep-user-{i}")[0] for i in range(3)]
+    p1, p2, p3 = (create_permission(db, PermissionCreate(name=f"uep:perm-{i}")).id for i in range(3))
+    a = create_role(db, RoleCreate(name="uep-role-a")).id
+    b = create_role(db, RoleCreate(name="uep-role-b")).id
+
+    def check():
+        assert _materialized(db, users) == _ground_truth(db, users)
+
+    replace_role_permissions(db, a, [p1, p2])
+    replace_role_permissions(db, b, [p2])
+    assign_role_to_user(db, users[0], a)
+    assign_role_to_user(db, users[0], b)
+    assign_role_to_user(db, users[1], b)
+    check()
+
+    # p2 仍由角色 b 支撑
+    remove_role_from_user(db, users[0], a)
+    check()
+    assert (users[0], p2) in _materialized(db, users)
+
+    add_permission_to_role(db, b, p3)
+    remove_permission_from_role(db, b, p2)
+    check()
+
+    replace_user_roles(db, users[2], [a, b])
+    replace_role_permissions(db, a, [p3])
+    check()
+    replace_user_roles(db, users[2], [])
+    replace_user_roles(db, users[0], [a])
+    check()
+    assert _materialized(db, [users[2]]) == set()
+
+
+def test_locks_take_ordered_row_locks_on_postgresql(monkeypatch):
+    class RecordingSession:
+        def __init__(self):
+            self.statements = []
+
+        def execute(self, statement):
+            self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+
+    monkeypatch.setattr(effective_permission_service, "dialect_name", lambda bind: "postgresql")
+    db = RecordingSession()
+    effective_permission_service.lock_memberships(db, [1], [2])
+    effective_permission_service.lock_grants(db, [2], [3])
+
+    users, roles, grant_roles, permissions = db.statements
+    assert "FROM users" in users and users.endswith("ORDER BY users.id FOR NO KEY UPDATE")
+    assert "user_roles" in roles and roles.endswith("ORDER BY roles.id FOR SHARE")
+    assert grant_roles.endswith("ORDER BY roles.id FOR NO KEY UPDATE")
+    assert permissions.endswith("ORDER BY permissions.id FOR NO KEY UPDATE")
+
+
+def test_locks_are_skipped_on_sqlite(db, monkeypatch):
+    executed = []
+    monkeypatch.setattr(effective_permission_service, "_lock_rows", lambda *args, **kwargs: executed.append(args))
+    effective_permission_service.lock_memberships(db, [1], [1])
+    effective_permission_service.lock_grants(db, [1], [1])
+    assert executed == []
+
+
+def test_empty_table_is_backfilled_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'upgraded.db'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        session.add_all([User(id=1, username="legacy", password="x"), Role(id=1, name="legacy")])
+        session.add_all([Permission(id=1, name="legacy:read"), Permission(id=2, name="legacy:write")])
+        session.flush()
+        session.execute(user_roles.insert().values(user_id=1, role_id=1))
+        session.execute(role_permissions.insert(), [{"role_id": 1, "permission_id": 1}, {"role_id": 1, "permission_id": 2}])
+        session.commit()
+
+        assert backfill_effective_permissions(session)
+        assert set(session.execute(select(uep.c.user_id, uep.c.permission_id)).all()) == {(1, 1), (1, 2)}
+        assert not backfill_effective_permissions(session)
+    finally:
+        session.close()
+        engine.dispose()
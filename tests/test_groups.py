@@ -0,0 +1,121 @@
+"""
+用户组测试：端点，以及嵌套关系变化后闭包表的行与路径计数
+"""
+
+import pytest
+from sqlalchemy import or_, select
+
+from backend.database.group_models import group_children, group_closure
+from backend.schemas.group import GroupCreate
+from backend.services.user.group_service import add_child_group, create_group, delete_group, remove_child_group
+
+
+def test_groups_listing_is_reachable(client, admin_headers):
+    response = client.get("/api/v1/groups", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+
+
+def test_nested_group_members_are_listed_recursively(client, admin_headers, make_user):
+    user_id, _ = make_user("group-member")
+    parent = client.post("/api/v1/groups", headers=admin_headers, json={"name": "parent"}).json()["data"]
+    child = client.post("/api/v1/groups", headers=admin_headers, json={"name": "child"}).json()["data"]
+    assert client.put(f"/api/v1/groups/{parent['id']}/children/{child['id']}", headers=admin_headers).status_code == 200
+    assert client.post(
+        f"/api/v1/groups/{child['id']}/members", headers=admin_headers, json={"user_ids": [user_id]}
+    ).status_code == 200
+
+    response = client.get(f"/api/v1/groups/{parent['id']}/members?recursive=true", headers=admin_headers)
+    assert response.status_code == 200
+    assert [member["id"] for member in response.json()["data"]["users"]] == [user_id]
+
+
+def _groups(db, prefix, names):
+    return {name: create_group(db, GroupCreate(name=f"{prefix}-{name}")).id for name in names}
+
+
+def _closure(db, group_ids):
+    rows = db.execute(
+        select(group_closure.c.ancestor_id, group_closure.c.descendant_id, group_closure.c.path_count)
+        .where(or_(group_closure.c.ancestor_id.in_(group_ids), group_closure.c.descendant_id.in_(group_ids)))
+    ).all()
+    return {(ancestor, descendant): count for ancestor, descendant, count in rows}
+
+
+def _path_counts(db, group_ids):
+    """
+    由 group_children 逐条枚举路径得到的闭包（含每个组到自身的一条路径）
+    """
+    children = {}
+    for parent, child in db.execute(select(group_children.c.parent_id, group_children.c.child_id)).all():
+        children.setdefault(parent, []).append(child)
+    counts = {}
+
+    def walk(ancestor, node):
+        counts[(ancestor, node)] = counts.get((ancestor, node), 0) + 1
+        for child in children.get(node, ()):
+            walk(ancestor, child)
+
+    for group_id in group_ids:
+        walk(group_id, group_id)
+    return counts
+
+
+def test_closure_counts_every_path_through_a_diamond(db):
+    g = _groups(db, "diamond", ["top", "left", "right", "bottom", "leaf"])
+    ids = list(g.values())
+    for parent, child in [("top", "left"), ("top", "right"), ("left", "bottom"), ("right", "bottom"), ("bottom", "leaf")]:
+        assert add_child_group(db, g[parent], g[child])
+    closure = _closure(db, ids)
+    assert closure == _path_counts(db, ids)
+    assert closure[(g["top"], g["bottom"])] == 2
+    assert closure[(g["top"], g["leaf"])] == 2
+    assert closure[(g["left"], g["leaf"])] == 1
+
+    # 加入已存在的边不改变计数
+    assert add_child_group(db, g["left"], g["bottom"])
+    assert _closure(db, ids) == closure
+
+    assert remove_child_group(db, g["left"], g["bottom"])
+    closure = _closure(db, ids)
+    assert closure == _path_counts(db, ids)
+    assert closure[(g["top"], g["leaf"])] == 1
+    assert (g["left"], g["bottom"]) not in closure and (g["left"], g["leaf"]) not in closure
+
+    assert remove_child_group(db, g["right"], g["bottom"])
+    closure = _closure(db, ids)
+    assert closure == _path_counts(db, ids)
+    assert (g["top"], g["bottom"]) not in closure
+    assert not remove_child_group(db, g["right"], g["bottom"])
+
+
+def test_cycles_are_rejected_without_touching_the_closure(db):
+    g = _groups(db, "cycle", ["a", "b", "c"])
+    ids = list(g.values())
+    assert add_child_group(db, g["a"], g["b"])
+    assert add_child_group(db, g["b"], g["c"])
+    closure = _closure(db, ids)
+
+    for parent, child in [("c", "a"), ("b", "a"), ("a", "a")]:
+        with pytest.raises(ValueError):
+            add_child_group(db, g[parent], g[child])
+    assert _closure(db, ids) == closure
+    assert closure == _path_counts(db, ids)
+
+
+def test_deleting_a_middle_group_detaches_its_edges(db):
+    g = _groups(db, "detach", ["root", "middle", "side", "leaf"])
+    ids = list(g.values())
+    for parent, child in [("root", "middle"), ("root", "side"), ("middle", "leaf"), ("side", "leaf")]:
+        assert add_child_group(db, g[parent], g[child])
+    assert _closure(db, ids)[(g["root"], g["leaf"])] == 2
+
+    assert delete_group(db, g["middle"])
+    remaining = [g["root"], g["side"], g["leaf"]]
+    closure = _closure(db, ids)
+    assert closure == _path_counts(db, remaining)
+    assert closure[(g["root"], g["leaf"])] == 1
+    assert not any(g["middle"] in key for key in closure)
+    assert db.execute(select(group_children).where(or_(
+        group_children.c.parent_id == g["middle"], group_children.c.child_id == g["middle"]
+    ))).all() == []
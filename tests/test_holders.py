@@ -0,0 +1,90 @@
+"""
+角色成员与权限持有者端点测试：持有者包含直接角色、临时角色与嵌套用户组带来的权限，按用户ID游标分页且不重复
+"""
+
+import itertools
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.schemas.group import GroupCreate
+from backend.schemas.user import PermissionCreate, RoleCreate
+from backend.services.user.group_service import add_child_group, add_group_members, create_group, replace_group_roles
+from backend.services.user.permission_service import create_permission
+from backend.services.user.role_service import create_role, replace_role_permissions
+from backend.services.user.user_service import assign_role_to_user
+
+# 每次构造场景使用不同的名称前缀，名称在整个测试会话中唯一
+_scenarios = itertools.count()
+
+
+@pytest.fixture
+def granted(db, make_user):
+    """
+    一个权限与持有它的角色，以及通过不同途径持有该权限的用户
+    """
+    prefix = f"holders-{next(_scenarios)}"
+    permission = create_permission(db, PermissionCreate(name=f"{prefix}:read")).id
+    role = create_role(db, RoleCreate(name=f"{prefix}-role")).id
+    replace_role_permissions(db, role, [permission])
+
+    direct, _ = make_user(f"{prefix}-direct")
+    temporary, _ = make_user(f"{prefix}-temporary")
+    nested, _ = make_user(f"{prefix}-nested")
+    both, _ = make_user(f"{prefix}-both")
+    make_user(f"{prefix}-none")
+    assign_role_to_user(db, direct, role)
+    assign_role_to_user(db, temporary, role, datetime.now(timezone.utc) + timedelta(hours=1))
+    assign_role_to_user(db, both, role)
+
+    # 角色授予父组，用户只是子组的成员
+    parent = create_group(db, GroupCreate(name=f"{prefix}-parent")).id
+    child = create_group(db, GroupCreate(name=f"{prefix}-child")).id
+    add_child_group(db, parent, child)
+    add_group_members(db, child, [nested, both])
+    replace_group_roles(db, parent, [role])
+    return {"permission": permission, "role": role, "holders": sorted([direct, temporary, nested, both]),
+            "members": sorted([direct, temporary, both])}
+
+
+def _pages(client, headers, url, limit):
+    ids, cursor = [], 0
+    while cursor is not None:
+        data = client.get(url, headers=headers, params={"cursor": cursor, "limit": limit}).json()["data"]
+        page = [user["id"] for user in data["users"]]
+        assert len(page) <= limit
+        ids.extend(page)
+        cursor = data["next_cursor"]
+    return ids
+
+
+def test_permission_holders_cover_every_grant_path(client, admin_headers, granted):
+    url = f"/api/v1/permissions/{granted['permission']}/holders"
+
+    users = client.get(url, headers=admin_headers).json()["data"]["users"]
+    assert [user["id"] for user in users] == granted["holders"]
+    assert client.get(url, headers=admin_headers, params={"count_only": True}).json()["data"] == {"total": 4}
+
+
+def test_permission_holders_paginate_without_gaps_or_duplicates(client, admin_headers, granted):
+    url = f"/api/v1/permissions/{granted['permission']}/holders"
+    for limit in (1, 2, 3):
+        assert _pages(client, admin_headers, url, limit) == granted["holders"]
+
+
+def test_role_members_list_direct_and_temporary_assignments(client, admin_headers, granted):
+    url = f"/api/v1/roles/{granted['role']}/members"
+
+    assert _pages(client, admin_headers, url, 2) == granted["members"]
+    assert client.get(url, headers=admin_headers, params={"count_only": True}).json()["data"] == {"total": 3}
+
+
+def test_listing_requires_both_read_permissions(client, make_user, granted):
+    _, headers = make_user("holders-reader")
+    response = client.get(f"/api/v1/permissions/{granted['permission']}/holders", headers=headers)
+    assert response.status_code == 403
+
+
+def test_missing_permission_and_role_are_not_found(client, admin_headers):
+    assert client.get("/api/v1/permissions/999999/holders", headers=admin_headers).status_code == 404
+    assert client.get("/api/v1/roles/999999/members", headers=admin_headers).status_code == 404
@@ -0,0 +1,66 @@
+"""
+重复写入测试：重复分配角色或授予权限是无操作，不抛出 IntegrityError，不产生新的变更事件或版本递增
+"""
+
+from sqlalchemy import func, select
+
+from backend.database.user_models import role_permissions, user_roles
+from backend.database.version_models import ROLES_VERSION, USERS_VERSION
+from backend.schemas.user import RoleCreate
+from backend.services.user.outbox_service import latest_sequence
+from backend.services.user.role_service import add_permission_to_role, create_role
+from backend.services.user.table_version_service import get_versions
+from backend.services.user.user_service import assign_role_to_user
+
+
+def _count(db, table, **values):
+    return db.execute(
+        select(func.count()).select_from(table).where(*(table.c[name] == value for name, value in values.items()))
+    ).scalar()
+
+
+def test_assigning_a_role_twice_is_a_no_op(db, make_user):
+    user_id, _ = make_user("duplicate-assign")
+    role = create_role(db, RoleCreate(name="duplicate-assign-role")).id
+    assert assign_role_to_user(db, user_id, role) is True
+    sequence, versions = latest_sequence(db), get_versions(db, [USERS_VERSION])
+
+    assert assign_role_to_user(db, user_id, role) is True
+
+    assert _count(db, user_roles, user_id=user_id, role_id=role) == 1
+    assert latest_sequence(db) == sequence
+    assert get_versions(db, [USERS_VERSION]) == versions
+
+
+def test_granting_a_permission_twice_is_a_no_op(db):
+    role = create_role(db, RoleCreate(name="duplicate-grant-role")).id
+    assert add_permission_to_role(db, role, 1) is True
+    sequence, versions = latest_sequence(db), get_versions(db, [ROLES_VERSION])
+
+    assert add_permission_to_role(db, role, 1) is True
+
+    assert _count(db, role_permissions, role_id=role, permission_id=1) == 1
+    assert latest_sequence(db) == sequence
+    assert get_versions(db, [ROLES_VERSION]) == versions
+
+
+def test_duplicate_requests_succeed_through_the_api(client, db, make_user, admin_headers):
+    user_id, _ = make_user("duplicate-api")
+    role = create_role(db, RoleCreate(name="duplicate-api-role")).id
+
+    for _ in range(2):
+        assert client.post(f"/api/v1/users/{user_id}/roles/{role}", headers=admin_headers).status_code == 200
+        assert client.post(f"/api/v1/roles/{role}/permissions/2", headers=admin_headers).status_code == 200
+    assert _count(db, user_roles, user_id=user_id, role_id=role) == 1
+    assert _count(db, role_permissions, role_id=role, permission_id=2) == 1
+
+
+def test_missing_targets_are_reported_without_inserting(db, make_user):
+    user_id, _ = make_user("duplicate-missing")
+    role = create_role(db, RoleCreate(name="duplicate-missing-role")).id
+
+    assert assign_role_to_user(db, user_id, 999999) is False
+    assert assign_role_to_user(db, 999999, role) is False
+    assert add_permission_to_role(db, role, 999999) is False
+    assert _count(db, user_roles, user_id=user_id) == 0
+    assert _count(db, role_permissions, role_id=role) == 0
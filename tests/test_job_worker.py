@@ -0,0 +1,43 @@
+"""
+任务工作者测试：领取期间收到的唤醒通知不会被其他空闲的工作协程吞掉
+"""
+
+import asyncio
+import threading
+
+from backend.services.user.job_worker import JobWorker
+
+
+def test_notification_during_a_claim_is_not_lost(monkeypatch):
+    worker = JobWorker(concurrency=2, poll_interval=60)
+    claims = {0: 0, 1: 0}
+    gate = threading.Event()
+
+    def claim(worker_id):
+        index = int(worker_id.rsplit("#", 1)[1])
+        claims[index] += 1
+        if index == 1 and claims[1] == 1:
+            # 第二个工作协程的第一次领取在通知到达之后才结束
+            gate.wait(5)
+        return None
+
+    monkeypatch.setattr(worker, "_claim", claim)
+
+    async def scenario():
+        await worker.start()
+        try:
+            await asyncio.sleep(0.1)
+            worker.notify()
+            # 让空闲的第一个工作协程先被唤醒并再次领取
+            await asyncio.sleep(0.1)
+            gate.set()
+            for _ in range(100):
+                if claims[1] >= 2:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await worker.stop()
+
+    asyncio.run(scenario())
+    assert claims[0] >= 2
+    assert claims[1] >= 2
@@ -0,0 +1,82 @@
+"""
+后台任务测试：任务按与服务层相同的分批阶段执行，中途不留下孤立的关联，并容忍并发写入的相同关联
+"""
+
+from sqlalchemy import func, select
+
+from backend.config import settings
+from backend.constants.permissions import PERMISSIONS
+from backend.database import SessionLocal
+from backend.database.acl_models import ACL_SUBJECT_ROLE, ResourceAcl
+from backend.database.group_models import group_roles
+from backend.database.job_models import JOB_SUCCEEDED
+from backend.database.user_models import Role, role_permissions, user_roles
+from backend.schemas.group import GroupCreate
+from backend.schemas.user import PermissionCreate, RoleCreate
+from backend.services.user import job_service
+from backend.services.user.acl_service import grant_resource_access
+from backend.services.user.effective_permission_service import get_permission_ids
+from backend.services.user.group_service import add_group_members, create_group, replace_group_roles
+from backend.services.user.job_service import claim_next_job, enqueue_job, get_job_by_id, run_job
+from backend.services.user.permission_service import create_permission
+from backend.services.user.role_service import create_role, replace_role_permissions
+from backend.services.user.user_service import assign_role_to_user
+
+
+def _run(db, job_type, params):
+    job_id = enqueue_job(db, job_type, params).id
+    while get_job_by_id(db, job_id).finished_at is None:
+        claimed = claim_next_job(db, "test-worker")
+        assert claimed is not None
+        run_job(SessionLocal, claimed, "test-worker")
+        db.expire_all()
+    return get_job_by_id(db, job_id)
+
+
+def test_role_delete_job_removes_group_links_in_small_chunks(db, make_user, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_CHUNK_SIZE", 1)
+    direct, _ = make_user("job-direct")
+    member, _ = make_user("job-group-member")
+    role = create_role(db, RoleCreate(name="job-deleted-role")).id
+    replace_role_permissions(db, role, [1, 2])
+    assign_role_to_user(db, direct, role)
+    groups = [create_group(db, GroupCreate(name=f"job-group-{i}")).id for i in range(2)]
+    add_group_members(db, groups[0], [member])
+    for group in groups:
+        replace_group_roles(db, group, [role])
+
+    assert _run(db, "role_delete", {"role_id": role}).status == JOB_SUCCEEDED
+    assert db.get(Role, role) is None
+    for table in (user_roles, group_roles, role_permissions):
+        assert db.execute(select(table).where(table.c.role_id == role)).all() == []
+    assert get_permission_ids(db, direct) == []
+    assert get_permission_ids(db, member) == []
+
+
+def test_role_delete_job_removes_the_roles_resource_grants(db, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_CHUNK_SIZE", 2)
+    role = create_role(db, RoleCreate(name="job-acl-role")).id
+    grant_resource_access(db, "document", [1, 2, 3], PERMISSIONS["USER_READ"], ACL_SUBJECT_ROLE, role)
+
+    assert _run(db, "role_delete", {"role_id": role}).status == JOB_SUCCEEDED
+    acls = ResourceAcl.__table__
+    assert db.execute(select(acls).where(acls.c.subject_type == ACL_SUBJECT_ROLE, acls.c.subject_id == role)).all() == []
+
+
+def test_grant_all_job_skips_grants_inserted_concurrently(db, make_user, monkeypatch):
+    user_id, _ = make_user("job-grant-all-member")
+    role = create_role(db, RoleCreate(name="job-grant-all-role")).id
+    assign_role_to_user(db, user_id, role)
+    permission = create_permission(db, PermissionCreate(name="job:grant-all")).id
+
+    def concurrent_grant(session, role_ids, permission_ids):
+        # 模拟另一个事务在存在性检查之后插入了同一授权
+        if role in role_ids:
+            session.execute(role_permissions.insert().values(role_id=role, permission_id=permission))
+
+    monkeypatch.setattr(job_service, "lock_grants", concurrent_grant)
+    assert _run(db, "permission_grant_all", {"permission_id": permission}).status == JOB_SUCCEEDED
+    grants = db.execute(
+        select(func.count()).select_from(role_permissions).where(role_permissions.c.permission_id == permission)
+    ).scalar()
+    assert grants == db.execute(select(func.count()).select_from(Role)).scalar()
@@ -0,0 +1,85 @@
+"""
+权限目录测试：其他进程删除或重命名权限后，本进程的目录在下一次版本比较时不再返回旧条目；
+版本比较按间隔节流，间隔内的查询不访问数据库
+"""
+
+import time
+
+import pytest
+from sqlalchemy import update
+
+from backend.database.user_models import Permission
+from backend.database.version_models import PERMISSIONS_VERSION
+from backend.schemas.user import PermissionCreate, PermissionUpdate
+from backend.services.user.cascade_service import delete_permission_cascade
+from backend.services.user import permission_catalog as catalog_module
+from backend.services.user.permission_catalog import PermissionCatalog, permission_catalog
+from backend.services.user.permission_service import (
+    create_permission, get_permission_by_id, get_permission_by_name, update_permission
+)
+from backend.services.user.table_version_service import bump_versions
+
+
+@pytest.fixture(autouse=True)
+def check_every_use(monkeypatch):
+    # 以下测试关注版本比较本身：每次使用目录都比较版本
+    monkeypatch.setattr(permission_catalog, "version_check_seconds", 0)
+
+
+def _rename_elsewhere(db, permission_id, name):
+    # 模拟其他工作进程的写入：修改数据库并递增版本，但不经过本进程的目录
+    db.execute(update(Permission.__table__).where(Permission.id == permission_id).values(name=name))
+    bump_versions(db, PERMISSIONS_VERSION)
+    db.commit()
+
+
+def test_deletion_in_another_worker_is_not_served_from_the_catalog(db):
+    permission_id = create_permission(db, PermissionCreate(name="catalog:deleted")).id
+    permission_catalog.ensure_fresh(db)
+    assert permission_catalog.get(permission_id) is not None
+
+    delete_permission_cascade(db, permission_id)
+    assert get_permission_by_id(db, permission_id) is None
+    assert get_permission_by_name(db, "catalog:deleted") is None
+
+
+def test_rename_in_another_worker_is_visible_to_reads_and_writes(db):
+    permission_id = create_permission(db, PermissionCreate(name="catalog:old")).id
+    assert get_permission_by_id(db, permission_id).name == "catalog:old"
+
+    _rename_elsewhere(db, permission_id, "catalog:new")
+    assert get_permission_by_name(db, "catalog:old") is None
+    assert get_permission_by_name(db, "catalog:new").id == permission_id
+
+    # 会话中已挂着旧实例，更新仍基于数据库中的行
+    updated = update_permission(db, permission_id, PermissionUpdate(description="renamed elsewhere"))
+    assert (updated.name, updated.description) == ("catalog:new", "renamed elsewhere")
+
+
+def test_update_after_deletion_in_another_worker_reports_not_found(db):
+    permission_id = create_permission(db, PermissionCreate(name="catalog:gone")).id
+    assert get_permission_by_id(db, permission_id) is not None
+
+    delete_permission_cascade(db, permission_id)
+    assert update_permission(db, permission_id, PermissionUpdate(description="x")) is None
+
+
+def test_version_check_is_throttled_within_the_interval(db, monkeypatch):
+    checks = []
+    data_version = catalog_module._data_version
+    monkeypatch.setattr(catalog_module, "_data_version", lambda session: checks.append(1) or data_version(session))
+    catalog = PermissionCatalog(version_check_seconds=0.2)
+    permission_id = create_permission(db, PermissionCreate(name="catalog:throttled")).id
+    catalog.ensure_fresh(db)
+    loads = len(checks)
+
+    _rename_elsewhere(db, permission_id, "catalog:throttled-renamed")
+    for _ in range(5):
+        catalog.ensure_fresh(db)
+    # 间隔内不读取版本，仍返回旧名称
+    assert len(checks) == loads
+    assert catalog.get_name(permission_id) == "catalog:throttled"
+
+    time.sleep(0.25)
+    catalog.ensure_fresh(db)
+    assert catalog.get_name(permission_id) == "catalog:throttled-renamed"
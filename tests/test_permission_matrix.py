@@ -0,0 +1,113 @@
+"""
+共享权限矩阵测试：按变更事件原地更新受影响的行，无法增量应用时重建，读取时只检查确认时间
+"""
+
+import os
+
+from backend.config import settings
+from backend.schemas.group import GroupCreate
+from backend.schemas.user import PermissionCreate, RoleCreate
+from backend.services.user.group_service import (
+    add_child_group, add_group_members, create_group, delete_group, replace_group_roles
+)
+from backend.services.user.permission_matrix import PermissionMatrix, ensure_matrix
+from backend.services.user.permission_service import create_permission, delete_permission
+from backend.services.user.role_service import (
+    add_permission_to_role, create_role, delete_role, replace_role_permissions
+)
+from backend.services.user.user_service import assign_role_to_user, remove_role_from_user
+
+
+def _matrix(db, tmp_path):
+    path = str(tmp_path / "matrix")
+    assert ensure_matrix(db, path)
+    matrix = PermissionMatrix(path)
+    assert matrix.refresh()
+    return matrix
+
+
+def test_changes_are_patched_into_the_mapped_rows(db, make_user, tmp_path):
+    direct, _ = make_user("matrix-direct")
+    member, _ = make_user("matrix-member")
+    p1, p2 = (create_permission(db, PermissionCreate(name=f"matrix:perm-{i}")).id for i in range(2))
+    role = create_role(db, RoleCreate(name="matrix-role")).id
+    replace_role_permissions(db, role, [p1])
+    assign_role_to_user(db, direct, role)
+
+    matrix = _matrix(db, tmp_path)
+    inode = os.stat(matrix.path).st_ino
+    assert matrix.lookup(direct) == {p1}
+    assert matrix.lookup(member) == frozenset()
+
+    parent = create_group(db, GroupCreate(name="matrix-parent")).id
+    child = create_group(db, GroupCreate(name="matrix-child")).id
+    add_group_members(db, child, [member])
+    replace_group_roles(db, parent, [role])
+    add_child_group(db, parent, child)
+    add_permission_to_role(db, role, p2)
+    remove_role_from_user(db, direct, role)
+    # 刷新之前仍返回已确认的内容
+    assert matrix.lookup(direct) == {p1}
+
+    assert not ensure_matrix(db, matrix.path)
+    assert os.stat(matrix.path).st_ino == inode
+    assert matrix.lookup(direct) == frozenset()
+    assert matrix.lookup(member) == {p1, p2}
+
+
+def test_permission_deletion_rebuilds_the_matrix(db, make_user, tmp_path):
+    user_id, _ = make_user("matrix-rebuild")
+    permission = create_permission(db, PermissionCreate(name="matrix:deleted")).id
+    role = create_role(db, RoleCreate(name="matrix-rebuild-role")).id
+    replace_role_permissions(db, role, [permission])
+    assign_role_to_user(db, user_id, role)
+    matrix = _matrix(db, tmp_path)
+    assert matrix.lookup(user_id) == {permission}
+
+    delete_permission(db, permission)
+    assert ensure_matrix(db, matrix.path)
+    assert matrix.refresh()
+    assert matrix.lookup(user_id) == frozenset()
+
+
+def test_unconfirmed_matrix_and_unknown_users_fall_back(db, make_user, tmp_path, monkeypatch):
+    user_id, _ = make_user("matrix-stale")
+    matrix = _matrix(db, tmp_path)
+    assert matrix.lookup(user_id) == frozenset()
+    assert matrix.lookup(10 ** 9) is None
+
+    monkeypatch.setattr(settings, "PERMISSION_MATRIX_MAX_STALENESS_SECONDS", -1.0)
+    assert matrix.lookup(user_id) is None
+
+
+def _group_granted_user(db, make_user, name):
+    user_id, _ = make_user(f"{name}-user")
+    permission = create_permission(db, PermissionCreate(name=f"matrix:{name}")).id
+    role = create_role(db, RoleCreate(name=f"{name}-role")).id
+    replace_role_permissions(db, role, [permission])
+    group = create_group(db, GroupCreate(name=f"{name}-group")).id
+    add_group_members(db, group, [user_id])
+    replace_group_roles(db, group, [role])
+    return user_id, permission, role, group
+
+
+def test_deleting_a_group_granted_role_revokes_it_from_the_matrix(db, make_user, tmp_path):
+    user_id, permission, role, _ = _group_granted_user(db, make_user, "matrix-role-delete")
+    matrix = _matrix(db, tmp_path)
+    assert matrix.lookup(user_id) == {permission}
+
+    delete_role(db, role)
+    assert ensure_matrix(db, matrix.path)
+    assert matrix.refresh()
+    assert matrix.lookup(user_id) == frozenset()
+
+
+def test_deleting_a_group_with_roles_revokes_them_from_the_matrix(db, make_user, tmp_path):
+    user_id, permission, _, group = _group_granted_user(db, make_user, "matrix-group-delete")
+    matrix = _matrix(db, tmp_path)
+    assert matrix.lookup(user_id) == {permission}
+
+    delete_group(db, group)
+    assert ensure_matrix(db, matrix.path)
+    assert matrix.refresh()
+    assert matrix.lookup(user_id) == frozenset()
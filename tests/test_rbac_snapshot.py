@@ -0,0 +1,112 @@
+"""
+RBAC 快照测试：序列化往返不丢失内容，损坏的文件被拒绝，过期的快照不用于预热，
+按快照计算的用户权限与数据库路径一致（包括经嵌套用户组闭包获得的权限）
+"""
+
+import itertools
+
+import pytest
+
+from backend.database.version_models import ROLES_VERSION
+from backend.schemas.group import GroupCreate
+from backend.schemas.user import RoleCreate
+from backend.services.user import rbac_snapshot_service
+from backend.services.user.effective_permission_service import iter_user_permission_ids
+from backend.services.user.group_service import add_child_group, add_group_members, create_group, replace_group_roles
+from backend.services.user.rbac_snapshot_service import (
+    SnapshotError, dumps, export_snapshot, loads, warm_from_snapshot, write_snapshot
+)
+from backend.services.user.role_service import create_role, replace_role_permissions
+from backend.services.user.table_version_service import bump_versions
+from backend.services.user.user_service import assign_role_to_user
+
+_SECTIONS = rbac_snapshot_service._INT_SECTIONS + rbac_snapshot_service._STRING_SECTIONS
+# 每次构造场景使用不同的名称前缀，名称在整个测试会话中唯一
+_scenarios = itertools.count()
+
+
+@pytest.fixture
+def nested_groups(db, make_user):
+    """
+    三层嵌套的用户组，角色分别授予顶层组与中间组，另有一个直接分配角色的用户
+    """
+    prefix = f"snapshot-{next(_scenarios)}"
+    roles = [create_role(db, RoleCreate(name=f"{prefix}-role-{i}")).id for i in range(3)]
+    for i, role in enumerate(roles):
+        replace_role_permissions(db, role, [i + 1, i + 2])
+    top, middle, leaf = (create_group(db, GroupCreate(name=f"{prefix}-{name}")).id for name in ("top", "middle", "leaf"))
+    add_child_group(db, top, middle)
+    add_child_group(db, middle, leaf)
+    replace_group_roles(db, top, [roles[0]])
+    replace_group_roles(db, middle, [roles[1]])
+
+    leaf_member, _ = make_user(f"{prefix}-leaf-member")
+    middle_member, _ = make_user(f"{prefix}-middle-member")
+    direct, _ = make_user(f"{prefix}-direct")
+    add_group_members(db, leaf, [leaf_member])
+    add_group_members(db, middle, [middle_member])
+    assign_role_to_user(db, direct, roles[2])
+    assign_role_to_user(db, leaf_member, roles[2])
+    return [leaf_member, middle_member, direct]
+
+
+def test_dumps_and_loads_round_trip(db, nested_groups):
+    snapshot = export_snapshot(db)
+
+    restored = loads(dumps(snapshot))
+
+    assert restored.versions == snapshot.versions
+    assert restored.created_at == snapshot.created_at
+    for name in _SECTIONS:
+        assert list(getattr(restored, name)) == list(getattr(snapshot, name)), name
+    assert restored.counts() == snapshot.counts()
+
+
+@pytest.mark.parametrize("corrupt, message", [
+    (lambda data: b"NOTRBAC!" + data[8:], "不是 RBAC 快照文件"),
+    (lambda data: data[:-1] + bytes([data[-1] ^ 0xFF]), "快照校验和不匹配"),
+    (lambda data: data[:-10], "快照校验和不匹配"),
+    (lambda data: data[:20], "快照文件不完整"),
+], ids=["magic", "flipped-byte", "truncated-payload", "truncated-header"])
+def test_corrupted_snapshot_is_rejected(db, corrupt, message):
+    data = dumps(export_snapshot(db))
+    with pytest.raises(SnapshotError, match=message):
+        loads(corrupt(data))
+
+
+def test_stale_snapshot_is_not_used_to_warm(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(rbac_snapshot_service, "_installed", None)
+    path = str(tmp_path / "rbac.snapshot")
+    write_snapshot(path, export_snapshot(db))
+    assert warm_from_snapshot(db, path) is not None
+
+    bump_versions(db, ROLES_VERSION)
+    db.commit()
+
+    monkeypatch.setattr(rbac_snapshot_service, "_installed", None)
+    assert warm_from_snapshot(db, path) is None
+    assert rbac_snapshot_service.installed_snapshot() is None
+
+
+def test_corrupted_file_is_not_used_to_warm(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(rbac_snapshot_service, "_installed", None)
+    path = tmp_path / "rbac.snapshot"
+    path.write_bytes(b"RBACSNP1 but not really")
+    assert warm_from_snapshot(db, str(path)) is None
+    assert warm_from_snapshot(db, str(tmp_path / "missing.snapshot")) is None
+
+
+def test_snapshot_expands_group_closure_like_the_database(db, nested_groups):
+    from_snapshot = {
+        user_id: permission_ids
+        for user_id, permission_ids in export_snapshot(db).iter_user_permissions() if user_id in nested_groups
+    }
+    from_database = {
+        user_id: set(permission_ids) for user_id, permission_ids in iter_user_permission_ids(db, user_ids=nested_groups)
+    }
+
+    assert from_snapshot == from_database
+    # 叶子组成员同时获得顶层组、中间组与直接分配的角色
+    assert from_snapshot[nested_groups[0]] == {1, 2, 3, 4}
+    assert from_snapshot[nested_groups[1]] == {1, 2, 3}
+    assert from_snapshot[nested_groups[2]] == {3, 4}
@@ -0,0 +1,206 @@
+"""
+临时角色分配测试：到期后即使清理尚未运行，权限矩阵、按版本生成的缓存与 User.roles 也不再返回该分配
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+
+from backend.database import SessionLocal
+from backend.database.outbox_models import OutboxEvent
+from backend.database.user_models import Role, User, user_roles
+from backend.database.version_models import USERS_VERSION
+from backend.schemas.user import RoleCreate
+from backend.services.user import principal_service
+from backend.services.user.effective_permission_service import get_permission_ids
+from backend.services.user.outbox_service import latest_sequence
+from backend.services.user.permission_matrix import PermissionMatrix, ensure_matrix
+from backend.services.user.role_expiry_scheduler import RoleExpiryScheduler
+from backend.services.user.role_service import create_role, replace_role_permissions
+from backend.services.user.table_version_service import get_versions
+from backend.services.user.user_service import (
+    assign_role_to_user, expire_role_assignments, get_user_cache_key, remove_role_from_user, replace_user_roles
+)
+
+
+def _assign_temporary_role(db, user_id, role_name):
+    role = create_role(db, RoleCreate(name=role_name))
+    assign_role_to_user(db, user_id, role.id, datetime.now(timezone.utc) + timedelta(hours=1))
+    return role.id
+
+
+def _lapse(db, user_id, role_id):
+    # 模拟到期时间已过而清理尚未运行：直接改写到期时间，不递增版本
+    db.execute(
+        update(user_roles)
+        .where(user_roles.c.user_id == user_id, user_roles.c.role_id == role_id)
+        .values(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+    )
+    db.commit()
+
+
+def test_matrix_is_bypassed_for_users_with_temporary_roles(db, make_user, monkeypatch, tmp_path):
+    temporary_id, _ = make_user("matrix-temporary")
+    permanent_id, _ = make_user("matrix-permanent")
+    temporary_role = _assign_temporary_role(db, temporary_id, "matrix-temporary-role")
+    permanent_role = create_role(db, RoleCreate(name="matrix-permanent-role")).id
+    replace_role_permissions(db, permanent_role, [1])
+
+    matrix = PermissionMatrix(str(tmp_path / "matrix"))
+    ensure_matrix(db, matrix.path)
+    matrix.refresh()
+    monkeypatch.setattr(principal_service, "permission_matrix", matrix)
+    replace_role_permissions(db, temporary_role, [1])
+    assign_role_to_user(db, permanent_id, permanent_role)
+
+    # 矩阵尚未刷新：永久分配的变更在刷新前不可见，有临时分配的用户始终从数据库读取
+    assert principal_service._fetch_principal(db, permanent_id, "matrix-permanent").permission_ids == frozenset()
+    assert principal_service._fetch_principal(db, temporary_id, "matrix-temporary").permission_ids == {1}
+
+
+def test_user_etag_changes_when_a_temporary_role_lapses(client, db, make_user, admin_headers):
+    user_id, _ = make_user("etag-temporary")
+    role_id = _assign_temporary_role(db, user_id, "etag-temporary-role")
+
+    first = client.get(f"/api/v1/users/{user_id}", headers=admin_headers)
+    assert first.status_code == 200
+    _lapse(db, user_id, role_id)
+
+    second = client.get(f"/api/v1/users/{user_id}", headers={**admin_headers, "If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+
+def test_lapsed_roles_are_hidden_from_relationships_and_responses(client, db, make_user, admin_headers):
+    user_id, _ = make_user("relationship-temporary")
+    role_id = _assign_temporary_role(db, user_id, "relationship-temporary-role")
+    assert client.get(f"/api/v1/users/{user_id}", headers=admin_headers).json()["data"]["roles"] == [
+        "relationship-temporary-role"
+    ]
+
+    _lapse(db, user_id, role_id)
+    db.expire_all()
+    user = db.get(User, user_id)
+    assert user.roles == []
+    assert user_id not in {member.id for member in db.get(Role, role_id).users}
+    assert client.get(f"/api/v1/users/{user_id}", headers=admin_headers).json()["data"]["roles"] == []
+
+
+def test_lapsed_roles_can_still_be_removed(db, make_user):
+    user_id, _ = make_user("remove-temporary")
+    role_id = _assign_temporary_role(db, user_id, "remove-temporary-role")
+    _lapse(db, user_id, role_id)
+
+    assert remove_role_from_user(db, user_id, role_id)
+    assert db.execute(select(user_roles).where(user_roles.c.user_id == user_id)).first() is None
+    assert not remove_role_from_user(db, user_id, 10**9)
+
+
+def _drain_expired(db):
+    while expire_role_assignments(db, 1000):
+        pass
+
+
+def _expired_events(db, since):
+    rows = db.execute(
+        select(OutboxEvent.payload).where(OutboxEvent.id > since, OutboxEvent.event_type == "user_roles.removed")
+    ).scalars().all()
+    return [payload for payload in map(json.loads, rows) if payload.get("reason") == "expired"]
+
+
+def test_other_users_lapses_do_not_change_a_user_cache_key(db, make_user):
+    watched_id, _ = make_user("lapse-watched")
+    other_id, _ = make_user("lapse-other")
+    role_id = _assign_temporary_role(db, other_id, "lapse-other-role")
+    before = get_user_cache_key(db, watched_id)
+
+    _lapse(db, other_id, role_id)
+    assert get_user_cache_key(db, watched_id) == before
+
+
+def test_assignments_sharing_one_expiry_are_removed_in_bounded_batches(db, make_user):
+    _drain_expired(db)
+    role = create_role(db, RoleCreate(name="bulk-temporary-role"))
+    user_ids = [make_user(f"bulk-temporary-{i}")[0] for i in range(5)]
+    for user_id in user_ids:
+        assign_role_to_user(db, user_id, role.id, datetime.now(timezone.utc) + timedelta(hours=1))
+    # 批量授予：全部分配共享同一个已过去的到期时间
+    db.execute(update(user_roles).where(user_roles.c.role_id == role.id).values(
+        expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)
+    ))
+    db.commit()
+    sequence = latest_sequence(db)
+    users_version = get_versions(db, [USERS_VERSION])[USERS_VERSION]
+    user_versions = dict(db.execute(select(User.id, User.version).where(User.id.in_(user_ids))).all())
+
+    assert [expire_role_assignments(db, 2) for _ in range(4)] == [2, 2, 1, 0]
+
+    assert db.execute(select(user_roles).where(user_roles.c.role_id == role.id)).first() is None
+    events = _expired_events(db, sequence)
+    assert len(events) == 3
+    assert sorted(user_id for event in events for user_id in event["user_ids"]) == user_ids
+    assert get_versions(db, [USERS_VERSION])[USERS_VERSION] == users_version + 3
+    db.expire_all()
+    assert all(
+        version == user_versions[user_id] + 1
+        for user_id, version in db.execute(select(User.id, User.version).where(User.id.in_(user_ids)))
+    )
+
+
+def test_extended_assignments_are_not_expired(db, make_user):
+    _drain_expired(db)
+    user_id, _ = make_user("extended-temporary")
+    role_id = _assign_temporary_role(db, user_id, "extended-temporary-role")
+    _lapse(db, user_id, role_id)
+    assign_role_to_user(db, user_id, role_id, datetime.now(timezone.utc) + timedelta(hours=1))
+
+    assert expire_role_assignments(db, 10) == 0
+    assert db.execute(select(user_roles).where(user_roles.c.user_id == user_id)).first() is not None
+
+
+def test_scheduler_sweeps_assignments_when_they_expire(db, make_user):
+    user_id, _ = make_user("scheduled-temporary")
+    role = create_role(db, RoleCreate(name="scheduled-temporary-role"))
+    sequence = latest_sequence(db)
+
+    async def run():
+        scheduler = RoleExpiryScheduler(SessionLocal, batch_size=10, refresh_interval=60)
+        await scheduler.start()
+        try:
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=0.5)
+            assign_role_to_user(db, user_id, role.id, expires_at)
+            # 本进程的分配通过 schedule 登记，无需等待下一次探测
+            scheduler.schedule(expires_at)
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                db.rollback()
+                if db.execute(select(user_roles).where(user_roles.c.user_id == user_id)).first() is None:
+                    return True
+            return False
+        finally:
+            await scheduler.stop()
+
+    assert asyncio.run(run())
+    assert any(event["user_ids"] == [user_id] for event in _expired_events(db, sequence))
+
+
+def test_replacing_roles_makes_a_lapsed_desired_assignment_permanent(db, make_user):
+    user_id, _ = make_user("replace-lapsed")
+    role_id = _assign_temporary_role(db, user_id, "replace-lapsed-role")
+    replace_role_permissions(db, role_id, [1])
+    _lapse(db, user_id, role_id)
+
+    change = replace_user_roles(db, user_id, [role_id])
+
+    assert change.added == [role_id] and change.removed == []
+    expires_at = db.execute(
+        select(user_roles.c.expires_at).where(user_roles.c.user_id == user_id, user_roles.c.role_id == role_id)
+    ).scalar_one()
+    assert expires_at is None
+    assert get_permission_ids(db, user_id) == [1]
+    # 重放同一集合不再报告变更
+    assert replace_user_roles(db, user_id, [role_id]).added == []
@@ -0,0 +1,15 @@
+"""
+路由挂载测试：各资源的列表端点不被 GET /api/v1/users/{user_id} 等路径参数路由遮蔽
+"""
+
+
+def test_jobs_listing_is_reachable(client, admin_headers):
+    response = client.get("/api/v1/jobs", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+
+
+def test_user_routes_are_mounted_under_users(client, admin_headers):
+    response = client.get("/api/v1/users/1", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["data"]["username"] == "admin"
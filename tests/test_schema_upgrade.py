@@ -0,0 +1,48 @@
+"""
+数据库结构升级测试：为缺少临时分配列的旧库补齐列与索引，并且可以重复执行
+"""
+
+from sqlalchemy import create_engine, inspect, text
+
+from backend.database.schema_upgrade import upgrade_schema
+
+
+def test_upgrade_adds_expiry_column_and_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE user_roles (user_id INTEGER NOT NULL, role_id INTEGER NOT NULL, "
+            "PRIMARY KEY (user_id, role_id))"
+        ))
+        connection.execute(text("INSERT INTO user_roles (user_id, role_id) VALUES (1, 1)"))
+
+    assert upgrade_schema(engine) == ["user_roles.expires_at"]
+    assert upgrade_schema(engine) == []
+
+    inspector = inspect(engine)
+    assert "expires_at" in {column["name"] for column in inspector.get_columns("user_roles")}
+    assert {"ix_user_roles_temporary_user", "ix_user_roles_expires_at"} <= {
+        index["name"] for index in inspector.get_indexes("user_roles")
+    }
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT expires_at FROM user_roles")).all() == [(None,)]
+
+
+def test_upgrade_skips_empty_database(tmp_path):
+    assert upgrade_schema(create_engine(f"sqlite:///{tmp_path / 'empty.db'}")) == []
+
+
+def test_upgrade_adds_user_version_with_default(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy-users.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE user_roles (user_id INTEGER NOT NULL, role_id INTEGER NOT NULL, "
+            "expires_at DATETIME, PRIMARY KEY (user_id, role_id))"
+        ))
+        connection.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(255) NOT NULL)"))
+        connection.execute(text("INSERT INTO users (id, username) VALUES (1, 'legacy')"))
+
+    assert upgrade_schema(engine) == ["users.version"]
+    assert upgrade_schema(engine) == []
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT version FROM users")).all() == [(0,)]
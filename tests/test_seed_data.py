@@ -0,0 +1,58 @@
+"""
+压测数据脚本测试：同一 seed 在空库上生成完全相同的数据，并递增数据版本使已有缓存失效
+"""
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from backend.database import Base
+from backend.database.user_models import Permission, Role, User, role_permissions, user_effective_permissions, user_roles
+from backend.database.version_models import PERMISSIONS_VERSION, ROLES_VERSION, USERS_VERSION
+from backend.scripts.seed_data import seed
+from backend.services.user.table_version_service import get_versions
+
+_VERSION_NAMES = (USERS_VERSION, ROLES_VERSION, PERMISSIONS_VERSION)
+
+# 比较时忽略由数据库填写的时间戳列
+_QUERIES = {
+    "users": select(User.id, User.username, User.email, User.password, User.status).order_by(User.id),
+    "roles": select(Role.id, Role.name, Role.description).order_by(Role.id),
+    "permissions": select(Permission.id, Permission.name, Permission.description).order_by(Permission.id),
+    "user_roles": select(user_roles).order_by(user_roles.c.user_id, user_roles.c.role_id),
+    "role_permissions": select(role_permissions).order_by(role_permissions.c.role_id, role_permissions.c.permission_id),
+    "user_effective_permissions": select(user_effective_permissions).order_by(
+        user_effective_permissions.c.user_id, user_effective_permissions.c.permission_id
+    ),
+}
+
+
+def _seeded(path, seed_value):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    counts = seed(engine, users=200, roles=20, permissions=50, seed_value=seed_value,
+                  password_hash="not-a-real-hash", batch_size=64, log=lambda message: None)
+    with Session(engine) as db:
+        rows = {name: db.execute(query).all() for name, query in _QUERIES.items()}
+        versions = get_versions(db, _VERSION_NAMES)
+    engine.dispose()
+    return counts, rows, versions
+
+
+def test_same_seed_produces_identical_rows(tmp_path):
+    first_counts, first, _ = _seeded(tmp_path / "first.db", 42)
+    second_counts, second, _ = _seeded(tmp_path / "second.db", 42)
+
+    assert first_counts == second_counts
+    assert first == second
+    assert len(first["users"]) == 200 and first["user_roles"] and first["user_effective_permissions"]
+
+
+def test_different_seeds_produce_different_memberships(tmp_path):
+    _, first, _ = _seeded(tmp_path / "first.db", 1)
+    _, second, _ = _seeded(tmp_path / "second.db", 2)
+    assert first["user_roles"] != second["user_roles"]
+
+
+def test_seeding_bumps_every_data_version(tmp_path):
+    _, _, versions = _seeded(tmp_path / "seeded.db", 0)
+    assert all(version > 0 for version in versions.values())
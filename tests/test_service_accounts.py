@@ -0,0 +1,90 @@
+"""
+服务账户与 API 密钥测试
+"""
+
+import pytest
+from sqlalchemy import func, select
+
+from backend.constants.permissions import PERMISSIONS
+from backend.database.api_key_models import ServiceAccount
+from backend.database.user_models import Permission, Role, User, user_roles
+from backend.schemas.user import RoleCreate
+from backend.services.user import service_account_service
+from backend.services.user.acl_service import grant_resource_access
+from backend.services.user.role_service import create_role, replace_role_permissions
+from backend.services.user.service_account_service import create_api_key, create_service_account
+from backend.services.user.user_service import assign_role_to_user
+
+
+def _admin_role_id(db):
+    return db.execute(select(Role.id).where(Role.name == "admin")).scalar()
+
+
+def test_service_accounts_listing_is_reachable(client, admin_headers):
+    response = client.get("/api/v1/service-accounts", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+
+
+def test_service_account_is_created_with_roles_in_one_transaction(db):
+    account = create_service_account(db, "svc-atomic", role_ids=[_admin_role_id(db)])
+    role_ids = db.execute(select(user_roles.c.role_id).where(user_roles.c.user_id == account.id)).scalars().all()
+    assert role_ids == [_admin_role_id(db)]
+
+
+def test_scoped_key_is_denied_outside_its_scope(client, db):
+    account = create_service_account(db, "svc-scoped", role_ids=[_admin_role_id(db)])
+    _, key = create_api_key(db, account.id, "reader", [PERMISSIONS["USER_READ"]])
+    headers = {"Authorization": "Bearer " + key}
+    grant_resource_access(db, "document", [7], PERMISSIONS["ROLE_READ"], "role", _admin_role_id(db))
+
+    # 账户通过 admin 角色拥有 role:read，但密钥范围只有 user:read
+    assert client.get("/api/v1/roles/", headers=headers).status_code == 403
+    response = client.post("/api/v1/acl/filter", headers=headers, json={
+        "resource_type": "document",
+        "permission": PERMISSIONS["ROLE_READ"],
+        "resource_ids": [7, 8],
+    })
+    assert response.status_code == 200
+    assert response.json()["data"]["resource_ids"] == []
+
+    response = client.post("/api/v1/acl/filter", headers=headers, json={
+        "resource_type": "document",
+        "permission": PERMISSIONS["USER_READ"],
+        "resource_ids": [7, 8],
+    })
+    assert response.json()["data"]["resource_ids"] == [7, 8]
+
+
+def test_assigning_roles_to_a_new_service_account_requires_user_update(client, db, make_user):
+    creator_id, headers = make_user("svc-creator")
+    role = create_role(db, RoleCreate(name="svc-creator-role"))
+    permission_id = db.execute(select(Permission.id).where(Permission.name == PERMISSIONS["USER_CREATE"])).scalar()
+    replace_role_permissions(db, role.id, [permission_id])
+    assign_role_to_user(db, creator_id, role.id)
+
+    response = client.post("/api/v1/service-accounts", headers=headers, json={
+        "username": "svc-escalated", "role_ids": [_admin_role_id(db)],
+    })
+    assert response.status_code == 403
+    assert db.execute(select(User.id).where(User.username == "svc-escalated")).scalar() is None
+
+    response = client.post("/api/v1/service-accounts", headers=headers, json={"username": "svc-roleless"})
+    assert response.status_code == 200
+
+
+def test_failed_creation_leaves_no_account_behind(db, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("outbox unavailable")
+
+    accounts = db.execute(select(func.count()).select_from(ServiceAccount)).scalar()
+    with pytest.raises(ValueError):
+        create_service_account(db, "svc-unknown-role", role_ids=[_admin_role_id(db), 10 ** 9])
+    monkeypatch.setattr(service_account_service, "record_change", fail)
+    with pytest.raises(RuntimeError):
+        create_service_account(db, "svc-outbox-failure", role_ids=[_admin_role_id(db)])
+    db.rollback()
+
+    usernames = ["svc-unknown-role", "svc-outbox-failure"]
+    assert db.execute(select(User.id).where(User.username.in_(usernames))).all() == []
+    assert db.execute(select(func.count()).select_from(ServiceAccount)).scalar() == accounts
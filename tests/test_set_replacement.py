@@ -0,0 +1,91 @@
+"""
+集合替换端点测试：PUT 用户角色与角色权限报告新增和移除的ID，重放同一集合不产生变更，
+不存在的目标返回 400，不存在的所有者返回 404，目标集合中已到期的临时分配改为永久分配
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+
+from backend.database.user_models import user_roles
+from backend.schemas.user import RoleCreate
+from backend.services.user.effective_permission_service import get_permission_ids
+from backend.services.user.role_service import create_role, replace_role_permissions
+from backend.services.user.user_service import assign_role_to_user
+
+
+def _put_roles(client, headers, user_id, role_ids):
+    return client.put(f"/api/v1/users/{user_id}/roles", headers=headers, json={"role_ids": role_ids})
+
+
+def _put_permissions(client, headers, role_id, permission_ids):
+    return client.put(f"/api/v1/roles/{role_id}/permissions", headers=headers, json={"permission_ids": permission_ids})
+
+
+def test_user_roles_replacement_reports_changes_and_is_idempotent(client, db, make_user, admin_headers):
+    user_id, _ = make_user("put-roles")
+    roles = [create_role(db, RoleCreate(name=f"put-roles-{i}")).id for i in range(3)]
+    assign_role_to_user(db, user_id, roles[0])
+
+    response = _put_roles(client, admin_headers, user_id, [roles[1], roles[2]])
+    assert response.status_code == 200
+    assert response.json()["data"] == {"added": [roles[1], roles[2]], "removed": [roles[0]]}
+
+    replay = _put_roles(client, admin_headers, user_id, [roles[2], roles[1]])
+    assert replay.json()["data"] == {"added": [], "removed": []}
+
+    assert _put_roles(client, admin_headers, user_id, []).json()["data"] == {"added": [], "removed": roles[1:]}
+
+
+def test_user_roles_replacement_rejects_unknown_ids(client, db, make_user, admin_headers):
+    user_id, _ = make_user("put-roles-unknown")
+    role = create_role(db, RoleCreate(name="put-roles-unknown-role")).id
+
+    assert _put_roles(client, admin_headers, user_id, [role, 999999]).status_code == 400
+    # 失败的请求不做任何修改
+    assert _put_roles(client, admin_headers, user_id, [role]).json()["data"]["added"] == [role]
+    assert _put_roles(client, admin_headers, 999999, [role]).status_code == 404
+
+
+def test_user_roles_replacement_makes_a_lapsed_assignment_permanent(client, db, make_user, admin_headers):
+    user_id, _ = make_user("put-roles-lapsed")
+    role = create_role(db, RoleCreate(name="put-roles-lapsed-role")).id
+    replace_role_permissions(db, role, [2])
+    assign_role_to_user(db, user_id, role, datetime.now(timezone.utc) + timedelta(hours=1))
+    # 到期时间已过而清理尚未运行
+    db.execute(
+        update(user_roles)
+        .where(user_roles.c.user_id == user_id, user_roles.c.role_id == role)
+        .values(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+    )
+    db.commit()
+
+    response = _put_roles(client, admin_headers, user_id, [role])
+    assert response.json()["data"] == {"added": [role], "removed": []}
+    expires_at = db.execute(
+        select(user_roles.c.expires_at).where(user_roles.c.user_id == user_id, user_roles.c.role_id == role)
+    ).scalar_one()
+    assert expires_at is None
+    assert get_permission_ids(db, user_id) == [2]
+
+
+def test_role_permissions_replacement_reports_changes_and_is_idempotent(client, db, make_user, admin_headers):
+    user_id, _ = make_user("put-permissions-member")
+    role = create_role(db, RoleCreate(name="put-permissions")).id
+    assign_role_to_user(db, user_id, role)
+    replace_role_permissions(db, role, [1, 2])
+
+    response = _put_permissions(client, admin_headers, role, [2, 3])
+    assert response.status_code == 200
+    assert response.json()["data"] == {"added": [3], "removed": [1]}
+    assert get_permission_ids(db, user_id) == [2, 3]
+
+    assert _put_permissions(client, admin_headers, role, [3, 2, 3]).json()["data"] == {"added": [], "removed": []}
+
+
+def test_role_permissions_replacement_rejects_unknown_ids(client, db, admin_headers):
+    role = create_role(db, RoleCreate(name="put-permissions-unknown")).id
+
+    assert _put_permissions(client, admin_headers, role, [1, 999999]).status_code == 400
+    assert _put_permissions(client, admin_headers, role, [1]).json()["data"] == {"added": [1], "removed": []}
+    assert _put_permissions(client, admin_headers, 999999, [1]).status_code == 404
@@ -0,0 +1,109 @@
+"""
+并发请求合并测试：同一键的并发加载只执行一次，领头调用的异常传递给全部等待者且不被缓存
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.database import SessionLocal
+from backend.services.user import principal_service
+from backend.utils.metrics import metrics
+from backend.utils.singleflight import SingleFlight
+
+_WAITERS = 4
+
+
+def _wait_for_waiters(name, count):
+    deadline = time.monotonic() + 5
+    while metrics.value("singleflight_waiters", name=name) < count:
+        assert time.monotonic() < deadline, "等待者未能加入进行中的加载"
+        time.sleep(0.005)
+
+
+def _blocking(fn, started, release):
+    """
+    包装 fn：开始执行后阻塞，直到 release 被设置
+    """
+    def wrapper(*args, **kwargs):
+        started.set()
+        assert release.wait(5)
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def _run_concurrently(flight_name, call, leader_started, release):
+    with ThreadPoolExecutor(max_workers=_WAITERS + 1) as pool:
+        leader = pool.submit(call)
+        assert leader_started.wait(5)
+        waiters = [pool.submit(call) for _ in range(_WAITERS)]
+        _wait_for_waiters(flight_name, _WAITERS)
+        release.set()
+        return [future.exception() or future.result() for future in [leader] + waiters]
+
+
+def test_concurrent_calls_share_a_single_execution():
+    flight = SingleFlight("test-shared")
+    executions = []
+    started, release = threading.Event(), threading.Event()
+    load = _blocking(lambda: executions.append(1) or object(), started, release)
+
+    results = _run_concurrently(flight.name, lambda: flight.do("key", load), started, release)
+
+    assert len(executions) == 1
+    assert all(result is results[0] for result in results)
+    # 结果不被缓存：加载完成后的调用重新执行
+    flight.do("key", lambda: executions.append(1))
+    assert len(executions) == 2
+
+
+def test_leader_exception_reaches_every_waiter_and_is_not_cached():
+    flight = SingleFlight("test-error")
+    started, release = threading.Event(), threading.Event()
+    error = RuntimeError("load failed")
+
+    def fail():
+        raise error
+
+    results = _run_concurrently(flight.name, lambda: flight.do("key", _blocking(fail, started, release)), started, release)
+
+    assert all(result is error for result in results)
+    assert flight.do("key", lambda: "recovered") == "recovered"
+
+
+def test_concurrent_principal_loads_read_the_database_once(make_user, monkeypatch):
+    user_id, _ = make_user("singleflight-principal")
+    fetches = []
+    started, release = threading.Event(), threading.Event()
+    fetch = principal_service._fetch_principal
+    monkeypatch.setattr(principal_service, "_fetch_principal",
+                        _blocking(lambda *args: fetches.append(1) or fetch(*args), started, release))
+
+    def load():
+        session = SessionLocal()
+        try:
+            user = principal_service.load_principal(session, user_id, "singleflight-principal")
+            return user.id, user.effective_permission_ids
+        finally:
+            session.close()
+
+    results = _run_concurrently(principal_service.principal_flight.name, load, started, release)
+
+    assert len(fetches) == 1
+    assert results == [(user_id, frozenset())] * (_WAITERS + 1)
+
+
+def test_principal_load_error_is_not_cached(db, make_user, monkeypatch):
+    user_id, _ = make_user("singleflight-principal-error")
+    fetch = principal_service._fetch_principal
+
+    def fail(*args):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(principal_service, "_fetch_principal", fail)
+    with pytest.raises(RuntimeError):
+        principal_service.load_principal(db, user_id, "singleflight-principal-error")
+    monkeypatch.setattr(principal_service, "_fetch_principal", fetch)
+    assert principal_service.load_principal(db, user_id, "singleflight-principal-error").id == user_id
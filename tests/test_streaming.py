@@ -0,0 +1,66 @@
+"""
+NDJSON 流式列表测试：响应类型为 application/x-ndjson，每行都是完整的 JSON 对象，
+跨越多个批次与 gzip 压缩时内容不变，权限检查在开始流式输出之前完成
+"""
+
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from backend.api.v1.user import users as users_api
+from backend.config import settings
+from backend.database.user_models import Permission, User
+from backend.utils.streaming import NDJSON_MEDIA_TYPE
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_BATCH_SIZE", 2)
+
+
+def _lines(response):
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(NDJSON_MEDIA_TYPE)
+    text = response.text
+    assert text.endswith("\n")
+    return [json.loads(line) for line in text.splitlines()]
+
+
+@pytest.mark.parametrize("path, model", [("/api/v1/users/", User), ("/api/v1/permissions/", Permission)])
+def test_ndjson_listing_streams_one_object_per_line(client, db, admin_headers, path, model):
+    response = client.get(path, headers=admin_headers, params={"format": "ndjson", "limit": 0})
+
+    rows = _lines(response)
+    ids = [row["id"] for row in rows]
+    assert ids == sorted(ids)
+    assert len(ids) == db.execute(select(func.count()).select_from(model)).scalar()
+
+
+def test_ndjson_listing_matches_the_json_page(client, admin_headers):
+    params = {"skip": 1, "limit": 3}
+    page = client.get("/api/v1/permissions/", headers=admin_headers, params=params).json()["data"]["permissions"]
+    streamed = _lines(client.get("/api/v1/permissions/", headers=admin_headers, params={**params, "format": "ndjson"}))
+    assert streamed == page
+
+
+def test_gzip_stream_decodes_to_the_same_lines(client, admin_headers):
+    params = {"format": "ndjson", "limit": 0}
+    plain = client.get("/api/v1/users/", headers={**admin_headers, "Accept-Encoding": "identity"}, params=params)
+    compressed = client.get("/api/v1/users/", headers={**admin_headers, "Accept-Encoding": "gzip"}, params=params)
+
+    assert "content-encoding" not in plain.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert _lines(compressed) == _lines(plain)
+
+
+def test_permission_is_checked_before_streaming(client, make_user, monkeypatch):
+    _, headers = make_user("ndjson-without-permission")
+    calls = []
+    monkeypatch.setattr(users_api, "iter_users", lambda *args: calls.append(args) or iter(()))
+
+    response = client.get("/api/v1/users/", headers=headers, params={"format": "ndjson"})
+
+    assert response.status_code == 403
+    assert not response.headers["content-type"].startswith(NDJSON_MEDIA_TYPE)
+    assert calls == []
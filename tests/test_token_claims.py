@@ -0,0 +1,75 @@
+"""
+令牌权限声明测试：位图编码往返、无效输入与版本不一致的处理，以及名称格式对目录外权限的回退
+"""
+
+import jwt
+import pytest
+
+from backend.config import settings
+from backend.database.user_models import User
+from backend.schemas.user import PermissionCreate, RoleCreate
+from backend.services.user.auth_service import create_access_token_for_user
+from backend.services.user.permission_catalog import permission_catalog
+from backend.services.user.permission_service import create_permission
+from backend.services.user.role_service import create_role, replace_role_permissions
+from backend.services.user.user_service import assign_role_to_user
+from backend.utils.security import (
+    PERMISSION_BITMAP_CLAIM, PERMISSION_VERSION_CLAIM,
+    decode_permission_bitmap, decode_permission_claim, encode_permission_bitmap,
+)
+
+
+@pytest.mark.parametrize("permission_ids", [set(), {0}, {1, 7, 8}, {5, 4095}, {2 ** 16 + 3, 1}])
+def test_bitmap_round_trips(permission_ids):
+    encoded = encode_permission_bitmap(permission_ids)
+    assert "=" not in encoded
+    assert decode_permission_bitmap(encoded) == permission_ids
+    assert decode_permission_claim({PERMISSION_BITMAP_CLAIM: encoded, PERMISSION_VERSION_CLAIM: 3}, 3) == permission_ids
+
+
+def test_duplicate_ids_are_merged():
+    assert encode_permission_bitmap([3, 3, 9]) == encode_permission_bitmap([9, 3])
+
+
+def test_padding_is_optional_and_invalid_bitmaps_are_rejected():
+    encoded = encode_permission_bitmap({1, 30})
+    assert decode_permission_bitmap(encoded + "=" * (-len(encoded) % 4)) == {1, 30}
+    with pytest.raises(ValueError):
+        decode_permission_bitmap("a")
+    assert decode_permission_claim({PERMISSION_BITMAP_CLAIM: "a", PERMISSION_VERSION_CLAIM: 1}, 1) is None
+
+
+def test_missing_claims_and_version_mismatch_fall_back():
+    encoded = encode_permission_bitmap({1})
+    assert decode_permission_claim({}) is None
+    assert decode_permission_claim({PERMISSION_BITMAP_CLAIM: 5}) is None
+    assert decode_permission_claim({PERMISSION_BITMAP_CLAIM: encoded, PERMISSION_VERSION_CLAIM: 1}, 2) is None
+    assert decode_permission_claim({PERMISSION_BITMAP_CLAIM: encoded}, 2) is None
+    assert decode_permission_claim({PERMISSION_BITMAP_CLAIM: encoded, PERMISSION_VERSION_CLAIM: 1}) == {1}
+
+
+def _claims(db, user):
+    return jwt.decode(create_access_token_for_user(db, user), settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
+def test_names_claim_resolves_permissions_missing_from_the_catalog(db, make_user, monkeypatch):
+    user_id, _ = make_user("claims-user")
+    permission = create_permission(db, PermissionCreate(name="claims:fresh"))
+    role = create_role(db, RoleCreate(name="claims-role"))
+    replace_role_permissions(db, role.id, [permission.id])
+    assign_role_to_user(db, user_id, role.id)
+    user = db.get(User, user_id)
+    # 模拟目录中尚没有该权限（其他进程刚创建、本进程尚未重新加载）
+    get_name = permission_catalog.get_name
+    monkeypatch.setattr(
+        permission_catalog, "get_name", lambda permission_id: None if permission_id == permission.id else get_name(permission_id)
+    )
+    assert _claims(db, user)["permissions"] == ["claims:fresh"]
+
+
+def test_both_format_writes_names_and_bitmap(db, make_user, monkeypatch):
+    user_id, _ = make_user("claims-both")
+    monkeypatch.setattr(settings, "TOKEN_PERMISSION_CLAIM_FORMAT", "both")
+    claims = _claims(db, db.get(User, user_id))
+    assert claims["permissions"] == []
+    assert decode_permission_claim(claims) == frozenset()
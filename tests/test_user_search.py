@@ -0,0 +1,44 @@
+"""
+用户搜索测试：非 ASCII 用户名的匹配与分页游标和数据库 lower() 一致，进程内前缀索引按用户增量更新
+"""
+
+from backend.schemas.user import UserCreate, UserUpdate
+from backend.services.user.user_search_service import prefix_indexes, search_users
+from backend.services.user.user_service import create_user, delete_user, update_user
+
+
+def _all_pages(db, q, **kwargs):
+    usernames, cursor = [], None
+    while True:
+        users, cursor = search_users(db, q, limit=1, cursor=cursor, **kwargs)
+        usernames.extend(user.username for user in users)
+        if cursor is None:
+            return usernames
+
+
+def test_non_ascii_prefix_pages_through_every_match(db):
+    for suffix in "abc":
+        create_user(db, UserCreate(username=f"Észak-{suffix}", password="password123"))
+
+    assert _all_pages(db, "Ész") == ["Észak-a", "Észak-b", "Észak-c"]
+    assert _all_pages(db, "ÉSZAK") == ["Észak-a", "Észak-b", "Észak-c"]
+    assert _all_pages(db, "ÉSZAK", mode="contains") == ["Észak-a", "Észak-b", "Észak-c"]
+    # SQLite 的 lower() 不转换非 ASCII 字符，搜索词按同样的规则处理
+    assert _all_pages(db, "észak") == []
+
+
+def test_prefix_index_is_updated_per_user_without_rebuilding(db):
+    index = prefix_indexes["username"]
+    search_users(db, "incremental")
+    built_at = index._built_at
+
+    user = create_user(db, UserCreate(username="Incremental-old", password="password123"))
+    assert [u.username for u in search_users(db, "incremental-o")[0]] == ["Incremental-old"]
+
+    update_user(db, user.id, UserUpdate(username="incremental-new"))
+    assert search_users(db, "incremental-o")[0] == []
+    assert [u.id for u in search_users(db, "INCREMENTAL-N")[0]] == [user.id]
+
+    delete_user(db, user.id)
+    assert search_users(db, "incremental")[0] == []
+    assert index._built_at == built_at
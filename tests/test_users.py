@@ -0,0 +1,48 @@
+"""
+用户详情 ETag 测试：按用户行的版本生成，其他用户的写入不会使其失效
+"""
+
+from backend.schemas.user import RoleCreate
+from backend.services.user.role_service import create_role
+
+
+def _etag(client, headers, user_id):
+    response = client.get(f"/api/v1/users/{user_id}", headers=headers)
+    assert response.status_code == 200
+    return response.headers["ETag"]
+
+
+def test_user_etag_ignores_writes_to_other_users(client, db, make_user, admin_headers):
+    user_id, _ = make_user("etag-watched")
+    other_id, _ = make_user("etag-other")
+    role = create_role(db, RoleCreate(name="etag-other-role"))
+    etag = _etag(client, admin_headers, user_id)
+
+    assert client.put(f"/api/v1/users/{other_id}", headers=admin_headers, json={"status": False}).status_code == 200
+    assert client.post(f"/api/v1/users/{other_id}/roles/{role.id}", headers=admin_headers).status_code == 200
+    make_user("etag-created")
+
+    response = client.get(f"/api/v1/users/{user_id}", headers={**admin_headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_user_etag_changes_on_own_profile_and_role_writes(client, db, make_user, admin_headers):
+    user_id, _ = make_user("etag-self")
+    role = create_role(db, RoleCreate(name="etag-self-role"))
+    first = _etag(client, admin_headers, user_id)
+
+    assert client.put(f"/api/v1/users/{user_id}", headers=admin_headers, json={"status": False}).status_code == 200
+    second = _etag(client, admin_headers, user_id)
+    assert second != first
+
+    assert client.post(f"/api/v1/users/{user_id}/roles/{role.id}", headers=admin_headers).status_code == 200
+    third = _etag(client, admin_headers, user_id)
+    assert third not in (first, second)
+
+    # 角色改名改变响应中的角色名称
+    assert client.put(f"/api/v1/roles/{role.id}", headers=admin_headers, json={"name": "etag-self-renamed"}).status_code == 200
+    assert _etag(client, admin_headers, user_id) != third
+
+
+def test_missing_user_is_not_found(client, admin_headers):
+    assert client.get("/api/v1/users/999999", headers=admin_headers).json()["success"] is False